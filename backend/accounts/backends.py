@@ -2,6 +2,8 @@ from django.contrib.auth.backends import ModelBackend
 from django.contrib.auth import get_user_model
 from django.db.models import Q
 
+from . import user_cache
+
 class EmailBackend(ModelBackend):
     def authenticate(self, request, email=None, password=None, **kwargs):
         UserModel = get_user_model()
@@ -16,6 +18,9 @@ class EmailBackend(ModelBackend):
     def get_user(self, user_id):
         UserModel = get_user_model()
         try:
-            return UserModel.objects.get(pk=user_id)
+            # Utilisateur et profils de rôle depuis le cache (accounts.user_cache)
+            user = user_cache.get_user(user_id)
         except UserModel.DoesNotExist:
-            return None 
\ No newline at end of file
+            return None
+        # Compte désactivé : la session n'est plus reconnue, comme avec ModelBackend
+        return user if self.user_can_authenticate(user) else None 
\ No newline at end of file
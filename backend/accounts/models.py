@@ -51,6 +51,17 @@ class Utilisateur(AbstractUser):
     def __str__(self):
         return f"{self.name} {self.first_name} ({self.email})"
     
+    def get_session_auth_hash(self):
+        """Hash de session, sans relire le mot de passe d'un utilisateur en cache
+
+        ``accounts.user_cache`` ne garde pas le hash du mot de passe, seulement
+        ce hash de session calculé au chargement.
+        """
+        cached = self.__dict__.get('_cached_session_auth_hash')
+        if cached is not None and 'password' in self.get_deferred_fields():
+            return cached
+        return super().get_session_auth_hash()
+    
     def get_preferred_languages_list(self):
         """Return a list of preferred languages"""
         return self.preferred_languages.split(',')
@@ -0,0 +1,45 @@
+"""
+Profil de rôle (Client ou Expert) de l'utilisateur de la requête.
+
+``EmailBackend.get_user`` charge l'utilisateur de la session avec ses deux
+profils (``select_related``) : ``client_profile`` et ``expert_profile`` sont
+ensuite lus sans requête pendant toute la requête HTTP, y compris quand le
+profil n'existe pas. Pour un utilisateur chargé autrement, le premier accès
+fait la requête et son résultat reste en cache sur l'instance.
+
+Les accesseurs lèvent ``Client.DoesNotExist`` / ``Expert.DoesNotExist``,
+comme ``Client.objects.get(user=user)`` qu'ils remplacent.
+"""
+
+from django.core.exceptions import ObjectDoesNotExist
+from django.http import Http404
+
+PROFILE_RELATIONS = ('client_profile', 'expert_profile')
+
+
+def get_client_profile(user):
+    return user.client_profile
+
+
+def get_expert_profile(user):
+    return user.expert_profile
+
+
+def get_role_profile(user):
+    """Profil correspondant au type de compte, ou None (admin, profil absent)"""
+    relation = {'client': 'client_profile', 'expert': 'expert_profile'}.get(
+        (user.account_type or '').lower()
+    )
+    if relation is None:
+        return None
+    try:
+        return getattr(user, relation)
+    except ObjectDoesNotExist:
+        return None
+
+
+def get_expert_profile_or_404(user):
+    try:
+        return get_expert_profile(user)
+    except ObjectDoesNotExist:
+        raise Http404('Expert profile not found')
@@ -0,0 +1,24 @@
+"""
+Signaux des comptes : invalidation de l'utilisateur en cache
+"""
+
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import user_cache
+from .models import Client, Expert
+
+
+@receiver(post_save, sender=get_user_model())
+@receiver(post_delete, sender=get_user_model())
+def forget_cached_user(sender, instance, **kwargs):
+    user_cache.invalidate(instance.pk)
+
+
+@receiver(post_save, sender=Client)
+@receiver(post_delete, sender=Client)
+@receiver(post_save, sender=Expert)
+@receiver(post_delete, sender=Expert)
+def forget_cached_profile(sender, instance, **kwargs):
+    user_cache.invalidate(instance.user_id)
@@ -0,0 +1,134 @@
+from asgiref.sync import async_to_sync
+from channels.auth import get_user as channels_get_user
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.http import Http404
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from . import roles, user_cache
+from .backends import EmailBackend
+from .models import Client, Expert
+
+
+class RoleProfileTests(TestCase):
+    """Profils Client / Expert chargés avec l'utilisateur de la session"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='client@example.com', password='x', name='Client', first_name='C', account_type='client'
+        )
+        Client.objects.get_or_create(user=self.user)
+
+    def test_profiles_come_with_the_session_user(self):
+        user = EmailBackend().get_user(self.user.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(roles.get_client_profile(user).user_id, self.user.pk)
+            self.assertEqual(roles.get_role_profile(user), roles.get_client_profile(user))
+            with self.assertRaises(Expert.DoesNotExist):
+                roles.get_expert_profile(user)
+            with self.assertRaises(Http404):
+                roles.get_expert_profile_or_404(user)
+
+    def test_view_does_not_query_the_profile_again(self):
+        self.client.force_login(self.user)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('custom_requests:api_client_requests'))
+        self.assertEqual(response.status_code, 200)
+        profile_queries = [
+            query['sql'] for query in queries.captured_queries
+            if query['sql'].startswith('SELECT') and 'FROM "accounts_client"' in query['sql']
+        ]
+        self.assertEqual(profile_queries, [])
+
+
+class UserCacheTests(TestCase):
+    """Utilisateur de la session servi par accounts.user_cache"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='cached@example.com', password='secret', name='Cached', first_name='U', account_type='client'
+        )
+        Client.objects.get_or_create(user=self.user, defaults={'origin_country': 'Maroc'})
+        user_cache.reset_stats()
+
+    def test_second_load_skips_the_database(self):
+        EmailBackend().get_user(self.user.pk)
+        with self.assertNumQueries(0):
+            user = EmailBackend().get_user(self.user.pk)
+            self.assertEqual(user.email, 'cached@example.com')
+            self.assertEqual(roles.get_client_profile(user).origin_country, 'Maroc')
+            self.assertIs(roles.get_role_profile(user).user, user)
+            with self.assertRaises(Expert.DoesNotExist):
+                roles.get_expert_profile(user)
+            user.get_session_auth_hash()
+        self.assertEqual(user_cache.stats, {'hits': 1, 'misses': 1})
+        # Mot de passe relu en base, à la demande seulement
+        self.assertTrue(user.check_password('secret'))
+
+    def test_snapshot_leaves_out_the_password_hash(self):
+        EmailBackend().get_user(self.user.pk)
+        data = user_cache.cache.get(user_cache.user_key(self.user.pk))
+        self.assertNotIn('password', data['fields'])
+        self.assertNotIn(self.user.password, data['values'])
+        self.assertEqual(data['session_auth_hash'], self.user.get_session_auth_hash())
+
+    def test_missing_user(self):
+        self.assertIsNone(EmailBackend().get_user(self.user.pk + 1000))
+
+    def test_user_and_profile_changes_invalidate_the_snapshot(self):
+        EmailBackend().get_user(self.user.pk)
+        self.user.set_password('other')
+        self.user.is_active = False
+        self.user.save()
+        user = user_cache.get_user(self.user.pk)
+        self.assertFalse(user.is_active)
+        self.assertTrue(user.check_password('other'))
+
+        profile = Client.objects.get(user=self.user)
+        profile.origin_country = 'France'
+        profile.save()
+        self.assertEqual(user_cache.get_user(self.user.pk).client_profile.origin_country, 'France')
+
+        profile.delete()
+        with self.assertRaises(Client.DoesNotExist):
+            user_cache.get_user(self.user.pk).client_profile
+        self.assertEqual(user_cache.stats['hits'], 0)
+
+    def test_password_change_ends_cached_sessions(self):
+        self.client.force_login(self.user, backend='accounts.backends.EmailBackend')
+        url = reverse('custom_requests:api_client_requests')
+        self.assertEqual(self.client.get(url).wsgi_request.user, self.user)
+        self.assertEqual(self.client.get(url).status_code, 200)
+        self.user.set_password('other')
+        self.user.save()
+        self.assertFalse(self.client.get(url).wsgi_request.user.is_authenticated)
+
+    def test_bulk_deactivation_ends_cached_sessions(self):
+        admin = get_user_model().objects.create_user(
+            email='admin@example.com', password='x', name='Admin', first_name='A', account_type='admin'
+        )
+        self.client.force_login(self.user, backend='accounts.backends.EmailBackend')
+        url = reverse('custom_requests:api_client_requests')
+        self.assertEqual(self.client.get(url).status_code, 200)
+        self.assertEqual(self.client.get(url).status_code, 200)
+        self.assertEqual(user_cache.stats['hits'], 1)
+
+        admin_client = self.client_class()
+        admin_client.force_login(admin, backend='accounts.backends.EmailBackend')
+        admin_client.post(
+            reverse('admin_bulk_toggle_users_status'),
+            {'selected_users': [self.user.pk], 'action': 'deactivate'},
+        )
+        self.assertFalse(get_user_model().objects.get(pk=self.user.pk).is_active)
+        self.assertFalse(self.client.get(url).wsgi_request.user.is_authenticated)
+
+    def test_websocket_auth_uses_the_cache(self):
+        self.client.force_login(self.user, backend='accounts.backends.EmailBackend')
+        session = self.client.session
+        dict(session.items())
+        EmailBackend().get_user(self.user.pk)
+        user = async_to_sync(channels_get_user)({'session': session})
+        self.assertEqual(user.pk, self.user.pk)
+        self.assertEqual(user_cache.stats['hits'], 1)
@@ -0,0 +1,164 @@
+"""
+Utilisateur de la session en cache.
+
+``EmailBackend.get_user`` est appelé à chaque requête authentifiée et à chaque
+connexion WebSocket (``channels.auth.AuthMiddlewareStack`` passe par le même
+backend). La ligne ``Utilisateur`` change rarement : on garde dans le cache
+Django un instantané compact (valeurs des colonnes de l'utilisateur et de son
+profil Client / Expert) et l'utilisateur est reconstruit sans requête.
+
+Le hash du mot de passe n'est pas mis en cache : l'instantané garde seulement
+le hash de session qui en dérive (``get_session_auth_hash``), ce qui suffit à
+vérifier la session à chaque requête. Le mot de passe n'est relu en base que
+si on le demande (``check_password``...). Un changement de mot de passe
+invalide l'instantané : les autres sessions sont fermées.
+
+Invalidation (``accounts.signals``, immédiate puis après validation) :
+enregistrement ou suppression de l'utilisateur (mot de passe, ``is_active``,
+type de compte, ``last_login``...) ou de son profil. Les ``update()`` en masse
+ne déclenchent pas de signal : appeler ``invalidate_many`` après coup.
+"""
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, transaction
+
+from .roles import PROFILE_RELATIONS
+
+# Incrémenter si le format de l'instantané change
+SNAPSHOT_VERSION = 2
+DEFAULT_TIMEOUT = 300
+
+stats = {
+    'hits': 0,
+    'misses': 0,
+}
+
+
+def user_key(user_id):
+    return f'accounts:user:v{SNAPSHOT_VERSION}:{user_id}'
+
+
+def get_timeout():
+    return getattr(settings, 'USER_CACHE_TIMEOUT', DEFAULT_TIMEOUT)
+
+
+# Colonnes jamais mises en cache
+EXCLUDED_FIELDS = {'password'}
+
+
+def _fields(instance):
+    return [field.attname for field in instance._meta.concrete_fields if field.attname not in EXCLUDED_FIELDS]
+
+
+def _values(instance):
+    return [getattr(instance, name) for name in _fields(instance)]
+
+
+def _from_values(model, names, values):
+    # Colonnes ajoutées depuis l'écriture de l'instantané : chargées à la demande
+    known = {field.attname for field in model._meta.concrete_fields}
+    pairs = [(name, value) for name, value in zip(names, values) if name in known]
+    return model.from_db(DEFAULT_DB_ALIAS, [name for name, _ in pairs], [value for _, value in pairs])
+
+
+def snapshot(user):
+    """Instantané sérialisable d'un utilisateur chargé avec ses profils"""
+    data = {
+        'fields': _fields(user),
+        'values': _values(user),
+        'session_auth_hash': user.get_session_auth_hash(),
+        'profiles': {},
+    }
+    for relation in PROFILE_RELATIONS:
+        profile = user._state.fields_cache.get(relation)
+        data['profiles'][relation] = None if profile is None else {
+            'fields': _fields(profile),
+            'values': _values(profile),
+        }
+    return data
+
+
+def restore(data):
+    """Utilisateur (et profils en cache) reconstruit depuis un instantané"""
+    UserModel = get_user_model()
+    user = _from_values(UserModel, data['fields'], data['values'])
+    # Lu par Utilisateur.get_session_auth_hash tant que le mot de passe n'est pas chargé
+    user._cached_session_auth_hash = data['session_auth_hash']
+    for relation in PROFILE_RELATIONS:
+        profile_data = data['profiles'].get(relation)
+        profile = None
+        if profile_data is not None:
+            model = UserModel._meta.get_field(relation).related_model
+            profile = _from_values(model, profile_data['fields'], profile_data['values'])
+            profile._state.fields_cache['user'] = user
+        # None mis en cache : l'accès lève DoesNotExist sans requête
+        user._state.fields_cache[relation] = profile
+    return user
+
+
+def load_user(user_id):
+    UserModel = get_user_model()
+    return UserModel.objects.select_related(*PROFILE_RELATIONS).get(pk=user_id)
+
+
+def get_user(user_id):
+    """Utilisateur de la session, depuis le cache si possible
+
+    Lève ``DoesNotExist`` si l'utilisateur n'existe pas.
+    """
+    timeout = get_timeout()
+    if not timeout:
+        return load_user(user_id)
+    key = user_key(user_id)
+    try:
+        data = cache.get(key)
+    except Exception as e:
+        print(f"Erreur lecture du cache utilisateur: {e}")
+        data = None
+    if data is not None:
+        try:
+            user = restore(data)
+            stats['hits'] += 1
+            return user
+        except Exception as e:
+            print(f"Instantané utilisateur illisible, rechargement: {e}")
+    stats['misses'] += 1
+    user = load_user(user_id)
+    try:
+        cache.set(key, snapshot(user), timeout=timeout)
+    except Exception as e:
+        print(f"Erreur écriture du cache utilisateur: {e}")
+    return user
+
+
+def invalidate(user_id):
+    """Oublier l'instantané d'un utilisateur
+
+    Supprimé tout de suite puis de nouveau après validation de la transaction :
+    une requête concurrente a pu entre-temps le recharger avec l'ancienne ligne.
+    """
+    key = user_key(user_id)
+    try:
+        cache.delete(key)
+    except Exception as e:
+        print(f"Erreur invalidation du cache utilisateur: {e}")
+    transaction.on_commit(lambda: cache.delete(key))
+
+
+def invalidate_many(user_ids):
+    """``invalidate`` pour plusieurs utilisateurs (après un ``update()`` en masse)"""
+    keys = [user_key(user_id) for user_id in user_ids]
+    if not keys:
+        return
+    try:
+        cache.delete_many(keys)
+    except Exception as e:
+        print(f"Erreur invalidation du cache utilisateur: {e}")
+    transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def reset_stats():
+    for key in stats:
+        stats[key] = 0
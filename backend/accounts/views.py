@@ -18,9 +18,11 @@ from django.template.loader import render_to_string
 from django.urls import reverse
 
 from .models import Utilisateur, Client, Expert, Address, Notification
+from .roles import get_client_profile, get_expert_profile, get_expert_profile_or_404
 from .forms import UserEditForm, CustomPasswordChangeForm  # Added form imports
 from custom_requests.models import Document, Message
 from services.email_notifications import EmailNotificationService
+from servicesbladi.http_cache import NO_STORE, PRIVATE, cache_policy
 
 # Authentication views
 def custom_login_view(request):
@@ -431,13 +433,13 @@ def profile_view(request):
     # Get additional profile info based on user type
     if user.account_type == 'CLIENT':
         try:
-            profile = Client.objects.get(user=user)
+            profile = get_client_profile(user)
         except Client.DoesNotExist:
             profile = None
         base_template = 'client/base.html'
     elif user.account_type == 'EXPERT':
         try:
-            profile = Expert.objects.get(user=user)
+            profile = get_expert_profile(user)
         except Expert.DoesNotExist:
             profile = None
         base_template = 'expert/base.html'
@@ -520,12 +522,12 @@ def edit_profile_view(request):
     profile_specific = None
     if user.account_type == 'CLIENT':
         try:
-            profile_specific = Client.objects.get(user=user)
+            profile_specific = get_client_profile(user)
         except Client.DoesNotExist:
             pass
     elif user.account_type == 'EXPERT':
         try:
-            profile_specific = Expert.objects.get(user=user)
+            profile_specific = get_expert_profile(user)
         except Expert.DoesNotExist:
             pass
 
@@ -583,7 +585,7 @@ def expert_availability_view(request):
     if request.user.account_type != 'EXPERT':
         raise PermissionDenied
     
-    expert = get_object_or_404(Expert, user=request.user)
+    expert = get_expert_profile_or_404(request.user)
     
     if request.method == 'POST':
         # Update availability status
@@ -607,7 +609,7 @@ def expert_services_view(request):
     if request.user.account_type != 'EXPERT':
         raise PermissionDenied
     
-    expert = get_object_or_404(Expert, user=request.user)
+    expert = get_expert_profile_or_404(request.user)
     
     # Get services offered by expert
     services = expert.services.all()
@@ -655,12 +657,12 @@ def admin_user_detail_view(request, user_id):
     # Get additional profile info based on user type
     if user.account_type == 'CLIENT':
         try:
-            profile = Client.objects.get(user=user)
+            profile = get_client_profile(user)
         except Client.DoesNotExist:
             profile = None
     elif user.account_type == 'EXPERT':
         try:
-            profile = Expert.objects.get(user=user)
+            profile = get_expert_profile(user)
         except Expert.DoesNotExist:
             profile = None
     else:
@@ -744,6 +746,7 @@ def admin_create_user_view(request):
 # API endpoints
 @csrf_exempt
 @login_required
+@cache_policy(PRIVATE)
 def api_profile(request):
     """API endpoint to get user profile"""
     user = request.user
@@ -763,7 +766,7 @@ def api_profile(request):
     # Get additional profile info based on user type
     if user.account_type == 'CLIENT':
         try:
-            profile = Client.objects.get(user=user)
+            profile = get_client_profile(user)
             profile_data = {
                 'preferred_language': profile.preferred_language,
             }
@@ -771,7 +774,7 @@ def api_profile(request):
             profile_data = {}
     elif user.account_type == 'EXPERT':
         try:
-            profile = Expert.objects.get(user=user)
+            profile = get_expert_profile(user)
             profile_data = {
                 'title': profile.title,
                 'specialty': profile.specialty,
@@ -806,6 +809,7 @@ def api_profile(request):
 
 @csrf_exempt
 @login_required
+@cache_policy(NO_STORE)
 def api_update_profile(request):
     """API endpoint to update user profile"""
     if request.method != 'POST':
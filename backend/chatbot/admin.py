@@ -1,7 +1,12 @@
 from django.contrib import admin
+from django.core.exceptions import PermissionDenied
+from django.shortcuts import redirect
+from django.urls import path
 from django.utils.html import format_html
-from django.db.models import Count
-from .models import ChatSession, ChatMessage, ChatFeedback, ChatAnalytics, ChatbotConfiguration
+from django.views.decorators.http import require_POST
+from django.db.models import Count, Sum
+from .models import ChatSession, ChatMessage, ChatFeedback, ChatAnalytics, ChatbotConfiguration, CachedResponse
+from . import response_cache
 
 
 @admin.register(ChatSession)
@@ -24,10 +29,10 @@ class ChatSessionAdmin(admin.ModelAdmin):
 
 @admin.register(ChatMessage)
 class ChatMessageAdmin(admin.ModelAdmin):
-    list_display = ['id', 'session', 'message_type', 'domain_category', 'content_preview', 'timestamp', 'response_time_ms']
+    list_display = ['id', 'session', 'message_type', 'domain_category', 'content_preview', 'timestamp', 'response_time_ms', 'time_to_first_token_ms']
     list_filter = ['message_type', 'domain_category', 'timestamp', 'is_escalated', 'needs_human_review']
     search_fields = ['content', 'session__session_id']
-    readonly_fields = ['timestamp', 'response_time_ms']
+    readonly_fields = ['timestamp', 'response_time_ms', 'time_to_first_token_ms']
     
     def content_preview(self, obj):
         return obj.content[:100] + "..." if len(obj.content) > 100 else obj.content
@@ -91,6 +96,40 @@ class ChatbotConfigurationAdmin(admin.ModelAdmin):
         super().save_model(request, obj, form, change)
 
 
+@admin.register(CachedResponse)
+class CachedResponseAdmin(admin.ModelAdmin):
+    list_display = ['normalized_question', 'domain_category', 'prompt_variant', 'api_model', 'hit_count', 'last_used_at', 'expires_at']
+    list_filter = ['domain_category', 'prompt_variant', 'api_model']
+    search_fields = ['normalized_question', 'response']
+    readonly_fields = ['key', 'hit_count', 'created_at', 'last_used_at']
+    
+    def changelist_view(self, request, extra_context=None):
+        # Afficher le taux de succès du cache dans le titre
+        total_hits = CachedResponse.objects.aggregate(total=Sum('hit_count'))['total'] or 0
+        extra_context = extra_context or {}
+        extra_context['title'] = (
+            f"Cache des réponses — {total_hits} réponses servies depuis le cache, "
+            f"taux de succès du processus : {response_cache.hit_rate():.0%} "
+            f"({response_cache.stats['hits']} succès / {response_cache.stats['misses']} échecs)"
+        )
+        extra_context['has_delete_permission'] = self.has_delete_permission(request)
+        return super().changelist_view(request, extra_context=extra_context)
+    
+    def get_urls(self):
+        # Vider tout le cache depuis un bouton de la liste : une action exige une sélection
+        purge_view = self.admin_site.admin_view(require_POST(self.purge_view))
+        return [
+            path('purge/', purge_view, name='chatbot_cachedresponse_purge'),
+        ] + super().get_urls()
+    
+    def purge_view(self, request):
+        if not self.has_delete_permission(request):
+            raise PermissionDenied
+        deleted = response_cache.purge()
+        self.message_user(request, f"Cache vidé : {deleted} réponse(s) supprimée(s)")
+        return redirect('admin:chatbot_cachedresponse_changelist')
+
+
 # Actions personnalisées
 @admin.action(description='Marquer comme nécessitant une révision humaine')
 def mark_for_human_review(modeladmin, request, queryset):
@@ -102,5 +141,12 @@ def mark_as_escalated(modeladmin, request, queryset):
     queryset.update(is_escalated=True)
 
 
+@admin.action(description='Purger les réponses sélectionnées du cache')
+def purge_selected_responses(modeladmin, request, queryset):
+    deleted = response_cache.purge(queryset)
+    modeladmin.message_user(request, f"{deleted} réponse(s) supprimée(s) du cache")
+
+
 # Ajouter les actions aux modèles appropriés
 ChatMessageAdmin.actions = [mark_for_human_review, mark_as_escalated]
+CachedResponseAdmin.actions = [purge_selected_responses]
@@ -0,0 +1,283 @@
+"""
+Agrégation des analytics du chatbot MRE.
+
+Les compteurs par message (total et par domaine) sont cumulés en mémoire dans
+chaque processus puis écrits en une seule requête ``UPDATE ... SET x = x + n``
+par jour, dès que ``CHATBOT_ANALYTICS_FLUSH_SIZE`` messages sont en attente
+ou que ``CHATBOT_ANALYTICS_FLUSH_INTERVAL`` secondes se sont écoulées (vérifié
+à chaque message et à la fin de chaque requête HTTP). Aucune
+lecture-modification-écriture : les incréments concurrents ne se perdent plus.
+Une écriture en échec remet les compteurs en attente pour la suivante.
+Un jour déjà matérialisé par ``rollup`` (``counters_rolled_up``) n'est plus
+incrémenté : ses messages y sont déjà comptés.
+
+Les métriques dérivées (sessions, utilisateurs uniques, temps de réponse
+moyen, taux d'escalade...) sont recalculées depuis ``ChatMessage`` par la
+commande ``rollup_chat_analytics``, qui matérialise aussi les compteurs par
+domaine des jours clos.
+
+Le tableau de bord ne lit que ce cumul journalier (une ligne par jour, une
+colonne par domaine) : une période de 7, 30 ou 365 jours, par jour ou par
+mois, se calcule en une requête dont le coût ne dépend pas du volume de
+messages.
+"""
+
+import atexit
+import threading
+import time
+from collections import Counter, defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Avg, Count, F, Q, Sum
+from django.db.models.functions import Coalesce, TruncDate, TruncMonth
+from django.utils import timezone
+
+from .models import ChatAnalytics, ChatMessage
+
+DEFAULT_FLUSH_SIZE = 20
+DEFAULT_FLUSH_INTERVAL = 10
+
+# Champ de ChatAnalytics incrémenté pour chaque domaine
+DOMAIN_COUNTER_FIELDS = {
+    'fiscalite': 'fiscalite_questions',
+    'immobilier': 'immobilier_questions',
+    'investissement': 'investissement_questions',
+    'administration': 'administration_questions',
+    'formation': 'formation_questions',
+}
+DEFAULT_DOMAIN_FIELD = 'off_topic_questions'
+
+# Clés des statistiques par domaine du tableau de bord
+DOMAIN_STAT_FIELDS = {
+    'fiscalite': 'fiscalite_questions',
+    'immobilier': 'immobilier_questions',
+    'investissement': 'investissement_questions',
+    'administration': 'administration_questions',
+    'formation': 'formation_questions',
+    'off_topic': 'off_topic_questions',
+}
+
+DASHBOARD_RANGES = (7, 30, 365)
+DEFAULT_DASHBOARD_DAYS = 30
+MAX_DASHBOARD_DAYS = 3 * 366
+
+_lock = threading.Lock()
+_pending = defaultdict(Counter)
+_state = {
+    'buffered': 0,
+    'last_flush': time.monotonic(),
+}
+
+stats = {
+    'recorded': 0,
+    'flushes': 0,
+    'skipped_rolled_up': 0,
+}
+
+
+def get_flush_size():
+    return getattr(settings, 'CHATBOT_ANALYTICS_FLUSH_SIZE', DEFAULT_FLUSH_SIZE)
+
+
+def get_flush_interval():
+    return getattr(settings, 'CHATBOT_ANALYTICS_FLUSH_INTERVAL', DEFAULT_FLUSH_INTERVAL)
+
+
+def record_message(domain_category, day=None):
+    """Comptabiliser un message utilisateur (écrit en base par lots)
+
+    Ne lève jamais : le message est déjà enregistré, une panne des analytics
+    ne doit pas faire échouer la réponse.
+    """
+    day = day or timezone.now().date()
+    with _lock:
+        counters = _pending[day]
+        counters['total_messages'] += 1
+        counters[DOMAIN_COUNTER_FIELDS.get(domain_category, DEFAULT_DOMAIN_FIELD)] += 1
+        _state['buffered'] += 1
+        stats['recorded'] += 1
+        should_flush = _state['buffered'] >= get_flush_size() or _flush_is_due()
+    if should_flush:
+        _flush_quietly()
+
+
+def _flush_is_due():
+    return time.monotonic() - _state['last_flush'] >= get_flush_interval()
+
+
+def flush_if_due():
+    """Écrire les compteurs en attente depuis plus de l'intervalle (fin de requête)"""
+    if _state['buffered'] and _flush_is_due():
+        _flush_quietly()
+
+
+def _flush_quietly():
+    try:
+        flush()
+    except Exception as e:
+        print(f"Erreur lors de l'écriture des analytics du chatbot: {e}")
+
+
+def flush():
+    """Écrire les compteurs en attente avec des expressions F()
+
+    En cas d'échec, les compteurs non écrits sont remis en attente et
+    l'exception remonte.
+    """
+    with _lock:
+        pending = dict(_pending)
+        _pending.clear()
+        _state['buffered'] = 0
+        _state['last_flush'] = time.monotonic()
+    if not pending:
+        return
+
+    stats['flushes'] += 1
+    try:
+        for day in list(pending):
+            _write_day(day, pending[day])
+            del pending[day]
+    except Exception:
+        _restore(pending)
+        raise
+
+
+def _write_day(day, counters):
+    increments = {field: F(field) + count for field, count in counters.items()}
+    rows = ChatAnalytics.objects.filter(date=day, counters_rolled_up=False)
+    if rows.update(**increments):
+        return
+    try:
+        with transaction.atomic():
+            ChatAnalytics.objects.create(date=day, **counters)
+    except IntegrityError:
+        # Ligne du jour déjà présente : créée entre-temps par un autre worker,
+        # ou recalculée depuis ChatMessage (ces messages y sont alors comptés)
+        if not rows.update(**increments):
+            stats['skipped_rolled_up'] += counters['total_messages']
+
+
+def _restore(pending):
+    """Remettre en attente des compteurs qui n'ont pas pu être écrits"""
+    with _lock:
+        for day, counters in pending.items():
+            _pending[day].update(counters)
+            _state['buffered'] += counters['total_messages']
+
+
+atexit.register(_flush_quietly)
+
+
+def reset_stats():
+    for key in stats:
+        stats[key] = 0
+
+
+def rollup(start_date, end_date):
+    """Recalculer les métriques dérivées depuis ChatMessage, jour par jour
+
+    Une seule requête agrégée groupée par jour ; retourne le nombre de jours
+    mis à jour. Les compteurs de messages par domaine ne sont réécrits que pour
+    les jours clos, qui sont alors marqués ``counters_rolled_up`` : un worker
+    qui écrit plus tard ses compteurs en attente pour ce jour les abandonne au
+    lieu de les compter une seconde fois. Ceux du jour courant restent
+    alimentés par les tampons des workers.
+    """
+    domain_counts = {
+        field: Count('id', filter=Q(message_type='user', domain_category=domain))
+        for domain, field in DOMAIN_COUNTER_FIELDS.items()
+    }
+    rows = (
+        ChatMessage.objects
+        .filter(timestamp__date__range=[start_date, end_date])
+        .annotate(day=TruncDate('timestamp'))
+        .values('day')
+        .annotate(
+            sessions=Count('session', distinct=True),
+            users=Count('session__user', distinct=True),
+            anonymous_visitors=Count(
+                'session__ip_address', distinct=True, filter=Q(session__user__isnull=True)
+            ),
+            user_messages=Count('id', filter=Q(message_type='user')),
+            escalated=Count('id', filter=Q(is_escalated=True)),
+            avg_response_time=Avg('response_time_ms', filter=Q(message_type='bot')),
+            satisfaction=Avg('satisfaction_rating'),
+            **domain_counts,
+        )
+        .order_by('day')
+    )
+
+    today = timezone.now().date()
+    updated = 0
+    for row in rows:
+        defaults = {
+            'total_sessions': row['sessions'],
+            'unique_users': row['users'] + row['anonymous_visitors'],
+            'avg_response_time_ms': row['avg_response_time'],
+            'escalation_rate': (
+                row['escalated'] / row['user_messages'] if row['user_messages'] else None
+            ),
+            'satisfaction_avg': row['satisfaction'],
+        }
+        if row['day'] < today:
+            counters = {field: row[field] for field in DOMAIN_COUNTER_FIELDS.values()}
+            counters[DEFAULT_DOMAIN_FIELD] = row['user_messages'] - sum(counters.values())
+            counters['total_messages'] = row['user_messages']
+            defaults.update(counters, counters_rolled_up=True)
+        ChatAnalytics.objects.update_or_create(date=row['day'], defaults=defaults)
+        updated += 1
+    return updated
+
+
+def get_period(days, end_date=None):
+    """Bornes (incluses) des ``days`` derniers jours"""
+    end_date = end_date or timezone.now().date()
+    return end_date - timedelta(days=days - 1), end_date
+
+
+def _domain_sums():
+    return {
+        key: Coalesce(Sum(field), 0)
+        for key, field in DOMAIN_STAT_FIELDS.items()
+    }
+
+
+def summarize(start_date, end_date):
+    """Totaux et répartition par domaine d'une période, en une seule requête
+
+    Retourne ``(total_stats, domain_stats)``.
+    """
+    totals = ChatAnalytics.objects.filter(date__range=[start_date, end_date]).aggregate(
+        total_sessions=Coalesce(Sum('total_sessions'), 0),
+        total_messages=Coalesce(Sum('total_messages'), 0),
+        avg_response_time=Avg('avg_response_time_ms'),
+        avg_satisfaction=Avg('satisfaction_avg'),
+        **_domain_sums(),
+    )
+    domain_stats = {key: totals.pop(key) for key in DOMAIN_STAT_FIELDS}
+    return totals, domain_stats
+
+
+def series(start_date, end_date, group='day'):
+    """Série chronologique d'une période, par jour ou par mois, en une requête"""
+    period = TruncMonth('date') if group == 'month' else F('date')
+    rows = (
+        ChatAnalytics.objects
+        .filter(date__range=[start_date, end_date])
+        .annotate(period=period)
+        .values('period')
+        .annotate(
+            sessions=Coalesce(Sum('total_sessions'), 0),
+            messages=Coalesce(Sum('total_messages'), 0),
+            avg_response_time=Avg('avg_response_time_ms'),
+            satisfaction=Avg('satisfaction_avg'),
+            **_domain_sums(),
+        )
+        .order_by('period')
+    )
+    return [
+        dict(row, period=row['period'].isoformat())
+        for row in rows
+    ]
@@ -0,0 +1,318 @@
+"""
+Disjoncteur et délestage des appels à l'API Gemini.
+
+L'état est partagé entre tous les workers via le cache Django :
+
+- fermé : les appels passent ; succès et échecs sont comptés par tranches de
+  ``BUCKET_SECONDS`` sur ``GEMINI_CIRCUIT_WINDOW_SECONDS``. Dès que
+  ``GEMINI_CIRCUIT_MIN_CALLS`` appels ont été vus et que le taux d'échec
+  atteint ``GEMINI_CIRCUIT_FAILURE_RATE``, le disjoncteur s'ouvre ;
+- ouvert : aucun appel pendant ``GEMINI_CIRCUIT_OPEN_SECONDS``, la réponse
+  de secours est servie immédiatement ;
+- semi-ouvert : un seul worker obtient le droit de sonder l'API. Un succès
+  referme le disjoncteur (compteurs remis à zéro), un échec le rouvre.
+
+Le nombre d'appels simultanés, tous workers confondus, est plafonné à
+``GEMINI_MAX_UPSTREAM_CALLS`` par un compteur partagé (``add`` puis ``incr``,
+``decr`` à la fin de l'appel : deux ou trois allers-retours vers le cache).
+Le compteur expire seul ``GEMINI_TIMEOUT_SECONDS`` + 5 s après sa création,
+ce qui rend les places d'un worker mort. Au-delà du plafond, la requête
+retente quelques fois avec un délai croissant (``QUEUE_BACKOFF_SECONDS``, au
+plus ``GEMINI_QUEUE_TIMEOUT_SECONDS`` en tout) puis reçoit la réponse de
+secours. Le compteur n'est exact qu'avec un cache à ``incr`` atomique (Redis,
+mémoire locale) ; avec le cache en base, le plafond est approximatif. Les
+clés ``circuit:`` ne passent pas par le niveau mémoire du cache à deux niveaux
+(``L1_EXCLUDE_PREFIXES``) : chaque worker lit l'état partagé à jour.
+
+Sont des échecs : erreurs réseau, délais dépassés, réponses 429 et 5xx.
+"""
+
+import asyncio
+import time
+from contextlib import asynccontextmanager, contextmanager
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+
+BUCKET_SECONDS = 10
+# Attentes successives d'une place libre (bornées par GEMINI_QUEUE_TIMEOUT_SECONDS)
+QUEUE_BACKOFF_SECONDS = (0.05, 0.15, 0.4, 1.0)
+
+DEFAULTS = {
+    'GEMINI_CIRCUIT_FAILURE_RATE': 0.5,
+    'GEMINI_CIRCUIT_MIN_CALLS': 10,
+    'GEMINI_CIRCUIT_WINDOW_SECONDS': 60,
+    'GEMINI_CIRCUIT_OPEN_SECONDS': 30,
+    'GEMINI_MAX_UPSTREAM_CALLS': 20,
+    'GEMINI_QUEUE_TIMEOUT_SECONDS': 2,
+}
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+# Compteurs du processus courant
+stats = {
+    'successes': 0,
+    'failures': 0,
+    'rejected_open': 0,
+    'rejected_busy': 0,
+    'trips': 0,
+}
+
+
+class UpstreamRejected(Exception):
+    """Appel refusé sans contacter l'API (servir la réponse de secours)"""
+
+
+class CircuitOpen(UpstreamRejected):
+    pass
+
+
+class UpstreamBusy(UpstreamRejected):
+    pass
+
+
+def get_setting(name):
+    return getattr(settings, name, DEFAULTS[name])
+
+
+def is_upstream_failure(exc):
+    """Vrai si l'exception traduit une défaillance de l'API (et non de la requête)"""
+    response = getattr(exc, 'response', None)
+    status = getattr(response, 'status_code', None)
+    if status is not None:
+        return status == 429 or status >= 500
+    # Erreur réseau ou délai dépassé (requests ou httpx)
+    return exc.__class__.__module__.split('.')[0] in ('requests', 'httpx', 'urllib3')
+
+
+class CircuitBreaker:
+    """Disjoncteur partagé via le cache, identifié par son nom"""
+
+    def __init__(self, name):
+        self.prefix = f'circuit:{name}'
+
+    # Clés de cache
+
+    def key(self, suffix):
+        return f'{self.prefix}:{suffix}'
+
+    def bucket_keys(self, generation, now=None):
+        """Clés (succès, échecs) des tranches de la fenêtre glissante"""
+        current = int((now or time.time()) // BUCKET_SECONDS)
+        count = max(get_setting('GEMINI_CIRCUIT_WINDOW_SECONDS') // BUCKET_SECONDS, 1)
+        return [
+            (self.key(f'{generation}:{bucket}:ok'), self.key(f'{generation}:{bucket}:ko'))
+            for bucket in range(current - count + 1, current + 1)
+        ]
+
+    # État
+
+    def read_state(self):
+        """(état, génération des compteurs)"""
+        values = cache.get_many([self.key('open_until'), self.key('generation')])
+        generation = values.get(self.key('generation'), 0)
+        open_until = values.get(self.key('open_until'))
+        if open_until is None:
+            return CLOSED, generation
+        if time.time() < open_until:
+            return OPEN, generation
+        return HALF_OPEN, generation
+
+    def state(self):
+        return self.read_state()[0]
+
+    def allow_request(self):
+        """Autoriser un appel ; retourne True si c'est la sonde semi-ouverte"""
+        state, _ = self.read_state()
+        if state == CLOSED:
+            return False
+        if state == HALF_OPEN and cache.add(
+            self.key('probe'), 1, timeout=get_setting('GEMINI_CIRCUIT_OPEN_SECONDS')
+        ):
+            return True
+        stats['rejected_open'] += 1
+        raise CircuitOpen('Disjoncteur Gemini ouvert')
+
+    def record_success(self, probe=False):
+        stats['successes'] += 1
+        if probe:
+            self.close()
+            return
+        _, generation = self.read_state()
+        ok_key, _ = self.bucket_keys(generation)[-1]
+        self.increment(ok_key)
+
+    def record_failure(self, probe=False):
+        stats['failures'] += 1
+        if probe:
+            self.trip()
+            return
+        state, generation = self.read_state()
+        buckets = self.bucket_keys(generation)
+        self.increment(buckets[-1][1])
+        if state != CLOSED:
+            return
+
+        counts = cache.get_many([key for pair in buckets for key in pair])
+        successes = sum(counts.get(ok, 0) for ok, _ in buckets)
+        failures = sum(counts.get(ko, 0) for _, ko in buckets)
+        total = successes + failures
+        if (total >= get_setting('GEMINI_CIRCUIT_MIN_CALLS')
+                and failures / total >= get_setting('GEMINI_CIRCUIT_FAILURE_RATE')):
+            self.trip()
+
+    def increment(self, key):
+        timeout = get_setting('GEMINI_CIRCUIT_WINDOW_SECONDS') + BUCKET_SECONDS
+        if not cache.add(key, 1, timeout=timeout):
+            try:
+                cache.incr(key)
+            except ValueError:
+                cache.set(key, 1, timeout=timeout)
+
+    def trip(self):
+        """Ouvrir le disjoncteur"""
+        stats['trips'] += 1
+        open_seconds = get_setting('GEMINI_CIRCUIT_OPEN_SECONDS')
+        cache.set(self.key('open_until'), time.time() + open_seconds, timeout=None)
+        cache.delete(self.key('probe'))
+        print(f"Disjoncteur Gemini ouvert pour {open_seconds} s")
+
+    def close(self):
+        """Refermer le disjoncteur et repartir de compteurs vides"""
+        try:
+            cache.incr(self.key('generation'))
+        except ValueError:
+            cache.set(self.key('generation'), int(time.time()), timeout=None)
+        cache.delete_many([self.key('open_until'), self.key('probe')])
+
+    # Plafond d'appels simultanés
+
+    def try_acquire_slot(self):
+        """Réserver une place d'appel, ou None si le plafond est atteint"""
+        slot = self.key('in_flight')
+        # Compteur expirant seul : les places d'un worker mort sont rendues
+        lease = int(getattr(settings, 'GEMINI_TIMEOUT_SECONDS', 15)) + 5
+        cache.add(slot, 0, timeout=lease)
+        try:
+            count = cache.incr(slot)
+        except ValueError:
+            # Compteur expiré entre add et incr : place refusée pour cette tentative
+            return None
+        if count > get_setting('GEMINI_MAX_UPSTREAM_CALLS'):
+            self.release_slot(slot)
+            return None
+        return slot
+
+    def backoff_delays(self):
+        """Attentes entre deux tentatives, bornées par le délai de file"""
+        deadline = time.monotonic() + get_setting('GEMINI_QUEUE_TIMEOUT_SECONDS')
+        for delay in QUEUE_BACKOFF_SECONDS:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            yield min(delay, remaining)
+
+    def acquire_slot(self):
+        """Réserver une place d'appel, en quelques tentatives au plus"""
+        delays = self.backoff_delays()
+        slot = self.try_acquire_slot()
+        while slot is None:
+            delay = next(delays, None)
+            if delay is None:
+                stats['rejected_busy'] += 1
+                raise UpstreamBusy("Trop d'appels Gemini simultanés")
+            time.sleep(delay)
+            slot = self.try_acquire_slot()
+        return slot
+
+    async def async_acquire_slot(self):
+        """Équivalent asynchrone de ``acquire_slot`` (attente sans bloquer la boucle)"""
+        delays = self.backoff_delays()
+        slot = await sync_to_async(self.try_acquire_slot)()
+        while slot is None:
+            delay = next(delays, None)
+            if delay is None:
+                stats['rejected_busy'] += 1
+                raise UpstreamBusy("Trop d'appels Gemini simultanés")
+            await asyncio.sleep(delay)
+            slot = await sync_to_async(self.try_acquire_slot)()
+        return slot
+
+    def release_slot(self, slot):
+        try:
+            if cache.decr(slot) < 0:
+                # Compteur expiré puis recréé pendant l'appel : ne pas descendre sous zéro
+                cache.incr(slot)
+        except ValueError:
+            # Compteur expiré : plus rien à rendre
+            pass
+
+    # Utilisation
+
+    @contextmanager
+    def guard(self):
+        """Encadrer un appel synchrone à l'API
+
+        Lève ``UpstreamRejected`` si l'appel ne doit pas être tenté.
+        """
+        probe = self.allow_request()
+        try:
+            slot = self.acquire_slot()
+        except UpstreamBusy:
+            if probe:
+                cache.delete(self.key('probe'))
+            raise
+        try:
+            yield
+        except Exception as e:
+            if is_upstream_failure(e):
+                self.record_failure(probe)
+            elif probe:
+                self.record_success(probe)
+            raise
+        else:
+            self.record_success(probe)
+        finally:
+            self.release_slot(slot)
+
+    @asynccontextmanager
+    async def async_guard(self):
+        """Équivalent de ``guard`` pour la passerelle asynchrone
+
+        Les opérations sur le cache s'exécutent hors de la boucle
+        d'événements ; une annulation (client parti) n'est pas un échec.
+        """
+        probe = await sync_to_async(self.allow_request)()
+        try:
+            slot = await self.async_acquire_slot()
+        except UpstreamBusy:
+            if probe:
+                await sync_to_async(cache.delete)(self.key('probe'))
+            raise
+        try:
+            yield
+        except Exception as e:
+            if is_upstream_failure(e):
+                await sync_to_async(self.record_failure)(probe)
+            elif probe:
+                await sync_to_async(self.record_success)(probe)
+            raise
+        except BaseException:
+            if probe:
+                await sync_to_async(cache.delete)(self.key('probe'))
+            raise
+        else:
+            await sync_to_async(self.record_success)(probe)
+        finally:
+            await sync_to_async(self.release_slot)(slot)
+
+
+gemini_breaker = CircuitBreaker('gemini')
+
+
+def reset_stats():
+    for key in stats:
+        stats[key] = 0
@@ -0,0 +1,253 @@
+"""
+Classification par domaine des messages du chatbot MRE.
+
+Les mots-clés de chaque langue (fr, en, ar) sont lus dans la configuration
+(``domain_keywords_fr``, ``domain_keywords_en``, ``domain_keywords_ar`` :
+objet JSON ``{"domaine": ["mot", ...]}``), à défaut dans ``DEFAULT_KEYWORDS``.
+Ils sont compilés en une seule expression régulière, recompilée seulement
+quand la configuration change :
+
+- recherche insensible à la casse et aux accents, limitée aux mots entiers
+  (``carte`` ne correspond plus à « écarter ») ;
+- pluriels latins acceptés (``impôt`` couvre « impôts ») ;
+- préfixes arabes usuels acceptés (و، ف، ب، ل، ك puis l'article ال) ;
+- un mot-clé écrit en majuscules (``IR``, ``IS``) est un sigle, comparé en
+  respectant la casse.
+
+Chaque occurrence compte un point pour son domaine ; ``score_domains``
+retourne la part de chaque domaine et ``classify`` le domaine majoritaire.
+"""
+
+import json
+import re
+import threading
+import unicodedata
+
+from . import config
+
+LANGUAGES = ('fr', 'en', 'ar')
+DOMAINS = ('fiscalite', 'immobilier', 'investissement', 'administration', 'formation')
+DEFAULT_DOMAIN = 'other'
+CONFIG_KEY_PREFIX = 'domain_keywords_'
+
+DEFAULT_KEYWORDS = {
+    'fr': {
+        'fiscalite': ['impôt', 'taxe', 'déclaration', 'fiscal', 'fiscale', 'fiscalité', 'tva',
+                      'IR', 'IS', 'convention'],
+        'immobilier': ['maison', 'appartement', 'terrain', 'achat', 'vente', 'location',
+                       'immobilier', 'logement'],
+        'investissement': ['investir', 'investissement', 'placement', 'bourse', 'opcvm', 'action',
+                           'obligation', 'projet'],
+        'administration': ['consulat', 'passeport', 'visa', 'état civil', 'document', 'carte'],
+        'formation': ['formation', 'diplôme', 'certification', 'cours', 'apprentissage', 'métier'],
+    },
+    'en': {
+        'fiscalite': ['tax', 'taxes', 'income tax', 'tax return', 'vat', 'fiscal'],
+        'immobilier': ['house', 'apartment', 'flat', 'land', 'property', 'real estate', 'rent',
+                       'mortgage'],
+        'investissement': ['invest', 'investment', 'stock', 'shares', 'bond', 'fund', 'savings'],
+        'administration': ['consulate', 'passport', 'visa', 'civil status', 'birth certificate',
+                           'id card', 'paperwork'],
+        'formation': ['training', 'diploma', 'degree', 'certificate', 'course', 'apprenticeship'],
+    },
+    'ar': {
+        'fiscalite': ['ضريبة', 'ضرائب', 'تصريح ضريبي', 'جبايات'],
+        'immobilier': ['منزل', 'شقة', 'أرض', 'عقار', 'عقارات', 'كراء', 'إيجار'],
+        'investissement': ['استثمار', 'بورصة', 'أسهم', 'سندات', 'مشروع'],
+        'administration': ['قنصلية', 'جواز السفر', 'جواز', 'تأشيرة', 'الحالة المدنية', 'بطاقة',
+                           'وثيقة', 'وثائق'],
+        'formation': ['تكوين', 'تدريب', 'شهادة', 'دبلوم', 'دورة', 'مهنة'],
+    },
+}
+
+ARABIC_RE = re.compile(r'[؀-ۿ]')
+ARABIC_PREFIX = r'(?:[وفبلك])?(?:ال)?'
+LATIN_PLURAL = r'(?:e?s|x)?'
+
+
+def strip_accents(text):
+    """Supprimer accents et signes diacritiques (casse conservée)"""
+    text = unicodedata.normalize('NFKD', text)
+    return ''.join(c for c in text if not unicodedata.combining(c))
+
+
+def normalize_keyword(keyword):
+    """Forme de comparaison d'un mot-clé (les sigles gardent leur casse)"""
+    keyword = ' '.join(strip_accents(keyword).split())
+    return keyword if keyword.isupper() else keyword.lower()
+
+
+def _trie_pattern(node):
+    """Motif regex d'un nœud de trie (branches les plus longues d'abord)"""
+    alternatives = [
+        (r'\s+' if char == ' ' else re.escape(char)) + _trie_pattern(child)
+        for char, child in sorted(node.items()) if char != ''
+    ]
+    if '' in node:
+        # Fin de mot-clé, essayée en dernier : suffixe éventuel (pluriel)
+        alternatives.append(node[''])
+    if len(alternatives) == 1:
+        return alternatives[0]
+    return '(?:' + '|'.join(alternatives) + ')'
+
+
+def trie_pattern(keywords):
+    """Motif regex factorisé d'un ensemble de mots-clés normalisés
+
+    Les préfixes communs sont partagés : le moteur n'explore que les
+    branches compatibles avec le texte, au lieu d'essayer chaque mot-clé.
+    """
+    trie = {}
+    for keyword in keywords:
+        node = trie
+        for char in keyword:
+            node = node.setdefault(char, {})
+        arabic = ARABIC_RE.search(keyword)
+        node[''] = LATIN_PLURAL if not arabic and not keyword.isupper() and len(keyword) > 2 else ''
+    return _trie_pattern(trie)
+
+
+def domain_pattern(keywords):
+    """Motif d'un domaine : mots latins, mots arabes (préfixes) et sigles"""
+    latin, arabic, acronyms = [], [], []
+    for keyword in keywords:
+        if keyword.isupper():
+            acronyms.append(keyword)
+        elif ARABIC_RE.search(keyword):
+            # L'article est couvert par le préfixe optionnel
+            arabic.append(keyword[len('ال'):] if keyword.startswith('ال') else keyword)
+        else:
+            latin.append(keyword)
+
+    alternatives = []
+    if latin:
+        alternatives.append(trie_pattern(latin))
+    if arabic:
+        alternatives.append(ARABIC_PREFIX + trie_pattern(arabic))
+    if acronyms:
+        alternatives.append(f'(?-i:{trie_pattern(acronyms)})')
+    return '|'.join(alternatives)
+
+
+def is_keyword_table(table):
+    """Vrai pour un objet ``{"domaine": ["mot", ...]}``"""
+    return isinstance(table, dict) and all(
+        isinstance(domain, str)
+        and isinstance(keywords, (list, tuple))
+        and all(isinstance(keyword, str) for keyword in keywords)
+        for domain, keywords in table.items()
+    )
+
+
+def checked_table(language, table):
+    """La table si sa forme est valide, sinon celle par défaut de la langue"""
+    if is_keyword_table(table):
+        return table
+    print(
+        f"Erreur: mots-clés {language} invalides (objet {{domaine: [mots]}} attendu), "
+        f"mots-clés par défaut utilisés: {table!r:.100}"
+    )
+    return DEFAULT_KEYWORDS[language]
+
+
+class DomainClassifier:
+    """Classifieur compilé à partir de tables de mots-clés par langue"""
+
+    def __init__(self, keywords_by_language):
+        # Mots-clés normalisés par domaine (un mot-clé appartient au premier domaine déclaré)
+        self.keywords = {}
+        seen = set()
+        if not isinstance(keywords_by_language, dict):
+            print(f"Erreur: tables de mots-clés invalides: {keywords_by_language!r:.100}")
+            keywords_by_language = DEFAULT_KEYWORDS
+        for language in LANGUAGES:
+            table = checked_table(language, keywords_by_language.get(language, {}))
+            for domain, keywords in table.items():
+                if domain not in DOMAINS:
+                    print(f"Erreur: domaine inconnu '{domain}' dans les mots-clés {language}")
+                    continue
+                for keyword in keywords:
+                    normalized = normalize_keyword(keyword)
+                    if normalized and normalized not in seen:
+                        seen.add(normalized)
+                        self.keywords.setdefault(domain, []).append(normalized)
+
+        # Un groupe nommé par domaine : match.lastgroup donne le domaine
+        alternatives = [
+            f'(?P<{domain}>{domain_pattern(keywords)})'
+            for domain, keywords in self.keywords.items()
+        ]
+        self.regex = re.compile(
+            r'(?<!\w)(?:' + '|'.join(alternatives) + r')(?!\w)', re.IGNORECASE
+        ) if alternatives else None
+
+    def count_hits(self, text):
+        """Nombre d'occurrences de mots-clés par domaine"""
+        hits = {}
+        if not text or self.regex is None:
+            return hits
+        for match in self.regex.finditer(strip_accents(text)):
+            hits[match.lastgroup] = hits.get(match.lastgroup, 0) + 1
+        return hits
+
+    def score_domains(self, text):
+        """Liste ``[(domaine, score)]`` triée par score décroissant (somme = 1)"""
+        hits = self.count_hits(text)
+        total = sum(hits.values())
+        if not total:
+            return []
+        # À égalité, l'ordre de DOMAINS départage (comme l'ancienne classification)
+        order = {domain: index for index, domain in enumerate(DOMAINS)}
+        return sorted(
+            ((domain, count / total) for domain, count in hits.items()),
+            key=lambda item: (-item[1], order.get(item[0], len(order))),
+        )
+
+    def classify(self, text):
+        """Domaine le plus représenté, ou ``other``"""
+        scores = self.score_domains(text)
+        return scores[0][0] if scores else DEFAULT_DOMAIN
+
+
+def load_keywords():
+    """Tables de mots-clés par langue, depuis la configuration si présente"""
+    keywords = {}
+    for language in LANGUAGES:
+        raw = config.get_value(CONFIG_KEY_PREFIX + language)
+        table = DEFAULT_KEYWORDS[language]
+        if raw:
+            try:
+                table = checked_table(language, json.loads(raw))
+            except ValueError as e:
+                print(f"Erreur: mots-clés {language} invalides dans la configuration: {e}")
+        keywords[language] = table
+    return keywords
+
+
+_lock = threading.Lock()
+_compiled = {
+    'source': None,
+    'classifier': None,
+}
+
+
+def get_classifier():
+    """Classifieur partagé, recompilé quand les mots-clés configurés changent"""
+    source = tuple(config.get_value(CONFIG_KEY_PREFIX + language) for language in LANGUAGES)
+    classifier = _compiled['classifier']
+    if classifier is not None and _compiled['source'] == source:
+        return classifier
+
+    with _lock:
+        if _compiled['classifier'] is None or _compiled['source'] != source:
+            _compiled['classifier'] = DomainClassifier(load_keywords())
+            _compiled['source'] = source
+        return _compiled['classifier']
+
+
+def classify(text):
+    return get_classifier().classify(text)
+
+
+def score_domains(text):
+    return get_classifier().score_domains(text)
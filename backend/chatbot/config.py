@@ -0,0 +1,105 @@
+"""
+Vue en cache, par processus, de la configuration du chatbot MRE.
+
+Toutes les lignes actives de ``ChatbotConfiguration`` sont chargées en une
+seule requête dans un instantané local au processus. Chaque modification
+(``set_value``, admin, commande ``init_chatbot_config``) incrémente une clé de
+version partagée dans le cache Django : chaque worker gunicorn compare sa
+version au plus toutes les ``CHATBOT_CONFIG_CHECK_INTERVAL`` secondes et
+recharge l'instantané si elle a changé.
+"""
+
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+VERSION_CACHE_KEY = 'chatbot:config:version'
+
+# Délai maximal (en secondes) avant qu'un worker ne voie une modification
+DEFAULT_CHECK_INTERVAL = 30
+
+_lock = threading.Lock()
+_snapshot = {
+    'values': None,
+    'version': None,
+    'checked_at': 0.0,
+}
+
+# Compteurs pour vérifier que le chemin critique ne fait pas de requêtes
+stats = {
+    'db_loads': 0,
+    'version_checks': 0,
+    'lookups': 0,
+}
+
+
+def get_check_interval():
+    """Intervalle de vérification de la version partagée"""
+    return getattr(settings, 'CHATBOT_CONFIG_CHECK_INTERVAL', DEFAULT_CHECK_INTERVAL)
+
+
+def get_shared_version():
+    """Lire la version partagée (créée si absente)"""
+    version = cache.get(VERSION_CACHE_KEY)
+    if version is None:
+        cache.add(VERSION_CACHE_KEY, 1, timeout=None)
+        version = cache.get(VERSION_CACHE_KEY, 1)
+    return version
+
+
+def _load_values():
+    """Charger toutes les configurations actives en une seule requête"""
+    from .models import ChatbotConfiguration
+
+    stats['db_loads'] += 1
+    return dict(
+        ChatbotConfiguration.objects.filter(is_active=True).values_list('key', 'value')
+    )
+
+
+def get_snapshot():
+    """Retourner l'instantané courant, rechargé si la version a changé"""
+    now = time.monotonic()
+    values = _snapshot['values']
+    if values is not None and now - _snapshot['checked_at'] < get_check_interval():
+        return values
+
+    with _lock:
+        if _snapshot['values'] is not None and now - _snapshot['checked_at'] < get_check_interval():
+            return _snapshot['values']
+
+        stats['version_checks'] += 1
+        version = get_shared_version()
+        if _snapshot['values'] is None or version != _snapshot['version']:
+            _snapshot['values'] = _load_values()
+            _snapshot['version'] = version
+        _snapshot['checked_at'] = now
+        return _snapshot['values']
+
+
+def get_value(key, default=None):
+    """Récupérer une valeur de configuration depuis l'instantané"""
+    stats['lookups'] += 1
+    return get_snapshot().get(key, default)
+
+
+def invalidate():
+    """Invalider l'instantané local et incrémenter la version partagée"""
+    try:
+        cache.incr(VERSION_CACHE_KEY)
+    except ValueError:
+        # Clé absente ou expirée : repartir d'une nouvelle version
+        cache.set(VERSION_CACHE_KEY, int(time.time()), timeout=None)
+
+    with _lock:
+        _snapshot['values'] = None
+        _snapshot['version'] = None
+        _snapshot['checked_at'] = 0.0
+
+
+def reset_stats():
+    """Remettre les compteurs à zéro"""
+    for key in stats:
+        stats[key] = 0
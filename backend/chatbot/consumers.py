@@ -0,0 +1,264 @@
+"""
+Points d'entrée asynchrones du chatbot MRE, servis par l'application ASGI.
+
+Contrairement à ``ChatAPIView`` (worker gunicorn synchrone bloqué pendant
+tout l'appel Gemini), l'attente de l'API ne monopolise ici aucun thread :
+seules les opérations en base passent par ``database_sync_to_async``.
+"""
+
+import asyncio
+import json
+import time
+
+import httpx
+from channels.db import database_sync_to_async
+from channels.generic.http import AsyncHttpConsumer
+from django.contrib.auth.models import AnonymousUser
+
+from . import circuit_breaker
+from . import gemini
+from .models import ChatMessage
+from .views import ChatAPIView
+
+
+class AsyncChatConsumer(AsyncHttpConsumer):
+    """API de chat asynchrone (même contrat JSON que ChatAPIView)"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.chat = ChatAPIView()
+        self.handle_task = None
+
+    async def http_request(self, message):
+        """Traiter la requête dans une tâche séparée
+
+        La boucle de réception reste ainsi disponible pour recevoir
+        ``http.disconnect`` et annuler l'appel Gemini en cours.
+        """
+        if "body" in message:
+            self.body.append(message["body"])
+        if not message.get("more_body"):
+            self.handle_task = asyncio.ensure_future(self.handle(b"".join(self.body)))
+
+    async def disconnect(self):
+        """Annuler le traitement si le client s'est déconnecté"""
+        if self.handle_task and not self.handle_task.done():
+            self.handle_task.cancel()
+
+    async def handle(self, body):
+        if self.scope.get('method') != 'POST':
+            return await self.send_json({'error': 'Méthode non autorisée'}, status=405)
+
+        try:
+            data = json.loads(body)
+            user_message = data.get('message', '').strip()
+            session_id = data.get('session_id')
+
+            if not user_message:
+                return await self.send_json({'error': 'Message requis'}, status=400)
+
+            session, user_msg = await self.save_user_message(user_message, session_id)
+
+            # Générer la réponse du bot
+            start_time = time.time()
+            bot_response = await self.generate_bot_response(user_message, session)
+            response_time = int((time.time() - start_time) * 1000)
+
+            bot_msg = await self.save_bot_message(session, user_msg, bot_response, response_time)
+
+            await self.send_json({
+                'response': bot_response,
+                'session_id': session.session_id,
+                'message_id': bot_msg.id,
+                'response_time': response_time
+            })
+
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            await self.send_json({'error': str(e)}, status=500)
+
+    async def send_json(self, data, status=200):
+        await self.send_response(
+            status,
+            json.dumps(data).encode('utf-8'),
+            headers=[(b'Content-Type', b'application/json')],
+        )
+
+    async def generate_bot_response(self, user_message, session):
+        """Générer la réponse via la passerelle Gemini asynchrone"""
+        try:
+            prepared = await database_sync_to_async(self.chat.prepare_gemini_request)(
+                user_message, session
+            )
+            if isinstance(prepared, str):
+                return prepared
+
+            async with circuit_breaker.gemini_breaker.async_guard():
+                data = await gemini.get_gateway().generate(
+                    prepared.model, prepared.api_key, prepared.payload
+                )
+
+            return await database_sync_to_async(self.chat.finalize_bot_response)(
+                gemini.extract_text(data), session, prepared.cache_key, prepared.recent_messages
+            )
+
+        except asyncio.CancelledError:
+            raise
+        except circuit_breaker.UpstreamRejected as e:
+            print(f"Appel API Gemini évité: {e}")
+            return self.chat.get_fallback_response()
+        except httpx.HTTPError as e:
+            print(f"Erreur de requête API Gemini: {e}")
+            return self.chat.get_fallback_response()
+        except Exception as e:
+            print(f"Erreur inattendue: {e}")
+            return self.chat.get_fallback_response()
+
+    @database_sync_to_async
+    def save_user_message(self, user_message, session_id):
+        """Créer ou récupérer la session et enregistrer le message utilisateur"""
+        session = self.chat.get_or_create_session(ScopeRequest(self.scope), session_id)
+        user_msg = ChatMessage.objects.create(
+            session=session,
+            message_type='user',
+            content=user_message,
+            domain_category=self.chat.classify_domain(user_message)
+        )
+        return session, user_msg
+
+    @database_sync_to_async
+    def save_bot_message(self, session, user_msg, bot_response, response_time,
+                         time_to_first_token=None):
+        """Enregistrer la réponse du bot et mettre à jour les analytics"""
+        bot_msg = ChatMessage.objects.create(
+            session=session,
+            message_type='bot',
+            content=bot_response,
+            response_time_ms=response_time,
+            # Sans streaming, rien n'est affiché avant la réponse complète
+            time_to_first_token_ms=time_to_first_token if time_to_first_token is not None else response_time,
+            domain_category=user_msg.domain_category
+        )
+        self.chat.update_analytics(user_msg.domain_category)
+        return bot_msg
+
+
+class StreamingChatConsumer(AsyncChatConsumer):
+    """API de chat en flux (Server-Sent Events) via streamGenerateContent
+
+    Événements envoyés au navigateur :
+    - ``token`` : fragment de texte à afficher immédiatement
+    - ``done`` : réponse finale validée, identifiants et temps mesurés
+    - ``error`` : erreur survenue après le début du flux
+    """
+
+    headers_sent = False
+
+    async def handle(self, body):
+        if self.scope.get('method') != 'POST':
+            return await self.send_json({'error': 'Méthode non autorisée'}, status=405)
+
+        try:
+            data = json.loads(body)
+            user_message = data.get('message', '').strip()
+            session_id = data.get('session_id')
+
+            if not user_message:
+                return await self.send_json({'error': 'Message requis'}, status=400)
+
+            session, user_msg = await self.save_user_message(user_message, session_id)
+
+            await self.send_headers(headers=[
+                (b'Content-Type', b'text/event-stream; charset=utf-8'),
+                (b'Cache-Control', b'no-cache'),
+                (b'X-Accel-Buffering', b'no'),  # Pas de mise en tampon par le proxy
+            ])
+            self.headers_sent = True
+
+            start_time = time.time()
+            bot_response, time_to_first_token = await self.stream_bot_response(
+                user_message, session, start_time
+            )
+            response_time = int((time.time() - start_time) * 1000)
+
+            bot_msg = await self.save_bot_message(
+                session, user_msg, bot_response, response_time, time_to_first_token
+            )
+
+            await self.send_event('done', {
+                'response': bot_response,
+                'session_id': session.session_id,
+                'message_id': bot_msg.id,
+                'response_time': response_time,
+                'time_to_first_token': time_to_first_token,
+            }, more_body=False)
+
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            if self.headers_sent:
+                await self.send_event('error', {'error': str(e)}, more_body=False)
+            else:
+                await self.send_json({'error': str(e)}, status=500)
+
+    async def send_event(self, event, data, more_body=True):
+        """Envoyer un événement SSE"""
+        payload = f"event: {event}\ndata: {json.dumps(data)}\n\n"
+        await self.send_body(payload.encode('utf-8'), more_body=more_body)
+
+    async def stream_bot_response(self, user_message, session, start_time):
+        """Relayer les fragments Gemini et retourner (réponse finale, délai du 1er fragment)"""
+        time_to_first_token = None
+        try:
+            prepared = await database_sync_to_async(self.chat.prepare_gemini_request)(
+                user_message, session
+            )
+            if isinstance(prepared, str):
+                return prepared, None
+
+            chunks = []
+            gateway = gemini.get_gateway()
+            async with circuit_breaker.gemini_breaker.async_guard():
+                async for text in gateway.stream(prepared.model, prepared.api_key, prepared.payload):
+                    if time_to_first_token is None:
+                        time_to_first_token = int((time.time() - start_time) * 1000)
+                    chunks.append(text)
+                    await self.send_event('token', {'text': text})
+
+            bot_response = await database_sync_to_async(self.chat.finalize_bot_response)(
+                ''.join(chunks) if chunks else None, session,
+                prepared.cache_key, prepared.recent_messages
+            )
+            return bot_response, time_to_first_token
+
+        except asyncio.CancelledError:
+            raise
+        except circuit_breaker.UpstreamRejected as e:
+            print(f"Appel API Gemini évité: {e}")
+        except httpx.HTTPError as e:
+            print(f"Erreur de requête API Gemini: {e}")
+        except Exception as e:
+            print(f"Erreur inattendue: {e}")
+        return self.chat.get_fallback_response(), time_to_first_token
+
+
+class ScopeRequest:
+    """Adaptateur minimal exposant un scope ASGI comme une requête Django
+
+    Suffisant pour ``ChatAPIView.get_or_create_session`` (user et META).
+    """
+
+    def __init__(self, scope):
+        self.user = scope.get('user') or AnonymousUser()
+        headers = {
+            name.decode('latin1').upper().replace('-', '_'): value.decode('latin1')
+            for name, value in scope.get('headers', [])
+        }
+        client = scope.get('client') or (None, None)
+        self.META = {
+            'HTTP_USER_AGENT': headers.get('USER_AGENT', ''),
+            'REMOTE_ADDR': client[0],
+        }
+        if 'X_FORWARDED_FOR' in headers:
+            self.META['HTTP_X_FORWARDED_FOR'] = headers['X_FORWARDED_FOR']
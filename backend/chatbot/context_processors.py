@@ -1,6 +1,7 @@
 """
 Context processors pour le chatbot MRE
 """
+from django.conf import settings
 
 def chatbot_context(request):
     """
@@ -12,5 +13,6 @@ def chatbot_context(request):
         'chatbot_config': {
             'show_on_all_pages': True,
             'auto_open_for_new_users': False,
+            'streaming': getattr(settings, 'CHATBOT_STREAMING_ENABLED', False),
         }
     }
@@ -0,0 +1,163 @@
+"""
+Passerelle vers l'API Gemini pour le chatbot MRE.
+
+La construction des requêtes est partagée entre la vue synchrone
+(``ChatAPIView``) et le point d'entrée asynchrone servi par l'application
+ASGI. La passerelle asynchrone réutilise un client HTTP unique par boucle
+d'événements (connexions keep-alive mises en commun) et limite le nombre
+d'appels simultanés par hôte amont.
+"""
+
+import asyncio
+import json
+import weakref
+from collections import namedtuple
+from urllib.parse import urlsplit
+
+import httpx
+from django.conf import settings
+
+DEFAULT_API_BASE_URL = 'https://generativelanguage.googleapis.com/v1beta'
+DEFAULT_TIMEOUT_SECONDS = 15
+DEFAULT_MAX_CONCURRENCY = 50
+DEFAULT_MAX_KEEPALIVE = 20
+
+# Appel Gemini préparé par ChatAPIView.prepare_gemini_request
+GeminiRequest = namedtuple(
+    'GeminiRequest', ['model', 'api_key', 'payload', 'cache_key', 'recent_messages']
+)
+
+GENERATION_CONFIG = {
+    "temperature": 0.7,  # Réduit pour plus de cohérence
+    "topK": 20,  # Réduit pour plus de précision
+    "topP": 0.8,  # Réduit pour éviter les répétitions
+    "maxOutputTokens": 800,  # Réduit pour des réponses plus concises
+    "stopSequences": ["Question:", "Réponse:", "User:", "Assistant:"]
+}
+
+SAFETY_SETTINGS = [
+    {
+        "category": "HARM_CATEGORY_HARASSMENT",
+        "threshold": "BLOCK_MEDIUM_AND_ABOVE"
+    },
+    {
+        "category": "HARM_CATEGORY_HATE_SPEECH",
+        "threshold": "BLOCK_MEDIUM_AND_ABOVE"
+    },
+    {
+        "category": "HARM_CATEGORY_SEXUALLY_EXPLICIT",
+        "threshold": "BLOCK_MEDIUM_AND_ABOVE"
+    },
+    {
+        "category": "HARM_CATEGORY_DANGEROUS_CONTENT",
+        "threshold": "BLOCK_MEDIUM_AND_ABOVE"
+    }
+]
+
+
+def get_api_base_url():
+    """URL de base de l'API Gemini (surchargée en test par un serveur local)"""
+    return getattr(settings, 'GEMINI_API_BASE_URL', DEFAULT_API_BASE_URL).rstrip('/')
+
+
+def get_timeout():
+    """Délai d'attente des appels Gemini en secondes"""
+    return getattr(settings, 'GEMINI_TIMEOUT_SECONDS', DEFAULT_TIMEOUT_SECONDS)
+
+
+def build_generate_url(model, api_key):
+    """URL de l'appel generateContent"""
+    return f"{get_api_base_url()}/models/{model}:generateContent?key={api_key}"
+
+
+def build_stream_url(model, api_key):
+    """URL de l'appel streamGenerateContent (réponse en Server-Sent Events)"""
+    return f"{get_api_base_url()}/models/{model}:streamGenerateContent?alt=sse&key={api_key}"
+
+
+def build_payload(conversation_history):
+    """Corps de la requête Gemini avec des paramètres stricts"""
+    return {
+        "contents": conversation_history,
+        "generationConfig": GENERATION_CONFIG,
+        "safetySettings": SAFETY_SETTINGS,
+    }
+
+
+def extract_text(data):
+    """Extraire le texte de la première candidate, ou None"""
+    try:
+        return data['candidates'][0]['content']['parts'][0]['text']
+    except (KeyError, IndexError, TypeError):
+        return None
+
+
+class AsyncGeminiGateway:
+    """Client Gemini asynchrone avec pool de connexions partagé"""
+
+    def __init__(self, max_concurrency=None, max_keepalive=None, timeout=None):
+        self.max_concurrency = max_concurrency or getattr(
+            settings, 'GEMINI_MAX_CONCURRENCY', DEFAULT_MAX_CONCURRENCY
+        )
+        max_keepalive = max_keepalive or getattr(
+            settings, 'GEMINI_MAX_KEEPALIVE', DEFAULT_MAX_KEEPALIVE
+        )
+        self.client = httpx.AsyncClient(
+            timeout=timeout or get_timeout(),
+            limits=httpx.Limits(
+                max_connections=self.max_concurrency,
+                max_keepalive_connections=max_keepalive,
+            ),
+        )
+        self._semaphores = {}
+
+    def get_semaphore(self, url):
+        """Sémaphore limitant les appels simultanés vers un même hôte"""
+        host = urlsplit(url).netloc
+        if host not in self._semaphores:
+            self._semaphores[host] = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphores[host]
+
+    async def generate(self, model, api_key, payload):
+        """Appeler generateContent et retourner le JSON décodé
+
+        Une annulation (déconnexion du client) interrompt la requête en cours
+        et libère la place dans le sémaphore.
+        """
+        url = build_generate_url(model, api_key)
+        async with self.get_semaphore(url):
+            response = await self.client.post(url, json=payload)
+            response.raise_for_status()
+            return response.json()
+
+    async def stream(self, model, api_key, payload):
+        """Appeler streamGenerateContent et produire les fragments de texte
+
+        Chaque événement SSE ``data: {...}`` contient une réponse partielle.
+        """
+        url = build_stream_url(model, api_key)
+        async with self.get_semaphore(url):
+            async with self.client.stream('POST', url, json=payload) as response:
+                response.raise_for_status()
+                async for line in response.aiter_lines():
+                    if not line.startswith('data:'):
+                        continue
+                    text = extract_text(json.loads(line[len('data:'):]))
+                    if text:
+                        yield text
+
+    async def aclose(self):
+        await self.client.aclose()
+
+
+_gateways = weakref.WeakKeyDictionary()
+
+
+def get_gateway():
+    """Passerelle partagée pour la boucle d'événements courante"""
+    loop = asyncio.get_running_loop()
+    gateway = _gateways.get(loop)
+    if gateway is None:
+        gateway = AsyncGeminiGateway()
+        _gateways[loop] = gateway
+    return gateway
@@ -0,0 +1,122 @@
+"""
+Serveur HTTP local imitant l'API Gemini, avec injection de pannes.
+
+Utilisé par les tests et par la commande ``run_gemini_stub`` : pointer
+``GEMINI_API_BASE_URL`` vers ``stub.url`` pour observer le comportement du
+chatbot (disjoncteur, délestage, flux) face à une API lente ou en panne.
+
+Pannes injectables (modifiables pendant que le serveur tourne) :
+
+- ``delay`` : attente en secondes avant chaque réponse ;
+- ``failure_rate`` : proportion de requêtes (0 à 1) en échec ;
+- ``failure_status`` : code HTTP de ces échecs (``0`` : connexion coupée
+  sans réponse).
+"""
+
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_TEXT = "🇲🇦 Réponse de test suffisamment longue pour être valide."
+
+
+class StubGeminiServer:
+    """API Gemini factice (generateContent et streamGenerateContent)"""
+
+    def __init__(self, text=DEFAULT_TEXT, delay=0, failure_rate=0, failure_status=503,
+                 host='127.0.0.1', port=0):
+        self.text = text
+        self.delay = delay
+        self.failure_rate = failure_rate
+        self.failure_status = failure_status
+        self.requests = 0
+        self.failures = 0
+        self.connections = 0
+        self.active = 0
+        self.max_active = 0
+        self._lock = threading.Lock()
+
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def setup(self):
+                super().setup()
+                with stub._lock:
+                    stub.connections += 1
+
+            def do_POST(self):
+                self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                with stub._lock:
+                    stub.requests += 1
+                    stub.active += 1
+                    stub.max_active = max(stub.max_active, stub.active)
+                try:
+                    time.sleep(stub.delay)
+                    if stub.failure_rate and random.random() < stub.failure_rate:
+                        return self.fail()
+                    if ':streamGenerateContent' in self.path:
+                        return self.stream_response()
+                    body = json.dumps({
+                        'candidates': [{'content': {'parts': [{'text': stub.text}]}}]
+                    }).encode('utf-8')
+                    self.send_response(200)
+                    self.send_header('Content-Type', 'application/json')
+                    self.send_header('Content-Length', str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+                finally:
+                    with stub._lock:
+                        stub.active -= 1
+
+            def fail(self):
+                with stub._lock:
+                    stub.failures += 1
+                self.close_connection = True
+                if not stub.failure_status:
+                    return
+                body = json.dumps({'error': {'code': stub.failure_status}}).encode('utf-8')
+                self.send_response(stub.failure_status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.send_header('Connection', 'close')
+                self.end_headers()
+                self.wfile.write(body)
+
+            def stream_response(self):
+                # Un événement SSE par mot, connexion fermée en fin de flux
+                self.close_connection = True
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/event-stream')
+                self.send_header('Connection', 'close')
+                self.end_headers()
+                for word in stub.text.split(' '):
+                    event = {'candidates': [{'content': {'parts': [{'text': word + ' '}]}}]}
+                    self.wfile.write(f"data: {json.dumps(event)}\r\n\r\n".encode('utf-8'))
+                    self.wfile.flush()
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self.url = f'http://{host}:{self.server.server_port}/v1beta'
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
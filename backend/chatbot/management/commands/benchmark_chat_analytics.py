@@ -0,0 +1,124 @@
+"""
+Commande de gestion Django pour mesurer le tableau de bord analytics du chatbot
+"""
+
+import statistics
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from chatbot import analytics
+from chatbot.models import ChatMessage, ChatSession
+
+DOMAINS = ['fiscalite', 'immobilier', 'investissement', 'administration', 'formation', 'other']
+
+# Requêtes attendues par affichage : totaux + série
+MAX_QUERIES = 2
+
+
+class Command(BaseCommand):
+    help = (
+        "Génère un historique de ChatMessage, le consolide puis mesure le nombre "
+        "de requêtes et la latence du tableau de bord pour 7, 30 et 365 jours"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=365, help="Jours d'historique générés")
+        parser.add_argument(
+            '--messages-per-day', type=int, default=40, help='Messages utilisateur par jour'
+        )
+        parser.add_argument('--repeat', type=int, default=20, help='Mesures par période')
+        parser.add_argument(
+            '--keep',
+            action='store_true',
+            help='Conserver les données générées (annulées par défaut)'
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            seeded = self.seed(options['days'], options['messages_per_day'])
+            self.stdout.write(f'ⓘ {seeded} messages générés sur {options["days"]} jours')
+
+            start = time.perf_counter()
+            end_date = timezone.now().date() - timedelta(days=1)
+            analytics.rollup(end_date - timedelta(days=options['days'] - 1), end_date)
+            self.stdout.write(f'ⓘ Consolidation : {(time.perf_counter() - start) * 1000:.0f} ms')
+
+            results = [
+                self.measure(days, group, options['repeat'])
+                for days, group in [(7, 'day'), (30, 'day'), (365, 'day'), (365, 'month')]
+            ]
+
+            if not options['keep']:
+                transaction.set_rollback(True)
+
+        failures = [result for result in results if result['queries'] > MAX_QUERIES]
+        if failures:
+            raise CommandError(
+                f'Trop de requêtes pour le tableau de bord (maximum {MAX_QUERIES}) : '
+                + ', '.join(f"{r['days']} jours/{r['group']} = {r['queries']}" for r in failures)
+            )
+        self.stdout.write(self.style.SUCCESS('✓ Tableau de bord en une requête par agrégat'))
+
+    def seed(self, days, messages_per_day):
+        """Générer des sessions et des paires question/réponse, jour par jour"""
+        today = timezone.now().date()
+        tz = timezone.get_current_timezone()
+        sessions_per_day = max(messages_per_day // 4, 1)
+        messages = []
+
+        for offset in range(1, days + 1):
+            day = today - timedelta(days=offset)
+            noon = timezone.make_aware(datetime.combine(day, datetime.min.time()), tz) + timedelta(hours=12)
+            sessions = ChatSession.objects.bulk_create([
+                ChatSession(
+                    session_id=str(uuid.uuid4()),
+                    created_at=noon,
+                    ip_address=f'10.0.{offset % 256}.{index % 256}',
+                )
+                for index in range(sessions_per_day)
+            ])
+            for index in range(messages_per_day):
+                session = sessions[index % sessions_per_day]
+                timestamp = noon + timedelta(seconds=index)
+                domain = DOMAINS[index % len(DOMAINS)]
+                messages.append(ChatMessage(
+                    session=session, message_type='user', content='Question',
+                    domain_category=domain, timestamp=timestamp,
+                ))
+                messages.append(ChatMessage(
+                    session=session, message_type='bot', content='Réponse',
+                    domain_category=domain, timestamp=timestamp,
+                    response_time_ms=800 + index, time_to_first_token_ms=800 + index,
+                ))
+
+        ChatMessage.objects.bulk_create(messages, batch_size=1000)
+        return len(messages)
+
+    def measure(self, days, group, repeat):
+        """Latence médiane et nombre de requêtes d'un affichage du tableau de bord"""
+        start_date, end_date = analytics.get_period(days)
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            with CaptureQueriesContext(connection) as queries:
+                analytics.summarize(start_date, end_date)
+                analytics.series(start_date, end_date, group)
+            timings.append((time.perf_counter() - start) * 1000)
+
+        result = {
+            'days': days,
+            'group': group,
+            'queries': len(queries),
+            'median_ms': statistics.median(timings),
+        }
+        self.stdout.write(
+            f"  {days:>3} jours / {group:<5} : {result['queries']} requête(s), "
+            f"{result['median_ms']:.1f} ms (médiane sur {repeat})"
+        )
+        return result
@@ -0,0 +1,120 @@
+"""
+Commande de gestion Django pour comparer la détection de répétitions
+(empreintes stockées contre le Jaccard recalculé sur le texte)
+"""
+
+import random
+import time
+
+from django.core.management.base import BaseCommand
+
+from chatbot import similarity
+from chatbot.views import ChatAPIView
+
+VOCABULARY = (
+    'impôt déclaration revenus fiscal convention maroc france passeport consulat visa '
+    'carte état civil acte naissance terrain maison appartement achat vente location '
+    'crédit banque investir placement bourse projet formation diplôme métier cours '
+    'comment quel quelle délai documents obtenir renouveler payer transférer retraite'
+).split()
+
+
+class Command(BaseCommand):
+    help = (
+        'Micro-benchmark : vérifications de répétition et recherche des questions '
+        'répétées sur N messages générés, empreintes contre Jaccard sur le texte'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--messages', type=int, default=10000, help='Nombre de messages')
+        parser.add_argument(
+            '--window', type=int, default=3, help='Messages précédents comparés à chaque tour'
+        )
+        parser.add_argument(
+            '--pairs-sample', type=int, default=200000,
+            help='Paires mesurées pour extrapoler la comparaison exhaustive'
+        )
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        texts = self.generate(options['messages'], rng)
+        view = ChatAPIView()
+
+        start = time.perf_counter()
+        fingerprints = [similarity.fingerprint(text) for text in texts]
+        fingerprint_ms = (time.perf_counter() - start) * 1000
+        self.stdout.write(
+            f'ⓘ Empreintes (coût à l\'écriture) : {fingerprint_ms:.0f} ms pour {len(texts)} messages'
+        )
+
+        # Vérifications par tour : chaque message contre les précédents de la fenêtre
+        window = options['window']
+        pairs = [
+            (index, previous)
+            for index in range(len(texts))
+            for previous in range(max(0, index - window), index)
+        ]
+
+        start = time.perf_counter()
+        text_scores = [view.calculate_similarity(texts[i], texts[j]) for i, j in pairs]
+        text_ms = (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        hash_scores = [
+            similarity.jaccard(fingerprints[i].word_hashes, fingerprints[j].word_hashes)
+            for i, j in pairs
+        ]
+        hash_ms = (time.perf_counter() - start) * 1000
+
+        mismatches = sum(abs(a - b) > 1e-9 for a, b in zip(text_scores, hash_scores))
+        self.stdout.write(
+            f'  Tours ({len(pairs)} comparaisons) : texte {text_ms:.0f} ms, '
+            f'empreintes {hash_ms:.0f} ms (x{text_ms / max(hash_ms, 0.001):.1f}), '
+            f'{mismatches} écart(s)'
+        )
+
+        # Recherche en masse : toutes les paires (extrapolé) contre LSH
+        sample = [
+            (rng.randrange(len(texts)), rng.randrange(len(texts)))
+            for _ in range(options['pairs_sample'])
+        ]
+        start = time.perf_counter()
+        for i, j in sample:
+            view.calculate_similarity(texts[i], texts[j])
+        all_pairs = len(texts) * (len(texts) - 1) // 2
+        all_pairs_ms = (time.perf_counter() - start) * 1000 * all_pairs / len(sample)
+
+        messages = [FingerprintedText(text, fp) for text, fp in zip(texts, fingerprints)]
+        start = time.perf_counter()
+        groups = similarity.find_near_duplicates(messages)
+        lsh_ms = (time.perf_counter() - start) * 1000
+        repeated = [group for group in groups if len(group) >= 3]
+
+        self.stdout.write(
+            f'  Questions répétées : toutes paires ~{all_pairs_ms / 1000:.0f} s (extrapolé), '
+            f'LSH {lsh_ms:.0f} ms, {len(repeated)} groupe(s) de 3 ou plus'
+        )
+        self.stdout.write(self.style.SUCCESS('✓ Benchmark terminé'))
+
+    def generate(self, count, rng):
+        """Questions aléatoires, dont un quart de reformulations de questions fréquentes"""
+        frequent = [' '.join(rng.sample(VOCABULARY, 8)) for _ in range(max(count // 200, 1))]
+        texts = []
+        for _ in range(count):
+            if rng.random() < 0.25:
+                words = rng.choice(frequent).split()
+                words[rng.randrange(len(words))] = rng.choice(VOCABULARY)
+                texts.append(' '.join(words) + ' ?')
+            else:
+                texts.append(' '.join(rng.sample(VOCABULARY, rng.randint(5, 15))) + ' ?')
+        return texts
+
+
+class FingerprintedText:
+    """Message en mémoire, avec les attributs lus par similarity.find_near_duplicates"""
+
+    def __init__(self, content, fingerprint):
+        self.content = content
+        self.word_hashes = fingerprint.word_hashes
+        self.minhash = fingerprint.minhash
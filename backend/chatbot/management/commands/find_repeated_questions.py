@@ -0,0 +1,72 @@
+"""
+Commande de gestion Django pour repérer les questions fréquemment répétées
+"""
+
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from chatbot import similarity
+from chatbot.models import ChatMessage
+
+BACKFILL_BATCH_SIZE = 500
+
+
+class Command(BaseCommand):
+    help = (
+        'Regroupe les questions quasi identiques posées dans toutes les sessions '
+        '(empreintes MinHash) et affiche les plus fréquentes'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=30, help='Période analysée en jours')
+        parser.add_argument(
+            '--threshold', type=float, default=0.7, help='Similarité de Jaccard minimale'
+        )
+        parser.add_argument(
+            '--min-count', type=int, default=3, help="Nombre minimal d'occurrences"
+        )
+        parser.add_argument('--limit', type=int, default=20, help='Nombre de groupes affichés')
+        parser.add_argument(
+            '--backfill',
+            action='store_true',
+            help='Calculer d\'abord les empreintes des messages qui n\'en ont pas'
+        )
+
+    def handle(self, *args, **options):
+        if options['backfill']:
+            filled = self.backfill()
+            self.stdout.write(f'ⓘ {filled} empreinte(s) calculée(s)')
+
+        since = timezone.now() - timedelta(days=options['days'])
+        groups = similarity.find_repeated_questions(
+            ChatMessage.objects.filter(timestamp__gte=since),
+            threshold=options['threshold'],
+            min_count=options['min_count'],
+        )
+
+        if not groups:
+            self.stdout.write(self.style.WARNING('ⓘ Aucune question répétée sur la période'))
+            return
+
+        for group in groups[:options['limit']]:
+            self.stdout.write(
+                f"  {group.count:>4} fois / {group.sessions:>3} session(s) : {group.content[:80]}"
+            )
+        self.stdout.write(self.style.SUCCESS(f'✓ {len(groups)} question(s) répétée(s)'))
+
+    def backfill(self):
+        """Renseigner les empreintes des messages enregistrés avant leur ajout"""
+        filled = 0
+        pending = ChatMessage.objects.filter(word_hashes=[]).exclude(content='')
+        while True:
+            batch = [
+                similarity.fill_fingerprint(message)
+                for message in pending.only('id', 'content', 'word_hashes')[:BACKFILL_BATCH_SIZE]
+            ]
+            batch = [message for message in batch if message.word_hashes]
+            if not batch:
+                return filled
+            ChatMessage.objects.bulk_update(batch, ['word_hashes', 'sentence_hashes', 'minhash'])
+            filled += len(batch)
@@ -2,8 +2,12 @@
 Commande de gestion Django pour initialiser les configurations du chatbot
 """
 
+import json
+
 from django.core.management.base import BaseCommand
 from chatbot.models import ChatbotConfiguration
+from chatbot import classifier
+from chatbot import config as chatbot_config
 
 
 class Command(BaseCommand):
@@ -49,6 +53,13 @@ class Command(BaseCommand):
                 'value': 'true',
                 'description': 'Activer le système de feedback sur les réponses'
             }
+        ] + [
+            {
+                'key': classifier.CONFIG_KEY_PREFIX + language,
+                'value': json.dumps(classifier.DEFAULT_KEYWORDS[language], ensure_ascii=False),
+                'description': f'Mots-clés ({language}) par domaine pour la classification des questions (JSON)'
+            }
+            for language in classifier.LANGUAGES
         ]
 
         created_count = 0
@@ -80,6 +91,9 @@ class Command(BaseCommand):
                     self.style.WARNING(f'ⓘ Configuration existante: {config.key}')
                 )
 
+        # Forcer tous les workers à recharger l'instantané de configuration
+        chatbot_config.invalidate()
+
         self.stdout.write(
             self.style.SUCCESS(
                 f'\n🎉 Initialisation terminée: {created_count} créées, {updated_count} mises à jour'
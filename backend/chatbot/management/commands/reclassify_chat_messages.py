@@ -0,0 +1,84 @@
+"""
+Commande de gestion Django pour reclasser l'historique des messages du chatbot
+"""
+
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from chatbot import classifier
+from chatbot.models import ChatMessage
+
+BATCH_SIZE = 1000
+
+
+class Command(BaseCommand):
+    help = (
+        'Reclasse par domaine les messages enregistrés avec le classifieur courant '
+        '(les réponses du bot reprennent le domaine de la question précédente)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--since',
+            type=str,
+            help='Ne reclasser que les messages depuis cette date (AAAA-MM-JJ)'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Compter les changements sans les enregistrer'
+        )
+
+    def handle(self, *args, **options):
+        messages = ChatMessage.objects.all()
+        if options['since']:
+            try:
+                messages = messages.filter(timestamp__date__gte=date.fromisoformat(options['since']))
+            except ValueError:
+                raise CommandError('Date invalide, format attendu : AAAA-MM-JJ')
+
+        domain_classifier = classifier.get_classifier()
+        start = time.perf_counter()
+        scanned = changed = 0
+        last_domains = {}
+        batch = []
+
+        rows = (
+            messages.order_by('session_id', 'timestamp', 'id')
+            .only('id', 'session_id', 'message_type', 'content', 'domain_category')
+            .iterator(chunk_size=BATCH_SIZE)
+        )
+        for message in rows:
+            scanned += 1
+            if message.message_type == 'user':
+                domain = domain_classifier.classify(message.content)
+                last_domains[message.session_id] = domain
+            else:
+                domain = last_domains.get(message.session_id, message.domain_category)
+
+            if domain != message.domain_category:
+                message.domain_category = domain
+                batch.append(message)
+                changed += 1
+            if len(batch) >= BATCH_SIZE:
+                self.save(batch, options['dry_run'])
+                batch = []
+        self.save(batch, options['dry_run'])
+
+        elapsed = time.perf_counter() - start
+        rate = scanned / elapsed if elapsed else 0
+        verb = 'à modifier' if options['dry_run'] else 'modifié(s)'
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ {scanned} message(s) analysé(s), {changed} {verb} en {elapsed:.1f} s '
+            f'({rate:.0f} messages/s)'
+        ))
+        if changed and not options['dry_run']:
+            self.stdout.write(
+                'ⓘ Lancez « rollup_chat_analytics --full » pour recalculer les compteurs par domaine'
+            )
+
+    def save(self, batch, dry_run):
+        if batch and not dry_run:
+            ChatMessage.objects.bulk_update(batch, ['domain_category'])
@@ -0,0 +1,70 @@
+"""
+Commande de gestion Django pour consolider les analytics du chatbot
+"""
+
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Min
+from django.utils import timezone
+
+from chatbot import analytics
+from chatbot.models import ChatAnalytics, ChatMessage
+
+
+class Command(BaseCommand):
+    help = (
+        'Recalcule sessions, utilisateurs uniques, temps de réponse moyen, taux '
+        "d'escalade et questions par domaine des jours clos depuis ChatMessage "
+        '(par défaut depuis la dernière consolidation)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--since',
+            type=str,
+            help='Date de début (AAAA-MM-JJ) au lieu de la dernière consolidation'
+        )
+        parser.add_argument(
+            '--full',
+            action='store_true',
+            help="Recalculer tout l'historique"
+        )
+
+    def handle(self, *args, **options):
+        end_date = timezone.now().date()
+
+        if options['since']:
+            try:
+                start_date = date.fromisoformat(options['since'])
+            except ValueError:
+                raise CommandError('Date invalide, format attendu : AAAA-MM-JJ')
+        elif options['full']:
+            start_date = self.get_first_message_date()
+        else:
+            start_date = self.get_last_rollup_date() or self.get_first_message_date()
+
+        if start_date is None:
+            self.stdout.write(self.style.WARNING('ⓘ Aucun message à consolider'))
+            return
+
+        # Écrire d'abord les compteurs encore en mémoire dans ce processus
+        analytics.flush()
+
+        updated = analytics.rollup(start_date, end_date)
+        self.stdout.write(
+            self.style.SUCCESS(f'✓ {updated} jour(s) consolidé(s) du {start_date} au {end_date}')
+        )
+
+    def get_last_rollup_date(self):
+        """Dernier jour déjà consolidé (recalculé car il pouvait être incomplet)"""
+        return (
+            ChatAnalytics.objects.filter(total_sessions__gt=0)
+            .order_by('-date')
+            .values_list('date', flat=True)
+            .first()
+        )
+
+    def get_first_message_date(self):
+        first = ChatMessage.objects.aggregate(first=Min('timestamp'))['first']
+        return first.date() if first else None
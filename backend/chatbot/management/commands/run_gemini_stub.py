@@ -0,0 +1,46 @@
+"""
+Commande de gestion Django pour lancer une API Gemini factice en local
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from chatbot.gemini_stub import StubGeminiServer
+
+
+class Command(BaseCommand):
+    help = (
+        "Lance un faux serveur Gemini avec injection de pannes (latence, taux "
+        "d'échec) ; définir GEMINI_API_BASE_URL sur l'URL affichée"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--port', type=int, default=8765)
+        parser.add_argument('--delay', type=float, default=0, help='Latence en secondes')
+        parser.add_argument(
+            '--failure-rate', type=float, default=0, help="Proportion de requêtes en échec (0 à 1)"
+        )
+        parser.add_argument(
+            '--failure-status', type=int, default=503,
+            help='Code HTTP des échecs (0 : connexion coupée sans réponse)'
+        )
+
+    def handle(self, *args, **options):
+        stub = StubGeminiServer(
+            delay=options['delay'],
+            failure_rate=options['failure_rate'],
+            failure_status=options['failure_status'],
+            port=options['port'],
+        ).start()
+        self.stdout.write(self.style.SUCCESS(f'✓ API Gemini factice sur {stub.url}'))
+        self.stdout.write('ⓘ Ctrl+C pour arrêter')
+        try:
+            while True:
+                time.sleep(10)
+                self.stdout.write(
+                    f'  {stub.requests} requête(s), {stub.failures} échec(s), '
+                    f'{stub.max_active} simultanée(s) au plus'
+                )
+        except KeyboardInterrupt:
+            stub.stop()
@@ -0,0 +1,18 @@
+# Generated by Django 4.2 on 2026-10-18 13:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chatbot', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chatmessage',
+            name='time_to_first_token_ms',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.2 on 2026-10-18 13:13
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chatbot', '0002_chatmessage_time_to_first_token_ms'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CachedResponse',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=64, unique=True)),
+                ('normalized_question', models.TextField()),
+                ('domain_category', models.CharField(choices=[('fiscalite', 'Fiscalité'), ('immobilier', 'Immobilier'), ('investissement', 'Investissement'), ('administration', 'Administration'), ('formation', 'Formation professionnelle'), ('other', 'Autre'), ('off_topic', 'Hors sujet')], max_length=20)),
+                ('prompt_variant', models.CharField(choices=[('visitor', 'Nouveau visiteur'), ('client', 'Client inscrit')], max_length=10)),
+                ('api_model', models.CharField(max_length=50)),
+                ('response', models.TextField()),
+                ('hit_count', models.IntegerField(default=0)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('last_used_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+                ('expires_at', models.DateTimeField(db_index=True)),
+            ],
+            options={
+                'ordering': ['-last_used_at'],
+            },
+        ),
+    ]
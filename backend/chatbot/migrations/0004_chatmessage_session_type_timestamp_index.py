@@ -0,0 +1,17 @@
+# Generated by Django 4.2 on 2026-10-18 13:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chatbot', '0003_cachedresponse'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='chatmessage',
+            index=models.Index(fields=['session', 'message_type', 'timestamp'], name='chatbot_msg_session_type_ts'),
+        ),
+    ]
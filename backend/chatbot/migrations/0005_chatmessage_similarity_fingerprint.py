@@ -0,0 +1,28 @@
+# Generated by Django 4.2 on 2026-10-18 13:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chatbot', '0004_chatmessage_session_type_timestamp_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chatmessage',
+            name='minhash',
+            field=models.JSONField(blank=True, default=list),
+        ),
+        migrations.AddField(
+            model_name='chatmessage',
+            name='sentence_hashes',
+            field=models.JSONField(blank=True, default=list),
+        ),
+        migrations.AddField(
+            model_name='chatmessage',
+            name='word_hashes',
+            field=models.JSONField(blank=True, default=list),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2 on 2026-10-18 14:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chatbot', '0006_chatmessage_session_timestamp_id_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chatanalytics',
+            name='counters_rolled_up',
+            field=models.BooleanField(default=False),
+        ),
+    ]
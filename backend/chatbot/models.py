@@ -2,6 +2,8 @@ from django.db import models
 from django.contrib.auth import get_user_model
 from django.utils import timezone
 
+from . import similarity
+
 User = get_user_model()
 
 
@@ -47,7 +49,8 @@ class ChatMessage(models.Model):
     timestamp = models.DateTimeField(default=timezone.now)
     
     # Métadonnées pour analytics
-    response_time_ms = models.IntegerField(null=True, blank=True)  # Temps de réponse API
+    response_time_ms = models.IntegerField(null=True, blank=True)  # Temps de réponse API (total)
+    time_to_first_token_ms = models.IntegerField(null=True, blank=True)  # Délai avant le premier fragment affiché
     api_model_used = models.CharField(max_length=50, default='gemini-2.0-flash-exp')
 
     class Meta:
@@ -64,13 +67,38 @@ class ChatMessage(models.Model):
     is_escalated = models.BooleanField(default=False)
     needs_human_review = models.BooleanField(default=False)
     satisfaction_rating = models.IntegerField(null=True, blank=True)  # 1-5
+    
+    # Empreinte de similarité calculée à l'écriture (voir chatbot.similarity)
+    word_hashes = models.JSONField(default=list, blank=True)
+    sentence_hashes = models.JSONField(default=list, blank=True)
+    minhash = models.JSONField(default=list, blank=True)
 
     class Meta:
         ordering = ['timestamp']
+        indexes = [
+            # Fenêtre des derniers messages d'une session (historique et répétitions) :
+            # filtre sur la session, tri -timestamp, -id servis par l'index
+            models.Index(fields=['session', 'timestamp', 'id'], name='chatbot_msg_session_ts_id'),
+        ]
 
     def __str__(self):
         return f"{self.get_message_type_display()} - {self.content[:50]}..."
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        message = super().from_db(db, field_names, values)
+        similarity.remember_source(message)
+        return message
+
+    def save(self, *args, **kwargs):
+        # bulk_create contourne save() : appeler similarity.fill_fingerprint
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or 'content' in update_fields:
+            similarity.fill_fingerprint(self)
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, *similarity.FINGERPRINT_FIELDS}
+        super().save(*args, **kwargs)
+
 
 class ChatFeedback(models.Model):
     """Feedback utilisateur sur les réponses du chatbot"""
@@ -105,6 +133,9 @@ class ChatAnalytics(models.Model):
     administration_questions = models.IntegerField(default=0)
     formation_questions = models.IntegerField(default=0)
     off_topic_questions = models.IntegerField(default=0)
+    # Compteurs recalculés depuis ChatMessage (jour clos, rollup_chat_analytics) :
+    # les tampons des workers ne s'y ajoutent plus
+    counters_rolled_up = models.BooleanField(default=False)
     
     # Métriques de performance
     avg_response_time_ms = models.FloatField(null=True, blank=True)
@@ -140,12 +171,9 @@ class ChatbotConfiguration(models.Model):
 
     @classmethod
     def get_value(cls, key, default=None):
-        """Récupérer une valeur de configuration"""
-        try:
-            config = cls.objects.get(key=key, is_active=True)
-            return config.value
-        except cls.DoesNotExist:
-            return default
+        """Récupérer une valeur de configuration (depuis l'instantané en cache)"""
+        from .config import get_value
+        return get_value(key, default)
 
     @classmethod
     def set_value(cls, key, value, description="", user=None):
@@ -163,4 +191,35 @@ class ChatbotConfiguration(models.Model):
             config.description = description
             config.updated_by = user
             config.save()
+        # L'instantané de configuration est invalidé par le signal post_save,
+        # après validation de la transaction
         return config
+
+
+class CachedResponse(models.Model):
+    """Réponse Gemini mise en cache pour une question normalisée"""
+    PROMPT_VARIANTS = [
+        ('visitor', 'Nouveau visiteur'),
+        ('client', 'Client inscrit'),
+    ]
+
+    key = models.CharField(max_length=64, unique=True)  # SHA-256 des éléments de la clé
+    normalized_question = models.TextField()
+    domain_category = models.CharField(max_length=20, choices=ChatMessage.DOMAIN_CATEGORIES)
+    prompt_variant = models.CharField(max_length=10, choices=PROMPT_VARIANTS)
+    api_model = models.CharField(max_length=50)
+    response = models.TextField()
+    hit_count = models.IntegerField(default=0)
+    created_at = models.DateTimeField(default=timezone.now)
+    last_used_at = models.DateTimeField(default=timezone.now, db_index=True)  # Pour l'éviction LRU
+    expires_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        ordering = ['-last_used_at']
+
+    def __str__(self):
+        return f"Cache [{self.domain_category}/{self.prompt_variant}] {self.normalized_question[:50]}"
+
+    @property
+    def is_expired(self):
+        return self.expires_at <= timezone.now()
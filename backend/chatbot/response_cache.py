@@ -0,0 +1,185 @@
+"""
+Cache des réponses du chatbot MRE pour les questions fréquentes.
+
+La clé combine la forme normalisée de la question (minuscules, sans accents,
+ponctuation ni mots vides, dans l'ordre de la question), le domaine détecté,
+la variante du prompt système (visiteur ou client) et le modèle Gemini. Les
+négations sont conservées : « je peux » et « je ne peux pas » n'ont pas la
+même réponse. Les entrées expirent après ``CHATBOT_RESPONSE_CACHE_TTL``
+secondes ; toutes les ``CHATBOT_RESPONSE_CACHE_EVICT_EVERY`` mises en cache,
+les moins récemment utilisées sont évincées au-delà de
+``CHATBOT_RESPONSE_CACHE_MAX_ENTRIES``.
+"""
+
+import hashlib
+import re
+import unicodedata
+from collections import namedtuple
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError
+from django.db.models import F
+from django.utils import timezone
+
+from .models import CachedResponse
+
+DEFAULT_TTL = 7 * 24 * 3600
+DEFAULT_MAX_ENTRIES = 5000
+DEFAULT_EVICT_EVERY = 100
+
+# Sans négations (ne, n', pas, non, jamais, plus, not, no, لا, ما) : elles
+# changent le sens de la question
+STOPWORDS = {
+    'a', 'au', 'aux', 'ce', 'ces', 'comment', 'de', 'des', 'du', 'en', 'est',
+    'et', 'il', 'je', 'j', 'la', 'le', 'les', 'l', 'ma', 'mes', 'mon',
+    'on', 'ou', 'par', 'pour', 'que', 'qu', 'quel', 'quelle', 'quels',
+    'quelles', 'qui', 's', 'sa', 'se', 'ses', 'son', 'sur', 'ta', 'te', 'tes',
+    'ton', 'tu', 'un', 'une', 'vos', 'votre', 'vous', 'y', 'd', 'c', 'm',
+    'est-ce', 'faire', 'faut', 'peux', 'puis', 'dois', 'bonjour', 'svp', 'merci',
+}
+
+WORD_RE = re.compile(r'\w+')
+
+CacheKey = namedtuple(
+    'CacheKey', ['key', 'normalized_question', 'domain_category', 'prompt_variant', 'api_model']
+)
+
+# Compteurs du processus courant (taux de succès du cache)
+stats = {
+    'hits': 0,
+    'misses': 0,
+}
+
+# Mises en cache depuis la dernière éviction (processus courant)
+_stores_since_evict = {'count': 0}
+
+
+def get_ttl():
+    return getattr(settings, 'CHATBOT_RESPONSE_CACHE_TTL', DEFAULT_TTL)
+
+
+def get_max_entries():
+    return getattr(settings, 'CHATBOT_RESPONSE_CACHE_MAX_ENTRIES', DEFAULT_MAX_ENTRIES)
+
+
+def get_evict_every():
+    return getattr(settings, 'CHATBOT_RESPONSE_CACHE_EVICT_EVERY', DEFAULT_EVICT_EVERY)
+
+
+def is_enabled():
+    return getattr(settings, 'CHATBOT_RESPONSE_CACHE_ENABLED', True)
+
+
+def normalize_question(question):
+    """Forme canonique d'une question, insensible aux accents et à la ponctuation
+
+    L'ordre des mots est conservé : « visa avant passeport » et « passeport
+    avant visa » ne sont pas la même question.
+    """
+    text = unicodedata.normalize('NFKD', question.lower())
+    text = ''.join(c for c in text if not unicodedata.combining(c))
+    return ' '.join(word for word in WORD_RE.findall(text) if word not in STOPWORDS)
+
+
+def make_key(normalized_question, domain_category, prompt_variant, api_model):
+    raw = '|'.join([normalized_question, domain_category or '', prompt_variant, api_model])
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+def get_prompt_variant(user):
+    """Variante du prompt système, comme dans ChatAPIView.get_system_prompt"""
+    return 'client' if user and user.is_authenticated else 'visitor'
+
+
+def build_key(question, domain_category, user, api_model):
+    """Construire la clé de cache d'une question"""
+    normalized = normalize_question(question)
+    domain_category = domain_category or 'other'
+    variant = get_prompt_variant(user)
+    return CacheKey(
+        make_key(normalized, domain_category, variant, api_model),
+        normalized, domain_category, variant, api_model,
+    )
+
+
+def get(cache_key):
+    """Retourner la réponse en cache pour cette clé, ou None"""
+    if not is_enabled() or not cache_key.normalized_question:
+        return None
+
+    now = timezone.now()
+    entry = CachedResponse.objects.filter(
+        key=cache_key.key, expires_at__gt=now
+    ).only('response').first()
+    if entry is None:
+        stats['misses'] += 1
+        return None
+
+    stats['hits'] += 1
+    CachedResponse.objects.filter(pk=entry.pk).update(
+        hit_count=F('hit_count') + 1,
+        last_used_at=now,
+    )
+    return entry.response
+
+
+def store(cache_key, response):
+    """Mettre une réponse en cache, avec une éviction toutes les N mises en cache"""
+    if not is_enabled() or not cache_key.normalized_question:
+        return
+
+    now = timezone.now()
+    values = {
+        'normalized_question': cache_key.normalized_question,
+        'domain_category': cache_key.domain_category,
+        'prompt_variant': cache_key.prompt_variant,
+        'api_model': cache_key.api_model,
+        'response': response,
+        'last_used_at': now,
+        'expires_at': now + timedelta(seconds=get_ttl()),
+    }
+    try:
+        CachedResponse.objects.update_or_create(key=cache_key.key, defaults=values)
+    except IntegrityError:
+        # Un autre worker vient d'insérer la même clé
+        return
+    _stores_since_evict['count'] += 1
+    if _stores_since_evict['count'] >= get_evict_every():
+        _stores_since_evict['count'] = 0
+        evict()
+
+
+def evict():
+    """Supprimer les entrées expirées et les moins récemment utilisées"""
+    CachedResponse.objects.filter(expires_at__lte=timezone.now()).delete()
+
+    max_entries = get_max_entries()
+    if CachedResponse.objects.count() <= max_entries:
+        return
+    # Date d'utilisation de la première entrée au-delà de la limite
+    cutoff = (
+        CachedResponse.objects.order_by('-last_used_at')
+        .values_list('last_used_at', flat=True)[max_entries]
+    )
+    CachedResponse.objects.filter(last_used_at__lte=cutoff).delete()
+
+
+def purge(queryset=None):
+    """Vider le cache (ou les entrées sélectionnées), retourne le nombre supprimé"""
+    if queryset is None:
+        queryset = CachedResponse.objects.all()
+    deleted, _ = queryset.delete()
+    return deleted
+
+
+def hit_rate():
+    """Taux de succès du cache depuis le démarrage du processus"""
+    total = stats['hits'] + stats['misses']
+    return stats['hits'] / total if total else 0.0
+
+
+def reset_stats():
+    for key in stats:
+        stats[key] = 0
+    _stores_since_evict['count'] = 0
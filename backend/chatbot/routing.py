@@ -0,0 +1,8 @@
+from django.urls import path
+from . import consumers
+
+# Routes relatives au préfixe chatbot/api/async/ (voir servicesbladi/asgi.py)
+http_urlpatterns = [
+    path('chat/', consumers.AsyncChatConsumer.as_asgi()),
+    path('stream/', consumers.StreamingChatConsumer.as_asgi()),
+]
@@ -0,0 +1,32 @@
+"""
+Signaux du chatbot MRE
+"""
+
+from django.core.signals import request_finished
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import analytics, config
+from .models import ChatbotConfiguration
+
+
+@receiver(post_save, sender=ChatbotConfiguration)
+@receiver(post_delete, sender=ChatbotConfiguration)
+def invalidate_chatbot_configuration(sender, **kwargs):
+    """Invalider l'instantané de configuration après toute modification
+
+    Après validation de la transaction seulement : un autre worker qui
+    rechargerait plus tôt lirait les anciennes lignes sous la nouvelle version.
+    """
+    transaction.on_commit(config.invalidate)
+
+
+@receiver(request_finished, dispatch_uid='chatbot_analytics_flush')
+def flush_chatbot_analytics(sender, **kwargs):
+    """Écrire en fin de requête les compteurs en attente depuis trop longtemps
+
+    Sans nouveau message du chatbot, un worker garderait sinon ses compteurs
+    jusqu'au prochain message ou à son arrêt.
+    """
+    analytics.flush_if_due()
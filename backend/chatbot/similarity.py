@@ -0,0 +1,202 @@
+"""
+Détection des quasi-doublons pour le chatbot MRE.
+
+Chaque ``ChatMessage`` enregistre à l'écriture son empreinte :
+
+- ``word_hashes`` : hachages triés des mots distincts (même découpage que
+  l'ancien ``ChatAPIView.calculate_similarity``), d'où un Jaccard exact par
+  simple fusion de deux listes triées, en O(k) ;
+- ``sentence_hashes`` : hachages des phrases de plus de 20 caractères, pour
+  repérer une phrase reprise mot pour mot ;
+- ``minhash`` : signature MinHash de ``NUM_PERMUTATIONS`` valeurs, découpée
+  en bandes (LSH) pour retrouver en masse les questions répétées, toutes
+  sessions confondues, sans comparer toutes les paires.
+
+Les hachages sont stables d'un processus à l'autre (CRC32), contrairement à
+``hash()``.
+"""
+
+import random
+import zlib
+from collections import defaultdict, namedtuple
+
+NUM_PERMUTATIONS = 64
+LSH_BANDS = 16  # 16 bandes de 4 valeurs : candidats dès ~50 % de similarité
+MIN_SENTENCE_LENGTH = 20
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+# Permutations fixes : les signatures stockées restent comparables
+_rng = random.Random(20240601)
+_PERMUTATIONS = [
+    (_rng.randrange(1, _MERSENNE_PRIME), _rng.randrange(0, _MERSENNE_PRIME))
+    for _ in range(NUM_PERMUTATIONS)
+]
+
+Fingerprint = namedtuple('Fingerprint', ['word_hashes', 'sentence_hashes', 'minhash'])
+FINGERPRINT_FIELDS = Fingerprint._fields
+
+RepeatedQuestion = namedtuple('RepeatedQuestion', ['content', 'count', 'sessions', 'message_ids'])
+
+
+def stable_hash(text):
+    return zlib.crc32(text.encode('utf-8'))
+
+
+def hash_words(text):
+    """Hachages triés des mots distincts du texte"""
+    return sorted({stable_hash(word) for word in text.lower().split()})
+
+
+def hash_sentences(text):
+    """Hachages triés des phrases significatives du texte"""
+    return sorted({
+        stable_hash(sentence.strip())
+        for sentence in text.split('.')
+        if len(sentence.strip()) > MIN_SENTENCE_LENGTH
+    })
+
+
+def compute_minhash(word_hashes):
+    """Signature MinHash d'un ensemble de hachages"""
+    if not word_hashes:
+        return []
+    return [
+        min((a * value + b) % _MERSENNE_PRIME for value in word_hashes) & _MAX_HASH
+        for a, b in _PERMUTATIONS
+    ]
+
+
+def fingerprint(text):
+    """Empreinte complète d'un texte"""
+    word_hashes = hash_words(text)
+    return Fingerprint(word_hashes, hash_sentences(text), compute_minhash(word_hashes))
+
+
+def remember_source(message):
+    """Noter le contenu dont l'empreinte chargée avec le message est issue"""
+    if 'content' not in message.get_deferred_fields():
+        message._fingerprint_source = message.content
+
+
+def fill_fingerprint(message):
+    """Renseigner l'empreinte d'un ChatMessage (appelé à l'écriture)
+
+    Recalculée si elle manque ou si le contenu a changé depuis le chargement
+    du message ou le dernier calcul.
+    """
+    if 'content' in message.get_deferred_fields():
+        return message
+    if message.word_hashes and message.content == getattr(message, '_fingerprint_source', None):
+        return message
+    if message.content:
+        message.word_hashes, message.sentence_hashes, message.minhash = fingerprint(message.content)
+    else:
+        message.word_hashes, message.sentence_hashes, message.minhash = [], [], []
+    message._fingerprint_source = message.content
+    return message
+
+
+def get_hashes(message):
+    """(hachages des mots, hachages des phrases) stockés d'un ChatMessage
+
+    Recalculés à la volée pour les messages antérieurs aux empreintes.
+    """
+    if message.word_hashes or not message.content.strip():
+        return message.word_hashes, message.sentence_hashes
+    return hash_words(message.content), hash_sentences(message.content)
+
+
+def jaccard(hashes1, hashes2):
+    """Coefficient de Jaccard de deux listes triées de hachages, en O(k)"""
+    if not hashes1 and not hashes2:
+        return 0
+    i = j = common = 0
+    len1, len2 = len(hashes1), len(hashes2)
+    while i < len1 and j < len2:
+        if hashes1[i] == hashes2[j]:
+            common += 1
+            i += 1
+            j += 1
+        elif hashes1[i] < hashes2[j]:
+            i += 1
+        else:
+            j += 1
+    return common / (len1 + len2 - common)
+
+
+def shares_sentence(hashes1, hashes2):
+    """Vrai si les deux textes ont une phrase significative identique"""
+    return not set(hashes1).isdisjoint(hashes2)
+
+
+def estimate_similarity(minhash1, minhash2):
+    """Similarité de Jaccard estimée à partir de deux signatures MinHash"""
+    if not minhash1 or len(minhash1) != len(minhash2):
+        return 0
+    return sum(x == y for x, y in zip(minhash1, minhash2)) / len(minhash1)
+
+
+def lsh_buckets(minhash):
+    """Clés de bandes LSH d'une signature"""
+    rows = NUM_PERMUTATIONS // LSH_BANDS
+    return [
+        (band, tuple(minhash[band * rows:(band + 1) * rows]))
+        for band in range(LSH_BANDS)
+    ]
+
+
+def find_near_duplicates(messages, threshold=0.7):
+    """Regrouper des messages quasi identiques (sessions confondues)
+
+    ``messages`` est un itérable de ChatMessage. Les candidats sont obtenus
+    par LSH puis confirmés par le Jaccard exact des hachages de mots ;
+    retourne une liste de groupes (listes de messages), du plus grand au
+    plus petit.
+    """
+    messages = [message for message in messages if message.word_hashes]
+    parents = list(range(len(messages)))
+
+    def find(index):
+        while parents[index] != index:
+            parents[index] = parents[parents[index]]
+            index = parents[index]
+        return index
+
+    buckets = defaultdict(list)
+    for index, message in enumerate(messages):
+        for bucket in lsh_buckets(message.minhash):
+            buckets[bucket].append(index)
+
+    # Membres d'une même bande comparés deux à deux, sauf s'ils sont déjà
+    # dans le même groupe : A ≉ B mais B ≈ C regroupe B et C
+    for candidates in buckets.values():
+        for position, second in enumerate(candidates[1:], start=1):
+            for first in candidates[:position]:
+                if find(first) == find(second):
+                    continue
+                if jaccard(messages[first].word_hashes, messages[second].word_hashes) >= threshold:
+                    parents[find(second)] = find(first)
+
+    groups = defaultdict(list)
+    for index, message in enumerate(messages):
+        groups[find(index)].append(message)
+    return sorted(groups.values(), key=len, reverse=True)
+
+
+def find_repeated_questions(queryset, threshold=0.7, min_count=3):
+    """Questions posées au moins ``min_count`` fois sous des formes voisines"""
+    messages = queryset.filter(message_type='user').only(
+        'id', 'session_id', 'content', 'word_hashes', 'minhash'
+    )
+    return [
+        RepeatedQuestion(
+            content=group[0].content,
+            count=len(group),
+            sessions=len({message.session_id for message in group}),
+            message_ids=[message.id for message in group],
+        )
+        for group in find_near_duplicates(messages.iterator(), threshold)
+        if len(group) >= min_count
+    ]
@@ -95,6 +95,12 @@ class ChatbotMRE {
         this.showTyping();
 
         try {
+            // Mode flux : les fragments s'affichent au fur et à mesure
+            if (window.chatbotStreamUrl && window.ReadableStream) {
+                await this.streamGeminiAPI(message);
+                return;
+            }
+
             const response = await this.callGeminiAPI(message);
             this.hideTyping();
             this.addBotMessage(response);
@@ -308,7 +314,92 @@ class ChatbotMRE {
             console.error('Erreur API:', error);
             throw new Error(`Impossible de contacter l'assistant: ${error.message}`);
         }
-    }    getCSRFToken() {
+    }
+
+    async streamGeminiAPI(userMessage) {
+        // Réponse en Server-Sent Events : événements token, done et error
+        const response = await fetch(window.chatbotStreamUrl, {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+                'X-CSRFToken': this.getCSRFToken(),
+            },
+            body: JSON.stringify({
+                message: userMessage,
+                session_id: this.sessionId
+            })
+        });
+
+        if (!response.ok || !response.body) {
+            const errorData = await response.json().catch(() => null);
+            throw new Error(`Erreur serveur (${response.status}): ${errorData?.error || 'Erreur inconnue'}`);
+        }
+
+        const messageElement = this.createMessageElement('', 'bot');
+        const contentDiv = messageElement.querySelector('.message-content');
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+        let text = '';
+        let displayed = false;
+
+        const display = () => {
+            if (!displayed) {
+                this.hideTyping();
+                this.chatbotMessages.appendChild(messageElement);
+                displayed = true;
+            }
+            contentDiv.innerHTML = this.processMessageContent(text, 'bot');
+            this.scrollToBottom();
+        };
+
+        while (true) {
+            const { value, done } = await reader.read();
+            if (done) break;
+            buffer += decoder.decode(value, { stream: true });
+
+            let separator;
+            while ((separator = buffer.indexOf('\n\n')) !== -1) {
+                const event = this.parseStreamEvent(buffer.slice(0, separator));
+                buffer = buffer.slice(separator + 2);
+
+                if (event.type === 'token') {
+                    text += event.data.text;
+                    display();
+                } else if (event.type === 'done') {
+                    this.sessionId = event.data.session_id;
+                    this.lastMessageId = event.data.message_id;
+                    messageElement.dataset.messageId = event.data.message_id;
+                    // La réponse finale validée peut différer des fragments reçus
+                    text = event.data.response;
+                    display();
+                    setTimeout(() => {
+                        this.addFeedbackButtons(messageElement);
+                    }, 1000);
+                } else if (event.type === 'error') {
+                    throw new Error(event.data.error);
+                }
+            }
+        }
+
+        if (!displayed) {
+            throw new Error('Réponse vide du serveur');
+        }
+    }
+
+    parseStreamEvent(raw) {
+        const event = { type: 'message', data: null };
+        raw.split('\n').forEach(line => {
+            if (line.startsWith('event:')) {
+                event.type = line.slice(6).trim();
+            } else if (line.startsWith('data:')) {
+                event.data = JSON.parse(line.slice(5));
+            }
+        });
+        return event;
+    }
+
+    getCSRFToken() {
         // Récupérer le token CSRF depuis la configuration globale
         if (window.csrfToken) {
             return window.csrfToken;
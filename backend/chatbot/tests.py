@@ -1,3 +1,845 @@
-from django.test import TestCase
+import asyncio
+import contextlib
+import json
+import time
+import unittest
+from unittest import mock
+from datetime import timedelta
+from io import StringIO
 
-# Create your tests here.
+import requests
+from asgiref.sync import async_to_sync
+from channels.testing import HttpCommunicator
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.signals import request_finished
+from django.db import OperationalError, connection
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from . import analytics
+from . import circuit_breaker
+from . import classifier
+from . import config as chatbot_config
+from . import gemini
+from . import response_cache
+from . import similarity
+from .consumers import AsyncChatConsumer, StreamingChatConsumer
+from .gemini_stub import StubGeminiServer
+from .models import CachedResponse, ChatAnalytics, ChatbotConfiguration, ChatMessage, ChatSession
+from .views import REPEATED_QUESTION_RESPONSE, ChatAPIView
+
+
+class ChatbotConfigurationCacheTests(TestCase):
+    """Instantané de configuration du chatbot"""
+
+    def setUp(self):
+        ChatbotConfiguration.objects.create(key='gemini_api_key', value='cle-test')
+        ChatbotConfiguration.objects.create(key='gemini_model', value='gemini-test')
+        chatbot_config.invalidate()
+        chatbot_config.reset_stats()
+
+    def test_hot_path_makes_no_config_queries(self):
+        ChatbotConfiguration.get_value('gemini_api_key')
+        with self.assertNumQueries(0):
+            for _ in range(10):
+                self.assertEqual(ChatbotConfiguration.get_value('gemini_api_key'), 'cle-test')
+                self.assertEqual(ChatbotConfiguration.get_value('gemini_model'), 'gemini-test')
+        self.assertEqual(chatbot_config.stats['db_loads'], 1)
+
+    def test_set_value_invalidates_snapshot(self):
+        self.assertEqual(ChatbotConfiguration.get_value('gemini_model'), 'gemini-test')
+        with self.captureOnCommitCallbacks(execute=True):
+            ChatbotConfiguration.set_value('gemini_model', 'gemini-nouveau')
+        self.assertEqual(ChatbotConfiguration.get_value('gemini_model'), 'gemini-nouveau')
+
+    def test_version_changes_only_after_commit(self):
+        ChatbotConfiguration.get_value('gemini_model')
+        version = chatbot_config.get_shared_version()
+        with self.captureOnCommitCallbacks() as callbacks:
+            ChatbotConfiguration.set_value('gemini_model', 'gemini-nouveau')
+            # Transaction en cours : un autre worker ne doit pas recharger maintenant
+            self.assertEqual(chatbot_config.get_shared_version(), version)
+        self.assertEqual(len(callbacks), 1)
+        callbacks[0]()
+        self.assertNotEqual(chatbot_config.get_shared_version(), version)
+
+    def test_inactive_rows_are_ignored(self):
+        ChatbotConfiguration.objects.filter(key='gemini_model').update(is_active=False)
+        chatbot_config.invalidate()
+        self.assertEqual(ChatbotConfiguration.get_value('gemini_model', 'defaut'), 'defaut')
+
+    def test_other_worker_sees_shared_version_change(self):
+        ChatbotConfiguration.get_value('gemini_model')
+        # Un autre worker modifie la configuration : seule la version partagée change ici
+        ChatbotConfiguration.objects.filter(key='gemini_model').update(value='gemini-autre')
+        chatbot_config.cache.incr(chatbot_config.VERSION_CACHE_KEY)
+        self.assertEqual(ChatbotConfiguration.get_value('gemini_model'), 'gemini-test')
+
+        with self.settings(CHATBOT_CONFIG_CHECK_INTERVAL=0):
+            self.assertEqual(ChatbotConfiguration.get_value('gemini_model'), 'gemini-autre')
+
+
+class AsyncGeminiGatewayTests(SimpleTestCase):
+    """Passerelle Gemini asynchrone contre un serveur local"""
+
+    def test_reuses_pooled_connection(self):
+        async def scenario():
+            gateway = gemini.AsyncGeminiGateway()
+            try:
+                for _ in range(5):
+                    data = await gateway.generate('gemini-test', 'cle', {'contents': []})
+                    self.assertTrue(gemini.extract_text(data))
+            finally:
+                await gateway.aclose()
+
+        with StubGeminiServer() as stub, self.settings(GEMINI_API_BASE_URL=stub.url):
+            async_to_sync(scenario)()
+        self.assertEqual(stub.requests, 5)
+        self.assertEqual(stub.connections, 1)
+
+    def test_limits_concurrent_upstream_calls(self):
+        async def scenario():
+            gateway = gemini.AsyncGeminiGateway(max_concurrency=2)
+            try:
+                await asyncio.gather(*[
+                    gateway.generate('gemini-test', 'cle', {'contents': []}) for _ in range(6)
+                ])
+            finally:
+                await gateway.aclose()
+
+        with StubGeminiServer(delay=0.1) as stub, self.settings(GEMINI_API_BASE_URL=stub.url):
+            async_to_sync(scenario)()
+        self.assertEqual(stub.requests, 6)
+        self.assertLessEqual(stub.max_active, 2)
+
+    def test_cancellation_releases_slot(self):
+        async def scenario():
+            gateway = gemini.AsyncGeminiGateway(max_concurrency=1)
+            try:
+                task = asyncio.ensure_future(
+                    gateway.generate('gemini-test', 'cle', {'contents': []})
+                )
+                await asyncio.sleep(0.1)
+                task.cancel()
+                with self.assertRaises(asyncio.CancelledError):
+                    await task
+                semaphore = gateway.get_semaphore(gemini.build_generate_url('gemini-test', 'cle'))
+                self.assertFalse(semaphore.locked())
+            finally:
+                await gateway.aclose()
+
+        with StubGeminiServer(delay=2) as stub, self.settings(GEMINI_API_BASE_URL=stub.url):
+            async_to_sync(scenario)()
+
+
+class AsyncChatConsumerTests(TransactionTestCase):
+    """Point d'entrée ASGI asynchrone du chatbot"""
+
+    def setUp(self):
+        ChatbotConfiguration.objects.create(key='gemini_api_key', value='cle-test')
+        ChatbotConfiguration.objects.create(key='gemini_model', value='gemini-test')
+
+    def post(self, payload):
+        async def scenario():
+            communicator = HttpCommunicator(
+                AsyncChatConsumer.as_asgi(), 'POST', '/chatbot/api/async/chat/',
+                body=json.dumps(payload).encode('utf-8'),
+            )
+            response = await communicator.get_response(timeout=5)
+            await communicator.send_input({'type': 'http.disconnect'})
+            await communicator.wait()
+            return response
+
+        return async_to_sync(scenario)()
+
+    def test_chat_round_trip(self):
+        with StubGeminiServer() as stub, self.settings(GEMINI_API_BASE_URL=stub.url):
+            response = self.post({'message': 'Comment déclarer mes impôts ?'})
+        self.assertEqual(response['status'], 200)
+        data = json.loads(response['body'])
+        self.assertTrue(data['session_id'])
+        self.assertEqual(ChatMessage.objects.filter(session__session_id=data['session_id']).count(), 2)
+
+    def test_empty_message_is_rejected(self):
+        response = self.post({'message': '  '})
+        self.assertEqual(response['status'], 400)
+
+
+class StreamingChatConsumerTests(TransactionTestCase):
+    """Réponses en flux (SSE) du chatbot"""
+
+    def setUp(self):
+        ChatbotConfiguration.objects.create(key='gemini_api_key', value='cle-test')
+        ChatbotConfiguration.objects.create(key='gemini_model', value='gemini-test')
+
+    def stream(self, payload):
+        async def scenario():
+            communicator = HttpCommunicator(
+                StreamingChatConsumer.as_asgi(), 'POST', '/chatbot/api/async/stream/',
+                body=json.dumps(payload).encode('utf-8'),
+            )
+            response = await communicator.get_response(timeout=5)
+            await communicator.send_input({'type': 'http.disconnect'})
+            await communicator.wait()
+            return response
+
+        return async_to_sync(scenario)()
+
+    def parse_events(self, body):
+        events = []
+        for raw in body.decode('utf-8').strip().split('\n\n'):
+            lines = dict(line.split(': ', 1) for line in raw.split('\n'))
+            events.append((lines['event'], json.loads(lines['data'])))
+        return events
+
+    def test_gateway_yields_partial_text(self):
+        async def scenario():
+            gateway = gemini.AsyncGeminiGateway()
+            try:
+                return [text async for text in gateway.stream('gemini-test', 'cle', {'contents': []})]
+            finally:
+                await gateway.aclose()
+
+        with StubGeminiServer(text="un deux trois") as stub, self.settings(GEMINI_API_BASE_URL=stub.url):
+            chunks = async_to_sync(scenario)()
+        self.assertEqual(chunks, ['un ', 'deux ', 'trois '])
+
+    def test_stream_records_first_token_and_total_time(self):
+        with StubGeminiServer() as stub, self.settings(GEMINI_API_BASE_URL=stub.url):
+            response = self.stream({'message': 'Comment acheter un appartement au Maroc ?'})
+
+        self.assertEqual(response['status'], 200)
+        self.assertIn((b'Content-Type', b'text/event-stream; charset=utf-8'), response['headers'])
+        events = self.parse_events(response['body'])
+        self.assertEqual(events[-1][0], 'done')
+        done = events[-1][1]
+
+        bot_msg = ChatMessage.objects.get(pk=done['message_id'])
+        self.assertEqual(bot_msg.content, done['response'])
+        self.assertIsNotNone(bot_msg.time_to_first_token_ms)
+        self.assertLessEqual(bot_msg.time_to_first_token_ms, bot_msg.response_time_ms)
+
+
+@override_settings(
+    GEMINI_CIRCUIT_MIN_CALLS=4,
+    GEMINI_CIRCUIT_FAILURE_RATE=0.5,
+    GEMINI_CIRCUIT_OPEN_SECONDS=30,
+    GEMINI_MAX_UPSTREAM_CALLS=5,
+    GEMINI_QUEUE_TIMEOUT_SECONDS=0.1,
+)
+class CircuitBreakerTests(TestCase):
+    """Disjoncteur Gemini partagé via le cache, contre un serveur en panne"""
+
+    def setUp(self):
+        cache.clear()
+        circuit_breaker.reset_stats()
+        self.breaker = circuit_breaker.gemini_breaker
+
+    def tearDown(self):
+        cache.clear()
+
+    def call(self, stub):
+        with self.breaker.guard():
+            requests.post(f'{stub.url}/models/m:generateContent', json={}, timeout=2).raise_for_status()
+
+    def fail_until_open(self, stub):
+        for _ in range(4):
+            with self.assertRaises(requests.HTTPError):
+                self.call(stub)
+
+    def test_opens_after_failure_rate_and_rejects_immediately(self):
+        with StubGeminiServer(failure_rate=1) as stub:
+            self.fail_until_open(stub)
+            self.assertEqual(self.breaker.state(), circuit_breaker.OPEN)
+            with self.assertRaises(circuit_breaker.CircuitOpen):
+                self.call(stub)
+            self.assertEqual(stub.requests, 4)
+
+    def test_client_errors_do_not_trip(self):
+        with StubGeminiServer(failure_rate=1, failure_status=400) as stub:
+            for _ in range(6):
+                with self.assertRaises(requests.HTTPError):
+                    self.call(stub)
+        self.assertEqual(self.breaker.state(), circuit_breaker.CLOSED)
+
+    def test_half_open_probe(self):
+        with StubGeminiServer(failure_rate=1) as stub:
+            self.fail_until_open(stub)
+            cache.set(self.breaker.key('open_until'), time.time() - 1, timeout=None)
+            self.assertEqual(self.breaker.state(), circuit_breaker.HALF_OPEN)
+
+            # Une seule sonde à la fois
+            self.assertTrue(self.breaker.allow_request())
+            with self.assertRaises(circuit_breaker.CircuitOpen):
+                self.breaker.allow_request()
+            cache.delete(self.breaker.key('probe'))
+
+            # Sonde en échec : réouverture
+            with self.assertRaises(requests.HTTPError):
+                self.call(stub)
+            self.assertEqual(self.breaker.state(), circuit_breaker.OPEN)
+
+            # Sonde réussie : fermeture, compteurs remis à zéro
+            cache.set(self.breaker.key('open_until'), time.time() - 1, timeout=None)
+            stub.failure_rate = 0
+            self.call(stub)
+            self.assertEqual(self.breaker.state(), circuit_breaker.CLOSED)
+            stub.failure_rate = 1
+            with self.assertRaises(requests.HTTPError):
+                self.call(stub)
+            self.assertEqual(self.breaker.state(), circuit_breaker.CLOSED)
+
+    def test_concurrent_calls_are_capped(self):
+        slots = [self.breaker.try_acquire_slot() for _ in range(5)]
+        self.assertNotIn(None, slots)
+        with StubGeminiServer() as stub:
+            with self.assertRaises(circuit_breaker.UpstreamBusy):
+                self.call(stub)
+            self.breaker.release_slot(slots[0])
+            self.call(stub)
+            self.assertEqual(stub.requests, 1)
+
+    def test_full_cap_fails_after_a_few_attempts(self):
+        slots = [self.breaker.try_acquire_slot() for _ in range(5)]
+        with mock.patch.object(self.breaker, 'try_acquire_slot', wraps=self.breaker.try_acquire_slot) as attempt:
+            with self.settings(GEMINI_QUEUE_TIMEOUT_SECONDS=30), mock.patch.object(circuit_breaker.time, 'sleep'):
+                with self.assertRaises(circuit_breaker.UpstreamBusy):
+                    self.breaker.acquire_slot()
+        self.assertEqual(attempt.call_count, len(circuit_breaker.QUEUE_BACKOFF_SECONDS) + 1)
+        # Les tentatives refusées ne gardent pas de place
+        self.assertEqual(cache.get(self.breaker.key('in_flight')), 5)
+        for slot in slots:
+            self.breaker.release_slot(slot)
+        self.assertEqual(cache.get(self.breaker.key('in_flight')), 0)
+
+    def test_view_serves_fallback_while_open(self):
+        ChatbotConfiguration.objects.create(key='gemini_api_key', value='cle-test')
+        chatbot_config.invalidate()
+        view = ChatAPIView()
+        session = ChatSession.objects.create(session_id='disjoncteur')
+        with StubGeminiServer(delay=1) as stub, self.settings(GEMINI_API_BASE_URL=stub.url):
+            self.breaker.trip()
+            start = time.monotonic()
+            response = view.generate_bot_response("Comment acheter un terrain ?", session)
+            self.assertLess(time.monotonic() - start, 0.5)
+            self.assertEqual(response, view.get_fallback_response())
+            self.assertEqual(stub.requests, 0)
+
+
+class ResponseCacheTests(TestCase):
+    """Cache des réponses pour les questions fréquentes"""
+
+    def setUp(self):
+        response_cache.reset_stats()
+
+    def key(self, question, domain='fiscalite', model='gemini-test'):
+        return response_cache.build_key(question, domain, AnonymousUser(), model)
+
+    def test_equivalent_questions_share_a_key(self):
+        self.assertEqual(
+            self.key("Comment déclarer mes impôts ?").key,
+            self.key("comment DECLARER mes impots").key,
+        )
+        self.assertNotEqual(
+            self.key("Comment déclarer mes impôts ?").key,
+            self.key("Comment déclarer mes impôts ?", model='autre-modele').key,
+        )
+
+    def test_negation_and_word_order_change_the_key(self):
+        self.assertNotEqual(
+            self.key("Je peux envoyer une procuration ?").key,
+            self.key("Je ne peux pas envoyer une procuration ?").key,
+        )
+        self.assertNotEqual(
+            self.key("Is a visa needed?").key,
+            self.key("Is no visa needed?").key,
+        )
+        self.assertNotEqual(
+            self.key("هل يمكن تجديد الجواز").key,
+            self.key("هل لا يمكن تجديد الجواز").key,
+        )
+        self.assertEqual(
+            response_cache.normalize_question("Visa avant le passeport ?"), 'visa avant passeport'
+        )
+        self.assertEqual(
+            response_cache.normalize_question("Passeport avant le visa ?"), 'passeport avant visa'
+        )
+
+    def test_hit_and_miss_are_counted(self):
+        key = self.key("Comment renouveler mon passeport ?", domain='administration')
+        self.assertIsNone(response_cache.get(key))
+        response_cache.store(key, "Réponse passeport")
+        self.assertEqual(response_cache.get(key), "Réponse passeport")
+        self.assertEqual(response_cache.stats, {'hits': 1, 'misses': 1})
+        self.assertEqual(response_cache.hit_rate(), 0.5)
+        self.assertEqual(CachedResponse.objects.get(key=key.key).hit_count, 1)
+
+    def test_expired_entries_are_ignored(self):
+        key = self.key("Quelle est la convention fiscale ?")
+        response_cache.store(key, "Réponse")
+        CachedResponse.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+        self.assertIsNone(response_cache.get(key))
+
+    def test_least_recently_used_entries_are_evicted(self):
+        with self.settings(CHATBOT_RESPONSE_CACHE_MAX_ENTRIES=2, CHATBOT_RESPONSE_CACHE_EVICT_EVERY=1):
+            keys = [self.key(f"question numero {i}") for i in range(3)]
+            response_cache.store(keys[0], "r0")
+            response_cache.store(keys[1], "r1")
+            CachedResponse.objects.filter(key=keys[0].key).update(last_used_at=timezone.now())
+            response_cache.store(keys[2], "r2")
+        remaining = set(CachedResponse.objects.values_list('key', flat=True))
+        self.assertEqual(remaining, {keys[0].key, keys[2].key})
+
+    def test_eviction_runs_every_n_stores(self):
+        with self.settings(CHATBOT_RESPONSE_CACHE_MAX_ENTRIES=1, CHATBOT_RESPONSE_CACHE_EVICT_EVERY=3):
+            keys = [self.key(f"question numero {i}") for i in range(3)]
+            with mock.patch.object(response_cache, 'evict', wraps=response_cache.evict) as evict:
+                response_cache.store(keys[0], "r0")
+                response_cache.store(keys[1], "r1")
+                self.assertEqual(CachedResponse.objects.count(), 2)
+                response_cache.store(keys[2], "r2")
+            self.assertEqual(evict.call_count, 1)
+        self.assertEqual(CachedResponse.objects.count(), 1)
+
+    def test_cached_response_skips_gemini(self):
+        ChatbotConfiguration.objects.create(key='gemini_api_key', value='cle-test')
+        ChatbotConfiguration.objects.create(key='gemini_model', value='gemini-test')
+        chatbot_config.invalidate()
+        question = "Comment acheter un terrain ?"
+        view = ChatAPIView()
+        response_cache.store(
+            response_cache.build_key(question, view.classify_domain(question), None, 'gemini-test'),
+            "Réponse terrain en cache",
+        )
+        session = ChatSession.objects.create(session_id='cache-test')
+        # Le serveur Gemini n'existe pas : seule une réponse en cache peut aboutir
+        with self.settings(GEMINI_API_BASE_URL='http://127.0.0.1:9/v1beta'):
+            self.assertEqual(view.generate_bot_response(question, session), "Réponse terrain en cache")
+
+    def test_repetitive_cached_response_is_not_served(self):
+        ChatbotConfiguration.objects.create(key='gemini_api_key', value='cle-test')
+        ChatbotConfiguration.objects.create(key='gemini_model', value='gemini-test')
+        chatbot_config.invalidate()
+        question = "Comment acheter un terrain ?"
+        answer = "Adressez-vous à un notaire pour acheter un terrain."
+        view = ChatAPIView()
+        response_cache.store(
+            response_cache.build_key(question, view.classify_domain(question), None, 'gemini-test'),
+            answer,
+        )
+        session = ChatSession.objects.create(session_id='cache-repetition')
+        ChatMessage.objects.create(session=session, message_type='bot', content=answer)
+        # La réponse en cache répète la conversation : un appel Gemini est préparé
+        prepared = view.prepare_gemini_request(question, session)
+        self.assertIsInstance(prepared, gemini.GeminiRequest)
+
+    def test_admin_purges_the_whole_cache_without_selection(self):
+        for i in range(3):
+            response_cache.store(self.key(f"question numero {i}"), f"r{i}")
+        admin = get_user_model().objects.create_superuser(email='admin@example.com', password='x')
+        self.client.force_login(admin)
+        changelist = self.client.get('/django-admin/chatbot/cachedresponse/')
+        # Le bouton « Purger tout le cache » est ajouté à la liste
+        self.assertTemplateUsed(changelist, 'admin/chatbot/cachedresponse/change_list.html')
+
+        self.assertEqual(self.client.get('/django-admin/chatbot/cachedresponse/purge/').status_code, 405)
+        response = self.client.post('/django-admin/chatbot/cachedresponse/purge/')
+        self.assertRedirects(response, '/django-admin/chatbot/cachedresponse/')
+        self.assertEqual(CachedResponse.objects.count(), 0)
+
+
+class ChatHistoryWindowTests(TestCase):
+    """Historique de session lu une seule fois par tour"""
+
+    def setUp(self):
+        ChatbotConfiguration.objects.create(key='gemini_api_key', value='cle-test')
+        ChatbotConfiguration.objects.create(key='gemini_model', value='gemini-test')
+        chatbot_config.invalidate()
+        ChatbotConfiguration.get_value('gemini_api_key')
+        self.view = ChatAPIView()
+        self.session = ChatSession.objects.create(session_id='historique')
+        start = timezone.now() - timedelta(minutes=10)
+        exchanges = [
+            ("Comment déclarer mes revenus au Maroc ?", "Vous devez remplir la déclaration annuelle."),
+            ("Quels documents pour un passeport ?", "Il faut un acte de naissance et une photo."),
+        ]
+        for index, (question, answer) in enumerate(exchanges):
+            ChatMessage.objects.create(session=self.session, message_type='user', content=question,
+                                       timestamp=start + timedelta(minutes=2 * index))
+            ChatMessage.objects.create(session=self.session, message_type='bot', content=answer,
+                                       timestamp=start + timedelta(minutes=2 * index + 1))
+
+    def ask(self, question):
+        ChatMessage.objects.create(session=self.session, message_type='user', content=question)
+        return self.view.prepare_gemini_request(question, self.session)
+
+    def test_one_history_query_per_turn(self):
+        question = "Comment acheter un terrain à Rabat ?"
+        ChatMessage.objects.create(session=self.session, message_type='user', content=question)
+        # Historique + recherche dans le cache des réponses
+        with self.assertNumQueries(2):
+            prepared = self.view.prepare_gemini_request(question, self.session)
+
+        texts = [part['parts'][0]['text'] for part in prepared.payload['contents']]
+        # Message système, 3 derniers messages, puis la question (une seule fois)
+        self.assertEqual(len(texts), 5)
+        self.assertEqual(texts[-1], f"Question: {question}")
+        self.assertEqual(sum(question in text for text in texts), 1)
+
+        with self.settings(CHATBOT_RESPONSE_CACHE_ENABLED=False), self.assertNumQueries(0):
+            response = self.view.finalize_bot_response(
+                "Pour acheter un terrain, adressez-vous à un notaire.", self.session,
+                prepared.cache_key, prepared.recent_messages,
+            )
+        self.assertEqual(response, "Pour acheter un terrain, adressez-vous à un notaire.")
+
+    @unittest.skipUnless(connection.vendor == 'sqlite', 'plan analysé pour SQLite')
+    def test_history_window_is_read_from_the_index(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.view.get_recent_messages(self.session)
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN QUERY PLAN ' + queries.captured_queries[0]['sql'])
+            details = [row[-1] for row in cursor.fetchall()]
+        # Ni parcours de la table ni tri temporaire
+        self.assertTrue(any('chatbot_msg_session_ts_id' in detail for detail in details), details)
+        self.assertFalse(any('TEMP B-TREE' in detail for detail in details), details)
+
+    def test_repeated_question_is_detected(self):
+        self.assertEqual(self.ask("Quels documents pour un passeport ?"), REPEATED_QUESTION_RESPONSE)
+
+    def test_repetitive_response_is_rejected(self):
+        prepared = self.ask("Comment acheter un terrain à Rabat ?")
+        response = self.view.finalize_bot_response(
+            "Il faut un acte de naissance et une photo.", self.session,
+            recent_messages=prepared.recent_messages,
+        )
+        self.assertEqual(response, self.view.get_fallback_response())
+
+
+class SimilarityTests(TestCase):
+    """Empreintes de similarité stockées avec les messages"""
+
+    def test_fingerprint_matches_text_jaccard(self):
+        view = ChatAPIView()
+        pairs = [
+            ("Comment déclarer mes impôts au Maroc ?", "comment déclarer mes impôts en France ?"),
+            ("Visa pour la France", "Acheter un terrain"),
+            ("", "Question"),
+        ]
+        for text1, text2 in pairs:
+            self.assertAlmostEqual(
+                similarity.jaccard(similarity.hash_words(text1), similarity.hash_words(text2)),
+                view.calculate_similarity(text1, text2),
+            )
+
+    def test_fingerprint_is_stored_on_save(self):
+        session = ChatSession.objects.create(session_id='empreinte')
+        message = ChatMessage.objects.create(
+            session=session, message_type='bot',
+            content="Il faut un acte de naissance récent. Comptez une semaine.",
+        )
+        message.refresh_from_db()
+        self.assertEqual(message.word_hashes, similarity.hash_words(message.content))
+        self.assertEqual(len(message.sentence_hashes), 1)
+        self.assertEqual(len(message.minhash), similarity.NUM_PERMUTATIONS)
+
+    def test_fingerprint_follows_content_changes(self):
+        session = ChatSession.objects.create(session_id='empreinte-modifiee')
+        message = ChatMessage.objects.create(session=session, message_type='bot', content="Visa pour la France")
+        message.content = "Acheter un terrain à Rabat"
+        message.save()
+        message.refresh_from_db()
+        self.assertEqual(message.word_hashes, similarity.hash_words("Acheter un terrain à Rabat"))
+
+        message = ChatMessage.objects.get(pk=message.pk)
+        message.content = "Formation en ligne"
+        message.save(update_fields=['content'])
+        message.refresh_from_db()
+        self.assertEqual(message.word_hashes, similarity.hash_words("Formation en ligne"))
+
+        # Contenu inchangé : empreinte chargée réutilisée
+        message = ChatMessage.objects.get(pk=message.pk)
+        with mock.patch.object(similarity, 'fingerprint') as compute:
+            message.is_escalated = True
+            message.save()
+            ChatMessage.objects.only('id', 'is_escalated').get(pk=message.pk).save()
+        compute.assert_not_called()
+
+    def test_repeated_questions_across_sessions(self):
+        variants = [
+            "comment renouveler mon passeport marocain depuis la France ?",
+            "comment renouveler mon passeport marocain depuis la Belgique ?",
+            "Comment renouveler mon passeport marocain depuis la France ?",
+        ]
+        for index, question in enumerate(variants):
+            session = ChatSession.objects.create(session_id=f'session-{index}')
+            ChatMessage.objects.create(session=session, message_type='user', content=question)
+            ChatMessage.objects.create(session=session, message_type='user',
+                                       content=["Quel impôt sur un loyer ?", "Formation en ligne",
+                                                "Acheter un riad"][index])
+
+        groups = similarity.find_repeated_questions(ChatMessage.objects.all(), min_count=3)
+        self.assertEqual(len(groups), 1)
+        self.assertEqual(groups[0].count, 3)
+        self.assertEqual(groups[0].sessions, 3)
+
+    def test_groups_members_not_similar_to_the_first_of_the_band(self):
+        class Fingerprinted:
+            def __init__(self, name, word_hashes):
+                self.name = name
+                self.word_hashes = word_hashes
+                # Même signature : les trois messages tombent dans les mêmes bandes
+                self.minhash = [0] * similarity.NUM_PERMUTATIONS
+
+        first = Fingerprinted('A', list(range(0, 10)))
+        second = Fingerprinted('B', list(range(5, 15)))
+        third = Fingerprinted('C', list(range(5, 16)))
+        self.assertLess(similarity.jaccard(first.word_hashes, second.word_hashes), 0.7)
+        self.assertLess(similarity.jaccard(first.word_hashes, third.word_hashes), 0.7)
+        self.assertGreaterEqual(similarity.jaccard(second.word_hashes, third.word_hashes), 0.7)
+
+        groups = similarity.find_near_duplicates([first, second, third])
+        self.assertEqual([[message.name for message in group] for group in groups], [['B', 'C'], ['A']])
+
+
+class DomainClassifierTests(TestCase):
+    """Classification multilingue compilée en une expression régulière"""
+
+    def setUp(self):
+        chatbot_config.invalidate()
+
+    def tearDown(self):
+        # Ne pas garder l'instantané d'une configuration annulée avec le test
+        chatbot_config.invalidate()
+
+    def test_whole_words_only(self):
+        self.assertEqual(classifier.classify("Je voudrais écarter cette option"), 'other')
+        self.assertEqual(classifier.classify("Il est parti"), 'other')
+        self.assertEqual(classifier.classify("Comment payer l'IR au Maroc ?"), 'fiscalite')
+        self.assertEqual(classifier.classify("Mes impôts et taxes"), 'fiscalite')
+
+    def test_languages_and_scores(self):
+        self.assertEqual(classifier.classify("How do I renew my passport?"), 'administration')
+        self.assertEqual(classifier.classify("أريد شراء شقة في الرباط"), 'immobilier')
+        self.assertEqual(classifier.classify("والضريبة على الدخل"), 'fiscalite')
+        self.assertEqual(
+            classifier.score_domains("Formation et diplôme pour mes impôts"),
+            [('formation', 2 / 3), ('fiscalite', 1 / 3)],
+        )
+
+    def test_keywords_from_configuration(self):
+        self.assertEqual(classifier.classify("Une question sur le hammam"), 'other')
+        with self.captureOnCommitCallbacks(execute=True):
+            ChatbotConfiguration.set_value(
+                'domain_keywords_fr', json.dumps({'immobilier': ['hammam', 'riad']})
+            )
+        self.assertEqual(classifier.classify("Une question sur le hammam"), 'immobilier')
+        # La table configurée remplace celle par défaut pour cette langue
+        self.assertEqual(classifier.classify("Acheter une maison"), 'other')
+
+    def test_badly_shaped_keywords_fall_back_to_defaults(self):
+        bad_tables = [
+            ['a', 'b'],                        # liste au lieu d'un objet
+            {'immobilier': 'riad'},            # chaîne au lieu d'une liste
+            {'immobilier': ['riad', 3]},       # mot-clé non textuel
+            'riad',
+        ]
+        with contextlib.redirect_stdout(StringIO()):
+            for table in bad_tables:
+                with self.subTest(table=table):
+                    domain_classifier = classifier.DomainClassifier({'fr': table})
+                    self.assertEqual(domain_classifier.classify("Acheter une maison"), 'immobilier')
+                    self.assertNotIn('r', domain_classifier.keywords.get('immobilier', []))
+
+                    with self.captureOnCommitCallbacks(execute=True):
+                        ChatbotConfiguration.set_value('domain_keywords_fr', json.dumps(table))
+                    self.assertEqual(classifier.classify("Acheter une maison"), 'immobilier')
+                    self.assertEqual(classifier.classify("Un riad à Marrakech"), 'other')
+
+    def test_reclassify_command(self):
+        session = ChatSession.objects.create(session_id='reclassement')
+        question = ChatMessage.objects.create(session=session, message_type='user',
+                                              content="Renouveler ma carte consulaire", domain_category='other')
+        answer = ChatMessage.objects.create(session=session, message_type='bot',
+                                            content="Voici la marche à suivre", domain_category='other')
+        call_command('reclassify_chat_messages', stdout=StringIO())
+        question.refresh_from_db()
+        answer.refresh_from_db()
+        self.assertEqual(question.domain_category, 'administration')
+        self.assertEqual(answer.domain_category, 'administration')
+
+
+class ChatAnalyticsPipelineTests(TestCase):
+    """Compteurs d'analytics écrits par lots et consolidation"""
+
+    def setUp(self):
+        analytics.flush()
+
+    def test_increments_are_batched(self):
+        with self.settings(CHATBOT_ANALYTICS_FLUSH_SIZE=5, CHATBOT_ANALYTICS_FLUSH_INTERVAL=3600):
+            with self.assertNumQueries(0):
+                for _ in range(4):
+                    analytics.record_message('fiscalite')
+            # Le 5e message déclenche l'écriture : UPDATE (aucune ligne) puis INSERT
+            # (dans un point de sauvegarde : SAVEPOINT et RELEASE en plus)
+            with self.assertNumQueries(4):
+                analytics.record_message('immobilier')
+
+        row = ChatAnalytics.objects.get(date=timezone.now().date())
+        self.assertEqual(row.total_messages, 5)
+        self.assertEqual(row.fiscalite_questions, 4)
+        self.assertEqual(row.immobilier_questions, 1)
+
+    def test_flush_adds_to_existing_row(self):
+        today = timezone.now().date()
+        ChatAnalytics.objects.create(date=today, total_messages=10, off_topic_questions=3)
+        with self.settings(CHATBOT_ANALYTICS_FLUSH_SIZE=100, CHATBOT_ANALYTICS_FLUSH_INTERVAL=3600):
+            analytics.record_message('other')
+            analytics.record_message('formation')
+            with self.assertNumQueries(1):
+                analytics.flush()
+        row = ChatAnalytics.objects.get(date=today)
+        self.assertEqual(row.total_messages, 12)
+        self.assertEqual(row.off_topic_questions, 4)
+        self.assertEqual(row.formation_questions, 1)
+
+    def test_failed_flush_keeps_counters(self):
+        today = timezone.now().date()
+        with self.settings(CHATBOT_ANALYTICS_FLUSH_SIZE=2, CHATBOT_ANALYTICS_FLUSH_INTERVAL=3600):
+            analytics.record_message('fiscalite')
+            with mock.patch.object(ChatAnalytics.objects, 'filter', side_effect=OperationalError('base indisponible')):
+                # Ne remonte pas jusqu'à la vue : le message est déjà enregistré
+                analytics.record_message('fiscalite')
+            self.assertFalse(ChatAnalytics.objects.filter(date=today).exists())
+            analytics.record_message('immobilier')
+        row = ChatAnalytics.objects.get(date=today)
+        self.assertEqual(row.total_messages, 3)
+        self.assertEqual(row.fiscalite_questions, 2)
+
+    def test_pending_counters_are_flushed_at_request_end(self):
+        today = timezone.now().date()
+        with self.settings(CHATBOT_ANALYTICS_FLUSH_SIZE=100, CHATBOT_ANALYTICS_FLUSH_INTERVAL=60):
+            analytics.record_message('formation')
+            request_finished.send(sender=self.__class__)
+            self.assertFalse(ChatAnalytics.objects.filter(date=today).exists())
+            analytics._state['last_flush'] -= 60
+            request_finished.send(sender=self.__class__)
+        self.assertEqual(ChatAnalytics.objects.get(date=today).formation_questions, 1)
+
+    def test_rollup_fills_derived_metrics(self):
+        first = ChatSession.objects.create(session_id='s1', ip_address='10.0.0.1')
+        second = ChatSession.objects.create(session_id='s2', ip_address='10.0.0.2')
+        for session, escalated in ((first, True), (second, False)):
+            ChatMessage.objects.create(
+                session=session, message_type='user', content='question', is_escalated=escalated
+            )
+        ChatMessage.objects.create(session=first, message_type='bot', content='r', response_time_ms=100)
+        ChatMessage.objects.create(session=second, message_type='bot', content='r', response_time_ms=300)
+
+        call_command('rollup_chat_analytics', stdout=StringIO())
+
+        row = ChatAnalytics.objects.get(date=timezone.now().date())
+        self.assertEqual(row.total_sessions, 2)
+        self.assertEqual(row.unique_users, 2)
+        self.assertEqual(row.avg_response_time_ms, 200)
+        self.assertEqual(row.escalation_rate, 0.5)
+
+
+class ChatAnalyticsDashboardTests(TestCase):
+    """Tableau de bord lu depuis le cumul journalier"""
+
+    def setUp(self):
+        from django.contrib.auth import get_user_model
+        self.staff = get_user_model().objects.create_user(
+            email='staff@example.com', password='secret', name='Staff', first_name='Admin', is_staff=True
+        )
+        today = timezone.now().date()
+        for offset in range(1, 400):
+            ChatAnalytics.objects.create(
+                date=today - timedelta(days=offset),
+                total_sessions=2, total_messages=5,
+                fiscalite_questions=3, off_topic_questions=2,
+                avg_response_time_ms=100,
+            )
+
+    def test_summary_is_a_single_query(self):
+        for days in analytics.DASHBOARD_RANGES:
+            start_date, end_date = analytics.get_period(days)
+            with self.assertNumQueries(1):
+                totals, domains = analytics.summarize(start_date, end_date)
+            # La journée en cours n'a pas encore de ligne
+            self.assertEqual(totals['total_messages'], 5 * (days - 1))
+            self.assertEqual(domains['fiscalite'], 3 * (days - 1))
+            self.assertEqual(domains['immobilier'], 0)
+
+    def test_series_by_month(self):
+        start_date, end_date = analytics.get_period(365)
+        with self.assertNumQueries(1):
+            rows = analytics.series(start_date, end_date, 'month')
+        self.assertIn(len(rows), (12, 13))
+        self.assertEqual(sum(row['messages'] for row in rows), 5 * 364)
+        self.assertTrue(all(row['period'].endswith('-01') for row in rows))
+
+    def test_json_endpoint(self):
+        self.client.force_login(self.staff)
+        response = self.client.get('/chatbot/analytics/data/', {'days': 7})
+        data = response.json()
+        self.assertEqual(data['group'], 'day')
+        self.assertEqual(len(data['series']), 6)
+        self.assertEqual(data['totals']['total_sessions'], 12)
+
+        response = self.client.get('/chatbot/analytics/data/', {'days': 365})
+        self.assertEqual(response.json()['group'], 'month')
+
+    def test_rollup_materializes_closed_days(self):
+        yesterday = timezone.now() - timedelta(days=1)
+        session = ChatSession.objects.create(session_id='s1', ip_address='10.0.0.1')
+        for domain in ('fiscalite', 'fiscalite', 'other'):
+            ChatMessage.objects.create(
+                session=session, message_type='user', content='q',
+                domain_category=domain, timestamp=yesterday,
+            )
+        ChatMessage.objects.create(session=session, message_type='user', content='q',
+                                   domain_category='formation')
+
+        analytics.rollup(yesterday.date(), timezone.now().date())
+
+        row = ChatAnalytics.objects.get(date=yesterday.date())
+        self.assertEqual(row.total_messages, 3)
+        self.assertEqual(row.fiscalite_questions, 2)
+        self.assertEqual(row.off_topic_questions, 1)
+        # Compteurs du jour courant laissés aux tampons des workers
+        self.assertEqual(ChatAnalytics.objects.get(date=timezone.now().date()).total_messages, 0)
+
+    def test_late_flush_does_not_double_count_a_rolled_up_day(self):
+        yesterday = timezone.now() - timedelta(days=1)
+        session = ChatSession.objects.create(session_id='s1', ip_address='10.0.0.1')
+        for _ in range(2):
+            ChatMessage.objects.create(
+                session=session, message_type='user', content='q',
+                domain_category='fiscalite', timestamp=yesterday,
+            )
+        analytics.flush()
+        analytics.reset_stats()
+        # Incréments d'un worker pas encore écrits au moment du rollup
+        with self.settings(CHATBOT_ANALYTICS_FLUSH_SIZE=100, CHATBOT_ANALYTICS_FLUSH_INTERVAL=3600):
+            for _ in range(2):
+                analytics.record_message('fiscalite', day=yesterday.date())
+
+        analytics.rollup(yesterday.date(), yesterday.date())
+        analytics.flush()
+
+        row = ChatAnalytics.objects.get(date=yesterday.date())
+        self.assertEqual((row.total_messages, row.fiscalite_questions), (2, 2))
+        self.assertEqual(analytics.stats['skipped_rolled_up'], 2)
+
+    def test_benchmark_command(self):
+        output = StringIO()
+        call_command('benchmark_chat_analytics', days=40, messages_per_day=4, repeat=1, stdout=output)
+        self.assertIn('✓', output.getvalue())
+        # Données générées annulées
+        self.assertFalse(ChatMessage.objects.exists())
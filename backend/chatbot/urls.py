@@ -14,4 +14,5 @@ urlpatterns = [
     # Pages d'historique et analytics
     path('history/', views.chat_history, name='history'),
     path('analytics/', views.chat_analytics, name='analytics'),
+    path('analytics/data/', views.chat_analytics_data, name='analytics_data'),
 ]
@@ -4,6 +4,7 @@ from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 from django.utils.decorators import method_decorator
 from django.views import View
+from django.conf import settings
 from django.contrib.auth.decorators import login_required
 from django.db.models import Q, Count, Avg, Sum
 from django.utils import timezone
@@ -15,6 +16,23 @@ import requests
 from datetime import datetime, timedelta
 
 from .models import ChatSession, ChatMessage, ChatFeedback, ChatAnalytics, ChatbotConfiguration
+from . import analytics
+from . import circuit_breaker
+from . import classifier
+from . import gemini
+from . import response_cache
+from . import similarity
+
+DEFAULT_HISTORY_WINDOW = 6
+
+REPEATED_QUESTION_RESPONSE = """🇲🇦 Je remarque que vous avez posé une question similaire. 
+
+Pour vous aider au mieux, pourriez-vous :
+• Préciser votre question
+• Donner plus de détails sur votre situation
+• Me dire si ma réponse précédente n'était pas claire
+
+Je suis là pour vous aider avec précision !"""
 
 
 class ChatbotView(View):
@@ -65,6 +83,7 @@ class ChatAPIView(View):
                 message_type='bot',
                 content=bot_response,
                 response_time_ms=response_time,
+                time_to_first_token_ms=response_time,  # Rien n'est affiché avant la réponse complète
                 domain_category=user_msg.domain_category
             )
             
@@ -110,132 +129,33 @@ class ChatAPIView(View):
         return ip
     
     def classify_domain(self, message):
-        """Classifier le domaine de la question"""
-        message_lower = message.lower()
-        
-        # Mots-clés par domaine
-        keywords = {
-            'fiscalite': ['impôt', 'taxe', 'déclaration', 'fiscal', 'tva', 'ir', 'is', 'convention'],
-            'immobilier': ['maison', 'appartement', 'terrain', 'achat', 'vente', 'location', 'immobilier'],
-            'investissement': ['investir', 'placement', 'bourse', 'opcvm', 'action', 'obligation', 'projet'],
-            'administration': ['consulat', 'passeport', 'visa', 'état civil', 'document', 'carte'],
-            'formation': ['formation', 'diplôme', 'certification', 'cours', 'apprentissage', 'métier']
-        }
-        
-        for domain, words in keywords.items():
-            if any(word in message_lower for word in words):
-                return domain
-        
-        return 'other'
+        """Classifier le domaine de la question (mots-clés fr/en/ar, voir chatbot.classifier)"""
+        return classifier.classify(message)
     
     def generate_bot_response(self, user_message, session):
         """Générer une réponse du bot via l'API Gemini"""
         try:
-            # Récupérer la clé API et le modèle depuis la configuration
-            api_key = ChatbotConfiguration.get_value('gemini_api_key', '')
-            model = ChatbotConfiguration.get_value('gemini_model', 'gemini-pro')
-            
-            if not api_key:
-                print("Erreur: Clé API Gemini manquante")
-                return self.get_fallback_response()
-            
-            # Vérifier si la question est similaire aux questions précédentes
-            if self.is_question_repeated(user_message, session):
-                return """🇲🇦 Je remarque que vous avez posé une question similaire. 
-
-Pour vous aider au mieux, pourriez-vous :
-• Préciser votre question
-• Donner plus de détails sur votre situation
-• Me dire si ma réponse précédente n'était pas claire
-
-Je suis là pour vous aider avec précision !"""
-            
-            # Récupérer l'historique des messages récents (limité à 3 pour éviter la confusion)
-            recent_messages = ChatMessage.objects.filter(
-                session=session
-            ).order_by('-created_at')[:3]
-            
-            # Construire l'historique de conversation avec un format plus strict
-            conversation_history = []
-            
-            # Ajouter le message système en premier
-            system_prompt = self.get_system_prompt(session.user)
-            conversation_history.append({
-                "role": "system",
-                "parts": [{"text": system_prompt}]
-            })
-            
-            # Ajouter l'historique des messages
-            for msg in reversed(recent_messages):
-                role = "user" if msg.message_type == "user" else "assistant"
-                # Ajouter un préfixe pour différencier les messages
-                prefix = "Question: " if role == "user" else "Réponse: "
-                conversation_history.append({
-                    "role": role,
-                    "parts": [{"text": f"{prefix}{msg.content}"}]
-                })
-            
-            # Ajouter le message actuel
-            conversation_history.append({
-                "role": "user",
-                "parts": [{"text": f"Question: {user_message}"}]
-            })
-            
-            # Préparer la requête pour Gemini avec des paramètres plus stricts
-            url = f"https://generativelanguage.googleapis.com/v1beta/models/{model}:generateContent?key={api_key}"
-            
-            payload = {
-                "contents": conversation_history,
-                "generationConfig": {
-                    "temperature": 0.7,  # Réduit pour plus de cohérence
-                    "topK": 20,  # Réduit pour plus de précision
-                    "topP": 0.8,  # Réduit pour éviter les répétitions
-                    "maxOutputTokens": 800,  # Réduit pour des réponses plus concises
-                    "stopSequences": ["Question:", "Réponse:", "User:", "Assistant:"]
-                },
-                "safetySettings": [
-                    {
-                        "category": "HARM_CATEGORY_HARASSMENT",
-                        "threshold": "BLOCK_MEDIUM_AND_ABOVE"
-                    },
-                    {
-                        "category": "HARM_CATEGORY_HATE_SPEECH",
-                        "threshold": "BLOCK_MEDIUM_AND_ABOVE"
-                    },
-                    {
-                        "category": "HARM_CATEGORY_SEXUALLY_EXPLICIT",
-                        "threshold": "BLOCK_MEDIUM_AND_ABOVE"
-                    },
-                    {
-                        "category": "HARM_CATEGORY_DANGEROUS_CONTENT",
-                        "threshold": "BLOCK_MEDIUM_AND_ABOVE"
-                    }
-                ]
-            }
+            prepared = self.prepare_gemini_request(user_message, session)
+            if isinstance(prepared, str):
+                return prepared
             
-            # Faire la requête avec un timeout plus court
-            response = requests.post(url, json=payload, timeout=15)
-            response.raise_for_status()
+            # Disjoncteur ouvert ou trop d'appels en cours : secours immédiat
+            with circuit_breaker.gemini_breaker.guard():
+                response = requests.post(
+                    gemini.build_generate_url(prepared.model, prepared.api_key),
+                    json=prepared.payload,
+                    timeout=gemini.get_timeout()
+                )
+                response.raise_for_status()
             
-            data = response.json()
-            
-            if 'candidates' in data and data['candidates']:
-                bot_response = data['candidates'][0]['content']['parts'][0]['text']
-                
-                # Nettoyer la réponse (enlever les préfixes potentiels)
-                bot_response = bot_response.replace("Réponse:", "").strip()
-                
-                # Vérifications supplémentaires
-                if (self.is_response_repetitive(bot_response, session) or 
-                    len(bot_response) < 20 or  # Réponse trop courte
-                    len(bot_response) > 1000):  # Réponse trop longue
-                    return self.get_fallback_response()
-                
-                return bot_response
-            else:
-                print("Erreur: Pas de réponse valide de l'API Gemini")
-                return self.get_fallback_response()
+            return self.finalize_bot_response(
+                gemini.extract_text(response.json()), session,
+                prepared.cache_key, prepared.recent_messages
+            )
                 
+        except circuit_breaker.UpstreamRejected as e:
+            print(f"Appel API Gemini évité: {e}")
+            return self.get_fallback_response()
         except requests.exceptions.RequestException as e:
             print(f"Erreur de requête API Gemini: {e}")
             return self.get_fallback_response()
@@ -243,42 +163,163 @@ Je suis là pour vous aider avec précision !"""
             print(f"Erreur inattendue: {e}")
             return self.get_fallback_response()
     
-    def is_question_repeated(self, question, session):
+    def prepare_gemini_request(self, user_message, session):
+        """Préparer l'appel Gemini
+        
+        Retourne un ``gemini.GeminiRequest``, ou directement le texte de la
+        réponse quand aucun appel n'est nécessaire (y compris si une réponse
+        à une question équivalente est en cache et ne répète pas la conversation).
+        """
+        # Récupérer la clé API et le modèle depuis la configuration
+        api_key = ChatbotConfiguration.get_value('gemini_api_key', '')
+        model = ChatbotConfiguration.get_value('gemini_model', 'gemini-pro')
+        
+        if not api_key:
+            print("Erreur: Clé API Gemini manquante")
+            return self.get_fallback_response()
+        
+        # Une seule lecture de l'historique, partagée par toutes les vérifications
+        recent_messages = self.get_recent_messages(session, user_message)
+        
+        # Vérifier si la question est similaire aux questions précédentes
+        if self.is_question_repeated(user_message, session, recent_messages):
+            return REPEATED_QUESTION_RESPONSE
+        
+        # Réponse déjà générée pour une question équivalente
+        cache_key = response_cache.build_key(
+            user_message, self.classify_domain(user_message), session.user, model
+        )
+        cached_response = response_cache.get(cache_key)
+        # Même vérification de répétition qu'une réponse fraîche, sinon on régénère
+        if cached_response and not self.is_response_repetitive(
+            cached_response, session, recent_messages
+        ):
+            return cached_response
+        
+        conversation_history = self.build_conversation_history(
+            user_message, session, recent_messages
+        )
+        return gemini.GeminiRequest(
+            model, api_key, gemini.build_payload(conversation_history), cache_key, recent_messages
+        )
+    
+    def get_recent_messages(self, session, user_message=None):
+        """Derniers messages de la session, du plus récent au plus ancien
+        
+        Une seule requête par tour (index session, date, id) ; le message
+        utilisateur en cours, déjà enregistré, est écarté.
+        """
+        window = getattr(settings, 'CHATBOT_HISTORY_WINDOW', DEFAULT_HISTORY_WINDOW)
+        recent_messages = list(
+            ChatMessage.objects.filter(session=session)
+            .only('message_type', 'content', 'timestamp', 'word_hashes', 'sentence_hashes')
+            .order_by('-timestamp', '-id')[:window + 1]
+        )
+        if (recent_messages and recent_messages[0].message_type == 'user'
+                and recent_messages[0].content == user_message):
+            return recent_messages[1:]
+        return recent_messages[:window]
+    
+    def build_conversation_history(self, user_message, session, recent_messages=None):
+        """Construire l'historique de conversation envoyé à Gemini"""
+        if recent_messages is None:
+            recent_messages = self.get_recent_messages(session, user_message)
+        # Historique des messages récents (limité à 3 pour éviter la confusion)
+        recent_messages = recent_messages[:3]
+        
+        # Construire l'historique de conversation avec un format plus strict
+        conversation_history = []
+        
+        # Ajouter le message système en premier
+        system_prompt = self.get_system_prompt(session.user)
+        conversation_history.append({
+            "role": "system",
+            "parts": [{"text": system_prompt}]
+        })
+        
+        # Ajouter l'historique des messages
+        for msg in reversed(recent_messages):
+            role = "user" if msg.message_type == "user" else "assistant"
+            # Ajouter un préfixe pour différencier les messages
+            prefix = "Question: " if role == "user" else "Réponse: "
+            conversation_history.append({
+                "role": role,
+                "parts": [{"text": f"{prefix}{msg.content}"}]
+            })
+        
+        # Ajouter le message actuel
+        conversation_history.append({
+            "role": "user",
+            "parts": [{"text": f"Question: {user_message}"}]
+        })
+        return conversation_history
+    
+    def finalize_bot_response(self, bot_response, session, cache_key=None, recent_messages=None):
+        """Nettoyer et valider le texte renvoyé par Gemini (mis en cache s'il est valide)"""
+        if bot_response is None:
+            print("Erreur: Pas de réponse valide de l'API Gemini")
+            return self.get_fallback_response()
+        
+        # Nettoyer la réponse (enlever les préfixes potentiels)
+        bot_response = bot_response.replace("Réponse:", "").strip()
+        
+        # Vérifications supplémentaires
+        if (self.is_response_repetitive(bot_response, session, recent_messages) or 
+            len(bot_response) < 20 or  # Réponse trop courte
+            len(bot_response) > 1000):  # Réponse trop longue
+            return self.get_fallback_response()
+        
+        if cache_key is not None:
+            response_cache.store(cache_key, bot_response)
+        return bot_response
+    
+    def is_question_repeated(self, question, session, recent_messages=None):
         """Vérifier si la question est similaire aux questions précédentes"""
-        recent_questions = ChatMessage.objects.filter(
-            session=session,
-            message_type='user'
-        ).order_by('-created_at')[:3]  # Dernières 3 questions
+        if recent_messages is None:
+            recent_messages = self.get_recent_messages(session, question)
+        recent_questions = [
+            msg for msg in recent_messages if msg.message_type == 'user'
+        ][:3]  # Dernières 3 questions
         
+        question_hashes = similarity.hash_words(question)
         for msg in recent_questions:
-            if self.calculate_similarity(question, msg.content) > 0.7:  # Seuil plus bas pour les questions
+            # Seuil plus bas pour les questions
+            word_hashes, _ = similarity.get_hashes(msg)
+            if similarity.jaccard(question_hashes, word_hashes) > 0.7:
                 return True
         return False
     
-    def is_response_repetitive(self, response, session):
+    def is_response_repetitive(self, response, session, recent_messages=None):
         """Vérifier si la réponse est trop similaire aux messages précédents"""
-        recent_bot_messages = ChatMessage.objects.filter(
-            session=session,
-            message_type='bot'
-        ).order_by('-created_at')[:3]
+        if recent_messages is None:
+            recent_messages = self.get_recent_messages(session)
+        recent_bot_messages = [
+            msg for msg in recent_messages if msg.message_type == 'bot'
+        ][:3]
+        
+        # Hachages de la réponse calculés une fois, ceux des messages sont stockés
+        response_words = similarity.hash_words(response)
+        response_sentences = similarity.hash_sentences(response)
         
         # Vérifications multiples
         for msg in recent_bot_messages:
+            word_hashes, sentence_hashes = similarity.get_hashes(msg)
             # Vérifier la similarité globale
-            if self.calculate_similarity(response, msg.content) > 0.6:  # Seuil plus strict
+            if similarity.jaccard(response_words, word_hashes) > 0.6:  # Seuil plus strict
                 return True
             
             # Vérifier les phrases identiques
-            response_sentences = set(s.strip() for s in response.split('.') if len(s.strip()) > 20)
-            msg_sentences = set(s.strip() for s in msg.content.split('.') if len(s.strip()) > 20)
-            
-            if response_sentences.intersection(msg_sentences):
+            if similarity.shares_sentence(response_sentences, sentence_hashes):
                 return True
         
         return False
     
     def calculate_similarity(self, text1, text2):
-        """Calculer la similarité entre deux textes (méthode simple)"""
+        """Calculer la similarité entre deux textes (méthode simple)
+        
+        Recalcule les ensembles de mots à chaque appel ; les vérifications de
+        répétition utilisent les empreintes de ``chatbot.similarity``.
+        """
         # Convertir en minuscules et en ensembles de mots
         words1 = set(text1.lower().split())
         words2 = set(text2.lower().split())
@@ -336,27 +377,8 @@ En attendant, je peux vous orienter vers nos ressources :
 💡 Pour une assistance personnalisée immédiate, n'hésitez pas à vous inscrire sur notre plateforme ou à contacter directement nos experts."""
     
     def update_analytics(self, domain_category):
-        """Mettre à jour les analytics quotidiennes"""
-        today = timezone.now().date()
-        analytics, created = ChatAnalytics.objects.get_or_create(date=today)
-        
-        analytics.total_messages += 1
-        
-        # Incrémenter le compteur de domaine
-        if domain_category == 'fiscalite':
-            analytics.fiscalite_questions += 1
-        elif domain_category == 'immobilier':
-            analytics.immobilier_questions += 1
-        elif domain_category == 'investissement':
-            analytics.investissement_questions += 1
-        elif domain_category == 'administration':
-            analytics.administration_questions += 1
-        elif domain_category == 'formation':
-            analytics.formation_questions += 1
-        else:
-            analytics.off_topic_questions += 1
-        
-        analytics.save()
+        """Mettre à jour les analytics quotidiennes (compteurs écrits par lots)"""
+        analytics.record_message(domain_category)
 
 
 @method_decorator(csrf_exempt, name='dispatch')
@@ -416,42 +438,58 @@ def chat_history(request):
     return render(request, 'chatbot/history.html', context)
 
 
+def get_analytics_days(request):
+    """Nombre de jours demandé (paramètre ``days``), borné"""
+    try:
+        days = int(request.GET.get('days', analytics.DEFAULT_DASHBOARD_DAYS))
+    except (TypeError, ValueError):
+        days = analytics.DEFAULT_DASHBOARD_DAYS
+    return min(max(days, 1), analytics.MAX_DASHBOARD_DAYS)
+
+
 @login_required 
 def chat_analytics(request):
     """Tableau de bord analytics pour les admins"""
     if not request.user.is_staff:
         return JsonResponse({'error': 'Accès non autorisé'}, status=403)
     
-    # Analytics des 30 derniers jours
-    end_date = timezone.now().date()
-    start_date = end_date - timedelta(days=30)
-    
-    analytics = ChatAnalytics.objects.filter(
-        date__range=[start_date, end_date]
-    ).order_by('-date')
-      # Agrégations
-    total_stats = analytics.aggregate(
-        total_sessions=Sum('total_sessions'),
-        total_messages=Sum('total_messages'),
-        avg_response_time=Avg('avg_response_time_ms'),
-        avg_satisfaction=Avg('satisfaction_avg')
-    )
+    # Analytics des 30 derniers jours par défaut (7, 30 ou 365 via ?days=)
+    days = get_analytics_days(request)
+    start_date, end_date = analytics.get_period(days)
     
-    # Top domaines
-    domain_stats = {
-        'fiscalite': analytics.aggregate(Sum('fiscalite_questions'))['fiscalite_questions__sum'] or 0,
-        'immobilier': analytics.aggregate(Sum('immobilier_questions'))['immobilier_questions__sum'] or 0,
-        'investissement': analytics.aggregate(Sum('investissement_questions'))['investissement_questions__sum'] or 0,
-        'administration': analytics.aggregate(Sum('administration_questions'))['administration_questions__sum'] or 0,
-        'formation': analytics.aggregate(Sum('formation_questions'))['formation_questions__sum'] or 0,
-        'off_topic': analytics.aggregate(Sum('off_topic_questions'))['off_topic_questions__sum'] or 0,
-    }
+    # Totaux et domaines en une seule agrégation sur le cumul journalier
+    total_stats, domain_stats = analytics.summarize(start_date, end_date)
     
     context = {
-        'analytics': analytics,
+        'analytics': analytics.series(start_date, end_date),
         'total_stats': total_stats,
         'domain_stats': domain_stats,
+        'days': days,
+        'ranges': analytics.DASHBOARD_RANGES,
         'date_range': f"{start_date} - {end_date}"
     }
     
     return render(request, 'chatbot/analytics.html', context)
+
+
+@login_required
+def chat_analytics_data(request):
+    """Données JSON des graphiques analytics (?days=N&group=day|month)"""
+    if not request.user.is_staff:
+        return JsonResponse({'error': 'Accès non autorisé'}, status=403)
+    
+    days = get_analytics_days(request)
+    start_date, end_date = analytics.get_period(days)
+    group = request.GET.get('group') or ('month' if days > 90 else 'day')
+    if group not in ('day', 'month'):
+        return JsonResponse({'error': 'Regroupement invalide'}, status=400)
+    
+    total_stats, domain_stats = analytics.summarize(start_date, end_date)
+    return JsonResponse({
+        'start_date': start_date.isoformat(),
+        'end_date': end_date.isoformat(),
+        'group': group,
+        'totals': total_stats,
+        'domains': domain_stats,
+        'series': analytics.series(start_date, end_date, group),
+    })
@@ -2,6 +2,7 @@ from django.shortcuts import redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.http import JsonResponse
+from accounts import user_cache
 from accounts.models import Utilisateur
 
 @login_required
@@ -37,6 +38,8 @@ def admin_bulk_toggle_users_status(request):
             
         # Update all selected users
         updated = Utilisateur.objects.filter(id__in=user_ids).update(is_active=is_active)
+        # update() n'envoie pas post_save : oublier les utilisateurs en cache
+        user_cache.invalidate_many(user_ids)
         
         messages.success(request, f"{updated} utilisateurs ont été {status_msg} avec succès.")
         
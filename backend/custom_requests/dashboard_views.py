@@ -4,6 +4,7 @@ from django.db.models import Count, Q
 from django.utils import timezone
 
 from accounts.models import Client, Utilisateur, Expert
+from accounts.roles import get_client_profile, get_expert_profile, get_role_profile
 from services.models import Service, ServiceCategory
 from .models import ServiceRequest, Document, RendezVous, Notification, Message
 
@@ -63,7 +64,7 @@ def client_dashboard_view(request):
             return redirect('home')
         
         # Check if client profile exists
-        client_exists = Client.objects.filter(user=request.user).exists()
+        client_exists = get_role_profile(request.user) is not None
         print(f"Client profile exists for user: {client_exists}")
         
         if not client_exists:
@@ -74,7 +75,7 @@ def client_dashboard_view(request):
             return redirect('home')
         
         # Get client profile
-        client_profile = Client.objects.get(user=request.user)
+        client_profile = get_client_profile(request.user)
         print(f"Found client profile for {client_profile}")
         
         # Count of active service requests
@@ -198,7 +199,7 @@ def expert_dashboard_view(request):
             return redirect('home')
             
         # Get expert profile
-        expert_profile = Expert.objects.get(user=request.user)
+        expert_profile = get_expert_profile(request.user)
         print(f"Found expert profile for {expert_profile}")
         
         # Count of active service requests
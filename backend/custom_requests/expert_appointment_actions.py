@@ -7,6 +7,7 @@ from django.contrib import messages
 from django.urls import reverse
 
 from accounts.models import Utilisateur, Expert, Client
+from accounts.roles import get_expert_profile
 from custom_requests.models import ServiceRequest, Document, RendezVous, Message, Notification
 from services.email_notifications import EmailNotificationService
 
@@ -17,7 +18,7 @@ def expert_confirm_appointment(request, appointment_id):
         return redirect('home')
 
     try:
-        expert = Expert.objects.get(user=request.user)
+        expert = get_expert_profile(request.user)
         
         # Get appointment details
         appointment = get_object_or_404(RendezVous, id=appointment_id, expert=request.user)
@@ -59,7 +60,7 @@ def expert_cancel_appointment(request, appointment_id):
         return redirect('home')
 
     try:
-        expert = Expert.objects.get(user=request.user)
+        expert = get_expert_profile(request.user)
         
         # Get appointment details
         appointment = get_object_or_404(RendezVous, id=appointment_id, expert=request.user)
@@ -101,7 +102,7 @@ def expert_complete_appointment(request, appointment_id):
         return redirect('home')
 
     try:
-        expert = Expert.objects.get(user=request.user)
+        expert = get_expert_profile(request.user)
         
         # Get appointment details
         appointment = get_object_or_404(RendezVous, id=appointment_id, expert=request.user)
@@ -149,7 +150,7 @@ def expert_appointment_detail(request, appointment_id):
         return redirect('home')
 
     try:
-        expert = Expert.objects.get(user=request.user)
+        expert = get_expert_profile(request.user)
         
         # Get appointment details
         appointment = get_object_or_404(RendezVous, id=appointment_id, expert=request.user)
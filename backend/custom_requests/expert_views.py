@@ -6,8 +6,10 @@ from django.utils.translation import gettext_lazy as _
 from django.contrib import messages
 
 from accounts.models import Utilisateur, Expert, Client
+from accounts.roles import get_expert_profile
 from custom_requests.models import ServiceRequest, Document, RendezVous, Message, Notification
 from services.email_notifications import EmailNotificationService
+from messaging.conversations import mark_read
 
 @login_required
 def expert_documents_view(request):
@@ -16,7 +18,7 @@ def expert_documents_view(request):
         return redirect('home')
 
     try:
-        expert = Expert.objects.get(user=request.user)
+        expert = get_expert_profile(request.user)
         
         # Get documents associated with this expert
         documents = Document.objects.filter(
@@ -42,7 +44,7 @@ def expert_appointments_view(request):
         return redirect('home')
         
     try:
-        expert = Expert.objects.get(user=request.user)
+        expert = get_expert_profile(request.user)
         # Get appointments for this expert
         appointments = RendezVous.objects.filter(
             expert=expert.user
@@ -68,7 +70,7 @@ def expert_messages_view(request):
         return redirect('home')
 
     try:
-        expert = Expert.objects.get(user=request.user)
+        expert = get_expert_profile(request.user)
         
         # Get all clients who have had appointments or service requests with this expert
         clients = Client.objects.filter(
@@ -91,10 +93,7 @@ def expert_messages_view(request):
             ).order_by('sent_at')
             
             # Mark messages as read
-            unread_messages = messages.filter(recipient=request.user, is_read=False)
-            for message in unread_messages:
-                message.is_read = True
-                message.save()
+            mark_read(request.user, active_client.user)
         
         context = {
             'clients': clients,
@@ -115,7 +114,7 @@ def expert_appointment_detail(request, appointment_id):
         return redirect('home')
 
     try:
-        expert = Expert.objects.get(user=request.user)
+        expert = get_expert_profile(request.user)
         
         # Get appointment details
         appointment = get_object_or_404(RendezVous, id=appointment_id, expert=expert.user)
@@ -141,7 +140,7 @@ def expert_appointment_detail(request, appointment_id):
         return redirect('home')
 
     try:
-        expert = Expert.objects.get(user=request.user)
+        expert = get_expert_profile(request.user)
         
         # Get appointment details
         appointment = get_object_or_404(RendezVous, id=appointment_id, expert=expert.user)
@@ -172,7 +171,7 @@ def expert_requests_view(request):
         return redirect('home')
 
     try:
-        expert = Expert.objects.get(user=request.user)
+        expert = get_expert_profile(request.user)
         
         # Get service requests assigned to this expert
         assigned_requests = ServiceRequest.objects.filter(
@@ -210,7 +209,7 @@ def expert_resources_view(request):
 
     try:
         if request.user.account_type.lower() == 'expert':
-            expert = Expert.objects.get(user=request.user)
+            expert = get_expert_profile(request.user)
             print(f"Expert found: {expert}")
         else:
             expert = None
@@ -668,7 +667,7 @@ def expert_take_request(request, request_id):
     
     try:
         # Get the expert profile
-        expert = Expert.objects.get(user=request.user)
+        expert = get_expert_profile(request.user)
         
         # Get the service request
         service_request = get_object_or_404(ServiceRequest, id=request_id)
@@ -9,6 +9,7 @@ from django.views.decorators.csrf import csrf_exempt
 from accounts.models import Utilisateur, Client, Expert
 from .models import Message, Notification, ServiceRequest
 from services.email_notifications import EmailNotificationService
+from messaging.conversations import get_page_number, inbox_page, mark_read, unread_total
 
 @login_required
 def client_messages_view(request):
@@ -18,72 +19,21 @@ def client_messages_view(request):
     active_contact = None
     messages_list = []
     
-    # Get all messages for this user
-    all_messages = Message.objects.filter(
-        Q(sender=request.user) | Q(recipient=request.user)
-    ).order_by('-sent_at')
-    
-    # Group messages by conversation
-    conversations = {}
-    for message in all_messages:
-        # Determine the other party in the conversation
-        other_party = message.recipient if message.sender == request.user else message.sender
-          # Create a unique key for this conversation
-        conversation_key = f"{min(request.user.id, other_party.id)}_{max(request.user.id, other_party.id)}"            # Check if other_party user object is valid before proceeding
-        if other_party is None or not hasattr(other_party, 'id'):
-            continue
-            
-        # Safely get and truncate message content to prevent display issues
-        try:
-            if message.content:
-                # Limit content length to prevent performance issues
-                safe_content = message.content[:2000]  # Limit to 2000 chars
-                # Replace potentially problematic characters that might cause display issues
-                safe_content = safe_content.replace('<', '&lt;').replace('>', '&gt;')
-            else:
-                safe_content = ""
-        except Exception as e:
-            print(f"Error processing message content: {str(e)}")
-            safe_content = "[Message content unavailable]"
-            
-        if conversation_key not in conversations:
-            conversations[conversation_key] = {
-                'user': other_party,
-                'latest_message': message,
-                'unread_count': 1 if message.recipient == request.user and not message.is_read else 0,
-                'last_message': safe_content[:50] + '...' if len(safe_content) > 50 else safe_content,
-                'last_message_time': message.sent_at
-            }
-        else:            # Update latest message if this one is newer
-            if message.sent_at > conversations[conversation_key]['latest_message'].sent_at:
-                conversations[conversation_key]['latest_message'] = message
-                
-                # Safely get and truncate message content
-                try:
-                    if message.content:
-                        # Limit content length to prevent performance issues
-                        safe_content = message.content[:2000]  # Limit to 2000 chars
-                        # Replace potentially problematic characters
-                        safe_content = safe_content.replace('<', '&lt;').replace('>', '&gt;')
-                    else:
-                        safe_content = ""
-                except Exception as e:
-                    print(f"Error processing message content: {str(e)}")
-                    safe_content = "[Message content unavailable]"
-                
-                conversations[conversation_key]['last_message'] = safe_content[:50] + '...' if len(safe_content) > 50 else safe_content
-                conversations[conversation_key]['last_message_time'] = message.sent_at
-            
-            # Update unread count
-            if message.recipient == request.user and not message.is_read:
-                conversations[conversation_key]['unread_count'] += 1
+    # Résumés de conversation (messaging.Conversation) : une requête, paginée
+    page = get_page_number(request)
+    rows, has_next = inbox_page(request.user, page)
+    contacts = []
+    for conversation in rows:
+        # Limiter et échapper l'aperçu pour éviter les problèmes d'affichage
+        safe_content = conversation.last_message_preview.replace('<', '&lt;').replace('>', '&gt;')
+        contacts.append({
+            'user': conversation.contact,
+            'latest_message': conversation.last_message,
+            'unread_count': conversation.unread_count,
+            'last_message': safe_content[:50] + '...' if len(safe_content) > 50 else safe_content,
+            'last_message_time': conversation.last_message_at
+        })
     
-    # Convert dictionary to list and sort by latest message date
-    contacts = sorted(
-        conversations.values(),
-        key=lambda x: x['latest_message'].sent_at,
-        reverse=True
-    )
       # If a contact is selected, get conversation with that contact
     if active_contact_id:
         try:
@@ -122,12 +72,7 @@ def client_messages_view(request):
                         safe_messages.append(safe_msg)
                 
                 # Mark messages as read
-                unread_messages = Message.objects.filter(
-                    recipient=request.user, 
-                    is_read=False,
-                    sender=active_contact
-                )
-                unread_messages.update(is_read=True, read_at=timezone.now())
+                mark_read(request.user, active_contact)
                 
                 # Replace the original messages with sanitized ones
                 messages_list = safe_messages
@@ -141,10 +86,12 @@ def client_messages_view(request):
             messages_list = []
     
     # Count total unread messages
-    unread_messages_count = sum([conv['unread_count'] for conv in conversations.values()])
+    unread_messages_count = unread_total(request.user)
     
     context = {
         'contacts': contacts,
+        'page': page,
+        'has_next': has_next,
         'messages': messages_list,
         'active_contact': active_contact,
         'unread_messages_count': unread_messages_count
@@ -262,41 +209,22 @@ def expert_messages_view(request):
     active_client = None
     messages_list = []
     
-    # Get all messages for this expert
-    all_messages = Message.objects.filter(
-        Q(sender=request.user) | Q(recipient=request.user)
-    ).order_by('-sent_at')
-    
-    # Group messages by conversation (similar to client_messages_view)
-    conversations = {}
-    for message in all_messages:
-        other_party = message.recipient if message.sender == request.user else message.sender
-        conversation_key = f"{min(request.user.id, other_party.id)}_{max(request.user.id, other_party.id)}"
-        
-        if other_party.account_type != 'client':
-            continue  # Only show conversations with clients
-        
-        # Similar logic to client_messages_view...
-        if conversation_key not in conversations:
-            conversations[conversation_key] = {
-                'id': other_party.id,
-                'name': f"{other_party.name} {other_party.first_name}",
-                'email': other_party.email,
-                'latest_message': message.content[:50] + '...' if len(message.content) > 50 else message.content,
-                'unread_count': 1 if message.recipient == request.user and not message.is_read else 0,
-                'time': message.sent_at,
-                'is_online': False  # This could be updated with a real online status system
-            }
-        else:
-            if message.recipient == request.user and not message.is_read:
-                conversations[conversation_key]['unread_count'] += 1
-    
-    # Convert dictionary to list and sort by latest message time
-    clients = sorted(
-        conversations.values(),
-        key=lambda x: x['time'],
-        reverse=True
-    )
+    # Résumés des conversations avec des clients : une requête, paginée
+    page = get_page_number(request)
+    rows, has_next = inbox_page(request.user, page, contact_type='client')
+    clients = []
+    for conversation in rows:
+        other_party = conversation.contact
+        preview = conversation.last_message_preview
+        clients.append({
+            'id': other_party.id,
+            'name': f"{other_party.name} {other_party.first_name}",
+            'email': other_party.email,
+            'latest_message': preview[:50] + '...' if len(preview) > 50 else preview,
+            'unread_count': conversation.unread_count,
+            'time': conversation.last_message_at,
+            'is_online': False  # This could be updated with a real online status system
+        })
     
     # If a client is selected, get conversation with that client
     if active_client_id:
@@ -306,13 +234,8 @@ def expert_messages_view(request):
             (Q(sender=request.user) & Q(recipient=active_client)) |
             (Q(sender=active_client) & Q(recipient=request.user))
         ).order_by('sent_at')
-          # Mark messages as read - using Message.objects to ensure we're working with a QuerySet
-        unread_messages = Message.objects.filter(
-            recipient=request.user, 
-            is_read=False,
-            sender=active_client
-        )
-        unread_messages.update(is_read=True, read_at=timezone.now())
+          # Mark messages as read (and reset the conversation counter)
+        mark_read(request.user, active_client)
           # Limit message count to prevent memory issues (show only last 100 messages)
         messages_list = messages_list[:100]
         
@@ -321,10 +244,12 @@ def expert_messages_view(request):
         # This prevents memory issues from object duplication
     
     # Count total unread messages
-    unread_messages_count = sum([client.get('unread_count', 0) for client in clients])
+    unread_messages_count = unread_total(request.user, contact_type='client')
     
     context = {
         'clients': clients,
+        'page': page,
+        'has_next': has_next,
         'messages': messages_list,
         'active_client': active_client,
         'unread_messages_count': unread_messages_count
@@ -0,0 +1,18 @@
+# Generated by Django 4.2 on 2026-10-18 13:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('custom_requests', '0003_rename_demande_message_service_request_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='message',
+            name='client_message_id',
+            field=models.UUIDField(blank=True, editable=False, null=True, unique=True, verbose_name='client message id'),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 4.2 on 2026-10-18 13:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('custom_requests', '0004_message_client_message_id'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['recipient', 'is_read'], name='cr_message_recipient_read'),
+        ),
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['sender', 'recipient', 'sent_at'], name='cr_message_pair_sent'),
+        ),
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['service_request', 'sent_at', 'id'], name='cr_message_request_sent'),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['user', 'is_read'], name='cr_notification_user_read'),
+        ),
+        migrations.AddIndex(
+            model_name='rendezvous',
+            index=models.Index(fields=['expert', 'date_time'], name='cr_rendezvous_expert_date'),
+        ),
+        migrations.AddIndex(
+            model_name='servicerequest',
+            index=models.Index(fields=['client', 'status'], name='cr_request_client_status'),
+        ),
+        migrations.AddIndex(
+            model_name='servicerequest',
+            index=models.Index(fields=['expert', 'status'], name='cr_request_expert_status'),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 4.2 on 2026-10-18 14:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('custom_requests', '0005_hot_query_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='message',
+            name='client_message_id',
+            field=models.UUIDField(blank=True, editable=False, null=True, verbose_name='client message id'),
+        ),
+        migrations.AddConstraint(
+            model_name='message',
+            constraint=models.UniqueConstraint(fields=('sender', 'client_message_id'), name='cr_message_sender_client_id'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 4.2 on 2026-10-18 14:46
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('custom_requests', '0006_message_client_message_id_per_sender'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='message',
+            name='sent_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False, verbose_name='sent at'),
+        ),
+    ]
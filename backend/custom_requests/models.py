@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 from accounts.models import Utilisateur
 from services.models import Service
@@ -49,6 +50,11 @@ class ServiceRequest(models.Model):
         verbose_name = _('service request')
         verbose_name_plural = _('service requests')
         ordering = ['-created_at']
+        indexes = [
+            # Demandes d'un client / d'un expert filtrées par statut (tableaux de bord)
+            models.Index(fields=['client', 'status'], name='cr_request_client_status'),
+            models.Index(fields=['expert', 'status'], name='cr_request_expert_status'),
+        ]
 
 class RendezVous(models.Model):
     """Model for appointments between clients and experts"""
@@ -85,6 +91,10 @@ class RendezVous(models.Model):
         verbose_name = _('rendez-vous')
         verbose_name_plural = _('rendez-vous')
         ordering = ['date_time']
+        indexes = [
+            # Rendez-vous à venir d'un expert
+            models.Index(fields=['expert', 'date_time'], name='cr_rendezvous_expert_date'),
+        ]
 
 class Document(models.Model):
     """Model for documents attached to service requests"""
@@ -123,16 +133,33 @@ class Message(models.Model):
     sender = models.ForeignKey(Utilisateur, on_delete=models.CASCADE, related_name='sent_messages')
     recipient = models.ForeignKey(Utilisateur, on_delete=models.CASCADE, related_name='received_messages')
     content = models.TextField(_('content'))
-    sent_at = models.DateTimeField(_('sent at'), auto_now_add=True)
+    # Horodatage fixé à la création de l'objet (et non à l'INSERT) : l'écriture
+    # différée enregistre l'heure diffusée en direct, même si le lot part plus tard
+    sent_at = models.DateTimeField(_('sent at'), default=timezone.now, editable=False)
     is_read = models.BooleanField(_('is read'), default=False)
     read_at = models.DateTimeField(_('read at'), null=True, blank=True)
     service_request = models.ForeignKey(ServiceRequest, on_delete=models.CASCADE, related_name='messages', null=True, blank=True)
+    # Identifiant généré par le client WebSocket : rend idempotente la réécriture d'un message
+    # (unique par expéditeur, voir Meta.constraints)
+    client_message_id = models.UUIDField(_('client message id'), null=True, blank=True, editable=False)
     
     def __str__(self):
         return f"From {self.sender.name} to {self.recipient.name} - {self.sent_at.strftime('%Y-%m-%d %H:%M')}"
     
     class Meta:
         ordering = ['sent_at']
+        indexes = [
+            # Messages non lus d'un destinataire
+            models.Index(fields=['recipient', 'is_read'], name='cr_message_recipient_read'),
+            # Conversation entre deux utilisateurs, dans l'ordre
+            models.Index(fields=['sender', 'recipient', 'sent_at'], name='cr_message_pair_sent'),
+            # Historique d'une demande, paginé par (sent_at, id)
+            models.Index(fields=['service_request', 'sent_at', 'id'], name='cr_message_request_sent'),
+        ]
+        constraints = [
+            # Identifiant fourni par le client : un autre utilisateur peut réutiliser le même
+            models.UniqueConstraint(fields=['sender', 'client_message_id'], name='cr_message_sender_client_id'),
+        ]
 
 class Notification(models.Model):
     """Notification model"""
@@ -159,3 +186,7 @@ class Notification(models.Model):
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Compteur de notifications non lues (processeur de contexte, chaque page)
+            models.Index(fields=['user', 'is_read'], name='cr_notification_user_read'),
+        ]
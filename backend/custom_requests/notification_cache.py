@@ -0,0 +1,105 @@
+"""
+Compteur de notifications non lues et dernières notifications, en cache.
+
+Le processeur de contexte ``notifications_context`` lit ces valeurs à chaque
+rendu de template : elles sont gardées dans le cache Django par utilisateur
+et reconstruites à la demande (une requête chacune) quand elles manquent.
+
+- création d'une notification : compteur incrémenté, liste invalidée ;
+- notification lue (``save()``) : compteur décrémenté, liste invalidée ;
+- mises à jour en masse (``mark_all_notifications_read``...) : ``invalidate``.
+
+Les modifications ne touchent le cache qu'après validation de la transaction.
+"""
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import Notification
+
+RECENT_LIMIT = 5
+DEFAULT_TIMEOUT = 300
+
+# Compteurs pour vérifier que les rendus ne font pas de requêtes
+stats = {
+    'hits': 0,
+    'misses': 0,
+}
+
+
+def unread_key(user_id):
+    return f'notifications:unread:{user_id}'
+
+
+def recent_key(user_id):
+    return f'notifications:recent:{user_id}'
+
+
+def get_timeout():
+    return getattr(settings, 'NOTIFICATIONS_CACHE_TIMEOUT', DEFAULT_TIMEOUT)
+
+
+def get_unread_count(user_id):
+    """Nombre de notifications non lues (reconstruit si absent du cache)"""
+    count = cache.get(unread_key(user_id))
+    if count is not None:
+        stats['hits'] += 1
+        return count
+    stats['misses'] += 1
+    count = Notification.objects.filter(user_id=user_id, is_read=False).count()
+    cache.add(unread_key(user_id), count, timeout=get_timeout())
+    return count
+
+
+def get_recent(user_id):
+    """Dernières notifications de l'utilisateur (reconstruites si absentes du cache)"""
+    recent = cache.get(recent_key(user_id))
+    if recent is not None:
+        stats['hits'] += 1
+        return recent
+    stats['misses'] += 1
+    recent = list(Notification.objects.filter(user_id=user_id).order_by('-created_at')[:RECENT_LIMIT])
+    cache.add(recent_key(user_id), recent, timeout=get_timeout())
+    return recent
+
+
+def _adjust_unread(user_id, delta):
+    key = unread_key(user_id)
+    try:
+        if cache.incr(key, delta) < 0:
+            cache.delete(key)
+    except ValueError:
+        # Compteur absent : il sera reconstruit à la prochaine lecture
+        pass
+
+
+def notification_created(notification):
+    user_id = notification.user_id
+
+    def update():
+        if not notification.is_read:
+            _adjust_unread(user_id, 1)
+        cache.delete(recent_key(user_id))
+
+    transaction.on_commit(update)
+
+
+def notification_read(notification):
+    user_id = notification.user_id
+
+    def update():
+        _adjust_unread(user_id, -1)
+        cache.delete(recent_key(user_id))
+
+    transaction.on_commit(update)
+
+
+def invalidate(user_id):
+    """Oublier les valeurs en cache d'un utilisateur (mises à jour en masse)"""
+    transaction.on_commit(lambda: cache.delete_many([unread_key(user_id), recent_key(user_id)]))
+
+
+def reset_stats():
+    for key in stats:
+        stats[key] = 0
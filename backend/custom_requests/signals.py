@@ -0,0 +1,30 @@
+"""
+Signaux des demandes : cache des notifications non lues
+"""
+
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+
+from . import notification_cache
+from .models import Notification
+
+
+@receiver(post_init, sender=Notification)
+def remember_read_state(sender, instance, **kwargs):
+    instance._was_read = instance.__dict__.get('is_read')
+
+
+@receiver(post_save, sender=Notification)
+def update_notification_cache(sender, instance, created, **kwargs):
+    if created:
+        notification_cache.notification_created(instance)
+    elif instance.is_read and instance._was_read is False:
+        notification_cache.notification_read(instance)
+    elif instance.is_read != instance._was_read:
+        notification_cache.invalidate(instance.user_id)
+    instance._was_read = instance.is_read
+
+
+@receiver(post_delete, sender=Notification)
+def forget_deleted_notification(sender, instance, **kwargs):
+    notification_cache.invalidate(instance.user_id)
@@ -0,0 +1,185 @@
+import unittest
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.template import Engine, RequestContext
+from django.test import RequestFactory, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from messaging import history
+
+from . import notification_cache
+from .models import Message, Notification, RendezVous, ServiceRequest
+
+
+@unittest.skipUnless(connection.vendor in ('sqlite', 'mysql'), 'EXPLAIN analysé pour SQLite et MySQL')
+class HotQueryPlanTests(TestCase):
+    """Aucune requête des pages fréquentes ne parcourt une table entière"""
+
+    TABLE_PREFIXES = ('custom_requests_', 'messaging_')
+
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        cls.clients = [
+            User.objects.create_user(
+                email=f'client{index}@example.com', password='x', name='Client', first_name=str(index),
+                account_type='client'
+            )
+            for index in range(5)
+        ]
+        cls.experts = [
+            User.objects.create_user(
+                email=f'expert{index}@example.com', password='x', name='Expert', first_name=str(index),
+                account_type='expert'
+            )
+            for index in range(3)
+        ]
+        cls.requests = []
+        for index in range(30):
+            client, expert = cls.clients[index % 5], cls.experts[index % 3]
+            service_request = ServiceRequest.objects.create(
+                client=client, expert=expert, title=f'Dossier {index}', description='d',
+                status=('new', 'in_progress', 'completed')[index % 3],
+            )
+            cls.requests.append(service_request)
+            RendezVous.objects.create(
+                client=client, expert=expert, service_request=service_request,
+                date_time=timezone.now() + timedelta(days=index - 15),
+            )
+            for number in range(10):
+                sender, recipient = (expert, client) if number % 2 else (client, expert)
+                Message.objects.create(
+                    sender=sender, recipient=recipient, service_request=service_request,
+                    content=f'Message {number}', is_read=number < 6,
+                )
+            Notification.objects.create(
+                user=client, type='system', title='Titre', content='Contenu', is_read=index % 2 == 0
+            )
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def full_scans(self, sql):
+        """Tables de l'application parcourues entièrement par ``sql``"""
+        with connection.cursor() as cursor:
+            if connection.vendor == 'sqlite':
+                cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+                details = [row[-1] for row in cursor.fetchall()]
+                return [detail for detail in details if detail.startswith('SCAN ')]
+            cursor.execute('EXPLAIN ' + sql)
+            columns = [column[0] for column in cursor.description]
+            rows = [dict(zip(columns, row)) for row in cursor.fetchall()]
+            return [f"ALL {row['table']}" for row in rows if row['type'] == 'ALL']
+
+    def assertNoFullScan(self, run):
+        with CaptureQueriesContext(connection) as queries:
+            run()
+        statements = [
+            query['sql'] for query in queries.captured_queries
+            if query['sql'].startswith(('SELECT', 'UPDATE'))
+            and any(f'"{prefix}' in query['sql'] or f'`{prefix}' in query['sql'] for prefix in self.TABLE_PREFIXES)
+        ]
+        self.assertTrue(statements)
+        scans = {
+            sql: [scan for scan in self.full_scans(sql) if any(prefix in scan for prefix in self.TABLE_PREFIXES)]
+            for sql in statements
+        }
+        self.assertEqual({sql: found for sql, found in scans.items() if found}, {})
+
+    def test_notifications_context_processor(self):
+        from servicesbladi.context_processors import notifications_context
+
+        request = RequestFactory().get('/')
+        request.user = self.clients[0]
+        cache.clear()
+        context = notifications_context(request)
+        self.assertNoFullScan(lambda: (context['unread_notifications_count'](), context['notifications']()))
+
+    def test_message_views(self):
+        client, expert = self.clients[0], self.experts[0]
+        self.client.force_login(client)
+        self.assertNoFullScan(lambda: self.client.get('/requests/api/messages/', {'user_id': expert.pk}))
+        self.assertNoFullScan(lambda: self.client.get('/requests/api/messages/'))
+        self.assertNoFullScan(
+            lambda: self.client.get(reverse('messaging:chat_history', args=[self.requests[0].pk]))
+        )
+        self.assertNoFullScan(lambda: history.mark_read(self.requests[0], client))
+
+    def test_dashboard_querysets(self):
+        client, expert = self.clients[0], self.experts[0]
+        self.assertNoFullScan(lambda: list(ServiceRequest.objects.filter(client=client, status='new')))
+        self.assertNoFullScan(lambda: list(ServiceRequest.objects.filter(expert=expert, status='in_progress')))
+        self.assertNoFullScan(lambda: list(
+            RendezVous.objects.filter(expert=expert, date_time__gte=timezone.now()).order_by('date_time')[:3]
+        ))
+
+
+class NotificationCacheTests(TestCase):
+    """Compteur de non-lues et dernières notifications servis par le cache"""
+
+    def setUp(self):
+        cache.clear()
+        notification_cache.reset_stats()
+        self.user = get_user_model().objects.create_user(
+            email='client@example.com', password='x', name='Client', first_name='C', account_type='client'
+        )
+        self.request = RequestFactory().get('/')
+        self.request.user = self.user
+
+    def notify(self, title='Titre'):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Notification.objects.create(user=self.user, type='system', title=title, content='Contenu')
+
+    def render(self, source):
+        engine = Engine(context_processors=['servicesbladi.context_processors.notifications_context'])
+        return engine.from_string(source).render(RequestContext(self.request))
+
+    def test_counter_is_maintained_without_queries(self):
+        self.notify()
+        # Reconstruit à la première lecture, servi par le cache ensuite
+        self.assertEqual(self.render('{{ unread_notifications_count }}'), '1')
+        with self.assertNumQueries(0):
+            self.assertEqual(self.render('{% if unread_notifications_count > 0 %}{{ unread_notifications_count }}{% endif %}'), '1')
+
+        notification = self.notify('Deuxième')
+        with self.assertNumQueries(0):
+            self.assertEqual(notification_cache.get_unread_count(self.user.pk), 2)
+
+        notification.is_read = True
+        with self.captureOnCommitCallbacks(execute=True):
+            notification.save()
+        with self.assertNumQueries(0):
+            self.assertEqual(notification_cache.get_unread_count(self.user.pk), 1)
+
+    def test_recent_list_is_refreshed_after_changes(self):
+        self.notify('Ancienne')
+        self.assertEqual(self.render('{% for n in notifications %}{{ n.title }}{% endfor %}'), 'Ancienne')
+        with self.assertNumQueries(0):
+            self.render('{% for n in notifications %}{{ n.title }}{% endfor %}')
+
+        self.notify('Nouvelle')
+        self.assertEqual(
+            self.render('{% for n in notifications %}{{ n.title }} {% endfor %}'), 'Nouvelle Ancienne '
+        )
+
+    def test_mark_all_read_invalidates(self):
+        self.notify()
+        self.assertEqual(notification_cache.get_unread_count(self.user.pk), 1)
+        self.client.force_login(self.user)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('custom_requests:mark_all_notifications_read'))
+
+        self.assertEqual(response.json()['updated_count'], 1)
+        self.assertEqual(notification_cache.get_unread_count(self.user.pk), 0)
+
+    def test_unused_variables_cost_nothing(self):
+        self.notify()
+        notification_cache.reset_stats()
+        with self.assertNumQueries(0):
+            self.assertEqual(self.render('Bonjour'), 'Bonjour')
+        self.assertEqual(notification_cache.stats, {'hits': 0, 'misses': 0})
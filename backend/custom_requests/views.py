@@ -13,9 +13,13 @@ import mimetypes
 import logging
 
 from accounts.models import Utilisateur, Client, Expert
+from accounts.roles import get_client_profile, get_expert_profile
 from services.models import Service, ServiceCategory
 from .models import ServiceRequest, RendezVous, Document, Message, Notification
+from . import notification_cache
 from services.email_notifications import EmailNotificationService
+from messaging.conversations import get_page_number, inbox_page, mark_read
+from servicesbladi.http_cache import NO_STORE, PRIVATE, cache_policy
 
 # Client request management views
 @login_required
@@ -23,7 +27,7 @@ def client_requests_view(request):
     """Display client's service requests with filtering"""
     try:
         # Vérifier si l'utilisateur est un client
-        client = Client.objects.get(user=request.user)
+        client = get_client_profile(request.user)
         
         # Récupérer les paramètres de filtre
         status_filter = request.GET.get('status', '')
@@ -70,7 +74,7 @@ def client_requests_view(request):
 def create_request_view(request, service_id):
     """Create a new service request"""
     try:
-        client = Client.objects.get(user=request.user)
+        client = get_client_profile(request.user)
         service = get_object_or_404(Service, id=service_id, is_active=True)
         
         if request.method == 'POST':
@@ -199,14 +203,14 @@ def request_detail_view(request, request_id):
       # Check if user has permission to view this request
     if request.user.account_type == 'client':
         try:
-            client = Client.objects.get(user=request.user)
+            client = get_client_profile(request.user)
             if demande.client != request.user:  # Compare with the User object, not the Client
                 return redirect('home')
         except Client.DoesNotExist:
             return redirect('home')
     elif request.user.account_type == 'expert':
         try:
-            expert = Expert.objects.get(user=request.user)
+            expert = get_expert_profile(request.user)
             if demande.expert != expert:
                 return redirect('home')
         except Expert.DoesNotExist:
@@ -260,7 +264,7 @@ def request_detail_view(request, request_id):
 def edit_request_view(request, request_id):
     """Edit an existing request"""
     try:
-        client = Client.objects.get(user=request.user)
+        client = get_client_profile(request.user)
         # Utiliser request.user pour le client car c'est une ForeignKey vers Utilisateur
         demande = get_object_or_404(ServiceRequest, id=request_id, client=request.user)
         
@@ -306,7 +310,7 @@ def edit_request_view(request, request_id):
 def cancel_request_view(request, request_id):
     """Cancel a request"""
     try:
-        client = Client.objects.get(user=request.user)
+        client = get_client_profile(request.user)
         demande = get_object_or_404(ServiceRequest, id=request_id, client=request.user)
         
         # Only allow cancellation if request is not already completed or cancelled
@@ -413,7 +417,7 @@ def create_appointment_view(request):
         return redirect('custom_requests:client_appointments')
     
     try:
-        client = Client.objects.get(user=request.user)
+        client = get_client_profile(request.user)
         
         # Get form data
         expert_id = request.POST.get('expert_id')
@@ -500,14 +504,14 @@ def appointment_detail_view(request, appointment_id):
     # Check if user has permission to view this appointment
     if request.user.account_type == 'client':
         try:
-            client = Client.objects.get(user=request.user)
+            client = get_client_profile(request.user)
             if appointment.client != request.user:
                 return redirect('home')
         except Client.DoesNotExist:
             return redirect('home')
     elif request.user.account_type == 'expert':
         try:
-            expert = Expert.objects.get(user=request.user)
+            expert = get_expert_profile(request.user)
             if appointment.expert != expert.user:
                 return redirect('home')
         except Expert.DoesNotExist:
@@ -631,7 +635,7 @@ def expert_appointments_view(request):
         return redirect('home')
         
     try:
-        expert = Expert.objects.get(user=request.user)
+        expert = get_expert_profile(request.user)
         
         # Check if appointment_id is provided in the query parameters
         appointment_id = request.GET.get('appointment_id')
@@ -699,7 +703,7 @@ def documents_view(request):
     # Apply user filter
     if request.user.account_type == 'client':
         try:
-            client = Client.objects.get(user=request.user)
+            client = get_client_profile(request.user)
             # Get documents from client's requests - fixed to use correct field names
             documents_query = documents_query.filter(
                 Q(service_request__client=request.user) |
@@ -716,7 +720,7 @@ def documents_view(request):
     
     elif request.user.account_type == 'expert':
         try:
-            expert = Expert.objects.get(user=request.user)
+            expert = get_expert_profile(request.user)
             # Get documents from expert's assigned requests
             documents_query = documents_query.filter(
                 Q(service_request__expert=expert.user) |
@@ -870,7 +874,7 @@ def upload_document_view(request):
     # Get requests and appointments for association
     if request.user.account_type == 'client':
         try:
-            client = Client.objects.get(user=request.user)
+            client = get_client_profile(request.user)
             # Use request.user instead of client when filtering ServiceRequest objects
             demandes = ServiceRequest.objects.filter(client=request.user)
             appointments = RendezVous.objects.filter(client=request.user)
@@ -879,7 +883,7 @@ def upload_document_view(request):
             appointments = []
     elif request.user.account_type == 'expert':
         try:
-            expert = Expert.objects.get(user=request.user)
+            expert = get_expert_profile(request.user)
             demandes = ServiceRequest.objects.filter(expert=expert.user)
             appointments = RendezVous.objects.filter(expert=expert.user)
         except Expert.DoesNotExist:
@@ -946,43 +950,22 @@ def delete_document_view(request, document_id):
 @login_required
 def messages_view(request):
     """Display user's messages"""
-    messages = Message.objects.filter(
-        Q(sender=request.user) | Q(recipient=request.user)
-    ).order_by('-sent_at')
-    
-    # Group messages by conversation
-    conversations = {}
-    for message in messages:
-        # Determine the other party in the conversation
-        other_party = message.recipient if message.sender == request.user else message.sender
-        
-        # Create a unique key for this conversation
-        conversation_key = f"{min(request.user.id, other_party.id)}_{max(request.user.id, other_party.id)}"
-        
-        if conversation_key not in conversations:
-            conversations[conversation_key] = {
-                'other_party': other_party,
-                'latest_message': message,
-                'unread_count': 1 if message.recipient == request.user and not message.is_read else 0
-            }
-        else:
-            # Update latest message if this one is newer
-            if message.sent_at > conversations[conversation_key]['latest_message'].sent_at:
-                conversations[conversation_key]['latest_message'] = message
-            
-            # Update unread count
-            if message.recipient == request.user and not message.is_read:
-                conversations[conversation_key]['unread_count'] += 1
-    
-    # Convert dictionary to list and sort by latest message date
-    conversations_list = sorted(
-        conversations.values(),
-        key=lambda x: x['latest_message'].sent_at,
-        reverse=True
-    )
+    # Résumés de conversation : une requête indexée, paginée
+    page = get_page_number(request)
+    rows, has_next = inbox_page(request.user, page)
+    conversations_list = [
+        {
+            'other_party': conversation.contact,
+            'latest_message': conversation.last_message,
+            'unread_count': conversation.unread_count,
+        }
+        for conversation in rows
+    ]
     
     context = {
         'conversations': conversations_list,
+        'page': page,
+        'has_next': has_next,
     }
     
     if request.user.account_type == 'client':
@@ -1045,7 +1028,7 @@ def send_message_view(request):
     if request.user.account_type == 'client':
         # Clients can message experts they have appointments with and admins
         try:
-            client = Client.objects.get(user=request.user)
+            client = get_client_profile(request.user)
             expert_users = Utilisateur.objects.filter(
                 expert_profile__appointments__client=client
             ).distinct()
@@ -1057,7 +1040,7 @@ def send_message_view(request):
     elif request.user.account_type == 'expert':
         # Experts can message clients they have appointments with and admins
         try:
-            expert = Expert.objects.get(user=request.user)
+            expert = get_expert_profile(request.user)
             client_users = Utilisateur.objects.filter(
                 client_profile__appointments__expert=expert
             ).distinct()
@@ -1075,13 +1058,13 @@ def send_message_view(request):
     # Get requests the user is involved in
     if request.user.account_type == 'client':
         try:
-            client = Client.objects.get(user=request.user)
+            client = get_client_profile(request.user)
             demandes = ServiceRequest.objects.filter(client=request.user)
         except Client.DoesNotExist:
             demandes = []
     elif request.user.account_type == 'expert':
         try:
-            expert = Expert.objects.get(user=request.user)
+            expert = get_expert_profile(request.user)
             demandes = ServiceRequest.objects.filter(expert=expert.user)
         except Expert.DoesNotExist:
             demandes = []
@@ -1108,6 +1091,7 @@ def notifications_view(request):
     # Mark all as read if requested
     if request.GET.get('mark_all_read'):
         notifications.filter(is_read=False).update(is_read=True)
+        notification_cache.invalidate(request.user.id)
     
     context = {
         'notifications': notifications,
@@ -1166,6 +1150,7 @@ def mark_all_notifications_read(request):
     try:
         # Marquer toutes les notifications non lues comme lues
         updated = Notification.objects.filter(user=request.user, is_read=False).update(is_read=True)
+        notification_cache.invalidate(request.user.id)
         
         return JsonResponse({
             'success': True,
@@ -1184,7 +1169,7 @@ def ajax_create_request(request):
     """Create a new service request via AJAX"""
     try:
         # Verify user is a client
-        client = Client.objects.get(user=request.user)
+        client = get_client_profile(request.user)
         
         # Get form data
         data = request.POST
@@ -1307,10 +1292,11 @@ def ajax_create_request(request):
 # API endpoints
 @login_required
 @csrf_exempt
+@cache_policy(PRIVATE)
 def api_client_requests(request):
     """API endpoint for client requests"""
     try:
-        client = Client.objects.get(user=request.user)
+        client = get_client_profile(request.user)
         requests_query = ServiceRequest.objects.filter(client=request.user).order_by('-created_at')
         
         # Apply status filter if provided
@@ -1320,20 +1306,22 @@ def api_client_requests(request):
         
         # Prepare response data
         requests_data = []
-        for demande in requests_query:
+        for demande in requests_query.select_related('service__service_type__category', 'expert'):
+            # service et expert : clés étrangères nullables ; expert est l'Utilisateur
             requests_data.append({
                 'id': demande.id,
                 'title': demande.title,
                 'service': {
                     'id': demande.service.id,
                     'title': demande.service.title,
-                    'category': demande.service.category
-                },                'status': demande.status,
+                    'category': demande.service.service_type.category.name
+                } if demande.service else None,
+                'status': demande.status,
                 'priority': demande.priority,
                 'created_at': demande.created_at.isoformat(),
                 'expert': {
                     'id': demande.expert.id,
-                    'name': f"{demande.expert.user.name} {demande.expert.user.first_name}",
+                    'name': f"{demande.expert.name} {demande.expert.first_name}",
                 } if demande.expert else None
             })
         
@@ -1350,6 +1338,7 @@ def api_client_requests(request):
 
 @login_required
 @csrf_exempt
+@cache_policy(PRIVATE)
 def api_request_detail(request, request_id):
     """API endpoint for request details"""
     try:
@@ -1357,13 +1346,13 @@ def api_request_detail(request, request_id):
         
         # Check permission
         if request.user.account_type == 'client':
-            client = Client.objects.get(user=request.user)
+            client = get_client_profile(request.user)
             if demande.client != client:                return JsonResponse({
                     'success': False,
                     'message': _('You do not have permission to view this request.')
                 }, status=403)
         elif request.user.account_type == 'expert':
-            expert = Expert.objects.get(user=request.user)
+            expert = get_expert_profile(request.user)
             if demande.expert != expert:
                 return JsonResponse({
                     'success': False,
@@ -1454,14 +1443,15 @@ def api_request_detail(request, request_id):
 
 @login_required
 @csrf_exempt
+@cache_policy(PRIVATE)
 def api_client_appointments(request):
     """API endpoint for client appointments"""
     try:
         if request.user.account_type == 'client':
-            client = Client.objects.get(user=request.user)
+            client = get_client_profile(request.user)
             appointments_query = RendezVous.objects.filter(client=request.user).order_by('date_time')
         elif request.user.account_type == 'expert':
-            expert = Expert.objects.get(user=request.user)
+            expert = get_expert_profile(request.user)
             appointments_query = RendezVous.objects.filter(expert=expert).order_by('date_time')
         elif request.user.account_type == 'admin':
             appointments_query = RendezVous.objects.all().order_by('date_time')
@@ -1535,10 +1525,11 @@ def api_client_appointments(request):
 
 @login_required
 @csrf_exempt
+@cache_policy(PRIVATE)
 def api_expert_requests(request):
     """API endpoint for expert requests"""
     try:
-        expert = Expert.objects.get(user=request.user)
+        expert = get_expert_profile(request.user)
         requests_query = ServiceRequest.objects.filter(expert=expert.user).order_by('-created_at')
         
         # Apply status filter if provided
@@ -1580,6 +1571,7 @@ def api_expert_requests(request):
 @login_required
 @csrf_exempt
 @require_POST
+@cache_policy(NO_STORE)
 def api_upload_document(request):
     """API endpoint to upload a document"""
     try:
@@ -1679,6 +1671,7 @@ def api_upload_document(request):
 
 @login_required
 @csrf_exempt
+@cache_policy(PRIVATE)
 def api_messages(request):
     """API endpoint for user messages"""
     if request.method == 'GET':
@@ -1693,10 +1686,7 @@ def api_messages(request):
                 ).order_by('sent_at')
                 
                 # Mark messages as read
-                Message.objects.filter(sender=other_user, recipient=request.user, is_read=False).update(
-                    is_read=True,
-                    read_at=timezone.now()
-                )
+                mark_read(request.user, other_user)
                   # Prepare response data with content safety
                 messages_data = []
                 for message in messages_query:
@@ -1732,62 +1722,33 @@ def api_messages(request):
                     'message': _('User not found.')
                 }, status=404)
           # Otherwise, return conversation summary with content safety
-        messages = Message.objects.filter(
-            Q(sender=request.user) | Q(recipient=request.user)
-        ).order_by('-sent_at')[:100]  # Limit to last 100 messages for performance
-        
-        # Group messages by conversation
-        conversations = {}
-        for message in messages:
-            # Determine the other party in the conversation
-            other_party = message.recipient if message.sender == request.user else message.sender
-            
-            # Create a unique key for this conversation
-            conversation_key = f"{min(request.user.id, other_party.id)}_{max(request.user.id, other_party.id)}"
-            
-            # Sanitize content for safety
-            safe_content = str(message.content)[:200] if message.content else ""
-            
-            if conversation_key not in conversations:
-                conversations[conversation_key] = {
-                    'user': {
-                        'id': other_party.id,
-                        'name': f"{other_party.name} {other_party.first_name}",
-                        'account_type': other_party.account_type
-                    },
-                    'latest_message': {
-                        'id': message.id,
-                        'content': safe_content,
-                        'sent_at': message.sent_at.isoformat(),
-                        'is_read': message.is_read,
-                        'is_mine': message.sender == request.user
-                    },
-                    'unread_count': 1 if message.recipient == request.user and not message.is_read else 0
-                }
-            else:
-                # Update latest message if this one is newer
-                if message.sent_at > timezone.datetime.fromisoformat(conversations[conversation_key]['latest_message']['sent_at']):
-                    conversations[conversation_key]['latest_message'] = {
-                        'id': message.id,
-                        'content': safe_content,
-                        'sent_at': message.sent_at.isoformat(),
-                        'is_read': message.is_read,
-                        'is_mine': message.sender == request.user
-                    }
-                
-                # Update unread count
-                if message.recipient == request.user and not message.is_read:
-                    conversations[conversation_key]['unread_count'] += 1
-          # Convert dictionary to list and sort by latest message date
-        conversations_list = sorted(
-            conversations.values(),
-            key=lambda x: x['latest_message']['sent_at'],
-            reverse=True
-        )
+        page = get_page_number(request)
+        rows, has_next = inbox_page(request.user, page)
+        conversations_list = []
+        for conversation in rows:
+            other_party = conversation.contact
+            last_message = conversation.last_message
+            conversations_list.append({
+                'user': {
+                    'id': other_party.id,
+                    'name': f"{other_party.name} {other_party.first_name}",
+                    'account_type': other_party.account_type
+                },
+                'latest_message': {
+                    'id': conversation.last_message_id,
+                    'content': conversation.last_message_preview,
+                    'sent_at': conversation.last_message_at.isoformat(),
+                    'is_read': last_message.is_read if last_message else False,
+                    'is_mine': conversation.last_message_mine
+                },
+                'unread_count': conversation.unread_count
+            })
         
         return JsonResponse({
             'success': True,
-            'conversations': conversations_list
+            'conversations': conversations_list,
+            'page': page,
+            'has_next': has_next
         })
     
     elif request.method == 'POST':
@@ -1868,6 +1829,7 @@ def api_messages(request):
 
 @login_required
 @csrf_exempt
+@cache_policy(PRIVATE)
 def api_notifications(request):
     """API endpoint for user notifications"""
     notifications_query = Notification.objects.filter(user=request.user).order_by('-created_at')
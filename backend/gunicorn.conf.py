@@ -7,6 +7,8 @@ bind = "0.0.0.0:8000"
 backlog = 2048
 
 # Worker processes
+# Chaque worker garde une connexion MySQL persistante (DB_CONN_MAX_AGE,
+# servicesbladi/settings/base.py) : le serveur en voit au plus `workers`.
 workers = multiprocessing.cpu_count() * 2 + 1
 worker_class = "sync"
 worker_connections = 1000
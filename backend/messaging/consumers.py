@@ -1,8 +1,13 @@
 import json
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.utils import timezone
 from custom_requests.models import ServiceRequest, Message
+from .notifications import user_group
+from .presence import get_presence
+from .write_behind import get_write_behind, new_message_id
 
 User = get_user_model()
 
@@ -12,7 +17,8 @@ class ChatConsumer(AsyncWebsocketConsumer):
         self.room_group_name = f'chat_{self.request_id}'
 
         # Vérifier si l'utilisateur est autorisé à accéder à cette demande
-        if not await self.is_user_authorized():
+        # (client et expert gardés sur la connexion, voir participants_update)
+        if not await self.load_participants() or not self.is_user_authorized():
             await self.close()
             return
 
@@ -24,6 +30,11 @@ class ChatConsumer(AsyncWebsocketConsumer):
 
         await self.accept()
 
+        # Signaler l'arrivée aux autres participants (tous processus confondus)
+        await get_presence().join(self.room_group_name, self.scope['user'].id, self.channel_name)
+        self.present = True
+        await self.broadcast_presence()
+
     async def disconnect(self, close_code):
         # Quitter la room group
         await self.channel_layer.group_discard(
@@ -31,8 +42,32 @@ class ChatConsumer(AsyncWebsocketConsumer):
             self.channel_name
         )
 
+        if getattr(self, 'present', False):
+            await get_presence().leave(self.room_group_name, self.channel_name)
+            await self.broadcast_presence()
+
+        # Arrêt du serveur ou départ du salon : ne rien laisser en file
+        if getattr(settings, 'CHAT_WRITE_BEHIND', False):
+            await get_write_behind().flush()
+
+    async def broadcast_presence(self):
+        """Diffuser la liste des participants connectés au salon"""
+        online = await get_presence().members(self.room_group_name)
+        await self.channel_layer.group_send(
+            self.room_group_name,
+            {
+                'type': 'presence_update',
+                'online': online,
+            }
+        )
+
     async def receive(self, text_data):
         text_data_json = json.loads(text_data)
+
+        # Battement de cœur : prolonger la présence du socket
+        if text_data_json.get('heartbeat'):
+            await get_presence().touch(self.room_group_name, self.scope['user'].id, self.channel_name)
+            return
         
         # Handle typing indicators
         if 'typing' in text_data_json:
@@ -52,9 +87,15 @@ class ChatConsumer(AsyncWebsocketConsumer):
         # Handle regular messages
         if 'message' in text_data_json:
             message = text_data_json['message']
+            client_message_id = new_message_id(text_data_json.get('client_id'))
 
-            # Sauvegarder le message en base de données
-            saved_message = await self.save_message(message)
+            if getattr(settings, 'CHAT_WRITE_BEHIND', False):
+                # Diffuser tout de suite, enregistrer avec le prochain lot
+                timestamp = await self.queue_message(message, client_message_id)
+            else:
+                # Sauvegarder le message en base de données
+                saved_message = await self.save_message(message, client_message_id)
+                timestamp = saved_message.sent_at.isoformat() if saved_message else None
 
             # Envoyer le message à la room group
             await self.channel_layer.group_send(
@@ -64,7 +105,8 @@ class ChatConsumer(AsyncWebsocketConsumer):
                     'message': message,
                     'sender_id': self.scope['user'].id,
                     'sender_name': getattr(self.scope['user'], 'name', self.scope['user'].username or self.scope['user'].email),
-                    'timestamp': saved_message.sent_at.isoformat() if saved_message else None
+                    'message_id': str(client_message_id),
+                    'timestamp': timestamp
                 }
             )
 
@@ -74,6 +116,7 @@ class ChatConsumer(AsyncWebsocketConsumer):
             'message': event['message'],
             'sender_id': event['sender_id'],
             'sender_name': event['sender_name'],
+            'message_id': event.get('message_id'),
             'timestamp': event['timestamp']
         }))
 
@@ -83,41 +126,104 @@ class ChatConsumer(AsyncWebsocketConsumer):
             'typing': event['typing']
         }))
 
+    async def presence_update(self, event):
+        # Envoyer la liste des participants connectés au websocket
+        await self.send(text_data=json.dumps({
+            'presence': {'online': event['online']}
+        }))
+
+    async def participants_update(self, event):
+        # Client ou expert réassigné : mettre à jour les participants du socket
+        self.client_id = event.get('client_id', self.client_id)
+        self.expert_id = event.get('expert_id', self.expert_id)
+        if not self.is_user_authorized():
+            await self.close()
+
     @database_sync_to_async
+    def load_participants(self):
+        """Charge une fois le client et l'expert de la demande (False si elle n'existe pas)"""
+        participants = (
+            ServiceRequest.objects.filter(pk=self.request_id)
+            .values_list('client_id', 'expert_id')
+            .first()
+        )
+        if participants is None:
+            return False
+        self.client_id, self.expert_id = participants
+        return True
+
     def is_user_authorized(self):
         """Vérifie si l'utilisateur est autorisé à accéder à cette conversation"""
         user = self.scope['user']
         if not user.is_authenticated:
             return False
 
-        try:
-            request = ServiceRequest.objects.get(pk=self.request_id)
-            # Vérifier si l'utilisateur est le client ou l'expert associé à cette demande
-            return user == request.client or user == request.expert or user.is_staff
-        except ServiceRequest.DoesNotExist:
-            return False
+        # Vérifier si l'utilisateur est le client ou l'expert associé à cette demande
+        return user.id in (self.client_id, self.expert_id) or user.is_staff
+
+    def get_recipient_id(self):
+        """Destinataire d'un message selon l'expéditeur (None pour le staff)"""
+        user_id = self.scope['user'].id
+        if user_id == self.client_id:
+            return self.expert_id
+        if user_id == self.expert_id:
+            return self.client_id
+        return None
+
+    def build_message(self, message_text, client_message_id):
+        """Message à enregistrer, ou None sans destinataire (staff, demande sans expert)"""
+        recipient_id = self.get_recipient_id()
+        if recipient_id is None:
+            return None
+        return Message(
+            service_request_id=self.request_id,
+            sender=self.scope['user'],
+            recipient_id=recipient_id,
+            content=message_text,
+            client_message_id=client_message_id
+        )
+
+    async def queue_message(self, message_text, client_message_id):
+        """Confie le message à l'écriture différée ; retourne l'horodatage diffusé"""
+        message = self.build_message(message_text, client_message_id)
+        if message is None:
+            return None
+        # Heure diffusée et heure enregistrée : la même, quel que soit le retard du lot
+        message.sent_at = timezone.now()
+        await get_write_behind().enqueue(message)
+        return message.sent_at.isoformat()
 
     @database_sync_to_async
-    def save_message(self, message_text):
-        """Enregistre le message dans la base de données"""
-        user = self.scope['user']
+    def save_message(self, message_text, client_message_id=None):
+        """Enregistre le message dans la base de données (un seul INSERT)"""
+        message = self.build_message(message_text, client_message_id)
+        if message is None:
+            return None
+
         try:
-            request = ServiceRequest.objects.get(pk=self.request_id)
-            
-            # Determine recipient based on sender
-            if user == request.client:
-                recipient = request.expert
-            elif user == request.expert:
-                recipient = request.client
-            else:
-                recipient = None  # For staff users
-            
-            message = Message.objects.create(
-                service_request=request,
-                sender=user,
-                recipient=recipient,
-                content=message_text
-            )
+            message.save(force_insert=True)
             return message
-        except (ServiceRequest.DoesNotExist, Exception):
+        except Exception as e:
+            print(f"Erreur lors de l'enregistrement du message: {e}")
             return None
+
+
+class NotificationConsumer(AsyncWebsocketConsumer):
+    """Canal personnel : nouveaux messages et notifications de l'utilisateur"""
+
+    async def connect(self):
+        user = self.scope['user']
+        if not user.is_authenticated:
+            await self.close()
+            return
+
+        self.group_name = user_group(user.id)
+        await self.channel_layer.group_add(self.group_name, self.channel_name)
+        await self.accept()
+
+    async def disconnect(self, close_code):
+        if hasattr(self, 'group_name'):
+            await self.channel_layer.group_discard(self.group_name, self.channel_name)
+
+    async def notify(self, event):
+        await self.send(text_data=json.dumps(event['event']))
@@ -0,0 +1,179 @@
+"""
+Résumés de conversation (messaging.models.Conversation) tenus à jour de façon
+incrémentale.
+
+- ``record_messages`` : à chaque nouveau message (signal post_save, lots de
+  l'écriture différée), deux lignes mises à jour : celle de l'expéditeur et
+  celle du destinataire, dont le compteur de non-lus augmente ;
+- ``mark_read`` : lecture de toute une conversation (une requête sur les
+  messages, une sur le résumé) ;
+- ``message_read`` : un message isolé passé à lu (``message.save()``) ;
+- ``refresh_unread`` : recalcul depuis les messages après une lecture
+  partielle (par demande de service, par exemple).
+
+Les boîtes de réception lisent ``inbox_page`` : une requête sur l'index
+(owner, -last_message_at), quel que soit l'historique des messages.
+"""
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Max, Q
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from custom_requests.models import Message
+
+from .models import Conversation
+
+PREVIEW_LENGTH = 200
+INBOX_PAGE_SIZE = 30
+
+
+def preview(content):
+    return (content or '')[:PREVIEW_LENGTH]
+
+
+def upsert(owner_id, contact_id, message, mine, unread_increment):
+    """Mettre à jour (ou créer) la ligne (propriétaire, interlocuteur)"""
+    values = {
+        'last_message': message if message.pk else None,
+        'last_message_preview': preview(message.content),
+        'last_message_mine': mine,
+        'last_message_at': message.sent_at or timezone.now(),
+    }
+    rows = Conversation.objects.filter(owner_id=owner_id, contact_id=contact_id)
+    if rows.update(unread_count=F('unread_count') + unread_increment, **values):
+        return
+    try:
+        with transaction.atomic():
+            Conversation.objects.create(
+                owner_id=owner_id, contact_id=contact_id, unread_count=unread_increment, **values
+            )
+    except IntegrityError:
+        # Ligne créée entre-temps par un autre worker
+        rows.update(unread_count=F('unread_count') + unread_increment, **values)
+
+
+def record_messages(messages):
+    """Répercuter de nouveaux messages (ordre d'arrivée) sur les résumés concernés
+
+    Une mise à jour par paire (propriétaire, interlocuteur), quel que soit le
+    nombre de messages du lot.
+    """
+    updates = {}
+    for message in messages:
+        if message.sender_id is None or message.recipient_id is None:
+            continue
+        rows = [((message.sender_id, message.recipient_id), True, 0)]
+        if message.recipient_id != message.sender_id:
+            rows.append(((message.recipient_id, message.sender_id), False, 1))
+        for key, mine, unread in rows:
+            previous_unread = updates[key][2] if key in updates else 0
+            updates[key] = (message, mine, previous_unread + unread)
+    for (owner_id, contact_id), (message, mine, unread) in updates.items():
+        upsert(owner_id, contact_id, message, mine, unread)
+
+
+def record_message(message):
+    record_messages([message])
+
+
+def mark_read(owner, contact):
+    """Marquer lus tous les messages de ``contact`` à ``owner``"""
+    updated = Message.objects.filter(sender=contact, recipient=owner, is_read=False).update(
+        is_read=True, read_at=timezone.now()
+    )
+    Conversation.objects.filter(owner=owner, contact=contact).update(unread_count=0)
+    return updated
+
+
+def message_read(message):
+    """Un message isolé vient d'être lu par son destinataire"""
+    Conversation.objects.filter(
+        owner_id=message.recipient_id, contact_id=message.sender_id
+    ).update(unread_count=Greatest(F('unread_count') - 1, 0))
+
+
+def refresh_unread(owner_id, contact_ids=None):
+    """Recalculer les non-lus de ``owner_id`` depuis les messages"""
+    conversations = Conversation.objects.filter(owner_id=owner_id)
+    if contact_ids is not None:
+        conversations = conversations.filter(contact_id__in=contact_ids)
+    unread = dict(
+        Message.objects.filter(recipient_id=owner_id, is_read=False, sender_id__in=conversations.values('contact_id'))
+        .values_list('sender_id')
+        .annotate(count=Count('id'))
+    )
+    for conversation in conversations.only('id', 'contact_id', 'unread_count'):
+        count = unread.get(conversation.contact_id, 0)
+        if conversation.unread_count != count:
+            conversation.unread_count = count
+            conversation.save(update_fields=['unread_count'])
+
+
+def inbox_page(user, page=1, page_size=INBOX_PAGE_SIZE, contact_type=None):
+    """Conversations de ``user``, les plus récentes d'abord : (lignes, page suivante ?)
+
+    Une seule requête : la ligne supplémentaire lue indique s'il reste une page.
+    """
+    page = max(page, 1)
+    conversations = (
+        Conversation.objects.filter(owner=user)
+        .select_related('contact', 'last_message')
+        .order_by('-last_message_at', '-id')
+    )
+    if contact_type:
+        conversations = conversations.filter(contact__account_type=contact_type)
+    offset = (page - 1) * page_size
+    rows = list(conversations[offset:offset + page_size + 1])
+    return rows[:page_size], len(rows) > page_size
+
+
+def unread_total(user, contact_type=None):
+    conversations = Conversation.objects.filter(owner=user, unread_count__gt=0)
+    if contact_type:
+        conversations = conversations.filter(contact__account_type=contact_type)
+    return sum(conversations.values_list('unread_count', flat=True))
+
+
+def get_page_number(request):
+    try:
+        return max(int(request.GET.get('page', 1)), 1)
+    except ValueError:
+        return 1
+
+
+def rebuild():
+    """Reconstruire tous les résumés depuis l'historique (commande rebuild_conversations)
+
+    Deux agrégats groupés par (expéditeur, destinataire), puis insertion par lots.
+    """
+    summaries = {}
+    pairs = (
+        Message.objects.values('sender_id', 'recipient_id')
+        .annotate(last_id=Max('id'), unread=Count('id', filter=Q(is_read=False)))
+    )
+    for pair in pairs:
+        sender_id, recipient_id = pair['sender_id'], pair['recipient_id']
+        for owner_id, contact_id in ((sender_id, recipient_id), (recipient_id, sender_id)):
+            summary = summaries.setdefault((owner_id, contact_id), {'last_id': 0, 'unread': 0})
+            summary['last_id'] = max(summary['last_id'], pair['last_id'])
+        if recipient_id != sender_id:
+            summaries[(recipient_id, sender_id)]['unread'] += pair['unread']
+
+    last_messages = Message.objects.only('id', 'sender_id', 'content', 'sent_at').in_bulk(
+        {summary['last_id'] for summary in summaries.values()}
+    )
+    Conversation.objects.all().delete()
+    Conversation.objects.bulk_create([
+        Conversation(
+            owner_id=owner_id,
+            contact_id=contact_id,
+            last_message_id=summary['last_id'],
+            last_message_preview=preview(last_messages[summary['last_id']].content),
+            last_message_mine=last_messages[summary['last_id']].sender_id == owner_id,
+            last_message_at=last_messages[summary['last_id']].sent_at,
+            unread_count=summary['unread'],
+        )
+        for (owner_id, contact_id), summary in summaries.items()
+    ], batch_size=500)
+    return len(summaries)
@@ -0,0 +1,98 @@
+"""
+Historique des messages d'une demande de service, paginé par curseur.
+
+Le curseur d'un message est ``"<sent_at en microsecondes>.<id>"`` : une page
+se lit avec ``(sent_at, id) < curseur`` (messages plus anciens) ou
+``> curseur`` (plus récents), sur l'ordre (sent_at, id). Contrairement à un
+OFFSET, le coût d'une page ne dépend pas de sa profondeur dans l'historique,
+et un message arrivé entre deux pages ne décale pas la suivante.
+"""
+
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.db.models import Q
+from django.utils import timezone
+
+from custom_requests.models import Message
+
+from . import conversations
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 100
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+# Plus grand identifiant représentable en base (BIGINT signé)
+MAX_ID = 2 ** 63 - 1
+
+
+def encode_cursor(message):
+    micros = (message.sent_at - EPOCH) // timedelta(microseconds=1)
+    return f'{micros}.{message.pk}'
+
+
+def decode_cursor(value):
+    """(sent_at, id) d'un curseur ; ValueError s'il est invalide"""
+    micros, _, pk = str(value).partition('.')
+    pk = int(pk)
+    if not 0 <= pk <= MAX_ID:
+        raise ValueError(f'Identifiant hors limites : {pk}')
+    try:
+        return EPOCH + timedelta(microseconds=int(micros)), pk
+    except OverflowError:
+        # Date hors de l'intervalle de datetime
+        raise ValueError(f'Date hors limites : {micros}')
+
+
+def can_access(user, service_request):
+    """Le client et l'expert de la demande, ou un administrateur"""
+    account_type = (user.account_type or '').lower()
+    if account_type == 'client':
+        return service_request.client_id == user.id
+    if account_type == 'expert':
+        return service_request.expert_id == user.id
+    return account_type == 'admin'
+
+
+def history_page(service_request, before=None, after=None, limit=None):
+    """Une page de messages, du plus ancien au plus récent : (messages, encore ?)
+
+    Sans curseur : la dernière page. ``before`` : les ``limit`` messages qui
+    précèdent ; ``after`` : les ``limit`` messages qui suivent. Le booléen
+    indique s'il reste des messages dans le sens demandé.
+    """
+    limit = min(max(int(limit or DEFAULT_PAGE_SIZE), 1), MAX_PAGE_SIZE)
+    messages = Message.objects.filter(service_request=service_request).select_related('sender')
+    if after is not None:
+        sent_at, pk = decode_cursor(after)
+        messages = messages.filter(Q(sent_at__gt=sent_at) | Q(sent_at=sent_at, id__gt=pk))
+        page = list(messages.order_by('sent_at', 'id')[:limit + 1])
+        return page[:limit], len(page) > limit
+    if before is not None:
+        sent_at, pk = decode_cursor(before)
+        messages = messages.filter(Q(sent_at__lt=sent_at) | Q(sent_at=sent_at, id__lt=pk))
+    page = list(messages.order_by('-sent_at', '-id')[:limit + 1])
+    return page[:limit][::-1], len(page) > limit
+
+
+def serialize(message, user):
+    sender = message.sender
+    return {
+        'id': message.pk,
+        'cursor': encode_cursor(message),
+        'message': message.content,
+        'sender_id': message.sender_id,
+        'sender_name': f'{sender.name} {sender.first_name}' if sender else '',
+        'timestamp': message.sent_at.isoformat(),
+        'is_read': message.is_read,
+        'is_mine': message.sender_id == user.id,
+    }
+
+
+def mark_read(service_request, user):
+    """Marquer lus les messages de la demande reçus par ``user`` (une requête UPDATE)"""
+    updated = Message.objects.filter(
+        service_request=service_request, recipient=user, is_read=False
+    ).update(is_read=True, read_at=timezone.now())
+    if updated:
+        participants = {service_request.client_id, service_request.expert_id} - {None, user.id}
+        conversations.refresh_unread(user.id, participants)
+    return updated
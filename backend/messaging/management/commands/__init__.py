@@ -0,0 +1 @@
+# Fichier __init__.py pour le package commands
@@ -0,0 +1,171 @@
+"""
+Commande de gestion Django pour tester la diffusion des messages de discussion
+entre plusieurs processus (N processus × M sockets par salon)
+"""
+
+import asyncio
+import json
+import multiprocessing
+import statistics
+import time
+import uuid
+
+from django import db
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from custom_requests.models import Message, ServiceRequest
+
+RECEIVE_TIMEOUT = 10
+
+
+def run_worker(index, options, request_id, user_id, marker, barrier, results):
+    """Processus fils : ouvrir M sockets sur le salon et compter les messages reçus"""
+    from channels.routing import URLRouter
+    from channels.testing import WebsocketCommunicator
+    from django.contrib.auth import get_user_model
+
+    from messaging.routing import websocket_urlpatterns
+
+    user = get_user_model().objects.get(pk=user_id)
+    application = URLRouter(websocket_urlpatterns)
+
+    async def receive_messages(communicator, expected):
+        latencies = []
+        deadline = time.monotonic() + RECEIVE_TIMEOUT
+        while len(latencies) < expected and time.monotonic() < deadline:
+            try:
+                data = json.loads(await communicator.receive_from(
+                    timeout=max(deadline - time.monotonic(), 0.01)
+                ))
+            except asyncio.TimeoutError:
+                break
+            message = data.get('message', '')
+            if message.startswith(marker):
+                sent_at = float(message.rsplit(':', 1)[1])
+                latencies.append((time.time() - sent_at) * 1000)
+        return latencies
+
+    async def main():
+        communicators = []
+        for _ in range(options['sockets']):
+            communicator = WebsocketCommunicator(application, f'/ws/chat/{request_id}/')
+            communicator.scope['user'] = user
+            connected, _ = await communicator.connect()
+            if not connected:
+                raise RuntimeError('Connexion WebSocket refusée')
+            communicators.append(communicator)
+
+        # Tous les sockets de tous les processus sont abonnés avant le premier envoi
+        await asyncio.get_running_loop().run_in_executor(None, barrier.wait)
+        receivers = [
+            asyncio.ensure_future(receive_messages(communicator, options['messages']))
+            for communicator in communicators
+        ]
+        if index == 0:
+            for number in range(options['messages']):
+                await communicators[0].send_to(text_data=json.dumps({
+                    'message': f'{marker}:{number}:{time.time()}'
+                }))
+
+        latencies = [latency for result in await asyncio.gather(*receivers) for latency in result]
+        for communicator in communicators:
+            try:
+                await communicator.disconnect()
+            except asyncio.CancelledError:
+                # Consommateur déjà arrêté par le délai de réception dépassé
+                pass
+        return latencies
+
+    try:
+        results.put((index, asyncio.run(main()), None))
+    except Exception as e:
+        results.put((index, [], str(e)))
+
+
+class Command(BaseCommand):
+    help = (
+        'Test de charge : N processus ouvrent chacun M sockets sur le même salon, '
+        'un socket envoie K messages, chaque socket doit tous les recevoir'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=4, help='Nombre de processus (N)')
+        parser.add_argument('--sockets', type=int, default=25, help='Sockets par processus (M)')
+        parser.add_argument('--messages', type=int, default=10, help='Messages envoyés (K)')
+        parser.add_argument(
+            '--request-id', type=int,
+            help='Demande servant de salon (par défaut : la première ayant un expert)'
+        )
+        parser.add_argument(
+            '--keep', action='store_true', help='Conserver les messages enregistrés par le test'
+        )
+
+    def handle(self, *args, **options):
+        if options['processes'] < 1 or options['sockets'] < 1 or options['messages'] < 1:
+            raise CommandError('--processes, --sockets et --messages doivent être positifs')
+
+        requests = ServiceRequest.objects.filter(expert__isnull=False)
+        if options['request_id']:
+            requests = requests.filter(pk=options['request_id'])
+        service_request = requests.order_by('pk').first()
+        if service_request is None:
+            raise CommandError('Aucune demande avec un client et un expert pour servir de salon')
+
+        layer = settings.CHANNEL_LAYERS['default']['BACKEND']
+        self.stdout.write(f'ⓘ Couche de canaux : {layer}')
+        if options['processes'] > 1 and layer.endswith('InMemoryChannelLayer'):
+            self.stdout.write(self.style.WARNING(
+                'ⓘ InMemoryChannelLayer ne diffuse qu\'à l\'intérieur d\'un processus : '
+                'définissez REDIS_URL pour un test multi-processus'
+            ))
+
+        marker = f'loadtest:{uuid.uuid4().hex[:8]}'
+        context = multiprocessing.get_context('fork')
+        barrier = context.Barrier(options['processes'])
+        results = context.Queue()
+
+        # Chaque processus fils ouvre ses propres connexions à la base
+        db.connections.close_all()
+        start = time.perf_counter()
+        workers = [
+            context.Process(
+                target=run_worker,
+                args=(index, options, service_request.pk, service_request.client_id, marker,
+                      barrier, results),
+            )
+            for index in range(options['processes'])
+        ]
+        for worker in workers:
+            worker.start()
+        collected = [results.get(timeout=RECEIVE_TIMEOUT * 3) for _ in workers]
+        for worker in workers:
+            worker.join()
+        elapsed = time.perf_counter() - start
+
+        errors = [f'processus {index} : {error}' for index, _, error in collected if error]
+        latencies = sorted(latency for _, result, _ in collected for latency in result)
+        expected = options['processes'] * options['sockets'] * options['messages']
+
+        if not options['keep']:
+            Message.objects.filter(
+                service_request=service_request, content__startswith=marker
+            ).delete()
+
+        for error in errors:
+            self.stdout.write(self.style.ERROR(f'✗ {error}'))
+        self.stdout.write(
+            f'ⓘ {len(latencies)}/{expected} messages reçus en {elapsed:.1f} s '
+            f'({options["processes"]} processus × {options["sockets"]} sockets × '
+            f'{options["messages"]} messages)'
+        )
+        if latencies:
+            p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+            self.stdout.write(
+                f'ⓘ Latence de diffusion : médiane {statistics.median(latencies):.1f} ms, '
+                f'p95 {p95:.1f} ms, max {latencies[-1]:.1f} ms'
+            )
+
+        if errors or len(latencies) < expected:
+            raise CommandError(f'{expected - len(latencies)} message(s) non reçu(s)')
+        self.stdout.write(self.style.SUCCESS('✓ Tous les sockets ont reçu tous les messages'))
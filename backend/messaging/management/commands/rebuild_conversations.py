@@ -0,0 +1,18 @@
+"""
+Commande de gestion Django pour reconstruire les résumés de conversation
+depuis l'historique des messages (après un import ou une correction en base)
+"""
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from messaging import conversations
+
+
+class Command(BaseCommand):
+    help = 'Reconstruit la table des conversations (boîtes de réception) depuis les messages'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            count = conversations.rebuild()
+        self.stdout.write(self.style.SUCCESS(f'✓ {count} conversation(s) reconstruite(s)'))
@@ -0,0 +1,55 @@
+from django.db import migrations
+from django.db.models import Count, Max, Q
+
+# Copie de messaging.conversations.PREVIEW_LENGTH au moment de la migration
+PREVIEW_LENGTH = 200
+
+
+def rebuild_conversations(apps, schema_editor):
+    """Résumés de conversation construits depuis l'historique des messages
+
+    Copie figée de messaging.conversations.rebuild, sur les modèles historiques.
+    """
+    Message = apps.get_model('custom_requests', 'Message')
+    Conversation = apps.get_model('messaging', 'Conversation')
+
+    summaries = {}
+    pairs = (
+        Message.objects.values('sender_id', 'recipient_id')
+        .annotate(last_id=Max('id'), unread=Count('id', filter=Q(is_read=False)))
+    )
+    for pair in pairs:
+        sender_id, recipient_id = pair['sender_id'], pair['recipient_id']
+        for owner_id, contact_id in ((sender_id, recipient_id), (recipient_id, sender_id)):
+            summary = summaries.setdefault((owner_id, contact_id), {'last_id': 0, 'unread': 0})
+            summary['last_id'] = max(summary['last_id'], pair['last_id'])
+        if recipient_id != sender_id:
+            summaries[(recipient_id, sender_id)]['unread'] += pair['unread']
+
+    last_messages = Message.objects.only('id', 'sender_id', 'content', 'sent_at').in_bulk(
+        {summary['last_id'] for summary in summaries.values()}
+    )
+    Conversation.objects.all().delete()
+    Conversation.objects.bulk_create([
+        Conversation(
+            owner_id=owner_id,
+            contact_id=contact_id,
+            last_message_id=summary['last_id'],
+            last_message_preview=(last_messages[summary['last_id']].content or '')[:PREVIEW_LENGTH],
+            last_message_mine=last_messages[summary['last_id']].sender_id == owner_id,
+            last_message_at=last_messages[summary['last_id']].sent_at,
+            unread_count=summary['unread'],
+        )
+        for (owner_id, contact_id), summary in summaries.items()
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('messaging', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(rebuild_conversations, migrations.RunPython.noop),
+    ]
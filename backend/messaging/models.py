@@ -1,3 +1,30 @@
+from django.conf import settings
 from django.db import models
+from django.utils.translation import gettext_lazy as _
 
-# Create your models here.
+
+class Conversation(models.Model):
+    """Résumé d'une conversation vu par l'un de ses participants
+
+    Une ligne par (propriétaire, interlocuteur), tenue à jour à chaque
+    message et à chaque lecture (messaging.conversations) : la boîte de
+    réception d'un utilisateur est une lecture de l'index (owner, -last_message_at).
+    """
+    owner = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='conversations')
+    contact = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='+')
+    last_message = models.ForeignKey('custom_requests.Message', on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    last_message_preview = models.CharField(_('last message preview'), max_length=200, blank=True)
+    last_message_mine = models.BooleanField(_('last message sent by owner'), default=False)
+    last_message_at = models.DateTimeField(_('last activity'))
+    unread_count = models.PositiveIntegerField(_('unread messages'), default=0)
+
+    def __str__(self):
+        return f"{self.owner_id} ↔ {self.contact_id} ({self.unread_count} non lus)"
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['owner', 'contact'], name='messaging_conversation_owner_contact'),
+        ]
+        indexes = [
+            models.Index(fields=['owner', '-last_message_at'], name='messaging_conv_owner_last'),
+        ]
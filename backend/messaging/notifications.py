@@ -0,0 +1,85 @@
+"""
+Notifications en temps réel par utilisateur (nouveaux messages et notifications).
+
+Les signaux de ``Message`` et ``Notification`` publient un événement dans le
+groupe ``user_<id>`` de la couche de canaux. Il est reçu :
+
+- par ``NotificationConsumer`` (``ws/notifications/``), qui le transmet au
+  navigateur ;
+- à défaut de WebSocket, par la vue de long-polling
+  (``messaging:notifications_poll``), qui attend un événement au lieu
+  d'interroger la base à intervalle fixe.
+
+Le curseur (``ETag`` de la vue) est formé des derniers identifiants de
+message reçu et de notification de l'utilisateur : un client à jour reçoit
+304, un client en retard reçoit immédiatement l'état courant.
+"""
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.db import transaction
+from django.db.models import Count, Max, Q
+
+from custom_requests.models import Message, Notification
+
+PREVIEW_LENGTH = 100
+
+
+def user_group(user_id):
+    return f'user_{user_id}'
+
+
+def publish(user_id, event):
+    """Envoyer un événement aux connexions de l'utilisateur, après validation"""
+    channel_layer = get_channel_layer()
+    if channel_layer is None or user_id is None:
+        return
+
+    def send():
+        try:
+            async_to_sync(channel_layer.group_send)(
+                user_group(user_id), {'type': 'notify', 'event': event}
+            )
+        except Exception as e:
+            print(f"Erreur lors de l'envoi de la notification en temps réel: {e}")
+
+    transaction.on_commit(send)
+
+
+def message_event(message):
+    return {
+        'kind': 'message',
+        'id': message.pk,
+        'client_message_id': str(message.client_message_id) if message.client_message_id else None,
+        'sender_id': message.sender_id,
+        'service_request_id': message.service_request_id,
+        'preview': message.content[:PREVIEW_LENGTH],
+        'sent_at': message.sent_at.isoformat() if message.sent_at else None,
+    }
+
+
+def notification_event(notification):
+    return {
+        'kind': 'notification',
+        'id': notification.pk,
+        'type': notification.type,
+        'title': str(notification.title),
+        'content': str(notification.content)[:PREVIEW_LENGTH],
+        'created_at': notification.created_at.isoformat() if notification.created_at else None,
+        'service_request_id': notification.related_service_request_id,
+    }
+
+
+def get_state(user_id):
+    """Compteurs non lus et curseur de l'utilisateur (deux requêtes)"""
+    messages = Message.objects.filter(recipient_id=user_id).aggregate(
+        last=Max('id'), unread=Count('id', filter=Q(is_read=False))
+    )
+    notifications = Notification.objects.filter(user_id=user_id).aggregate(
+        last=Max('id'), unread=Count('id', filter=Q(is_read=False))
+    )
+    return {
+        'cursor': f"{messages['last'] or 0}.{notifications['last'] or 0}",
+        'unread_messages': messages['unread'],
+        'unread_notifications': notifications['unread'],
+    }
@@ -0,0 +1,148 @@
+"""
+Présence des participants dans les salons de discussion (ChatConsumer).
+
+Chaque socket ouvert sur un salon est enregistré avec l'identifiant de son
+utilisateur et une échéance de ``CHAT_PRESENCE_TTL`` secondes, repoussée
+par les battements de cœur du client. Un socket dont le processus a disparu
+sans se déconnecter proprement sort ainsi de la liste tout seul.
+
+Le stockage est choisi par ``CHAT_PRESENCE_BACKEND`` :
+
+- ``messaging.presence.MemoryPresence`` : dictionnaire du processus, pour le
+  développement et les tests (un seul processus ASGI) ;
+- ``messaging.presence.RedisPresence`` : ensemble trié Redis par salon,
+  partagé par tous les processus daphne/uvicorn (``REDIS_URL``).
+"""
+
+import asyncio
+import time
+import weakref
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+DEFAULT_BACKEND = 'messaging.presence.MemoryPresence'
+DEFAULT_TTL = 60
+
+
+class BasePresence:
+    """Interface commune des stockages de présence"""
+
+    def __init__(self, ttl=None):
+        self.ttl = ttl or getattr(settings, 'CHAT_PRESENCE_TTL', DEFAULT_TTL)
+
+    async def join(self, room, user_id, channel_name):
+        """Enregistrer (ou prolonger) un socket dans le salon"""
+        raise NotImplementedError
+
+    async def leave(self, room, channel_name):
+        """Retirer un socket du salon"""
+        raise NotImplementedError
+
+    async def members(self, room):
+        """Identifiants triés des utilisateurs connectés au salon"""
+        raise NotImplementedError
+
+    async def touch(self, room, user_id, channel_name):
+        """Battement de cœur d'un socket"""
+        await self.join(room, user_id, channel_name)
+
+
+class MemoryPresence(BasePresence):
+    """Présence en mémoire du processus"""
+
+    def __init__(self, ttl=None):
+        super().__init__(ttl)
+        self.rooms = {}
+
+    async def join(self, room, user_id, channel_name):
+        self.rooms.setdefault(room, {})[channel_name] = (user_id, time.time() + self.ttl)
+
+    async def leave(self, room, channel_name):
+        sockets = self.rooms.get(room, {})
+        sockets.pop(channel_name, None)
+        if not sockets:
+            self.rooms.pop(room, None)
+
+    async def members(self, room):
+        now = time.time()
+        sockets = self.rooms.get(room, {})
+        for channel_name, (_, expires_at) in list(sockets.items()):
+            if expires_at <= now:
+                del sockets[channel_name]
+        return sorted({user_id for user_id, _ in sockets.values()})
+
+
+class RedisPresence(BasePresence):
+    """Présence partagée dans Redis
+
+    Par salon : un ensemble trié ``socket -> échéance`` et un hash
+    ``socket -> utilisateur``, tous deux expirant avec le dernier socket.
+    """
+
+    def __init__(self, ttl=None, url=None, prefix='presence'):
+        super().__init__(ttl)
+        self.url = url or settings.REDIS_URL
+        self.prefix = prefix
+        self._clients = weakref.WeakKeyDictionary()
+
+    def get_client(self):
+        """Client Redis de la boucle d'événements courante"""
+        import redis.asyncio as redis
+
+        loop = asyncio.get_running_loop()
+        client = self._clients.get(loop)
+        if client is None:
+            client = redis.from_url(self.url)
+            self._clients[loop] = client
+        return client
+
+    def keys(self, room):
+        return f'{self.prefix}:{room}:sockets', f'{self.prefix}:{room}:users'
+
+    async def join(self, room, user_id, channel_name):
+        sockets_key, users_key = self.keys(room)
+        async with self.get_client().pipeline(transaction=True) as pipe:
+            pipe.zadd(sockets_key, {channel_name: time.time() + self.ttl})
+            pipe.hset(users_key, channel_name, user_id)
+            pipe.expire(sockets_key, self.ttl)
+            pipe.expire(users_key, self.ttl)
+            await pipe.execute()
+
+    async def leave(self, room, channel_name):
+        sockets_key, users_key = self.keys(room)
+        async with self.get_client().pipeline(transaction=True) as pipe:
+            pipe.zrem(sockets_key, channel_name)
+            pipe.hdel(users_key, channel_name)
+            await pipe.execute()
+
+    async def members(self, room):
+        sockets_key, users_key = self.keys(room)
+        client = self.get_client()
+        now = time.time()
+        expired = await client.zrangebyscore(sockets_key, '-inf', now)
+        async with client.pipeline(transaction=True) as pipe:
+            if expired:
+                pipe.zremrangebyscore(sockets_key, '-inf', now)
+                pipe.hdel(users_key, *expired)
+            pipe.hvals(users_key)
+            results = await pipe.execute()
+        return sorted({int(user_id) for user_id in results[-1]})
+
+
+_backend = None
+
+
+def get_presence():
+    """Stockage de présence configuré (instance partagée par le processus)"""
+    global _backend
+    if _backend is None:
+        backend_path = getattr(settings, 'CHAT_PRESENCE_BACKEND', DEFAULT_BACKEND)
+        _backend = import_string(backend_path)()
+    return _backend
+
+
+def reset():
+    """Oublier l'instance partagée (changement de configuration, tests)"""
+    global _backend
+    _backend = None
@@ -0,0 +1,79 @@
+"""
+Signaux de la messagerie
+"""
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.db import transaction
+from django.db.models.signals import post_init, post_save
+from django.dispatch import receiver
+
+from custom_requests.models import Message, Notification, ServiceRequest
+
+from . import conversations, notifications
+
+
+PARTICIPANT_FIELDS = ('client_id', 'expert_id')
+
+
+def participants(instance):
+    """Client et expert chargés sur l'instance (les champs différés sont ignorés)"""
+    return {field: instance.__dict__[field] for field in PARTICIPANT_FIELDS if field in instance.__dict__}
+
+
+@receiver(post_init, sender=ServiceRequest)
+def remember_participants(sender, instance, **kwargs):
+    instance._chat_participants = participants(instance)
+
+
+@receiver(post_save, sender=ServiceRequest)
+def broadcast_participants(sender, instance, created, **kwargs):
+    """Prévenir les sockets du salon quand le client ou l'expert change
+
+    Les consommateurs gardent les participants résolus à la connexion
+    (messaging.consumers.ChatConsumer) et les remplacent à la réception.
+    """
+    previous = instance._chat_participants
+    current = participants(instance)
+    instance._chat_participants = current
+    changed = {
+        field: value for field, value in current.items()
+        if field not in previous or previous[field] != value
+    }
+    if created or not changed:
+        return
+
+    channel_layer = get_channel_layer()
+    if channel_layer is None:
+        return
+    event = {'type': 'participants_update', **changed}
+    group = f'chat_{instance.pk}'
+    transaction.on_commit(lambda: async_to_sync(channel_layer.group_send)(group, event))
+
+
+@receiver(post_init, sender=Message)
+def remember_read_state(sender, instance, **kwargs):
+    instance._was_read = instance.__dict__.get('is_read')
+
+
+@receiver(post_save, sender=Message)
+def push_new_message(sender, instance, created, **kwargs):
+    """Prévenir le destinataire d'un nouveau message (remplace le polling)"""
+    if created:
+        notifications.publish(instance.recipient_id, notifications.message_event(instance))
+
+
+@receiver(post_save, sender=Message)
+def update_conversations(sender, instance, created, **kwargs):
+    """Tenir à jour les résumés de conversation des deux participants"""
+    if created:
+        conversations.record_messages([instance])
+    elif instance.is_read and instance._was_read is False:
+        conversations.message_read(instance)
+    instance._was_read = instance.is_read
+
+
+@receiver(post_save, sender=Notification)
+def push_new_notification(sender, instance, created, **kwargs):
+    if created:
+        notifications.publish(instance.user_id, notifications.notification_event(instance))
@@ -0,0 +1,685 @@
+import asyncio
+import json
+import os
+import time
+import unittest
+import uuid
+from datetime import timedelta
+from unittest import mock
+
+from asgiref.sync import async_to_sync, sync_to_async
+from channels.routing import URLRouter
+from channels.db import database_sync_to_async
+from channels.testing import WebsocketCommunicator
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.db import connection
+from django.http import HttpResponse
+from django.test import (
+    RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings,
+)
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from custom_requests.models import Message, Notification, ServiceRequest
+
+from . import conversations, history, presence, write_behind
+from .models import Conversation
+from .routing import websocket_urlpatterns
+from .views import notifications_poll
+
+
+class PresenceContractMixin:
+    """Comportement attendu de tout stockage de présence"""
+
+    def make_presence(self, ttl=60):
+        raise NotImplementedError
+
+    def test_members_are_distinct_users(self):
+        store = self.make_presence()
+
+        async def scenario():
+            await store.join('room-test', 1, 'socket-a')
+            await store.join('room-test', 1, 'socket-b')
+            await store.join('room-test', 2, 'socket-c')
+            before = await store.members('room-test')
+            await store.leave('room-test', 'socket-a')
+            await store.leave('room-test', 'socket-c')
+            after = await store.members('room-test')
+            await store.leave('room-test', 'socket-b')
+            return before, after, await store.members('room-test')
+
+        self.assertEqual(async_to_sync(scenario)(), ([1, 2], [1], []))
+
+    def test_silent_socket_expires(self):
+        store = self.make_presence(ttl=1)
+
+        async def scenario():
+            await store.join('room-test', 1, 'socket-a')
+            await store.join('room-test', 2, 'socket-b')
+            await asyncio.sleep(0.6)
+            await store.touch('room-test', 2, 'socket-b')
+            await asyncio.sleep(0.6)
+            members = await store.members('room-test')
+            await store.leave('room-test', 'socket-b')
+            return members
+
+        self.assertEqual(async_to_sync(scenario)(), [2])
+
+
+class MemoryPresenceTests(PresenceContractMixin, SimpleTestCase):
+
+    def make_presence(self, ttl=60):
+        return presence.MemoryPresence(ttl=ttl)
+
+
+@unittest.skipUnless(os.environ.get('REDIS_URL'), 'REDIS_URL non défini')
+class RedisPresenceTests(PresenceContractMixin, SimpleTestCase):
+
+    def make_presence(self, ttl=60):
+        return presence.RedisPresence(ttl=ttl, url=os.environ['REDIS_URL'], prefix='presence-test')
+
+
+@override_settings(
+    CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}},
+    CHAT_PRESENCE_BACKEND='messaging.presence.MemoryPresence',
+)
+class ChatRoomFanOutTests(TransactionTestCase):
+    """Diffusion et présence dans les salons de messagerie (messaging.ChatConsumer)"""
+
+    def setUp(self):
+        presence.reset()
+        User = get_user_model()
+        self.client_user = User.objects.create_user(
+            email='client@example.com', password='x', name='Client', first_name='C'
+        )
+        self.expert = User.objects.create_user(
+            email='expert@example.com', password='x', name='Expert', first_name='E'
+        )
+        self.request = ServiceRequest.objects.create(
+            client=self.client_user, expert=self.expert, title='Dossier', description='d'
+        )
+
+    def tearDown(self):
+        presence.reset()
+
+    async def open_socket(self, user):
+        communicator = WebsocketCommunicator(
+            URLRouter(websocket_urlpatterns), f'/ws/chat/{self.request.pk}/'
+        )
+        communicator.scope['user'] = user
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+        return communicator
+
+    async def receive(self, communicator, key):
+        """Prochain message du socket portant la clé donnée"""
+        while True:
+            data = json.loads(await communicator.receive_from(timeout=2))
+            if key in data:
+                return data
+
+    def test_presence_follows_connections(self):
+        async def scenario():
+            client_socket = await self.open_socket(self.client_user)
+            first = await self.receive(client_socket, 'presence')
+            expert_socket = await self.open_socket(self.expert)
+            both = await self.receive(client_socket, 'presence')
+            await expert_socket.disconnect()
+            after = await self.receive(client_socket, 'presence')
+            await client_socket.disconnect()
+            return first, both, after
+
+        first, both, after = async_to_sync(scenario)()
+        self.assertEqual(first['presence']['online'], [self.client_user.pk])
+        self.assertEqual(sorted(both['presence']['online']),
+                         sorted([self.client_user.pk, self.expert.pk]))
+        self.assertEqual(after['presence']['online'], [self.client_user.pk])
+
+    def test_message_reaches_every_socket_of_the_room(self):
+        async def scenario():
+            sockets = [await self.open_socket(self.client_user) for _ in range(3)]
+            sockets.append(await self.open_socket(self.expert))
+            await sockets[0].send_to(text_data=json.dumps({'message': 'Bonjour'}))
+            received = [await self.receive(socket, 'message') for socket in sockets]
+            # Le battement de cœur ne produit aucune diffusion
+            await sockets[0].send_to(text_data=json.dumps({'heartbeat': True}))
+            silent = await sockets[1].receive_nothing(timeout=0.2)
+            for socket in sockets:
+                await socket.disconnect()
+            return received, silent
+
+        received, silent = async_to_sync(scenario)()
+        self.assertEqual([data['message'] for data in received], ['Bonjour'] * 4)
+        self.assertTrue(silent)
+        self.assertEqual(Message.objects.filter(service_request=self.request).count(), 1)
+
+    def test_sending_a_message_is_one_insert(self):
+        async def scenario():
+            client_socket = await self.open_socket(self.client_user)
+            await self.receive(client_socket, 'presence')
+            queries = CaptureQueriesContext(connection)
+            await sync_to_async(queries.__enter__)()
+            await client_socket.send_to(text_data=json.dumps({'message': 'Une question'}))
+            await self.receive(client_socket, 'message')
+            await sync_to_async(queries.__exit__)(None, None, None)
+            await client_socket.disconnect()
+            return queries
+
+        queries = async_to_sync(scenario)()
+        # Ni relecture de la demande ni des participants : un INSERT, puis les résumés
+        self.assertFalse([q for q in queries if 'custom_requests_servicerequest' in q['sql']])
+        message_queries = [q for q in queries if 'custom_requests_message' in q['sql']]
+        self.assertEqual(len(message_queries), 1)
+        self.assertTrue(message_queries[0]['sql'].startswith('INSERT'))
+        self.assertEqual(Message.objects.get().recipient, self.expert)
+
+    def test_reassignment_refreshes_participants(self):
+        new_expert = get_user_model().objects.create_user(
+            email='expert2@example.com', password='x', name='Expert', first_name='F'
+        )
+
+        def reassign():
+            service_request = ServiceRequest.objects.get(pk=self.request.pk)
+            service_request.expert = new_expert
+            service_request.save()
+
+        async def scenario():
+            client_socket = await self.open_socket(self.client_user)
+            expert_socket = await self.open_socket(self.expert)
+            await database_sync_to_async(reassign)()
+            # L'ancien expert perd l'accès au salon
+            closed = await expert_socket.receive_output(timeout=2)
+            while closed['type'] != 'websocket.close':
+                closed = await expert_socket.receive_output(timeout=2)
+            await client_socket.send_to(text_data=json.dumps({'message': 'Bonjour'}))
+            await self.receive(client_socket, 'message')
+            await client_socket.disconnect()
+            return closed
+
+        closed = async_to_sync(scenario)()
+        self.assertEqual(closed['type'], 'websocket.close')
+        self.assertEqual(Message.objects.get().recipient, new_expert)
+
+
+class MessageWriteBehindTests(TransactionTestCase):
+    """Enregistrement différé des messages de discussion (messaging.write_behind)"""
+
+    def setUp(self):
+        write_behind.reset()
+        write_behind.reset_stats()
+        User = get_user_model()
+        self.client_user = User.objects.create_user(
+            email='client@example.com', password='x', name='Client', first_name='C'
+        )
+        self.expert = User.objects.create_user(
+            email='expert@example.com', password='x', name='Expert', first_name='E'
+        )
+        self.request = ServiceRequest.objects.create(
+            client=self.client_user, expert=self.expert, title='Dossier', description='d'
+        )
+
+    def tearDown(self):
+        write_behind.reset()
+
+    def build(self, count):
+        return [
+            Message(service_request=self.request, sender=self.client_user,
+                    recipient=self.expert, content=f'message {number}', client_message_id=uuid.uuid4())
+            for number in range(count)
+        ]
+
+    def stored_contents(self):
+        return list(Message.objects.order_by('id').values_list('content', flat=True))
+
+    def test_batches_keep_arrival_order(self):
+        writer = write_behind.MessageWriteBehind(flush_ms=50, batch_size=3)
+
+        async def scenario():
+            for message in self.build(7):
+                await writer.enqueue(message)
+            # Deux lots pleins écrits sans attendre, le reste au délai
+            await asyncio.sleep(0.3)
+
+        async_to_sync(scenario)()
+        self.assertEqual(self.stored_contents(), [f'message {number}' for number in range(7)])
+        self.assertEqual(write_behind.stats['written'], 7)
+        self.assertEqual(write_behind.stats['flushes'], 3)
+
+    def test_failed_batch_is_retried(self):
+        writer = write_behind.MessageWriteBehind(flush_ms=10000, batch_size=10)
+        real_bulk_create = Message.objects.bulk_create
+        calls = []
+
+        def flaky_bulk_create(batch, **kwargs):
+            calls.append(len(batch))
+            if len(calls) == 1:
+                raise RuntimeError('base indisponible')
+            return real_bulk_create(batch, **kwargs)
+
+        async def scenario():
+            for message in self.build(3):
+                await writer.enqueue(message)
+            return await writer.flush(), await writer.flush()
+
+        with mock.patch.object(Message.objects, 'bulk_create', side_effect=flaky_bulk_create):
+            first, second = async_to_sync(scenario)()
+        self.assertEqual((first, second), (False, True))
+        self.assertEqual(calls, [3, 3])
+        self.assertEqual(self.stored_contents(), ['message 0', 'message 1', 'message 2'])
+
+    def test_late_batch_keeps_the_enqueue_time(self):
+        writer = write_behind.MessageWriteBehind(flush_ms=10000, batch_size=10)
+        messages = self.build(2)
+        enqueued_at = timezone.now() - timedelta(minutes=5)
+        for message in messages:
+            message.sent_at = enqueued_at
+
+        async def scenario():
+            for message in messages:
+                await writer.enqueue(message)
+            # Lot en échec puis réécrit plus tard
+            with mock.patch.object(Message.objects, 'bulk_create', side_effect=RuntimeError('base indisponible')):
+                await writer.flush()
+            await writer.flush()
+
+        async_to_sync(scenario)()
+        self.assertEqual(set(Message.objects.values_list('sent_at', flat=True)), {enqueued_at})
+
+    def test_drain_writes_queue_and_replays_without_duplicates(self):
+        writer = write_behind.MessageWriteBehind(flush_ms=10000, batch_size=10)
+        messages = self.build(2)
+
+        async def scenario():
+            for message in messages:
+                await writer.enqueue(message)
+
+        async_to_sync(scenario)()
+        self.assertFalse(Message.objects.exists())
+
+        writer.drain()
+        self.assertEqual(Message.objects.count(), 2)
+
+        # Écriture dont l'issue est inconnue, rejouée à l'arrêt : pas de doublon
+        writer.in_flight = [
+            Message(service_request=self.request, sender=self.client_user, recipient=self.expert,
+                    content=message.content, client_message_id=message.client_message_id)
+            for message in messages
+        ]
+        writer.drain()
+        self.assertEqual(self.stored_contents(), ['message 0', 'message 1'])
+
+    def test_replayed_batch_counts_unread_once(self):
+        writer = write_behind.MessageWriteBehind(flush_ms=10000, batch_size=10)
+        messages = self.build(2)
+        writer.pending.extend(messages)
+        writer.write_pending()
+        # Lot rejoué (écriture incertaine) : ni doublon ni non-lu compté deux fois
+        writer.pending.extend(
+            Message(service_request=self.request, sender=self.client_user, recipient=self.expert,
+                    content=message.content, client_message_id=message.client_message_id)
+            for message in messages
+        )
+        writer.write_pending()
+        self.assertEqual(Message.objects.count(), 2)
+        self.assertEqual(Conversation.objects.get(owner=self.expert, contact=self.client_user).unread_count, 2)
+        self.assertEqual(write_behind.stats['duplicates'], 2)
+
+    def test_client_ids_are_scoped_to_the_sender(self):
+        writer = write_behind.MessageWriteBehind(flush_ms=10000, batch_size=10)
+        shared_id = uuid.uuid4()
+        writer.pending.extend([
+            Message(service_request=self.request, sender=self.client_user, recipient=self.expert,
+                    content='du client', client_message_id=shared_id),
+            # Même identifiant réutilisé par l'autre participant
+            Message(service_request=self.request, sender=self.expert, recipient=self.client_user,
+                    content="de l'expert", client_message_id=shared_id),
+        ])
+        writer.write_pending()
+        self.assertEqual(self.stored_contents(), ['du client', "de l'expert"])
+
+    def test_rejected_message_does_not_block_the_batch(self):
+        writer = write_behind.MessageWriteBehind(flush_ms=10000, batch_size=10)
+        messages = self.build(3)
+        # Demande supprimée entre-temps : clé étrangère invalide
+        messages[1].service_request_id = self.request.pk + 1000
+        writer.pending.extend(messages)
+        self.assertTrue(writer.write_pending())
+        self.assertEqual(self.stored_contents(), ['message 0', 'message 2'])
+        self.assertEqual(write_behind.stats['rejected'], 1)
+        self.assertEqual(Conversation.objects.get(owner=self.expert, contact=self.client_user).unread_count, 2)
+        self.assertFalse(writer.pending)
+
+    @override_settings(
+        CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}},
+        CHAT_PRESENCE_BACKEND='messaging.presence.MemoryPresence',
+        CHAT_WRITE_BEHIND=True,
+        CHAT_WRITE_BEHIND_FLUSH_MS=10000,
+    )
+    def test_consumer_broadcasts_before_writing(self):
+        presence.reset()
+
+        async def scenario():
+            communicator = WebsocketCommunicator(
+                URLRouter(websocket_urlpatterns), f'/ws/chat/{self.request.pk}/'
+            )
+            communicator.scope['user'] = self.client_user
+            await communicator.connect()
+            await communicator.send_to(text_data=json.dumps({
+                'message': 'Bonjour', 'client_id': '0f8fad5b-d9cb-469f-a165-70867728950e'
+            }))
+            while True:
+                data = json.loads(await communicator.receive_from(timeout=2))
+                if 'message' in data:
+                    break
+            stored_before = await database_sync_to_async(Message.objects.count)()
+            # La déconnexion vide la file
+            await communicator.disconnect()
+            return data, stored_before
+
+        data, stored_before = async_to_sync(scenario)()
+        presence.reset()
+        self.assertEqual(data['message_id'], '0f8fad5b-d9cb-469f-a165-70867728950e')
+        self.assertEqual(stored_before, 0)
+        message = Message.objects.get()
+        self.assertEqual(str(message.client_message_id), data['message_id'])
+
+
+@override_settings(
+    CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}},
+    NOTIFICATIONS_PUSH=True,
+)
+class RealtimeNotificationTests(TransactionTestCase):
+    """Canal personnel ws/notifications/ et long-polling de repli"""
+
+    def setUp(self):
+        User = get_user_model()
+        self.client_user = User.objects.create_user(
+            email='client@example.com', password='x', name='Client', first_name='C'
+        )
+        self.expert = User.objects.create_user(
+            email='expert@example.com', password='x', name='Expert', first_name='E'
+        )
+        self.client.force_login(self.client_user)
+
+    def notify(self, user):
+        return Notification.objects.create(user=user, type='system', title='Titre', content='Contenu')
+
+    def test_socket_receives_messages_and_notifications(self):
+        async def scenario():
+            communicator = WebsocketCommunicator(
+                URLRouter(websocket_urlpatterns), '/ws/notifications/'
+            )
+            communicator.scope['user'] = self.client_user
+            connected, _ = await communicator.connect()
+            await database_sync_to_async(Message.objects.create)(
+                sender=self.expert, recipient=self.client_user, content='Bonjour'
+            )
+            # Message envoyé par l'utilisateur lui-même : rien à signaler
+            await database_sync_to_async(Message.objects.create)(
+                sender=self.client_user, recipient=self.expert, content='Merci'
+            )
+            await database_sync_to_async(self.notify)(self.client_user)
+            events = [json.loads(await communicator.receive_from(timeout=2)) for _ in range(2)]
+            silent = await communicator.receive_nothing(timeout=0.1)
+            await communicator.disconnect()
+            return connected, events, silent
+
+        connected, events, silent = async_to_sync(scenario)()
+        self.assertTrue(connected)
+        self.assertEqual([event['kind'] for event in events], ['message', 'notification'])
+        self.assertEqual(events[0]['sender_id'], self.expert.pk)
+        self.assertEqual(events[0]['preview'], 'Bonjour')
+        self.assertTrue(silent)
+
+    def test_anonymous_socket_is_refused(self):
+        async def scenario():
+            communicator = WebsocketCommunicator(
+                URLRouter(websocket_urlpatterns), '/ws/notifications/'
+            )
+            communicator.scope['user'] = AnonymousUser()
+            connected, _ = await communicator.connect()
+            return connected
+
+        self.assertFalse(async_to_sync(scenario)())
+
+    def test_poll_returns_state_then_not_modified(self):
+        self.notify(self.client_user)
+        response = self.client.get('/messaging/notifications/poll/', {'timeout': 0})
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data['unread_notifications'], 1)
+        self.assertEqual(response['ETag'], f'"{data["cursor"]}"')
+
+        response = self.client.get(
+            '/messaging/notifications/poll/', {'timeout': 0.1},
+            HTTP_IF_NONE_MATCH=f'"{data["cursor"]}"',
+        )
+        self.assertEqual(response.status_code, 304)
+
+        self.notify(self.client_user)
+        response = self.client.get('/messaging/notifications/poll/', {'cursor': data['cursor'], 'timeout': 0})
+        self.assertEqual(response.json()['unread_notifications'], 2)
+
+    def test_poll_wakes_up_on_new_notification(self):
+        cursor = self.client.get('/messaging/notifications/poll/', {'timeout': 0}).json()['cursor']
+
+        async def scenario():
+            async def later():
+                await asyncio.sleep(0.2)
+                await database_sync_to_async(self.notify)(self.client_user)
+
+            # Vue appelée sur la boucle du test : InMemoryChannelLayer ne réveille
+            # pas une attente d'une autre boucle (le middleware synchrone en crée une)
+            request = RequestFactory().get(
+                '/messaging/notifications/poll/', {'cursor': cursor, 'timeout': 5}
+            )
+            request.user = self.client_user
+            start = time.monotonic()
+            response, _ = await asyncio.gather(notifications_poll(request), later())
+            return response, time.monotonic() - start
+
+        response, elapsed = async_to_sync(scenario)()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content)['events'][0]['kind'], 'notification')
+        self.assertLess(elapsed, 2)
+
+    def test_poll_does_not_wait_without_push(self):
+        cursor = self.client.get('/messaging/notifications/poll/', {'timeout': 0}).json()['cursor']
+        start = time.monotonic()
+        with override_settings(NOTIFICATIONS_PUSH=False):
+            response = self.client.get('/messaging/notifications/poll/', {'cursor': cursor, 'timeout': 5})
+        self.assertEqual(response.status_code, 304)
+        self.assertLess(time.monotonic() - start, 1)
+
+    def test_pages_keep_short_polling_without_push(self):
+        from servicesbladi.context_processors import notifications_context
+
+        request = RequestFactory().get('/')
+        request.user = self.client_user
+        with override_settings(NOTIFICATIONS_PUSH=False):
+            self.assertFalse(notifications_context(request)['notifications_push'])
+        self.assertTrue(notifications_context(request)['notifications_push'])
+
+    def test_poll_requires_authentication(self):
+        self.client.logout()
+        response = self.client.get('/messaging/notifications/poll/', {'timeout': 0})
+        self.assertEqual(response.status_code, 401)
+
+
+class ConversationSummaryTests(TestCase):
+    """Résumés de conversation tenus à jour à chaque message"""
+
+    def setUp(self):
+        User = get_user_model()
+        self.client_user = User.objects.create_user(
+            email='client@example.com', password='x', name='Client', first_name='C', account_type='client'
+        )
+        self.expert = User.objects.create_user(
+            email='expert@example.com', password='x', name='Expert', first_name='E', account_type='expert'
+        )
+        self.other = User.objects.create_user(
+            email='other@example.com', password='x', name='Autre', first_name='A', account_type='expert'
+        )
+
+    def send(self, sender, recipient, content):
+        return Message.objects.create(sender=sender, recipient=recipient, content=content)
+
+    def summary(self, owner, contact):
+        return Conversation.objects.get(owner=owner, contact=contact)
+
+    def test_counters_follow_new_messages_and_reads(self):
+        self.send(self.expert, self.client_user, 'Bonjour')
+        last = self.send(self.expert, self.client_user, 'Avez-vous le document ?')
+
+        inbox = self.summary(self.client_user, self.expert)
+        self.assertEqual(inbox.unread_count, 2)
+        self.assertEqual(inbox.last_message, last)
+        self.assertFalse(inbox.last_message_mine)
+        sent = self.summary(self.expert, self.client_user)
+        self.assertEqual(sent.unread_count, 0)
+        self.assertTrue(sent.last_message_mine)
+
+        last.is_read = True
+        last.save()
+        self.assertEqual(self.summary(self.client_user, self.expert).unread_count, 1)
+
+        self.assertEqual(conversations.mark_read(self.client_user, self.expert), 1)
+        self.assertEqual(self.summary(self.client_user, self.expert).unread_count, 0)
+        self.assertEqual(conversations.unread_total(self.client_user), 0)
+
+    def test_inbox_is_one_query_whatever_the_history(self):
+        for index in range(20):
+            self.send(self.expert, self.client_user, f'Message {index}')
+        self.send(self.client_user, self.other, 'Question')
+
+        with self.assertNumQueries(1):
+            rows, has_next = conversations.inbox_page(self.client_user, page_size=1)
+            self.assertEqual(rows[0].contact.email, 'other@example.com')
+            self.assertEqual(rows[0].last_message.content, 'Question')
+        self.assertTrue(has_next)
+
+        rows, has_next = conversations.inbox_page(self.client_user, page=2, page_size=1)
+        self.assertEqual([row.contact for row in rows], [self.expert])
+        self.assertFalse(has_next)
+
+    def test_api_summary_reads_conversations(self):
+        self.send(self.expert, self.client_user, 'Bonjour')
+        self.client.force_login(self.client_user)
+
+        data = self.client.get('/requests/api/messages/').json()
+
+        self.assertEqual(len(data['conversations']), 1)
+        conversation = data['conversations'][0]
+        self.assertEqual(conversation['user']['id'], self.expert.pk)
+        self.assertEqual(conversation['latest_message']['content'], 'Bonjour')
+        self.assertEqual(conversation['unread_count'], 1)
+        self.assertFalse(data['has_next'])
+
+    def test_rebuild_matches_incremental_updates(self):
+        self.send(self.expert, self.client_user, 'Bonjour')
+        self.send(self.client_user, self.expert, 'Merci')
+        self.send(self.other, self.client_user, 'Autre sujet')
+        fields = ('owner_id', 'contact_id', 'last_message_id', 'last_message_mine', 'unread_count')
+        incremental = sorted(Conversation.objects.values_list(*fields))
+
+        self.assertEqual(conversations.rebuild(), 4)
+        self.assertEqual(sorted(Conversation.objects.values_list(*fields)), incremental)
+
+
+class MessageHistoryTests(TestCase):
+    """Historique paginé par curseur (sent_at, id) et lecture en une requête"""
+
+    def setUp(self):
+        User = get_user_model()
+        self.client_user = User.objects.create_user(
+            email='client@example.com', password='x', name='Client', first_name='C', account_type='client'
+        )
+        self.expert = User.objects.create_user(
+            email='expert@example.com', password='x', name='Expert', first_name='E', account_type='expert'
+        )
+        self.request = ServiceRequest.objects.create(
+            client=self.client_user, expert=self.expert, title='Dossier', description='d'
+        )
+        self.messages = [
+            Message.objects.create(
+                sender=self.expert, recipient=self.client_user,
+                service_request=self.request, content=f'Message {index}'
+            )
+            for index in range(7)
+        ]
+        # Horodatages identiques : l'identifiant départage les messages
+        Message.objects.update(sent_at=timezone.now())
+        self.client.force_login(self.client_user)
+
+    def url(self, name):
+        return reverse(f'messaging:{name}', args=[self.request.pk])
+
+    def test_pages_walk_back_through_history_without_gaps(self):
+        seen = []
+        before = None
+        while True:
+            page, has_more = history.history_page(self.request, before=before, limit=3)
+            seen = [message.pk for message in page] + seen
+            if not has_more:
+                break
+            before = history.encode_cursor(page[0])
+        self.assertEqual(seen, [message.pk for message in self.messages])
+
+        newer, has_more = history.history_page(
+            self.request, after=history.encode_cursor(Message.objects.get(pk=seen[1])), limit=10
+        )
+        self.assertEqual([message.pk for message in newer], seen[2:])
+        self.assertFalse(has_more)
+
+    def test_history_endpoint(self):
+        data = self.client.get(self.url('chat_history'), {'limit': 2}).json()
+        self.assertEqual([m['message'] for m in data['messages']], ['Message 5', 'Message 6'])
+        self.assertTrue(data['has_more'])
+
+        data = self.client.get(
+            self.url('chat_history'), {'before': data['messages'][0]['cursor'], 'limit': 2}
+        ).json()
+        self.assertEqual([m['message'] for m in data['messages']], ['Message 3', 'Message 4'])
+
+        self.assertEqual(self.client.get(self.url('chat_history'), {'before': 'x'}).status_code, 400)
+        for cursor in ('99999999999999999999.1', '-99999999999999999999.1', '0.99999999999999999999'):
+            response = self.client.get(self.url('chat_history'), {'before': cursor})
+            self.assertEqual(response.status_code, 400)
+
+    def test_history_is_restricted_to_participants(self):
+        outsider = get_user_model().objects.create_user(
+            email='autre@example.com', password='x', name='Autre', first_name='A', account_type='client'
+        )
+        self.client.force_login(outsider)
+        self.assertEqual(self.client.get(self.url('chat_history')).status_code, 403)
+        self.assertEqual(self.client.post(self.url('chat_mark_read')).status_code, 403)
+
+    def test_mark_read_is_one_update(self):
+        with CaptureQueriesContext(connection) as queries:
+            updated = history.mark_read(self.request, self.client_user)
+        self.assertEqual(updated, 7)
+        message_updates = [
+            query['sql'] for query in queries.captured_queries
+            if query['sql'].startswith('UPDATE') and 'custom_requests_message' in query['sql']
+        ]
+        self.assertEqual(len(message_updates), 1)
+        self.assertFalse(Message.objects.filter(is_read=False).exists())
+        self.assertEqual(Conversation.objects.get(owner=self.client_user).unread_count, 0)
+
+        response = self.client.post(self.url('chat_mark_read'))
+        self.assertEqual(response.json(), {'success': True, 'updated': 0})
+
+    def test_chat_page_renders_latest_page_only(self):
+        with mock.patch.object(history, 'DEFAULT_PAGE_SIZE', 5), \
+                mock.patch('messaging.views.render', return_value=HttpResponse()) as render:
+            self.client.get(self.url('chat'))
+        context = render.call_args.args[2]
+        self.assertEqual(
+            [message.content for message in context['chat_messages']],
+            [f'Message {index}' for index in range(2, 7)],
+        )
+        self.assertTrue(context['has_more_history'])
+        self.assertEqual(context['history_cursor'], history.encode_cursor(Message.objects.get(pk=self.messages[2].pk)))
+        self.assertFalse(Message.objects.filter(is_read=False).exists())
@@ -5,4 +5,7 @@ app_name = 'messaging'
 
 urlpatterns = [
     path('chat/<int:request_id>/', views.chat_view, name='chat'),
+    path('chat/<int:request_id>/messages/', views.chat_history, name='chat_history'),
+    path('chat/<int:request_id>/read/', views.chat_mark_read, name='chat_mark_read'),
+    path('notifications/poll/', views.notifications_poll, name='notifications_poll'),
 ] 
\ No newline at end of file
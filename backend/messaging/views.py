@@ -1,7 +1,17 @@
+import asyncio
+
+from asgiref.sync import sync_to_async
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.http import HttpResponseNotModified, JsonResponse
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
+from django.views.decorators.http import require_GET, require_POST
 from custom_requests.models import ServiceRequest, Message
+from . import history, notifications
+
+DEFAULT_LONG_POLL_SECONDS = 25
 
 # Create your views here.
 
@@ -45,20 +55,17 @@ def chat_view(request, request_id):
         messages.error(request, "Vous n'avez pas les autorisations nécessaires pour accéder à cette page.")
         return redirect('home')
     
-    # Récupérer les messages de cette conversation
-    chat_messages = Message.objects.filter(
-        service_request=service_request
-    ).order_by('sent_at')
+    # Récupérer la dernière page de la conversation (les plus anciennes au défilement)
+    chat_messages, has_more_history = history.history_page(service_request)
     
-    # Marquer les messages non lus comme lus
-    unread_messages = chat_messages.filter(recipient=request.user, is_read=False)
-    for msg in unread_messages:
-        msg.is_read = True
-        msg.save()
+    # Marquer les messages non lus comme lus (une seule requête UPDATE)
+    history.mark_read(service_request, request.user)
     
     context = {
         'service_request': service_request,
         'chat_messages': chat_messages,
+        'has_more_history': has_more_history,
+        'history_cursor': history.encode_cursor(chat_messages[0]) if chat_messages else '',
         'user_type': request.user.account_type.lower(),
         'request_id': request_id
     }
@@ -69,3 +76,102 @@ def chat_view(request, request_id):
         return render(request, 'messaging/expert_chat.html', context)
     else:  # admin
         return render(request, 'messaging/admin_chat.html', context)
+
+
+@login_required
+@require_GET
+def chat_history(request, request_id):
+    """Page d'historique d'une conversation (JSON), paginée par curseur
+
+    ``?before=<curseur>`` : messages plus anciens (défilement vers le haut) ;
+    ``?after=<curseur>`` : messages plus récents (rattrapage après reconnexion).
+    """
+    service_request = get_object_or_404(ServiceRequest, id=request_id)
+    if not history.can_access(request.user, service_request):
+        return JsonResponse({'success': False, 'error': 'Accès refusé'}, status=403)
+
+    try:
+        chat_messages, has_more = history.history_page(
+            service_request,
+            before=request.GET.get('before') or None,
+            after=request.GET.get('after') or None,
+            limit=request.GET.get('limit'),
+        )
+    except ValueError:
+        return JsonResponse({'success': False, 'error': 'Curseur invalide'}, status=400)
+
+    return JsonResponse({
+        'success': True,
+        'messages': [history.serialize(message, request.user) for message in chat_messages],
+        'has_more': has_more,
+    })
+
+
+@login_required
+@require_POST
+def chat_mark_read(request, request_id):
+    """Marquer lus tous les messages reçus dans une conversation"""
+    service_request = get_object_or_404(ServiceRequest, id=request_id)
+    if not history.can_access(request.user, service_request):
+        return JsonResponse({'success': False, 'error': 'Accès refusé'}, status=403)
+
+    updated = history.mark_read(service_request, request.user)
+    return JsonResponse({'success': True, 'updated': updated})
+
+
+def get_authenticated_user_id(request):
+    return request.user.id if request.user.is_authenticated else None
+
+
+async def notifications_poll(request):
+    """Long-polling des notifications, repli du canal WebSocket ws/notifications/
+
+    Le client renvoie le dernier curseur reçu (``?cursor=`` ou
+    ``If-None-Match``). S'il est à jour, la requête attend un événement
+    jusqu'à NOTIFICATIONS_LONG_POLL_SECONDS puis répond 304. Sans
+    NOTIFICATIONS_PUSH (déploiement WSGI), la réponse est immédiate : une
+    attente bloquerait un worker synchrone.
+    """
+    user_id = await sync_to_async(get_authenticated_user_id)(request)
+    if user_id is None:
+        return JsonResponse({'success': False, 'error': 'Authentication required'}, status=401)
+
+    max_wait = getattr(settings, 'NOTIFICATIONS_LONG_POLL_SECONDS', DEFAULT_LONG_POLL_SECONDS)
+    if not getattr(settings, 'NOTIFICATIONS_PUSH', False):
+        max_wait = 0
+    try:
+        wait = min(max(float(request.GET.get('timeout', max_wait)), 0), max_wait)
+    except ValueError:
+        wait = max_wait
+    cursor = request.GET.get('cursor') or request.headers.get('If-None-Match', '').strip('W/"')
+
+    channel_layer = get_channel_layer()
+    group = notifications.user_group(user_id)
+    channel = None
+    events = []
+    try:
+        # S'abonner avant de lire l'état : aucun événement ne peut être manqué
+        if channel_layer is not None and wait:
+            channel = await channel_layer.new_channel()
+            await channel_layer.group_add(group, channel)
+
+        state = await sync_to_async(notifications.get_state)(user_id)
+        if channel is not None and state['cursor'] == cursor:
+            try:
+                message = await asyncio.wait_for(channel_layer.receive(channel), timeout=wait)
+                events.append(message['event'])
+            except asyncio.TimeoutError:
+                pass
+            if events:
+                state = await sync_to_async(notifications.get_state)(user_id)
+    finally:
+        if channel is not None:
+            await channel_layer.group_discard(group, channel)
+
+    if state['cursor'] == cursor and not events:
+        response = HttpResponseNotModified()
+    else:
+        response = JsonResponse({'success': True, 'events': events, **state})
+    response['ETag'] = f'"{state["cursor"]}"'
+    response['Cache-Control'] = 'private, no-cache'
+    return response
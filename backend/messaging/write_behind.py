@@ -0,0 +1,233 @@
+"""
+Enregistrement différé (write-behind) des messages de discussion.
+
+Avec ``CHAT_WRITE_BEHIND = True``, ChatConsumer diffuse chaque message dès sa
+réception puis le confie à la file du processus, vidée par ``bulk_create``
+toutes les ``CHAT_WRITE_BEHIND_FLUSH_MS`` millisecondes ou dès
+``CHAT_WRITE_BEHIND_BATCH_SIZE`` messages en attente. La latence de la base
+sort ainsi du chemin critique des salons très actifs.
+
+Garanties :
+
+- ordre : les messages sont insérés dans leur ordre d'arrivée dans le processus,
+  avec le ``sent_at`` fixé à la mise en file (l'heure diffusée aux clients),
+  même si le lot est écrit ou réessayé plus tard ;
+- au moins une fois : un lot en échec (base indisponible) reste en file et
+  sera réessayé ; la file est vidée à la déconnexion des sockets et à l'arrêt
+  du processus ;
+- pas de doublons : chaque message porte un ``client_message_id``, unique par
+  expéditeur. Avant chaque écriture, les messages déjà enregistrés (lot
+  réécrit après une écriture incertaine, client qui renvoie un message) sont
+  écartés ; seuls les messages réellement insérés mettent à jour les
+  conversations et sont notifiés ;
+- un message refusé par la base (contrainte d'intégrité) est écarté et
+  journalisé, sans bloquer le reste de la file.
+"""
+
+import asyncio
+import atexit
+import threading
+import uuid
+from collections import deque
+
+from channels.db import database_sync_to_async
+from django.conf import settings
+from django.db import IntegrityError, transaction
+
+from custom_requests.models import Message
+
+from . import conversations, notifications
+
+DEFAULT_FLUSH_MS = 200
+DEFAULT_BATCH_SIZE = 100
+DRAIN_TIMEOUT = 5
+
+# Compteurs du processus courant
+stats = {
+    'queued': 0,
+    'written': 0,
+    'flushes': 0,
+    'failures': 0,
+    # Déjà enregistrés (lot rejoué, renvoi du client) ou refusés par la base
+    'duplicates': 0,
+    'rejected': 0,
+}
+
+
+def new_message_id(value=None):
+    """UUID fourni par le client s'il est valide, sinon un nouvel identifiant"""
+    try:
+        return uuid.UUID(str(value)) if value else uuid.uuid4()
+    except ValueError:
+        return uuid.uuid4()
+
+
+class MessageWriteBehind:
+    """File d'écriture différée des messages d'un processus"""
+
+    def __init__(self, flush_ms=None, batch_size=None):
+        self.flush_ms = flush_ms or getattr(settings, 'CHAT_WRITE_BEHIND_FLUSH_MS', DEFAULT_FLUSH_MS)
+        self.batch_size = batch_size or getattr(
+            settings, 'CHAT_WRITE_BEHIND_BATCH_SIZE', DEFAULT_BATCH_SIZE
+        )
+        self.pending = deque()
+        # Lot en cours d'écriture, réécrit à l'arrêt si l'écriture n'a pas abouti
+        self.in_flight = []
+        self._lock = threading.Lock()
+        self._timer = None
+        self._timer_loop = None
+        self._tasks = set()
+
+    async def enqueue(self, message):
+        """Ajouter un message (non enregistré) à la file"""
+        if message.client_message_id is None:
+            message.client_message_id = uuid.uuid4()
+        self.pending.append(message)
+        stats['queued'] += 1
+        if len(self.pending) >= self.batch_size:
+            self.start_flush()
+        else:
+            self.schedule_flush()
+
+    def schedule_flush(self):
+        """Programmer une écriture dans FLUSH_MS (une seule à la fois par boucle)"""
+        loop = asyncio.get_running_loop()
+        if self._timer is not None and self._timer_loop is loop:
+            return
+        self._timer_loop = loop
+        self._timer = loop.call_later(self.flush_ms / 1000, self.start_flush)
+
+    def start_flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        task = asyncio.ensure_future(self.flush())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def flush(self):
+        """Écrire les messages en attente ; reprogrammée en cas d'échec"""
+        if not self.pending:
+            return True
+        written = await database_sync_to_async(self.write_pending)()
+        if not written:
+            self.schedule_flush()
+        return written
+
+    def write_pending(self):
+        """Écrire la file lot par lot (synchrone) ; False si un lot a échoué"""
+        with self._lock:
+            return self._write_pending()
+
+    def _write_pending(self):
+        while self.pending:
+            batch = []
+            while self.pending and len(batch) < self.batch_size:
+                batch.append(self.pending.popleft())
+            self.in_flight = batch
+            try:
+                inserted = self.insert(batch)
+            except Exception as e:
+                stats['failures'] += 1
+                print(f"Erreur lors de l'enregistrement différé de {len(batch)} message(s): {e}")
+                # Remettre le lot en tête de file, dans l'ordre
+                self.pending.extendleft(reversed(batch))
+                self.in_flight = []
+                return False
+            self.in_flight = []
+            stats['written'] += len(inserted)
+            stats['flushes'] += 1
+            # bulk_create n'envoie pas post_save : résumés et destinataires mis à jour ici
+            try:
+                conversations.record_messages(inserted)
+            except Exception as e:
+                print(f"Erreur lors de la mise à jour des conversations: {e}")
+            for message in inserted:
+                notifications.publish(message.recipient_id, notifications.message_event(message))
+        return True
+
+    def insert(self, batch):
+        """Insérer les messages pas encore enregistrés ; retourne ceux insérés"""
+        fresh = self.without_duplicates(batch)
+        if not fresh:
+            return []
+        try:
+            with transaction.atomic():
+                Message.objects.bulk_create(fresh)
+            return fresh
+        except IntegrityError:
+            # Un message refusé ne doit pas bloquer le lot : un par un
+            pass
+        inserted = []
+        for message in fresh:
+            try:
+                # bulk_create plutôt que save() : pas de signaux, traités avec le lot
+                with transaction.atomic():
+                    Message.objects.bulk_create([message])
+            except IntegrityError as e:
+                stats['rejected'] += 1
+                print(f"Message {message.client_message_id} de {message.sender_id} refusé par la base: {e}")
+                continue
+            inserted.append(message)
+        return inserted
+
+    def without_duplicates(self, batch):
+        """Messages du lot absents de la base (et non répétés dans le lot)"""
+        client_ids = {message.client_message_id for message in batch} - {None}
+        stored = set(
+            Message.objects.filter(client_message_id__in=client_ids)
+            .values_list('sender_id', 'client_message_id')
+        ) if client_ids else set()
+        fresh = []
+        for message in batch:
+            key = (message.sender_id, message.client_message_id)
+            if message.client_message_id is None:
+                # Sans identifiant (hors de enqueue) : impossible à reconnaître
+                fresh.append(message)
+                continue
+            if key in stored:
+                stats['duplicates'] += 1
+                continue
+            stored.add(key)
+            fresh.append(message)
+        return fresh
+
+    def drain(self):
+        """Vider la file de façon synchrone (arrêt du processus)"""
+        # Une écriture bloquée ne doit pas empêcher le processus de s'arrêter
+        acquired = self._lock.acquire(timeout=DRAIN_TIMEOUT)
+        try:
+            if self.in_flight:
+                # Écriture interrompue : la rejouer (les messages déjà enregistrés sont écartés)
+                self.pending.extendleft(reversed(self.in_flight))
+                self.in_flight = []
+            if self.pending and not self._write_pending():
+                print(f"Erreur: {len(self.pending)} message(s) non enregistré(s) à l'arrêt")
+        finally:
+            if acquired:
+                self._lock.release()
+
+
+_writer = None
+
+
+def get_write_behind():
+    """File d'écriture différée du processus (vidée à l'arrêt)"""
+    global _writer
+    if _writer is None:
+        _writer = MessageWriteBehind()
+        atexit.register(_writer.drain)
+    return _writer
+
+
+def reset():
+    """Oublier la file du processus (changement de configuration, tests)"""
+    global _writer
+    if _writer is not None:
+        atexit.unregister(_writer.drain)
+    _writer = None
+
+
+def reset_stats():
+    for key in stats:
+        stats[key] = 0
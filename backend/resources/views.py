@@ -6,9 +6,21 @@ from django.views.decorators.csrf import csrf_exempt
 from django.utils import translation
 from django.db.models import Q, F
 
+from servicesbladi.http_cache import NO_STORE, PUBLIC, cache_policy, model_state
+
 from .models import Resource, ResourceFile, ResourceLink, ConsulateEmbassy, FAQ
 
+
+def resources_state(request, *args, **kwargs):
+    return model_state(Resource.objects.all())
+
+
+def faq_state(request, *args, **kwargs):
+    return model_state(FAQ.objects.all())
+
+
 # Resource views
+@cache_policy(PUBLIC, state=resources_state)
 def resource_list_view(request):
     """Display list of available resources"""
     # Get current language
@@ -59,6 +71,7 @@ def resource_detail_view(request, resource_id):
     
     return render(request, 'resources/resource_detail.html', context)
 
+@cache_policy(PUBLIC, state=resources_state)
 def resource_category_view(request, category):
     """Display resources filtered by category"""
     # Get current language
@@ -256,6 +269,7 @@ def delete_resource(request, resource_id):
     return render(request, 'resources/delete_resource.html', {'resource': resource})
 
 # Embassy and consulate views
+@cache_policy(PUBLIC)
 def embassy_list_view(request):
     """Display list of embassies and consulates"""
     # Filter by entity type if specified
@@ -285,6 +299,7 @@ def embassy_list_view(request):
     
     return render(request, 'resources/embassy_list.html', context)
 
+@cache_policy(PUBLIC)
 def embassy_country_view(request, country):
     """Display embassies and consulates for a specific country"""
     embassies = ConsulateEmbassy.objects.filter(country=country).order_by('entity_type', 'city')
@@ -296,6 +311,7 @@ def embassy_country_view(request, country):
     
     return render(request, 'resources/embassy_country.html', context)
 
+@cache_policy(PUBLIC)
 def embassy_detail_view(request, country, city):
     """Display details of a specific embassy or consulate"""
     # Use the first match if there are multiple entity types in the same location
@@ -312,6 +328,7 @@ def embassy_detail_view(request, country, city):
     return render(request, 'resources/embassy_detail.html', context)
 
 # FAQ views
+@cache_policy(PUBLIC, state=faq_state)
 def faq_view(request):
     """Display frequently asked questions"""
     # Get current language
@@ -333,6 +350,7 @@ def faq_view(request):
     
     return render(request, 'resources/faq.html', context)
 
+@cache_policy(PUBLIC, state=faq_state)
 def faq_category_view(request, category):
     """Display FAQs for a specific category"""
     # Get current language
@@ -350,6 +368,7 @@ def faq_category_view(request, category):
 
 # API endpoints
 @csrf_exempt
+@cache_policy(PUBLIC)
 def api_resource_list(request):
     """API endpoint to list resources"""
     # Get current language
@@ -391,6 +410,7 @@ def api_resource_list(request):
     })
 
 @csrf_exempt
+@cache_policy(NO_STORE)  # Incrémente le compteur de vues
 def api_resource_detail(request, resource_id):
     """API endpoint to get resource details"""
     try:
@@ -448,6 +468,7 @@ def api_resource_detail(request, resource_id):
         }, status=404)
 
 @csrf_exempt
+@cache_policy(PUBLIC)
 def api_embassy_list(request):
     """API endpoint to list embassies and consulates"""
     # Filter by entity type if specified
@@ -491,6 +512,7 @@ def api_embassy_list(request):
     })
 
 @csrf_exempt
+@cache_policy(PUBLIC)
 def api_embassy_country(request, country):
     """API endpoint to get embassies and consulates for a specific country"""
     embassies = ConsulateEmbassy.objects.filter(country=country).order_by('entity_type', 'city')
@@ -521,6 +543,7 @@ def api_embassy_country(request, country):
     })
 
 @csrf_exempt
+@cache_policy(PUBLIC)
 def api_faq_list(request):
     """API endpoint to list FAQs"""
     # Get current language
@@ -12,7 +12,42 @@ from django.conf import settings
 from .models import ServiceCategory, ServiceType, Service, TourismService, AdministrativeService
 from .models import InvestmentService, RealEstateService, FiscalService
 from accounts.models import Expert, Utilisateur
+from servicesbladi.http_cache import NO_STORE, PRIVATE, PUBLIC, cache_policy, model_state, rows_state
 
+
+# Colonnes des experts, comptes et types affichés avec les services mis en avant
+FEATURED_FIELDS = (
+    'pk', 'expert__specialty', 'expert__user__name', 'expert__user__first_name',
+    'expert__user__profile_picture', 'expert__user__is_active',
+    'service_type__name', 'service_type__name_fr', 'service_type__name_ar', 'service_type__price',
+)
+
+
+def services_state(request, *args, **kwargs):
+    return model_state(Service.objects.all(), ServiceCategory.objects.all())
+
+
+def get_featured_services():
+    return Service.objects.filter(
+        is_active=True
+    ).select_related('expert', 'expert__user', 'service_type')[:6]
+
+
+def all_services_state(request, *args, **kwargs):
+    """Catalogue et services mis en avant, avec leurs experts et types
+
+    Expert, Utilisateur et ServiceType n'ont pas de date de modification : les
+    valeurs affichées des six services mis en avant entrent dans le jeton.
+    """
+    last_modified, token = model_state(
+        Service.objects.all(), ServiceCategory.objects.all(), ServiceType.objects.all(),
+        Expert.objects.all(), Utilisateur.objects.filter(account_type='expert'),
+    )
+    return last_modified, f'{token}|{rows_state(get_featured_services(), *FEATURED_FIELDS)}'
+
+
+# Page avec formulaire ({% csrf_token %}) : jamais public
+@cache_policy(PRIVATE, state=all_services_state)
 def all_services_view(request):
     """View for the main services page showing all categories"""
     categories = ServiceCategory.objects.all()
@@ -21,9 +56,7 @@ def all_services_view(request):
     if not categories.exists():
         categories = create_default_categories()
     
-    featured_services = Service.objects.filter(
-        is_active=True
-    ).select_related('expert', 'expert__user', 'service_type')[:6]
+    featured_services = get_featured_services()
     
     context = {
         'categories': categories,
@@ -95,6 +128,7 @@ def create_default_categories():
     
     return created_categories
 
+@cache_policy(PUBLIC, state=services_state)
 def tourism_services_view(request):
     """View for tourism services"""
     tourism_services = TourismService.objects.filter(is_active=True)
@@ -107,6 +141,7 @@ def tourism_services_view(request):
     
     return render(request, 'general/Tourisme.html', context)
 
+@cache_policy(PUBLIC, state=services_state)
 def administrative_services_view(request):
     """View for administrative services"""
     admin_services = AdministrativeService.objects.filter(is_active=True)
@@ -119,6 +154,7 @@ def administrative_services_view(request):
     
     return render(request, 'general/Administrative.html', context)
 
+@cache_policy(PUBLIC, state=services_state)
 def fiscal_services_view(request):
     """View for fiscal services"""
     fiscal_services = FiscalService.objects.filter(is_active=True)
@@ -131,6 +167,7 @@ def fiscal_services_view(request):
     
     return render(request, 'general/Fiscale.html', context)
 
+@cache_policy(PUBLIC, state=services_state)
 def real_estate_services_view(request):
     """View for real estate services"""
     real_estate_services = RealEstateService.objects.filter(is_active=True)
@@ -143,6 +180,7 @@ def real_estate_services_view(request):
     
     return render(request, 'general/Immobilier.html', context)
 
+@cache_policy(PUBLIC, state=services_state)
 def investment_services_view(request):
     """View for investment services"""
     investment_services = InvestmentService.objects.filter(is_active=True)
@@ -155,6 +193,7 @@ def investment_services_view(request):
     
     return render(request, 'general/Investisment.html', context)
 
+@cache_policy(NO_STORE)
 def contact_view(request):
     """View for contact page and form handling"""
     if request.method == 'POST':
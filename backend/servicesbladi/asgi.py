@@ -9,14 +9,26 @@ https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 
 import os
 from django.core.asgi import get_asgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'servicesbladi.settings')
+
+# Initialiser Django avant d'importer les consumers (qui importent les modèles)
+django_asgi_app = get_asgi_application()
+
+from django.urls import re_path
 from channels.routing import ProtocolTypeRouter, URLRouter
 from channels.auth import AuthMiddlewareStack
+import chatbot.routing
 import messaging.routing
 
-os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'servicesbladi.settings')
-
 application = ProtocolTypeRouter({
-    "http": get_asgi_application(),
+    # Endpoints HTTP asynchrones (chatbot), le reste est servi par Django
+    "http": URLRouter([
+        re_path(r'^chatbot/api/async/', AuthMiddlewareStack(
+            URLRouter(chatbot.routing.http_urlpatterns)
+        )),
+        re_path(r'', django_asgi_app),
+    ]),
     "websocket": AuthMiddlewareStack(
         URLRouter(
             messaging.routing.websocket_urlpatterns
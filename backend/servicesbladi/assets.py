@@ -0,0 +1,69 @@
+"""
+Version des ressources statiques, calculée une fois par processus.
+
+Elle sert de paramètre ``?v=`` aux feuilles de style et scripts
+(``cache_version_context``) : elle ne change qu'à un nouveau déploiement, si
+bien que les navigateurs gardent les fichiers en cache entre deux versions.
+
+Ordre de résolution :
+
+1. ``ASSET_VERSION`` (variable d'environnement posée par le déploiement) ;
+2. empreinte des fichiers de ``STATIC_ROOT`` (chemin, taille, date), donc du
+   résultat de ``collectstatic`` ;
+3. à défaut, l'heure de démarrage du processus.
+"""
+
+import hashlib
+import os
+import threading
+import time
+
+from django.conf import settings
+
+_lock = threading.Lock()
+_version = None
+
+
+def compute_static_fingerprint(root):
+    """Empreinte courte des fichiers collectés, ou None si le dossier est vide"""
+    digest = hashlib.sha1()
+    found = False
+    for directory, subdirectories, files in os.walk(root):
+        subdirectories.sort()
+        for name in sorted(files):
+            path = os.path.join(directory, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            found = True
+            digest.update(f'{os.path.relpath(path, root)}:{stat.st_size}:{int(stat.st_mtime)}\n'.encode())
+    return digest.hexdigest()[:12] if found else None
+
+
+def compute_version():
+    version = getattr(settings, 'ASSET_VERSION', '')
+    if version:
+        return str(version)
+    static_root = getattr(settings, 'STATIC_ROOT', None)
+    if static_root and os.path.isdir(static_root):
+        fingerprint = compute_static_fingerprint(static_root)
+        if fingerprint:
+            return fingerprint
+    return str(int(time.time()))
+
+
+def get_asset_version():
+    """Version des ressources du déploiement courant"""
+    global _version
+    if _version is None:
+        with _lock:
+            if _version is None:
+                _version = compute_version()
+    return _version
+
+
+def reset():
+    """Oublier la version calculée (changement de configuration, tests)"""
+    global _version
+    _version = None
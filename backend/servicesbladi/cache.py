@@ -0,0 +1,278 @@
+"""
+Cache à deux niveaux : mémoire du processus (L1) devant un cache partagé (L2).
+
+Chaque lecture du ``DatabaseCache`` était un aller-retour vers le serveur
+MySQL distant, souvent plus coûteux que la requête qu'il évitait. Ici :
+
+- L1 : LRU en mémoire, partagé par les threads du processus, avec une durée
+  de vie courte (``L1_TIMEOUT``, quelques secondes) : une valeur modifiée par
+  un autre processus est vue au plus tard après ce délai ;
+- L2 : n'importe quel backend Django (Redis en production, fichiers en local),
+  décrit par ``OPTIONS['L2']`` comme une entrée de ``CACHES``.
+
+Les écritures et suppressions passent par les deux niveaux. Les clés de L1
+sont les clés complètes de L2 (préfixe et version compris) : l'invalidation
+passe par les versions de clés de Django (``incr_version``, ``VERSION``) et
+vaut pour les deux niveaux.
+
+Les clés commençant par l'un des ``L1_EXCLUDE_PREFIXES`` ne passent jamais par
+L1 : état partagé qui doit être lu à jour (disjoncteur, compteurs d'appels).
+
+Exemple ::
+
+    CACHES = {
+        'default': {
+            'BACKEND': 'servicesbladi.cache.TieredCache',
+            'TIMEOUT': 300,
+            'OPTIONS': {
+                'L1_TIMEOUT': 5,
+                'L1_MAX_ENTRIES': 1000,
+                'L1_EXCLUDE_PREFIXES': ('circuit:',),
+                'L2': {
+                    'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+                    'LOCATION': 'redis://localhost:6379/1',
+                },
+            },
+        }
+    }
+
+Une panne de L2 est traitée comme un défaut de cache (la vue recalcule).
+"""
+
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.utils.module_loading import import_string
+
+DEFAULT_L1_TIMEOUT = 5
+DEFAULT_L1_MAX_ENTRIES = 1000
+
+# Paramètres communs recopiés vers L2 pour que les clés soient identiques
+SHARED_PARAMS = ('TIMEOUT', 'KEY_PREFIX', 'VERSION', 'KEY_FUNCTION')
+
+# Compteurs par niveau (tous les caches à deux niveaux du processus)
+stats = {
+    'l1_hits': 0,
+    'l1_misses': 0,
+    'l2_hits': 0,
+    'l2_misses': 0,
+    'l2_errors': 0,
+}
+
+# Stockages L1 par LOCATION : Django crée une instance de cache par thread
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+class LocalStore:
+    """LRU en mémoire avec échéances, protégé par un verrou"""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            expires_at, data = entry
+            if expires_at <= time.monotonic():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return data
+
+    def set(self, key, data, ttl):
+        with self.lock:
+            self.entries[key] = (time.monotonic() + ttl, data)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def delete(self, key):
+        with self.lock:
+            return self.entries.pop(key, None) is not None
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+def get_store(name, max_entries):
+    with _stores_lock:
+        store = _stores.get(name)
+        if store is None:
+            store = _stores[name] = LocalStore(max_entries)
+        return store
+
+
+class TieredCache(BaseCache):
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self.l1_timeout = options.get('L1_TIMEOUT', DEFAULT_L1_TIMEOUT)
+        self.l1 = get_store(location, options.get('L1_MAX_ENTRIES', DEFAULT_L1_MAX_ENTRIES))
+        self.l1_exclude = tuple(options.get('L1_EXCLUDE_PREFIXES', ()))
+
+        l2_params = dict(options['L2'])
+        l2_backend = import_string(l2_params.pop('BACKEND'))
+        for name in SHARED_PARAMS:
+            if name in params:
+                l2_params.setdefault(name, params[name])
+        self.l2 = l2_backend(l2_params.pop('LOCATION', ''), l2_params)
+
+    # --- L1 ---------------------------------------------------------------
+
+    def _uses_l1(self, key):
+        return not (self.l1_exclude and key.startswith(self.l1_exclude))
+
+    def _l1_ttl(self, timeout):
+        timeout = self.get_backend_timeout(timeout)
+        if timeout is None:
+            return self.l1_timeout
+        return min(self.l1_timeout, max(timeout - time.time(), 0))
+
+    def _l1_get(self, key):
+        data = self.l1.get(key)
+        if data is None:
+            stats['l1_misses'] += 1
+            return None
+        stats['l1_hits'] += 1
+        # Copie à chaque lecture, comme LocMemCache
+        return (pickle.loads(data),)
+
+    def _l1_set(self, key, value, timeout=DEFAULT_TIMEOUT):
+        ttl = self._l1_ttl(timeout)
+        if ttl > 0:
+            self.l1.set(key, pickle.dumps(value, pickle.HIGHEST_PROTOCOL), ttl)
+        else:
+            self.l1.delete(key)
+
+    # --- L2 ---------------------------------------------------------------
+
+    def _l2(self, method, *args, default=None, **kwargs):
+        try:
+            return getattr(self.l2, method)(*args, **kwargs)
+        except Exception as e:
+            stats['l2_errors'] += 1
+            print(f"Erreur du cache partagé ({method}): {e}")
+            return default
+
+    # --- API Django -------------------------------------------------------
+
+    def get(self, key, default=None, version=None):
+        full_key = self.make_and_validate_key(key, version=version)
+        uses_l1 = self._uses_l1(key)
+        found = self._l1_get(full_key) if uses_l1 else None
+        if found is not None:
+            return found[0]
+        missing = object()
+        value = self._l2('get', key, missing, version=version, default=missing)
+        if value is missing:
+            stats['l2_misses'] += 1
+            return default
+        stats['l2_hits'] += 1
+        if uses_l1:
+            self._l1_set(full_key, value)
+        return value
+
+    def get_many(self, keys, version=None):
+        result = {}
+        pending = []
+        for key in keys:
+            if not self._uses_l1(key):
+                pending.append(key)
+                continue
+            found = self._l1_get(self.make_and_validate_key(key, version=version))
+            if found is not None:
+                result[key] = found[0]
+            else:
+                pending.append(key)
+        if pending:
+            fetched = self._l2('get_many', pending, version=version, default={})
+            stats['l2_hits'] += len(fetched)
+            stats['l2_misses'] += len(pending) - len(fetched)
+            for key, value in fetched.items():
+                if self._uses_l1(key):
+                    self._l1_set(self.make_and_validate_key(key, version=version), value)
+            result.update(fetched)
+        return result
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        full_key = self.make_and_validate_key(key, version=version)
+        self._l2('set', key, value, timeout=timeout, version=version)
+        if self._uses_l1(key):
+            self._l1_set(full_key, value, timeout)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        failed = self._l2('set_many', data, timeout=timeout, version=version, default=list(data))
+        for key, value in data.items():
+            full_key = self.make_and_validate_key(key, version=version)
+            if key in failed or not self._uses_l1(key):
+                self.l1.delete(full_key)
+            else:
+                self._l1_set(full_key, value, timeout)
+        return failed
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        full_key = self.make_and_validate_key(key, version=version)
+        added = self._l2('add', key, value, timeout=timeout, version=version, default=False)
+        if added and self._uses_l1(key):
+            self._l1_set(full_key, value, timeout)
+        else:
+            # La valeur de L2 fait foi
+            self.l1.delete(full_key)
+        return added
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        return self._l2('touch', key, timeout=timeout, version=version, default=False)
+
+    def delete(self, key, version=None):
+        self.l1.delete(self.make_and_validate_key(key, version=version))
+        return self._l2('delete', key, version=version, default=False)
+
+    def delete_many(self, keys, version=None):
+        keys = list(keys)
+        for key in keys:
+            self.l1.delete(self.make_and_validate_key(key, version=version))
+        self._l2('delete_many', keys, version=version)
+
+    def has_key(self, key, version=None):
+        if self._uses_l1(key) and self.l1.get(self.make_and_validate_key(key, version=version)) is not None:
+            return True
+        return self._l2('has_key', key, version=version, default=False)
+
+    def incr(self, key, delta=1, version=None):
+        full_key = self.make_and_validate_key(key, version=version)
+        try:
+            value = self.l2.incr(key, delta, version=version)
+        except ValueError:
+            # Clé absente : remonte à l'appelant, comme pour les autres backends
+            self.l1.delete(full_key)
+            raise
+        except Exception as e:
+            stats['l2_errors'] += 1
+            print(f"Erreur du cache partagé (incr): {e}")
+            self.l1.delete(full_key)
+            raise ValueError(f"Key '{key}' not found")
+        # Échéance de L2 inconnue : L1 garde la valeur au plus L1_TIMEOUT
+        if self._uses_l1(key):
+            self._l1_set(full_key, value, None)
+        return value
+
+    def clear(self):
+        self.l1.clear()
+        self._l2('clear')
+
+    def close(self, **kwargs):
+        self.l2.close(**kwargs)
+
+
+def reset_stats():
+    for key in stats:
+        stats[key] = 0
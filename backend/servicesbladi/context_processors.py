@@ -1,5 +1,9 @@
+import functools
 import time
-import random
+
+from django.conf import settings
+
+from servicesbladi.assets import get_asset_version
 
 def language_context(request):
     """
@@ -14,49 +18,46 @@ def notifications_context(request):
     """
     Context processor that adds unread notifications count and recent notifications
     to the template context for authenticated users.
-    """
-    if not request.user.is_authenticated:
-        return {
-            'unread_notifications_count': 0,
-            'notifications': []
-        }
     
+    Les valeurs viennent du cache (custom_requests.notification_cache) et ne
+    sont lues que si le template les utilise : les variables sont des
+    fonctions, appelées par le moteur de templates au premier usage.
+    """
     # Import here to avoid circular imports
-    from custom_requests.models import Notification
+    from custom_requests import notification_cache
     
-    # Get unread notifications count
-    unread_count = Notification.objects.filter(
-        user=request.user,
-        is_read=False
-    ).count()
+    @functools.lru_cache(maxsize=None)
+    def unread_notifications_count():
+        if not request.user.is_authenticated:
+            return 0
+        return notification_cache.get_unread_count(request.user.id)
     
-    # Get recent notifications (limit to 5)
-    notifications = Notification.objects.filter(
-        user=request.user
-    ).order_by('-created_at')[:5]
+    @functools.lru_cache(maxsize=None)
+    def notifications():
+        if not request.user.is_authenticated:
+            return []
+        return notification_cache.get_recent(request.user.id)
     
     return {
-        'unread_notifications_count': unread_count,
-        'notifications': notifications
+        'unread_notifications_count': unread_notifications_count,
+        'notifications': notifications,
+        # Scripts temps réel chargés seulement si le push est déployé (ASGI + Redis)
+        'notifications_push': getattr(settings, 'NOTIFICATIONS_PUSH', False),
     }
 
 def cache_version_context(request):
     """
     Add cache version information to the template context
     to prevent cached pages from different versions.
+    
+    La version est celle du déploiement (servicesbladi.assets) : elle ne
+    touche pas à la session, qui n'est donc plus réécrite à chaque requête.
     """
-    # Timestamp actuel si pas encore défini
     if not hasattr(request, 'request_time'):
         request.request_time = int(time.time())
     
-    # Version de cache si pas dans la session
-    if 'cache_version' not in request.session:
-        cache_version = f"{request.request_time}.{random.randint(1000, 9999)}"
-        request.session['cache_version'] = cache_version
-        request.session.modified = True
-    
     return {
-        'cache_version': request.session.get('cache_version', ''),
+        'cache_version': get_asset_version(),
         'request_time': request.request_time,
         'timestamp': int(time.time()),
-    }
\ No newline at end of file
+    }
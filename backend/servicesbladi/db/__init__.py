@@ -0,0 +1,267 @@
+"""
+Connexions à la base : mesures et pool par processus.
+
+Les moteurs ``servicesbladi.db.mysql`` et ``servicesbladi.db.sqlite3``
+enveloppent ceux de Django :
+
+- chaque ouverture de connexion (poignée de main TCP, TLS, authentification)
+  est comptée et chronométrée dans ``stats`` ;
+- avec ``'POOL': {'SIZE': n}`` dans l'entrée de ``DATABASES``, les connexions
+  fermées par Django (fin de requête, ``database_sync_to_async``) retournent
+  dans un pool du processus au lieu d'être coupées. C'est le mode prévu pour
+  le serveur ASGI : chaque thread y a sa propre connexion Django, qu'une
+  connexion persistante (``CONN_MAX_AGE``) laisserait ouverte à la fin du
+  thread.
+
+Options de ``POOL`` :
+
+- ``SIZE`` : connexions au plus par processus (ouvertes ou libres) ;
+- ``TIMEOUT`` : attente maximale (secondes) d'une connexion libre, au-delà
+  ``OperationalError`` ;
+- ``MAX_LIFETIME`` : âge (secondes) au-delà duquel une connexion est fermée ;
+- ``CHECK_IDLE`` : une connexion restée libre plus longtemps est vérifiée
+  (``ping``) avant d'être rendue.
+
+Sans ``POOL``, les réglages de Django s'appliquent tels quels
+(``CONN_MAX_AGE``, ``CONN_HEALTH_CHECKS``).
+"""
+
+import os
+import threading
+import time
+from collections import deque
+
+DEFAULT_POOL_TIMEOUT = 10
+DEFAULT_MAX_LIFETIME = 300
+DEFAULT_CHECK_IDLE = 10
+
+stats = {
+    # Connexions réellement ouvertes et durée cumulée des ouvertures
+    'opened': 0,
+    'open_seconds': 0.0,
+    'closed': 0,
+    # Pool : connexions reprises, rendues, écartées (âge, vérification ratée)
+    'reused': 0,
+    'returned': 0,
+    'discarded': 0,
+    # Pool : attentes d'une connexion libre
+    'waits': 0,
+    'wait_seconds': 0.0,
+    'timeouts': 0,
+}
+
+_pools = {}
+_pools_lock = threading.Lock()
+_pid = os.getpid()
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+class PooledConnection:
+    """Connexion brute du pilote avec ses dates de création et de retour"""
+
+    def __init__(self, raw):
+        self.raw = raw
+        self.created_at = time.monotonic()
+        self.released_at = self.created_at
+
+
+class ConnectionPool:
+    def __init__(self, size, timeout=DEFAULT_POOL_TIMEOUT, max_lifetime=DEFAULT_MAX_LIFETIME,
+                 check_idle=DEFAULT_CHECK_IDLE):
+        self.size = size
+        self.timeout = timeout
+        self.max_lifetime = max_lifetime
+        self.check_idle = check_idle
+        self.idle = deque()
+        self.in_use = {}
+        self.condition = threading.Condition()
+
+    def acquire(self, connect, is_usable, close):
+        """Connexion brute libre, ou nouvelle si le pool n'est pas plein
+
+        Rend ``(connexion brute, reprise ?)``.
+        """
+        started = time.monotonic()
+        waited = False
+        placeholder = object()
+        with self.condition:
+            while True:
+                while self.idle:
+                    entry = self.idle.pop()
+                    now = time.monotonic()
+                    if now - entry.created_at >= self.max_lifetime or (
+                        now - entry.released_at >= self.check_idle and not is_usable(entry.raw)
+                    ):
+                        stats['discarded'] += 1
+                        self._close_quietly(close, entry.raw)
+                        continue
+                    self.in_use[id(entry.raw)] = entry
+                    stats['reused'] += 1
+                    self._record_wait(waited, started)
+                    return entry.raw, True
+                if len(self.in_use) < self.size:
+                    # Place réservée pendant l'ouverture, faite hors du verrou
+                    self.in_use[placeholder] = None
+                    break
+                remaining = self.timeout - (time.monotonic() - started)
+                if remaining <= 0:
+                    stats['timeouts'] += 1
+                    self._record_wait(waited, started)
+                    raise PoolTimeout(
+                        f'Aucune connexion libre après {self.timeout} s ({self.size} au plus)'
+                    )
+                waited = True
+                self.condition.wait(remaining)
+            self._record_wait(waited, started)
+        try:
+            raw = connect()
+        except Exception:
+            with self.condition:
+                del self.in_use[placeholder]
+                self.condition.notify()
+            raise
+        with self.condition:
+            del self.in_use[placeholder]
+            self.in_use[id(raw)] = PooledConnection(raw)
+        return raw, False
+
+    def release(self, raw, reusable, close):
+        with self.condition:
+            entry = self.in_use.pop(id(raw), None)
+            if entry is not None and reusable and time.monotonic() - entry.created_at < self.max_lifetime:
+                entry.released_at = time.monotonic()
+                self.idle.append(entry)
+                stats['returned'] += 1
+            else:
+                stats['discarded'] += 1
+                self._close_quietly(close, raw)
+            self.condition.notify()
+
+    def clear(self, close):
+        with self.condition:
+            while self.idle:
+                self._close_quietly(close, self.idle.pop().raw)
+
+    @staticmethod
+    def _close_quietly(close, raw):
+        try:
+            close(raw)
+        except Exception as e:
+            print(f"Erreur fermeture d'une connexion du pool: {e}")
+
+    @staticmethod
+    def _record_wait(waited, started):
+        if waited:
+            stats['waits'] += 1
+            stats['wait_seconds'] += time.monotonic() - started
+
+
+def close_raw(raw):
+    raw.close()
+    stats['closed'] += 1
+
+
+def get_pool(alias, settings_dict):
+    """Pool du processus pour cette base, ou None sans ``POOL['SIZE']``"""
+    global _pid
+    options = settings_dict.get('POOL') or {}
+    if not options.get('SIZE'):
+        return None
+    with _pools_lock:
+        if _pid != os.getpid():
+            # Processus fils (fork) : ne pas partager les sockets du parent
+            _pools.clear()
+            _pid = os.getpid()
+        pool = _pools.get(alias)
+        if pool is None:
+            pool = _pools[alias] = ConnectionPool(
+                options['SIZE'],
+                timeout=options.get('TIMEOUT', DEFAULT_POOL_TIMEOUT),
+                max_lifetime=options.get('MAX_LIFETIME', DEFAULT_MAX_LIFETIME),
+                check_idle=options.get('CHECK_IDLE', DEFAULT_CHECK_IDLE),
+            )
+        return pool
+
+
+class MeasuredPoolMixin:
+    """À placer devant le ``DatabaseWrapper`` d'un moteur Django"""
+
+    def raw_is_usable(self, raw):
+        raise NotImplementedError
+
+    def open_raw_connection(self, conn_params):
+        started = time.monotonic()
+        raw = super().get_new_connection(conn_params)
+        stats['opened'] += 1
+        stats['open_seconds'] += time.monotonic() - started
+        return raw
+
+    def close_raw_connection(self, raw):
+        close_raw(raw)
+
+    def get_new_connection(self, conn_params):
+        self.pool_reused = False
+        pool = get_pool(self.alias, self.settings_dict)
+        if pool is None:
+            return self.open_raw_connection(conn_params)
+        try:
+            raw, self.pool_reused = pool.acquire(
+                lambda: self.open_raw_connection(conn_params),
+                self.raw_is_usable,
+                self.close_raw_connection,
+            )
+        except PoolTimeout as e:
+            raise self.Database.OperationalError(str(e))
+        return raw
+
+    def init_connection_state(self):
+        # Connexion reprise du pool : déjà initialisée
+        if not getattr(self, 'pool_reused', False):
+            super().init_connection_state()
+
+    def _close(self):
+        if self.connection is None:
+            return
+        pool = get_pool(self.alias, self.settings_dict)
+        if pool is None:
+            with self.wrap_database_errors:
+                self.close_raw_connection(self.connection)
+            return
+        raw = self.connection
+        # Fermée au milieu d'un bloc atomic : Django garde la référence, ne pas la prêter
+        reusable = not self.in_atomic_block
+        if reusable and (not self.autocommit or self.errors_occurred):
+            try:
+                raw.rollback()
+                reusable = not self.errors_occurred or self.raw_is_usable(raw)
+            except Exception:
+                reusable = False
+        pool.release(raw, reusable, self.close_raw_connection)
+
+
+def snapshot():
+    """Compteurs et état des pools du processus"""
+    data = dict(stats)
+    with _pools_lock:
+        data['pools'] = {
+            alias: {'size': pool.size, 'idle': len(pool.idle), 'in_use': len(pool.in_use)}
+            for alias, pool in _pools.items()
+        }
+    return data
+
+
+def close_pools():
+    """Fermer les connexions libres de tous les pools (tests, arrêt)"""
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.clear(close_raw)
+
+
+def reset_stats():
+    for key in stats:
+        stats[key] = 0
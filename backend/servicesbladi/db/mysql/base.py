@@ -0,0 +1,16 @@
+"""
+Moteur MySQL de Django, avec mesures et pool optionnel (servicesbladi.db)
+"""
+
+from django.db.backends.mysql import base
+
+from servicesbladi.db import MeasuredPoolMixin
+
+
+class DatabaseWrapper(MeasuredPoolMixin, base.DatabaseWrapper):
+    def raw_is_usable(self, raw):
+        try:
+            raw.ping()
+        except self.Database.Error:
+            return False
+        return True
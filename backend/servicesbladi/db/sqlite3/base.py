@@ -0,0 +1,19 @@
+"""
+Moteur SQLite de Django, avec mesures et pool optionnel (servicesbladi.db)
+
+Sert au profil local et aux benchmarks ; les bases en mémoire ne passent
+jamais par le pool (Django ne les ferme pas).
+"""
+
+from django.db.backends.sqlite3 import base
+
+from servicesbladi.db import MeasuredPoolMixin
+
+
+class DatabaseWrapper(MeasuredPoolMixin, base.DatabaseWrapper):
+    def raw_is_usable(self, raw):
+        try:
+            raw.execute('SELECT 1')
+        except self.Database.Error:
+            return False
+        return True
@@ -0,0 +1,145 @@
+"""
+Politique de cache HTTP déclarée vue par vue.
+
+``@cache_policy(...)`` remplace, pour la vue décorée, les en-têtes ``no-store``
+posés par défaut par ``CacheControlMiddleware`` :
+
+- ``PUBLIC`` : catalogue identique pour tous les visiteurs anonymes
+  (``public, max-age=N, must-revalidate``) ; pour un utilisateur connecté, la
+  page contient son menu : elle devient ``PRIVATE``, de même qu'une page qui
+  contient un jeton CSRF (propre au visiteur). Une page avec formulaire se
+  déclare directement ``PRIVATE`` : sa réponse 304 est décidée avant le rendu ;
+- ``PRIVATE`` : données de l'utilisateur (``private, no-cache``) : le
+  navigateur garde la réponse mais la revalide à chaque fois ;
+- ``NO_STORE`` : rien n'est gardé (formulaires, effets de bord).
+
+Validateurs (GET et HEAD uniquement) :
+
+- avec ``state`` (fonction de la requête et des arguments de la vue rendant
+  ``(dernière modification, jeton)``, voir ``model_state``) : ETag et
+  Last-Modified sont connus avant la vue, un client à jour reçoit 304 sans
+  que la page soit calculée ;
+- sinon : ETag fort calculé sur le contenu de la réponse (API JSON), un
+  client à jour reçoit 304 sans corps.
+
+L'ETag inclut la version du déploiement, la langue et l'utilisateur : un
+nouveau gabarit, une autre langue ou une connexion invalident la réponse.
+"""
+
+import hashlib
+from functools import wraps
+
+from django.db.models import Count, Max
+from django.utils import translation
+from django.utils.cache import (
+    get_conditional_response, patch_cache_control, patch_vary_headers, set_response_etag,
+)
+from django.utils.http import http_date, quote_etag
+
+from servicesbladi.assets import get_asset_version
+
+PUBLIC = 'public'
+PRIVATE = 'private'
+NO_STORE = 'no-store'
+
+# Cookie du stockage des messages flash (django.contrib.messages)
+MESSAGES_COOKIE = 'messages'
+
+
+def model_state(*querysets, field='updated_at'):
+    """(dernière modification, jeton) de plusieurs querysets, une requête chacun
+
+    Le jeton combine nombre de lignes, identifiant maximal et date maximale :
+    il change aussi quand une ligne est supprimée.
+    """
+    last_modified = None
+    token = []
+    for queryset in querysets:
+        aggregates = {'count': Count('pk'), 'last_id': Max('pk')}
+        if field and any(f.name == field for f in queryset.model._meta.fields):
+            aggregates['last'] = Max(field)
+        state = queryset.aggregate(**aggregates)
+        last = state.get('last')
+        if last is not None and (last_modified is None or last > last_modified):
+            last_modified = last
+        token.append(f"{queryset.model._meta.label}:{state['count']}:{state['last_id']}:{last}")
+    return last_modified, '|'.join(token)
+
+
+def rows_state(queryset, *fields):
+    """Jeton des valeurs de quelques lignes affichées, pour les modèles sans
+    date de modification (``model_state`` n'y voit pas les changements)"""
+    values = list(queryset.values_list(*fields))
+    return hashlib.sha1(repr(values).encode()).hexdigest()
+
+
+def uses_csrf_token(request):
+    """Le rendu a appelé ``get_token`` (``{% csrf_token %}``, formulaire)"""
+    return bool(request.META.get('CSRF_COOKIE_NEEDS_UPDATE'))
+
+
+def request_etag(request, token):
+    user_id = request.user.pk if request.user.is_authenticated else 'anon'
+    seed = f'{get_asset_version()}:{translation.get_language()}:{user_id}:{token}'
+    return quote_etag(hashlib.sha1(seed.encode()).hexdigest())
+
+
+def has_pending_messages(request):
+    """Un message flash attend d'être affiché : la page doit être recalculée"""
+    return bool(request.COOKIES.get(MESSAGES_COOKIE))
+
+
+def apply_policy(request, response, policy, max_age=0):
+    if policy == PUBLIC and (request.user.is_authenticated or uses_csrf_token(request)):
+        policy = PRIVATE
+    if policy == PUBLIC:
+        patch_cache_control(response, public=True, max_age=max_age, must_revalidate=True)
+    elif policy == PRIVATE:
+        patch_cache_control(response, private=True, no_cache=True)
+    else:
+        patch_cache_control(response, no_store=True, no_cache=True, must_revalidate=True)
+    patch_vary_headers(response, ('Cookie', 'Accept-Language'))
+    response.cache_policy = policy
+    return response
+
+
+def cache_policy(policy, state=None, max_age=0):
+    """Déclarer la politique de cache d'une vue (voir le docstring du module)"""
+    def decorator(view):
+        @wraps(view)
+        def wrapped(request, *args, **kwargs):
+            conditional = (
+                policy != NO_STORE
+                and request.method in ('GET', 'HEAD')
+                and not has_pending_messages(request)
+            )
+            if not conditional:
+                return apply_policy(request, view(request, *args, **kwargs), NO_STORE)
+
+            etag = last_modified = None
+            if state is not None:
+                modified_at, token = state(request, *args, **kwargs)
+                etag = request_etag(request, token)
+                last_modified = int(modified_at.timestamp()) if modified_at else None
+                not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+                if not_modified is not None:
+                    not_modified['ETag'] = etag
+                    if last_modified:
+                        not_modified['Last-Modified'] = http_date(last_modified)
+                    return apply_policy(request, not_modified, policy, max_age)
+
+            response = view(request, *args, **kwargs)
+            if response.status_code != 200 or response.streaming:
+                return apply_policy(request, response, policy, max_age)
+            if etag:
+                response['ETag'] = etag
+            else:
+                set_response_etag(response)
+            if last_modified:
+                response['Last-Modified'] = http_date(last_modified)
+            response = get_conditional_response(
+                request, etag=response.get('ETag'), last_modified=last_modified, response=response
+            )
+            return apply_policy(request, response, policy, max_age)
+        return wrapped
+    return decorator
@@ -0,0 +1,348 @@
+"""
+Commande de gestion Django pour mesurer les vues les plus sollicitées sur un
+jeu de données réaliste (profil bench : servicesbladi.settings.bench)
+"""
+
+import contextlib
+import io
+import logging
+import os
+import random
+import statistics
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client as HttpClient
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from accounts.models import Client
+from custom_requests.models import Message, Notification, RendezVous, ServiceRequest
+from messaging import conversations
+from resources.models import Resource
+from services.models import Service, ServiceCategory, ServiceType
+
+BENCH_DOMAIN = 'bench.local'
+# Valeurs par défaut de servicesbladi/settings/production.py
+PRODUCTION_DB_HOST = 'servicesbladi.mysql.database.azure.com'
+PRODUCTION_DB_NAME = 'servicesbladi'
+BATCH_SIZE = 1000
+STATUSES = ('new', 'pending_info', 'in_progress', 'completed')
+CATEGORIES = [category for category, _ in Resource.CATEGORIES]
+
+
+class Command(BaseCommand):
+    help = (
+        'Profil bench uniquement : génère un jeu de données (clients, demandes, '
+        'messages, notifications, ressources) puis mesure latence et requêtes SQL '
+        'des vues les plus sollicitées'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clients', type=int, default=300)
+        parser.add_argument('--experts', type=int, default=30)
+        parser.add_argument('--requests-per-client', type=int, default=4)
+        parser.add_argument('--messages-per-request', type=int, default=40)
+        parser.add_argument('--notifications-per-client', type=int, default=30)
+        parser.add_argument('--resources', type=int, default=120)
+        parser.add_argument('--iterations', type=int, default=50, help='Requêtes mesurées par vue')
+        parser.add_argument('--users', type=int, default=20, help='Clients connectés utilisés')
+        parser.add_argument('--reseed', action='store_true', help='Vider la base et régénérer le jeu de données')
+        parser.add_argument('--seed-only', action='store_true', help='Générer sans mesurer')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        if not getattr(settings, 'BENCH_PROFILE', False):
+            raise CommandError(
+                'Profil bench requis (SERVICESBLADI_PROFILE=bench ou '
+                'DJANGO_SETTINGS_MODULE=servicesbladi.settings.bench)'
+            )
+        self.check_not_production()
+        rng = random.Random(options['seed'])
+        call_command('migrate', verbosity=0)
+
+        User = get_user_model()
+        bench_users = User.objects.filter(email__endswith=f'@{BENCH_DOMAIN}')
+        if options['reseed']:
+            # Base dédiée au profil bench : vidée entièrement
+            call_command('flush', interactive=False, verbosity=0)
+        if bench_users.exists():
+            self.stdout.write('ⓘ Jeu de données déjà présent (--reseed pour le régénérer)')
+        else:
+            start = time.perf_counter()
+            with transaction.atomic():
+                counts = self.seed(rng, options)
+            self.stdout.write(
+                f'ⓘ Jeu de données généré en {time.perf_counter() - start:.1f} s : '
+                + ', '.join(f'{count} {label}' for label, count in counts.items())
+            )
+        if options['seed_only']:
+            self.stdout.write(self.style.SUCCESS('✓ Jeu de données prêt'))
+            return
+
+        samples = self.sample_sessions(rng, options['users'])
+        if not samples:
+            raise CommandError('Aucun client avec une demande dans le jeu de données')
+        self.stdout.write(
+            f'ⓘ {len(samples)} clients connectés, {options["iterations"]} requêtes par vue '
+            f'({connection.vendor})'
+        )
+        failed = []
+        for name, build_url, anonymous in self.hot_views():
+            result = self.measure(samples, build_url, anonymous, options['iterations'])
+            self.report(name, result)
+            if result['errors']:
+                failed.append(name)
+        if failed:
+            # Mesures faussées (pages d'erreur chronométrées) : échec de la commande
+            raise CommandError(f'Vues en erreur : {", ".join(failed)}')
+        self.stdout.write(self.style.SUCCESS('✓ Benchmark terminé'))
+
+    def check_not_production(self):
+        """Refuser une base MySQL qui serait celle de la production (--reseed la vide)"""
+        database = connection.settings_dict
+        if connection.vendor != 'mysql':
+            return
+        production = (
+            os.environ.get('DB_HOST', PRODUCTION_DB_HOST),
+            os.environ.get('DB_NAME', PRODUCTION_DB_NAME),
+        )
+        if (database['HOST'], database['NAME']) == production:
+            raise CommandError(
+                f'Base {database["NAME"]} sur {database["HOST"]} : celle de la production, '
+                'bench refusé (BENCH_DB_HOST / BENCH_DB_NAME)'
+            )
+
+    # --- Jeu de données ------------------------------------------------------
+
+    def seed(self, rng, options):
+        User = get_user_model()
+        password = make_password('bench')
+        now = timezone.now()
+
+        def create_users(prefix, count, account_type):
+            User.objects.bulk_create(
+                [
+                    User(
+                        email=f'{prefix}{index}@{BENCH_DOMAIN}', password=password,
+                        name=prefix.capitalize(), first_name=str(index), account_type=account_type,
+                        is_verified=True,
+                    )
+                    for index in range(count)
+                ],
+                batch_size=BATCH_SIZE,
+            )
+            # Identifiants relus : MySQL ne les renvoie pas après bulk_create
+            return list(User.objects.filter(email__startswith=prefix, email__endswith=f'@{BENCH_DOMAIN}'))
+
+        clients = create_users('client', options['clients'], 'client')
+        # Les vues mesurées sont celles des clients : pas de profils Expert
+        experts = create_users('expert', options['experts'], 'expert')
+        Client.objects.bulk_create([Client(user=user) for user in clients], batch_size=BATCH_SIZE)
+
+        services = []
+        for number in range(4):
+            category = ServiceCategory.objects.create(name=f'Catégorie {number}', slug=f'bench-{number}')
+            service_type = ServiceType.objects.create(category=category, name=f'Type {number}')
+            services += [
+                Service.objects.create(
+                    service_type=service_type, title=f'[bench] Service {number}.{index}',
+                    description='Service généré pour le benchmark', price=rng.randint(50, 500),
+                )
+                for index in range(3)
+            ]
+
+        ServiceRequest.objects.bulk_create(
+            [
+                ServiceRequest(
+                    client=client, expert=rng.choice(experts), service=rng.choice(services),
+                    title=f'Dossier {number} de {client.pk}',
+                    description='Demande générée pour le benchmark', status=rng.choice(STATUSES),
+                )
+                for client in clients
+                for number in range(options['requests_per_client'])
+            ],
+            batch_size=BATCH_SIZE,
+        )
+        requests = list(ServiceRequest.objects.filter(client__in=clients))
+
+        RendezVous.objects.bulk_create(
+            [
+                RendezVous(
+                    client_id=request.client_id, expert_id=request.expert_id, service_request=request,
+                    date_time=now + timedelta(days=rng.randint(-30, 30), hours=rng.randint(8, 18)),
+                )
+                for request in requests
+            ],
+            batch_size=BATCH_SIZE,
+        )
+
+        messages = []
+        for request in requests:
+            for number in range(options['messages_per_request']):
+                from_client = number % 2 == 0
+                messages.append(Message(
+                    sender_id=request.client_id if from_client else request.expert_id,
+                    recipient_id=request.expert_id if from_client else request.client_id,
+                    service_request=request,
+                    content=f'Message {number} : ' + ' '.join(rng.choices(WORDS, k=rng.randint(5, 40))),
+                    # Les derniers messages restent non lus
+                    is_read=number < options['messages_per_request'] - 3,
+                ))
+        Message.objects.bulk_create(messages, batch_size=BATCH_SIZE)
+
+        Notification.objects.bulk_create(
+            [
+                Notification(
+                    user=client, type=rng.choice(('request_update', 'appointment', 'message', 'system')),
+                    title=f'Notification {number}', content='Notification générée pour le benchmark',
+                    is_read=number % 3 != 0,
+                )
+                for client in clients
+                for number in range(options['notifications_per_client'])
+            ],
+            batch_size=BATCH_SIZE,
+        )
+
+        Resource.objects.bulk_create(
+            [
+                Resource(
+                    category=rng.choice(CATEGORIES), title=f'[bench] Ressource {number}',
+                    description=' '.join(rng.choices(WORDS, k=30)), size_kb=rng.randint(10, 5000),
+                )
+                for number in range(options['resources'])
+            ],
+            batch_size=BATCH_SIZE,
+        )
+
+        conversation_count = conversations.rebuild()
+        if connection.vendor == 'sqlite':
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+        return {
+            'clients': len(clients),
+            'experts': len(experts),
+            'demandes': len(requests),
+            'messages': len(messages),
+            'notifications': len(clients) * options['notifications_per_client'],
+            'services': len(services),
+            'ressources': options['resources'],
+            'conversations': conversation_count,
+        }
+
+    def sample_sessions(self, rng, count):
+        """Clients de test connectés, chacun avec une de ses demandes"""
+        requests = list(
+            ServiceRequest.objects.filter(client__email__endswith=f'@{BENCH_DOMAIN}')
+            .select_related('client').order_by('id')
+        )
+        by_client = {}
+        for request in requests:
+            by_client.setdefault(request.client_id, request)
+        chosen = rng.sample(list(by_client.values()), min(count, len(by_client)))
+        samples = []
+        for request in chosen:
+            http = HttpClient(raise_request_exception=False)
+            http.force_login(request.client)
+            samples.append((http, request))
+        return samples
+
+    # --- Mesures -------------------------------------------------------------
+
+    def hot_views(self):
+        """(nom, URL en fonction de la demande, anonyme ?)"""
+        return [
+            ('Tableau de bord client', lambda request: reverse('client_dashboard'), False),
+            ('Boîte de réception', lambda request: reverse('custom_requests:messages'), False),
+            ('Discussion', lambda request: reverse('messaging:chat', args=[request.pk]), False),
+            ('Historique (API)', lambda request: reverse('messaging:chat_history', args=[request.pk]), False),
+            ('Demandes (API)', lambda request: reverse('custom_requests:api_client_requests'), False),
+            ('Notifications (API)', lambda request: reverse('custom_requests:api_notifications'), False),
+            ('Sondage notifications', lambda request: reverse('messaging:notifications_poll') + '?timeout=0', False),
+            ('Ressources', lambda request: reverse('resources:resource_list'), True),
+        ]
+
+    def measure(self, samples, build_url, anonymous, iterations):
+        # Erreurs comptées dans le rapport, sans trace complète à chaque requête
+        # (et sans les traces de débogage que certaines vues affichent)
+        request_logger = logging.getLogger('django.request')
+        level = request_logger.level
+        request_logger.setLevel(logging.CRITICAL)
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                return self.measure_view(samples, build_url, anonymous, iterations)
+        finally:
+            request_logger.setLevel(level)
+
+    def measure_view(self, samples, build_url, anonymous, iterations):
+        anonymous_client = HttpClient(raise_request_exception=False)
+        durations = []
+        query_counts = []
+        statuses = set()
+        errors = []
+        etag = None
+        revalidated = 0
+        for index in range(iterations + 1):
+            http, request = samples[index % len(samples)]
+            if anonymous:
+                http = anonymous_client
+            headers = {'HTTP_IF_NONE_MATCH': etag} if etag else {}
+            try:
+                with CaptureQueriesContext(connection) as queries:
+                    started = time.perf_counter()
+                    response = http.get(build_url(request), **headers)
+                    elapsed = time.perf_counter() - started
+            except Exception as e:
+                errors.append(str(e))
+                continue
+            if anonymous:
+                # Visiteur qui revient : revalidation par ETag (servicesbladi.http_cache)
+                etag = response.get('ETag') or etag
+                revalidated += response.status_code == 304
+            if index == 0:
+                # Premier appel : chauffe (gabarits, caches du processus)
+                continue
+            if response.status_code >= 400:
+                errors.append(f'HTTP {response.status_code}')
+                continue
+            durations.append(elapsed)
+            query_counts.append(len(queries.captured_queries))
+            statuses.add(response.status_code)
+        return {
+            'durations': sorted(durations),
+            'queries': query_counts,
+            'statuses': sorted(statuses),
+            'errors': errors,
+            'revalidated': revalidated,
+        }
+
+    def report(self, name, result):
+        durations = result['durations']
+        if not durations:
+            self.stdout.write(self.style.ERROR(f'  ✗ {name} : {result["errors"][:1]}'))
+            return
+        p95 = durations[max(int(len(durations) * 0.95) - 1, 0)]
+        line = (
+            f'  {name:<24} p50 {statistics.median(durations) * 1000:>7.1f} ms  '
+            f'p95 {p95 * 1000:>7.1f} ms  {statistics.mean(result["queries"]):>5.1f} requêtes SQL  '
+            f'HTTP {",".join(str(status) for status in result["statuses"])}'
+        )
+        if result['revalidated']:
+            line += f'  ({result["revalidated"]} réponse(s) 304)'
+        if result['errors']:
+            line += f'  {len(result["errors"])} erreur(s) : {result["errors"][0]}'
+        self.stdout.write(line)
+
+
+WORDS = (
+    'bonjour merci dossier documents passeport consulat rendez-vous impôt déclaration '
+    'terrain maison achat vente notaire banque virement délai semaine envoyer reçu '
+    'signature copie original traduction question réponse confirmer disponible'
+).split()
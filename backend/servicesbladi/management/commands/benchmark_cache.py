@@ -0,0 +1,126 @@
+"""
+Commande de gestion Django pour comparer les backends de cache
+(DatabaseCache actuel contre le cache à deux niveaux servicesbladi.cache)
+"""
+
+import random
+import shutil
+import statistics
+import tempfile
+import time
+
+from django.core.cache.backends.db import DatabaseCache
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.management.base import BaseCommand
+from django.core.management.commands.createcachetable import Command as CreateCacheTable
+from django.db import DEFAULT_DB_ALIAS, connection
+
+from servicesbladi import cache as tiered
+
+BENCH_TABLE = 'benchmark_cache_table'
+
+# Part de lectures de chaque mélange
+MIXES = {
+    'lecture': 0.95,
+    'mixte': 0.8,
+    'écriture': 0.5,
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Micro-benchmark : opérations get/set sur DatabaseCache, FileBasedCache '
+        'et TieredCache (L1 mémoire devant fichier, base ou Redis)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--operations', type=int, default=5000, help='Opérations par mélange')
+        parser.add_argument('--keys', type=int, default=500, help='Nombre de clés distinctes')
+        parser.add_argument('--value-size', type=int, default=1024, help='Taille des valeurs (octets)')
+        parser.add_argument('--l1-timeout', type=int, default=5, help='Durée de vie L1 (secondes)')
+        parser.add_argument('--redis', default='', help='URL Redis pour mesurer aussi un L2 Redis')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        directory = tempfile.mkdtemp(prefix='benchmark_cache_')
+        create_table = CreateCacheTable()
+        create_table.verbosity = 0
+        create_table.create_table(DEFAULT_DB_ALIAS, BENCH_TABLE, dry_run=False)
+        try:
+            backends = self.build_backends(directory, options)
+            for mix, read_ratio in MIXES.items():
+                self.stdout.write(f'ⓘ Mélange {mix} ({read_ratio:.0%} de lectures)')
+                for name, backend in backends.items():
+                    backend.clear()
+                    tiered.reset_stats()
+                    self.report(name, self.run(backend, read_ratio, options))
+        finally:
+            with connection.cursor() as cursor:
+                cursor.execute(f'DROP TABLE {connection.ops.quote_name(BENCH_TABLE)}')
+            shutil.rmtree(directory, ignore_errors=True)
+        self.stdout.write(self.style.SUCCESS('✓ Benchmark terminé'))
+
+    def build_backends(self, directory, options):
+        db = {'BACKEND': 'django.core.cache.backends.db.DatabaseCache', 'LOCATION': BENCH_TABLE}
+        files = {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': f'{directory}/l2',
+        }
+        l2_choices = {'base': db, 'fichier': files}
+        if options['redis']:
+            l2_choices['redis'] = {
+                'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+                'LOCATION': options['redis'],
+            }
+
+        backends = {
+            'DatabaseCache': DatabaseCache(BENCH_TABLE, {}),
+            'FileBasedCache': FileBasedCache(f'{directory}/seul', {}),
+        }
+        for label, l2 in l2_choices.items():
+            backends[f'Tiered (L1 + {label})'] = tiered.TieredCache(
+                f'benchmark-{label}',
+                {'OPTIONS': {'L1_TIMEOUT': options['l1_timeout'], 'L2': l2}},
+            )
+        return backends
+
+    def run(self, backend, read_ratio, options):
+        rng = random.Random(options['seed'])
+        value = {'payload': 'x' * options['value_size'], 'count': 0}
+        latencies = []
+        hits = reads = 0
+        start = time.perf_counter()
+        for _ in range(options['operations']):
+            # Accès concentrés sur quelques clés chaudes (loi de Pareto)
+            key = f'bench:{int(rng.paretovariate(1.2)) % options["keys"]}'
+            began = time.perf_counter()
+            if rng.random() < read_ratio:
+                reads += 1
+                if backend.get(key) is not None:
+                    hits += 1
+                else:
+                    backend.set(key, value, 300)
+            else:
+                backend.set(key, value, 300)
+            latencies.append(time.perf_counter() - began)
+        elapsed = time.perf_counter() - start
+        latencies.sort()
+        return {
+            'ops_per_second': len(latencies) / elapsed,
+            'p50_us': statistics.median(latencies) * 1e6,
+            'p99_us': latencies[int(len(latencies) * 0.99) - 1] * 1e6,
+            'hit_rate': hits / reads if reads else 0,
+            'tiers': dict(tiered.stats),
+        }
+
+    def report(self, name, result):
+        line = (
+            f'  {name:<26} {result["ops_per_second"]:>9.0f} op/s  '
+            f'p50 {result["p50_us"]:>7.0f} µs  p99 {result["p99_us"]:>7.0f} µs  '
+            f'succès {result["hit_rate"]:.0%}'
+        )
+        tiers = result['tiers']
+        l1_reads = tiers['l1_hits'] + tiers['l1_misses']
+        if l1_reads:
+            line += f'  (L1 {tiers["l1_hits"] / l1_reads:.0%}, L2 {tiers["l2_hits"]}/{tiers["l2_hits"] + tiers["l2_misses"]})'
+        self.stdout.write(line)
@@ -0,0 +1,144 @@
+"""
+Commande de gestion Django pour comparer la gestion des connexions à la base
+(sans persistance, persistantes, pool servicesbladi.db)
+"""
+
+import os
+import tempfile
+import threading
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.db.utils import load_backend
+
+from servicesbladi import db as db_metrics
+
+ENGINES = {
+    'django.db.backends.mysql': 'servicesbladi.db.mysql',
+    'django.db.backends.sqlite3': 'servicesbladi.db.sqlite3',
+    'servicesbladi.db.mysql': 'servicesbladi.db.mysql',
+    'servicesbladi.db.sqlite3': 'servicesbladi.db.sqlite3',
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Micro-benchmark : requêtes HTTP simulées (gunicorn : un thread, ASGI : un '
+        'thread par requête) sans persistance, avec connexions persistantes et avec pool'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default='default', help='Base mesurée (alias)')
+        parser.add_argument('--requests', type=int, default=300, help='Requêtes par mesure')
+        parser.add_argument('--queries', type=int, default=3, help='Requêtes SQL par requête HTTP')
+        parser.add_argument('--concurrency', type=int, default=8, help='Requêtes ASGI simultanées')
+        parser.add_argument('--pool-size', type=int, default=4, help='Taille du pool mesuré')
+
+    def handle(self, *args, **options):
+        base = dict(connections[options['database']].settings_dict)
+        if base['ENGINE'] not in ENGINES:
+            raise CommandError(f"Moteur non pris en charge : {base['ENGINE']}")
+        base['ENGINE'] = ENGINES[base['ENGINE']]
+
+        temporary = None
+        if base['ENGINE'].endswith('sqlite3') and connections[options['database']].is_in_memory_db():
+            # Une base en mémoire n'est pas partagée entre connexions : fichier temporaire
+            handle, temporary = tempfile.mkstemp(suffix='.sqlite3')
+            os.close(handle)
+            base['NAME'] = temporary
+
+        modes = {
+            'sans persistance': {'CONN_MAX_AGE': 0, 'CONN_HEALTH_CHECKS': False, 'POOL': {}},
+            'persistantes': {'CONN_MAX_AGE': 60, 'CONN_HEALTH_CHECKS': True, 'POOL': {}},
+            f'pool ({options["pool_size"]})': {
+                'CONN_MAX_AGE': 0, 'CONN_HEALTH_CHECKS': False,
+                'POOL': {'SIZE': options['pool_size'], 'TIMEOUT': 30},
+            },
+        }
+        self.stdout.write(f"ⓘ Moteur {base['ENGINE']}, base {base['NAME']}")
+        try:
+            for scenario in ('gunicorn', 'asgi'):
+                self.stdout.write(f'ⓘ Scénario {scenario}')
+                for index, (mode, overrides) in enumerate(modes.items()):
+                    settings_dict = {**base, **overrides}
+                    alias = f'benchmark_{scenario}_{index}'
+                    db_metrics.reset_stats()
+                    result = getattr(self, f'run_{scenario}')(settings_dict, alias, options)
+                    db_metrics.close_pools()
+                    self.report(mode, result)
+        finally:
+            if temporary:
+                os.remove(temporary)
+        self.stdout.write(self.style.SUCCESS('✓ Benchmark terminé'))
+
+    def make_wrapper(self, settings_dict, alias):
+        return load_backend(settings_dict['ENGINE']).DatabaseWrapper(settings_dict, alias)
+
+    def handle_request(self, wrapper, queries):
+        # Comme request_started / request_finished (close_old_connections)
+        wrapper.close_if_unusable_or_obsolete()
+        with wrapper.cursor() as cursor:
+            for _ in range(queries):
+                cursor.execute('SELECT 1')
+                cursor.fetchone()
+        wrapper.close_if_unusable_or_obsolete()
+
+    def run_gunicorn(self, settings_dict, alias, options):
+        """Worker sync : un seul thread, donc une seule connexion Django"""
+        wrapper = self.make_wrapper(settings_dict, alias)
+        start = time.perf_counter()
+        for _ in range(options['requests']):
+            self.handle_request(wrapper, options['queries'])
+        elapsed = time.perf_counter() - start
+        left_open = int(wrapper.connection is not None)
+        wrapper.close()
+        return self.collect(options['requests'], elapsed, left_open)
+
+    def run_asgi(self, settings_dict, alias, options):
+        """Serveur ASGI : chaque requête passe par un nouveau thread (et sa connexion)"""
+        wrappers = []
+        lock = threading.Lock()
+
+        def request():
+            wrapper = self.make_wrapper(settings_dict, alias)
+            self.handle_request(wrapper, options['queries'])
+            with lock:
+                wrappers.append(wrapper)
+
+        start = time.perf_counter()
+        remaining = options['requests']
+        while remaining > 0:
+            batch = [threading.Thread(target=request) for _ in range(min(options['concurrency'], remaining))]
+            for thread in batch:
+                thread.start()
+            for thread in batch:
+                thread.join()
+            remaining -= len(batch)
+        elapsed = time.perf_counter() - start
+
+        # Connexions persistantes des threads terminés : jamais fermées par Django
+        leaked = [wrapper for wrapper in wrappers if wrapper.connection is not None]
+        for wrapper in leaked:
+            db_metrics.close_raw(wrapper.connection)
+        return self.collect(options['requests'], elapsed, len(leaked))
+
+    def collect(self, requests, elapsed, left_open):
+        stats = dict(db_metrics.stats)
+        return {
+            'requests_per_second': requests / elapsed,
+            'opened': stats['opened'],
+            'open_ms': stats['open_seconds'] * 1000 / stats['opened'] if stats['opened'] else 0,
+            'reused': stats['reused'],
+            'waits': stats['waits'],
+            'wait_ms': stats['wait_seconds'] * 1000,
+            'left_open': left_open,
+        }
+
+    def report(self, mode, result):
+        self.stdout.write(
+            f'  {mode:<18} {result["requests_per_second"]:>8.0f} req/s  '
+            f'{result["opened"]:>4} ouverture(s) ({result["open_ms"]:.2f} ms chacune)  '
+            f'{result["reused"]:>4} reprise(s)  attentes {result["waits"]} '
+            f'({result["wait_ms"]:.0f} ms)  restées ouvertes {result["left_open"]}'
+        )
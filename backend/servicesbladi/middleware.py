@@ -1,9 +1,12 @@
+from django.conf import settings
 from django.contrib import messages
 import time
-import random
 from django.utils.deprecation import MiddlewareMixin
 from django.utils import timezone
 
+# Dernière prolongation de la session (secondes depuis l'epoch)
+SESSION_REFRESH_KEY = '_refreshed_at'
+
 class MessageMiddleware(MiddlewareMixin):
     """Middleware for processing message-related tasks"""
 
@@ -17,25 +20,45 @@ class MessageMiddleware(MiddlewareMixin):
         return None
 
 class CacheControlMiddleware(MiddlewareMixin):
-    """Middleware to control browser caching of static files"""
+    """Middleware to control browser caching of static files
+    
+    La version des ressources vient du déploiement (servicesbladi.assets) :
+    la session n'est écrite que si son contenu change, ou pour repousser son
+    expiration au plus une fois par demi-durée de vie (SESSION_REFRESH_KEY).
+    """
     
     def process_request(self, request):
-        # Générer un timestamp unique pour cette requête
+        # Horodatage de la requête (cache_version_context)
         request.request_time = int(time.time())
         
-        # Toujours générer une nouvelle version pour le cache à chaque requête
-        cache_version = f"{int(time.time())}.{random.randint(1000, 9999)}"
-        request.session['cache_version'] = cache_version
-        request.session['request_time'] = request.request_time
-        request.session.modified = True
-        
         # Ajouter un indicateur si c'est une requête WebSocket
         if request.path.startswith('/ws/'):
             request.is_websocket = True
             
         return None
     
+    def refresh_session(self, request):
+        """Prolonger une session active sans la réécrire à chaque requête"""
+        session = getattr(request, 'session', None)
+        # Session non lue pendant la requête ou visiteur sans session : rien à faire
+        if session is None or not session.accessed or session.session_key is None:
+            return
+        now = int(time.time())
+        refreshed_at = session.get(SESSION_REFRESH_KEY)
+        if refreshed_at is None:
+            # Sessions plus anciennes : marquées lors de leur prochaine écriture
+            if session.modified:
+                session[SESSION_REFRESH_KEY] = now
+        elif now - refreshed_at > settings.SESSION_COOKIE_AGE // 2:
+            session[SESSION_REFRESH_KEY] = now
+    
     def process_response(self, request, response):
+        self.refresh_session(request)
+        
+        # Vue déclarant sa politique de cache (servicesbladi.http_cache) : ne rien forcer
+        if hasattr(response, 'cache_policy'):
+            return response
+        
         # Ajouter des en-têtes no-cache pour toutes les réponses HTML
         if response.get('Content-Type', '').startswith('text/html'):
             response['Cache-Control'] = 'no-cache, no-store, must-revalidate, max-age=0, private'
@@ -43,9 +66,6 @@ class CacheControlMiddleware(MiddlewareMixin):
             response['Expires'] = '0'
             response['X-Accel-Expires'] = '0'  # Pour Nginx
             
-            # Ajouter un ETag aléatoire pour forcer le rechargement
-            response['ETag'] = f'W/"{time.time()}-{random.randint(1000, 9999)}"'
-            
         # Aussi pour JS, CSS, JSON et autres ressources importantes
         elif response.get('Content-Type', '').startswith(('text/css', 'application/javascript', 'application/json')):
             response['Cache-Control'] = 'no-cache, no-store, must-revalidate'
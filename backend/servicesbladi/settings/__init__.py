@@ -0,0 +1,28 @@
+"""
+Réglages du projet, par profil (variable d'environnement SERVICESBLADI_PROFILE) :
+
+- production (par défaut) : Azure, MySQL distant (production.py) ;
+- bench : base et caches locaux, pour les mesures hors ligne (bench.py) ;
+- test : SQLite en mémoire, sans service extérieur (test.py), choisi d'office
+  par ``manage.py test``.
+
+DJANGO_SETTINGS_MODULE peut aussi désigner un profil directement
+(servicesbladi.settings.bench).
+"""
+
+import os
+import sys
+
+from django.core.exceptions import ImproperlyConfigured
+
+DEFAULT_PROFILE = 'test' if sys.argv[1:2] == ['test'] else 'production'
+PROFILE = os.environ.get('SERVICESBLADI_PROFILE', DEFAULT_PROFILE)
+
+if PROFILE == 'production':
+    from .production import *  # noqa: F401,F403
+elif PROFILE == 'bench':
+    from .bench import *  # noqa: F401,F403
+elif PROFILE == 'test':
+    from .test import *  # noqa: F401,F403
+else:
+    raise ImproperlyConfigured(f"Profil de réglages inconnu : {PROFILE}")
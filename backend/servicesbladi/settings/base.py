@@ -0,0 +1,392 @@
+"""
+Réglages communs à tous les profils (servicesbladi.settings)
+
+Les valeurs propres à un déploiement sont lues dans l'environnement ; la base
+de données est décrite par chaque profil (production.py, bench.py).
+"""
+
+import os
+import tempfile
+from pathlib import Path
+from django.utils.translation import gettext_lazy as _
+
+# Build paths inside the project like this: BASE_DIR / 'subdir'.
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+SECRET_KEY = os.environ.get(
+    'DJANGO_SECRET_KEY', 'django-insecure-dj217004uhfoid4ut98h9843h98fn-dkn2f808jf9jkef'
+)
+
+DEBUG = os.environ.get('DJANGO_DEBUG', '') == '1'
+
+# ALLOWED_HOSTS for Azure (DJANGO_ALLOWED_HOSTS : liste séparée par des virgules)
+ALLOWED_HOSTS = [
+    host.strip() for host in os.environ.get(
+        'DJANGO_ALLOWED_HOSTS',
+        'servicesbladi-dqf3hchmcqeudmfm.spaincentral-01.azurewebsites.net,'
+        'servicesbladi.azurewebsites.net,127.0.0.1,localhost'
+    ).split(',') if host.strip()
+]
+
+INSTALLED_APPS = [
+    'django.contrib.admin',
+    'django.contrib.auth',
+    'django.contrib.contenttypes',
+    'django.contrib.sessions',
+    'django.contrib.messages',
+    'django.contrib.staticfiles',
+
+    'rest_framework',
+    'channels',
+
+    'accounts',
+    'services',
+    'custom_requests',
+    'resources',
+    'messaging',
+    'chatbot',
+
+    # Commandes et tests propres au projet (servicesbladi/management)
+    'servicesbladi',
+]
+
+AUTH_USER_MODEL = 'accounts.Utilisateur'
+
+MIDDLEWARE = [
+    'django.middleware.security.SecurityMiddleware',
+    'whitenoise.middleware.WhiteNoiseMiddleware',  # Add WhiteNoise for static files
+    'django.contrib.sessions.middleware.SessionMiddleware',
+    'django.middleware.common.CommonMiddleware',
+    'django.middleware.csrf.CsrfViewMiddleware',
+    'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'django.contrib.messages.middleware.MessageMiddleware',
+    'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'django.middleware.locale.LocaleMiddleware',
+    'servicesbladi.middleware.CacheControlMiddleware',
+]
+
+ROOT_URLCONF = 'servicesbladi.urls'
+
+TEMPLATES = [
+    {
+        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'DIRS': [
+            os.path.join(BASE_DIR, 'templates'),  # For backend/project-level templates
+            os.path.join(BASE_DIR, 'frontend/template'),  # For frontend templates
+            # The path os.path.join(BASE_DIR, 'templates/frontend') could also be used here
+            # as your deployment script copies frontend templates there too.
+            # Keeping it simple with one primary location for frontend templates is often clearer.
+        ],
+        'APP_DIRS': True,
+        'OPTIONS': {
+            'context_processors': [
+                'django.template.context_processors.debug',
+                'django.template.context_processors.request',
+                'django.contrib.auth.context_processors.auth',
+                'django.contrib.messages.context_processors.messages',
+                'django.template.context_processors.i18n',
+                'servicesbladi.context_processors.language_context',
+                'servicesbladi.context_processors.notifications_context',
+                'servicesbladi.context_processors.cache_version_context',
+                'chatbot.context_processors.chatbot_context',
+            ],
+        },
+    },
+]
+
+WSGI_APPLICATION = 'servicesbladi.wsgi.application'
+ASGI_APPLICATION = 'servicesbladi.asgi.application'
+
+# Connexions à la base (servicesbladi.db), reprises par chaque profil :
+# - gunicorn (workers sync, un thread) : connexion persistante DB_CONN_MAX_AGE
+#   secondes, vérifiée avant d'être reprise après une erreur ou au début d'une
+#   requête (CONN_HEALTH_CHECKS) ;
+# - ASGI (daphne) : DB_POOL_SIZE > 0 active un pool par processus, chaque
+#   thread de database_sync_to_async y reprend une connexion déjà ouverte.
+#   Connexions au plus sur le serveur : processus x DB_POOL_SIZE.
+DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', '0'))
+DB_CONN_MAX_AGE = 0 if DB_POOL_SIZE else int(os.environ.get('DB_CONN_MAX_AGE', '60'))
+DB_CONNECTION_SETTINGS = {
+    'CONN_MAX_AGE': DB_CONN_MAX_AGE,
+    'CONN_HEALTH_CHECKS': True,
+    'POOL': {
+        'SIZE': DB_POOL_SIZE,
+        'TIMEOUT': int(os.environ.get('DB_POOL_TIMEOUT', '10')),
+    },
+}
+
+# Channels : Redis dès que REDIS_URL est défini (plusieurs processus ASGI),
+# sinon InMemoryChannelLayer (un seul processus, développement).
+# CHANNEL_LAYER force le choix : memory, redis ou redis_pubsub.
+REDIS_URL = os.environ.get('REDIS_URL', '')
+CHANNEL_LAYER = os.environ.get('CHANNEL_LAYER', 'redis' if REDIS_URL else 'memory')
+
+if CHANNEL_LAYER == 'redis':
+    CHANNEL_LAYERS = {
+        'default': {
+            'BACKEND': 'channels_redis.core.RedisChannelLayer',
+            'CONFIG': {
+                'hosts': [REDIS_URL],
+                'prefix': 'servicesbladi',
+                'capacity': 1000,
+                'expiry': 60,
+                'group_expiry': 86400,
+            },
+        },
+    }
+elif CHANNEL_LAYER == 'redis_pubsub':
+    CHANNEL_LAYERS = {
+        'default': {
+            'BACKEND': 'channels_redis.pubsub.RedisPubSubChannelLayer',
+            'CONFIG': {
+                'hosts': [REDIS_URL],
+                'prefix': 'servicesbladi',
+            },
+        },
+    }
+else:
+    CHANNEL_LAYERS = {
+        'default': {
+            'BACKEND': 'channels.layers.InMemoryChannelLayer',
+        },
+    }
+
+# Présence dans les salons de discussion (messaging.presence)
+CHAT_PRESENCE_BACKEND = (
+    'messaging.presence.RedisPresence' if REDIS_URL else 'messaging.presence.MemoryPresence'
+)
+CHAT_PRESENCE_TTL = 60  # secondes sans battement de cœur avant de sortir de la liste
+
+# Messages WebSocket diffusés immédiatement puis enregistrés par lots
+# (messaging.write_behind) : au plus FLUSH_MS de retard ou BATCH_SIZE messages
+CHAT_WRITE_BEHIND = False
+CHAT_WRITE_BEHIND_FLUSH_MS = 200
+CHAT_WRITE_BEHIND_BATCH_SIZE = 100
+
+# Notifications poussées (ws/notifications/ et long-polling de repli) : à
+# n'activer que sous ASGI avec la couche Redis. Sans cela (gunicorn WSGI), les
+# pages gardent le polling court et /messaging/notifications/poll/ répond sans attendre.
+NOTIFICATIONS_PUSH = os.environ.get('NOTIFICATIONS_PUSH', '') == '1'
+
+# Attente maximale (secondes) du long-polling des notifications,
+# repli du canal WebSocket ws/notifications/ (messaging.notifications)
+NOTIFICATIONS_LONG_POLL_SECONDS = 25
+
+# Durée de vie (secondes) du compteur de notifications non lues et des
+# dernières notifications en cache (custom_requests.notification_cache)
+NOTIFICATIONS_CACHE_TIMEOUT = 300
+
+# Durée de vie (secondes) de l'utilisateur de la session en cache,
+# 0 pour le désactiver (accounts.user_cache)
+USER_CACHE_TIMEOUT = 300
+
+AUTH_PASSWORD_VALIDATORS = [
+    {'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator', },
+    {'NAME': 'django.contrib.auth.password_validation.MinimumLengthValidator', 'OPTIONS': {'min_length': 8}},
+    {'NAME': 'django.contrib.auth.password_validation.CommonPasswordValidator', },
+    {'NAME': 'django.contrib.auth.password_validation.NumericPasswordValidator', },
+]
+
+LANGUAGE_CODE = 'fr'
+
+LANGUAGES = [
+    ('fr', _('French')),
+    ('en', _('English')),
+    ('ar', _('Arabic')),
+]
+
+LOCALE_PATHS = [os.path.join(BASE_DIR, 'locale')]
+
+TIME_ZONE = 'UTC'
+
+USE_I18N = True
+USE_TZ = True
+
+STATIC_URL = '/static/'
+STATICFILES_DIRS = [
+    os.path.join(BASE_DIR, 'frontend/static'),  # This path is correct for the Azure deployed structure
+]
+STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
+
+# Use WhiteNoise for serving static files in production - using basic storage for maximum compatibility
+STATICFILES_STORAGE = 'whitenoise.storage.StaticFilesStorage'
+
+# Version des ressources (?v=) : identifiant du déploiement, sinon empreinte
+# de STATIC_ROOT calculée au démarrage (servicesbladi.assets)
+ASSET_VERSION = os.environ.get('ASSET_VERSION', '')
+
+MEDIA_URL = '/media/'
+MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+
+# Security settings for production
+SECURE_PROXY_SSL_HEADER = ('HTTP_X_FORWARDED_PROTO', 'https')
+SECURE_SSL_REDIRECT = False  # Azure handles SSL termination
+USE_TZ = True
+
+# CSRF and session settings
+CSRF_COOKIE_SECURE = True
+SESSION_COOKIE_SECURE = True
+SECURE_BROWSER_XSS_FILTER = True
+SECURE_CONTENT_TYPE_NOSNIFF = True
+
+# Cache à deux niveaux (servicesbladi.cache) : mémoire du processus devant un
+# cache partagé. CACHE_L2 choisit le cache partagé : redis (dès que REDIS_URL
+# est défini), sinon db (table django_cache_table sur MySQL, partagée par tous
+# les workers) ; file (répertoire local, non partagé entre machines) est réservé
+# au développement, sur demande explicite. CACHE_VERSION invalide tout au déploiement.
+CACHE_L2 = os.environ.get('CACHE_L2', 'redis' if REDIS_URL else 'db')
+CACHE_L2_BACKENDS = {
+    'redis': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.environ.get('CACHE_REDIS_URL', REDIS_URL),
+    },
+    'file': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get(
+            'CACHE_DIR', os.path.join(tempfile.gettempdir(), 'servicesbladi_cache')
+        ),
+    },
+    'db': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'django_cache_table',
+    },
+}
+CACHES = {
+    'default': {
+        'BACKEND': 'servicesbladi.cache.TieredCache',
+        'LOCATION': 'default',
+        'TIMEOUT': 300,
+        'VERSION': int(os.environ.get('CACHE_VERSION', '1')),
+        'OPTIONS': {
+            'L1_TIMEOUT': int(os.environ.get('CACHE_L1_TIMEOUT', '5')),
+            'L1_MAX_ENTRIES': 1000,
+            # Disjoncteur et plafond d'appels Gemini : toujours lus dans L2
+            'L1_EXCLUDE_PREFIXES': ('circuit:',),
+            'L2': CACHE_L2_BACKENDS[CACHE_L2],
+        },
+    }
+}
+
+# Logging configuration - simplified to avoid file permission issues during build
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'verbose': {
+            'format': '{levelname} {asctime} {module} {process:d} {thread:d} {message}',
+            'style': '{',
+        },
+        'simple': {
+            'format': '{levelname} {message}',
+            'style': '{',
+        },
+    },
+    'handlers': {
+        'console': {
+            'level': 'INFO',
+            'class': 'logging.StreamHandler',
+            'formatter': 'simple',
+        },
+    },
+    'root': {
+        'handlers': ['console'],
+        'level': 'INFO',
+    },
+    'loggers': {
+        'django': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+        'servicesbladi': {
+            'handlers': ['console'],
+            'level': 'DEBUG',
+            'propagate': False,
+        },
+        # Les URL Gemini contiennent la clé API : ne pas journaliser chaque requête
+        'httpx': {
+            'handlers': ['console'],
+            'level': 'WARNING',
+            'propagate': False,
+        },
+    },
+}
+
+DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+LOGIN_URL = 'accounts:login'
+LOGIN_REDIRECT_URL = 'accounts:dashboard_redirect'
+LOGOUT_REDIRECT_URL = 'home'
+
+SESSION_ENGINE = 'django.contrib.sessions.backends.db'
+SESSION_COOKIE_AGE = 86400
+# La session n'est écrite que si elle change (CacheControlMiddleware la prolonge)
+SESSION_SAVE_EVERY_REQUEST = False
+SESSION_EXPIRE_AT_BROWSER_CLOSE = True
+
+# Remove this old cache config - it's been moved above
+# CACHES = {
+#     'default': {
+#         'BACKEND': 'django.core.cache.backends.dummy.DummyCache',
+#     }
+# }
+
+EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
+EMAIL_HOST = 'smtp.gmail.com'
+EMAIL_PORT = 587
+EMAIL_USE_TLS = True
+EMAIL_HOST_USER = 'adval.devteam@gmail.com'
+EMAIL_HOST_PASSWORD = 'oeth fank mhsn lcjr'  # Your Gmail app password
+DEFAULT_FROM_EMAIL = 'Adval Services Marketplace <adval.devteam@gmail.com>'
+EMAIL_SUBJECT_PREFIX = '[Adval Services] '
+
+REST_FRAMEWORK = {
+    'DEFAULT_PERMISSION_CLASSES': ['rest_framework.permissions.IsAuthenticated'],
+    'DEFAULT_AUTHENTICATION_CLASSES': ['rest_framework.authentication.SessionAuthentication'],
+}
+
+AUTHENTICATION_BACKENDS = [
+    'accounts.backends.EmailBackend',
+    'django.contrib.auth.backends.ModelBackend',
+]
+
+GEMINI_API_KEY = os.environ.get('GEMINI_API_KEY', '')
+
+# Délai max (secondes) avant qu'un worker recharge la configuration du chatbot
+CHATBOT_CONFIG_CHECK_INTERVAL = 30
+
+# Passerelle Gemini asynchrone (chatbot/api/async/, servie par servicesbladi.asgi)
+GEMINI_API_BASE_URL = 'https://generativelanguage.googleapis.com/v1beta'
+GEMINI_TIMEOUT_SECONDS = 15
+GEMINI_MAX_CONCURRENCY = 50  # Appels simultanés max par hôte amont et par processus
+GEMINI_MAX_KEEPALIVE = 20
+
+# Disjoncteur Gemini partagé entre workers via le cache (voir chatbot.circuit_breaker)
+GEMINI_CIRCUIT_FAILURE_RATE = 0.5  # Taux d'échec déclenchant l'ouverture
+GEMINI_CIRCUIT_MIN_CALLS = 10  # Appels minimum dans la fenêtre avant de juger
+GEMINI_CIRCUIT_WINDOW_SECONDS = 60
+GEMINI_CIRCUIT_OPEN_SECONDS = 30  # Durée d'ouverture avant une sonde
+GEMINI_MAX_UPSTREAM_CALLS = 20  # Appels simultanés max, tous workers confondus
+GEMINI_QUEUE_TIMEOUT_SECONDS = 2  # Attente max d'une place (quelques tentatives) avant la réponse de secours
+
+# Réponses du chatbot en flux (SSE) : nécessite un serveur ASGI (daphne/uvicorn)
+CHATBOT_STREAMING_ENABLED = False
+
+# Cache des réponses du chatbot pour les questions fréquentes
+CHATBOT_RESPONSE_CACHE_ENABLED = True
+CHATBOT_RESPONSE_CACHE_TTL = 7 * 24 * 3600  # secondes
+CHATBOT_RESPONSE_CACHE_MAX_ENTRIES = 5000  # Éviction LRU au-delà
+CHATBOT_RESPONSE_CACHE_EVICT_EVERY = 100  # Mises en cache entre deux évictions
+
+# Analytics du chatbot : compteurs écrits par lots (taille ou délai en secondes)
+CHATBOT_ANALYTICS_FLUSH_SIZE = 20
+CHATBOT_ANALYTICS_FLUSH_INTERVAL = 10
+
+# Derniers messages de session lus à chaque tour (historique et répétitions)
+CHATBOT_HISTORY_WINDOW = 6
+
+COUNTRIES = [
+    ('FR', _('France')),
+    ('US', _('États-Unis')),
+    # Add more as needed
+]
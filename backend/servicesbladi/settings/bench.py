@@ -0,0 +1,73 @@
+"""
+Profil bench : mesures hors ligne (manage.py bench)
+
+- base : SQLite locale (BENCH_DB_PATH), ou MySQL dès que BENCH_DB_HOST est
+  défini (BENCH_DB_NAME, BENCH_DB_USER, BENCH_DB_PASSWORD, BENCH_DB_PORT).
+  Jamais les variables DB_* de la production : ``bench --reseed`` vide la base ;
+- cache en mémoire du processus, channel layer et présence en mémoire :
+  aucun service extérieur ;
+- gabarits et fichiers statiques lus dans ../frontend (arborescence du dépôt).
+"""
+
+import os
+
+from .base import *  # noqa: F401,F403
+from .base import BASE_DIR, DB_CONNECTION_SETTINGS, STATICFILES_DIRS, TEMPLATES
+
+# Garde-fou : manage.py bench refuse de remplir une autre base
+BENCH_PROFILE = True
+
+DEBUG = False
+ALLOWED_HOSTS = ['testserver', 'localhost', '127.0.0.1']
+
+if os.environ.get('BENCH_DB_HOST'):
+    DATABASES = {
+        'default': {
+            'ENGINE': 'servicesbladi.db.mysql',
+            'NAME': os.environ.get('BENCH_DB_NAME', 'servicesbladi_bench'),
+            'USER': os.environ.get('BENCH_DB_USER', 'root'),
+            'PASSWORD': os.environ.get('BENCH_DB_PASSWORD', ''),
+            'HOST': os.environ['BENCH_DB_HOST'],
+            'PORT': os.environ.get('BENCH_DB_PORT', '3306'),
+            'OPTIONS': {'init_command': "SET sql_mode='STRICT_TRANS_TABLES'"},
+            **DB_CONNECTION_SETTINGS,
+        }
+    }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'servicesbladi.db.sqlite3',
+            'NAME': os.environ.get('BENCH_DB_PATH', os.path.join(BASE_DIR, 'bench.sqlite3')),
+            **DB_CONNECTION_SETTINGS,
+        }
+    }
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'bench',
+        'TIMEOUT': 300,
+    }
+}
+
+CHANNEL_LAYER = 'memory'
+CHANNEL_LAYERS = {
+    'default': {
+        'BACKEND': 'channels.layers.InMemoryChannelLayer',
+    },
+}
+CHAT_PRESENCE_BACKEND = 'messaging.presence.MemoryPresence'
+
+# Dépôt : frontend/ est à côté de backend/ (copié dans backend/ au déploiement)
+REPO_FRONTEND_DIR = os.path.join(os.path.dirname(BASE_DIR), 'frontend')
+TEMPLATES = [
+    {**TEMPLATES[0], 'DIRS': TEMPLATES[0]['DIRS'] + [os.path.join(REPO_FRONTEND_DIR, 'template')]},
+]
+STATICFILES_DIRS = [
+    path for path in STATICFILES_DIRS + [os.path.join(REPO_FRONTEND_DIR, 'static')]
+    if os.path.isdir(path)
+]
+
+CSRF_COOKIE_SECURE = False
+SESSION_COOKIE_SECURE = False
+EMAIL_BACKEND = 'django.core.mail.backends.locmem.EmailBackend'
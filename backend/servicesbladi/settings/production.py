@@ -0,0 +1,43 @@
+"""
+Profil production : Azure App Service et MySQL Azure
+
+Chaque paramètre de connexion peut être remplacé par une variable
+d'environnement (DB_NAME, DB_USER, DB_PASSWORD, DB_HOST, DB_PORT).
+"""
+
+import os
+
+from .base import *  # noqa: F401,F403
+from .base import BASE_DIR, DB_CONNECTION_SETTINGS
+
+# Import Azure-specific configuration
+IS_AZURE = False  # Default to False
+SSL_CERT_PATH = os.path.join(BASE_DIR, 'BaltimoreCyberTrustRoot.crt.pem')  # Default for local
+
+try:
+    from azure_config import SSL_CERT_PATH as AZURE_SSL_CERT_PATH
+    IS_AZURE = True
+    # Override with Azure specific path if running in Azure
+    SSL_CERT_PATH = os.path.join(BASE_DIR, 'BaltimoreCyberTrustRoot.crt.pem')  # Use local copy instead of Azure path
+except ImportError:
+    # This block will execute in local development if azure_config.py is not found
+    pass
+
+# Define SSL options regardless of environment
+DATABASES_SSL_OPTIONS = {
+    'init_command': "SET sql_mode='STRICT_TRANS_TABLES'",
+    'ssl': False  # Disable SSL to allow non-secure connections
+}
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'servicesbladi.db.mysql',
+        'NAME': os.environ.get('DB_NAME', 'servicesbladi'),
+        'USER': os.environ.get('DB_USER', 'servicesbladiadmin'),
+        'PASSWORD': os.environ.get('DB_PASSWORD', 'Aa123456a'),
+        'HOST': os.environ.get('DB_HOST', 'servicesbladi.mysql.database.azure.com'),
+        'PORT': os.environ.get('DB_PORT', '3306'),
+        'OPTIONS': DATABASES_SSL_OPTIONS,
+        **DB_CONNECTION_SETTINGS,
+    }
+}
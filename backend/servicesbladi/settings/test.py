@@ -0,0 +1,55 @@
+"""
+Profil test : manage.py test sans service extérieur
+
+- base SQLite en mémoire (moteur servicesbladi.db.sqlite3, mesures comprises) ;
+- cache en mémoire du processus, channel layer et présence en mémoire ;
+- hachage de mots de passe rapide ;
+- gabarits et fichiers statiques lus dans ../frontend (arborescence du dépôt).
+
+Choisi d'office par ``manage.py test`` (settings/__init__.py), ou avec
+SERVICESBLADI_PROFILE=test.
+"""
+
+import os
+
+from .base import *  # noqa: F401,F403
+from .base import BASE_DIR, DB_CONNECTION_SETTINGS, STATICFILES_DIRS, TEMPLATES
+
+DEBUG = False
+ALLOWED_HOSTS = ['testserver', 'localhost', '127.0.0.1']
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'servicesbladi.db.sqlite3',
+        'NAME': ':memory:',
+        **DB_CONNECTION_SETTINGS,
+    }
+}
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'test',
+        'TIMEOUT': 300,
+    }
+}
+
+CHANNEL_LAYER = 'memory'
+CHANNEL_LAYERS = {
+    'default': {
+        'BACKEND': 'channels.layers.InMemoryChannelLayer',
+    },
+}
+CHAT_PRESENCE_BACKEND = 'messaging.presence.MemoryPresence'
+
+PASSWORD_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+
+# Dépôt : frontend/ est à côté de backend/ (copié dans backend/ au déploiement)
+REPO_FRONTEND_DIR = os.path.join(os.path.dirname(BASE_DIR), 'frontend')
+TEMPLATES = [
+    {**TEMPLATES[0], 'DIRS': TEMPLATES[0]['DIRS'] + [os.path.join(REPO_FRONTEND_DIR, 'template')]},
+]
+STATICFILES_DIRS = [
+    path for path in STATICFILES_DIRS + [os.path.join(REPO_FRONTEND_DIR, 'static')]
+    if os.path.isdir(path)
+]
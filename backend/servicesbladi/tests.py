@@ -0,0 +1,445 @@
+import importlib
+import os
+import tempfile
+import time
+from unittest import mock
+from io import StringIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import OperationalError, connection
+from django.db.utils import ConnectionHandler
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from custom_requests.models import Notification, ServiceRequest
+from messaging.models import Conversation
+from resources.models import FAQ
+
+from . import assets
+from . import cache as tiered_cache
+from . import db as db_metrics
+from .middleware import SESSION_REFRESH_KEY
+
+
+class SessionWriteTests(TestCase):
+    """La session n'est écrite que si son contenu change"""
+
+    def setUp(self):
+        assets.reset()
+        self.user = get_user_model().objects.create_user(
+            email='client@example.com', password='x', name='Client', first_name='C', account_type='client'
+        )
+        self.request = ServiceRequest.objects.create(
+            client=self.user, title='Dossier', description='d'
+        )
+        self.url = reverse('messaging:chat_history', args=[self.request.pk])
+
+    def tearDown(self):
+        assets.reset()
+
+    def session_writes(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        writes = [
+            query['sql'] for query in queries.captured_queries
+            if query['sql'].startswith(('INSERT', 'UPDATE')) and 'django_session' in query['sql']
+        ]
+        return response, writes
+
+    def test_plain_get_does_not_write_the_session(self):
+        self.client.force_login(self.user)
+        for _ in range(2):
+            response, writes = self.session_writes(self.url)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(writes, [])
+
+    def test_anonymous_visitor_gets_no_session(self):
+        response, writes = self.session_writes(self.url)
+        self.assertEqual(writes, [])
+        self.assertNotIn(settings.SESSION_COOKIE_NAME, response.cookies)
+
+    def test_active_session_is_refreshed_once_per_half_life(self):
+        self.client.force_login(self.user)
+        session = self.client.session
+        session[SESSION_REFRESH_KEY] = int(time.time()) - settings.SESSION_COOKIE_AGE
+        session.save()
+
+        _, writes = self.session_writes(self.url)
+        self.assertEqual(len(writes), 1)
+        _, writes = self.session_writes(self.url)
+        self.assertEqual(writes, [])
+
+    @override_settings(ASSET_VERSION='deploy-42')
+    def test_asset_version_comes_from_the_deployment(self):
+        from servicesbladi.context_processors import cache_version_context
+
+        request = RequestFactory().get('/')
+        self.assertEqual(cache_version_context(request)['cache_version'], 'deploy-42')
+        self.assertFalse(hasattr(request, 'session'))
+
+
+class HttpCachePolicyTests(TestCase):
+    """ETag, Last-Modified et 304 selon la politique déclarée par la vue"""
+
+    def setUp(self):
+        assets.reset()
+        self.faq = FAQ.objects.create(question='Question ?', answer='Réponse', language='fr')
+        self.user = get_user_model().objects.create_user(
+            email='client@example.com', password='x', name='Client', first_name='C', account_type='client'
+        )
+
+    def tearDown(self):
+        assets.reset()
+
+    def test_public_json_is_revalidated_by_content(self):
+        url = reverse('resources:api_faq_list')
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('public', response['Cache-Control'])
+        self.assertNotIn('no-store', response['Cache-Control'])
+        etag = response['ETag']
+        self.assertFalse(etag.startswith('W/'))
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+
+        self.faq.answer = 'Nouvelle réponse'
+        self.faq.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_catalog_page_answers_304_without_running_the_view(self):
+        url = reverse('resources:faq')
+        with mock.patch('resources.views.render', return_value=HttpResponse('FAQ')) as render:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertIn('Last-Modified', response)
+
+            not_modified = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+            self.assertEqual(not_modified.status_code, 304)
+            self.assertEqual(not_modified['ETag'], response['ETag'])
+            self.assertEqual(render.call_count, 1)
+
+            # Une suppression change aussi l'ETag
+            FAQ.objects.create(question='Autre ?', answer='R', language='fr').delete()
+            self.faq.delete()
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 200)
+
+    def test_public_page_is_private_for_a_logged_in_user(self):
+        self.client.force_login(self.user)
+        with mock.patch('resources.views.render', return_value=HttpResponse('FAQ')):
+            response = self.client.get(reverse('resources:faq'))
+        self.assertIn('private', response['Cache-Control'])
+        self.assertNotIn('public', response['Cache-Control'])
+
+    def test_page_with_csrf_token_is_never_public(self):
+        from django.middleware.csrf import get_token
+
+        def render_form(request, *args, **kwargs):
+            return HttpResponse(f'<input name="csrfmiddlewaretoken" value="{get_token(request)}">')
+
+        with mock.patch('resources.views.render', side_effect=render_form):
+            response = self.client.get(reverse('resources:faq'))
+        self.assertIn('private', response['Cache-Control'])
+        self.assertNotIn('public', response['Cache-Control'])
+
+        with mock.patch('services.views.render', side_effect=render_form):
+            response = self.client.get(reverse('services:service_list'))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('private', response['Cache-Control'])
+        self.assertNotIn('public', response['Cache-Control'])
+
+    def test_services_page_follows_related_models(self):
+        from services.models import Service, ServiceCategory, ServiceType
+
+        category = ServiceCategory.objects.create(name='Tourisme', slug='tourisme')
+        service_type = ServiceType.objects.create(category=category, name='Visa')
+        Service.objects.create(service_type=service_type, title='Visa', description='d', price=10)
+        url = reverse('services:service_list')
+
+        def status_after(change):
+            with mock.patch('services.views.render', return_value=HttpResponse('Services')):
+                etag = self.client.get(url)['ETag']
+                self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+                change()
+                return self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code
+
+        # Type de service renommé (pas de date de modification sur ServiceType)
+        service_type.name = 'Séjour'
+        self.assertEqual(status_after(service_type.save), 200)
+        self.assertEqual(status_after(lambda: get_user_model().objects.create_user(
+            email='expert@example.com', password='x', name='Expert', first_name='E', account_type='expert'
+        )), 200)
+
+    def test_private_api_and_undeclared_views(self):
+        Notification.objects.create(user=self.user, type='system', title='Titre', content='Contenu')
+        self.client.force_login(self.user)
+
+        response = self.client.get(reverse('custom_requests:api_notifications'))
+        self.assertIn('private', response['Cache-Control'])
+        self.assertEqual(
+            self.client.get(
+                reverse('custom_requests:api_notifications'), HTTP_IF_NONE_MATCH=response['ETag']
+            ).status_code,
+            304,
+        )
+
+        # Vue sans politique déclarée : toujours no-store, sans ETag aléatoire
+        service_request = ServiceRequest.objects.create(client=self.user, title='Dossier', description='d')
+        response = self.client.get(reverse('messaging:chat_history', args=[service_request.pk]))
+        self.assertIn('no-store', response['Cache-Control'])
+        self.assertNotIn('ETag', response)
+
+
+class TieredCacheTests(SimpleTestCase):
+    """Cache à deux niveaux : L1 mémoire devant un L2 partagé"""
+
+    def make_cache(self, name, l1_timeout=5):
+        return tiered_cache.TieredCache(name, {
+            'OPTIONS': {
+                'L1_TIMEOUT': l1_timeout,
+                'L1_EXCLUDE_PREFIXES': ('circuit:',),
+                'L2': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': name},
+            },
+        })
+
+    def setUp(self):
+        self.cache = self.make_cache(self.id())
+        self.cache.clear()
+        tiered_cache.reset_stats()
+
+    def test_l1_serves_repeated_reads(self):
+        self.cache.set('key', {'value': 1})
+        self.assertEqual(self.cache.get('key'), {'value': 1})
+        self.cache.get('key')['value'] = 2
+        self.assertEqual(self.cache.get('key'), {'value': 1})
+        self.assertEqual(tiered_cache.stats['l1_hits'], 3)
+        self.assertEqual(tiered_cache.stats['l2_hits'], 0)
+
+    def test_other_process_falls_back_to_l2(self):
+        self.cache.set('key', 'value')
+        self.cache.l1.clear()
+        self.assertEqual(self.cache.get('key'), 'value')
+        self.assertEqual(self.cache.get('key'), 'value')
+        self.assertEqual(tiered_cache.stats, {
+            'l1_hits': 1, 'l1_misses': 1, 'l2_hits': 1, 'l2_misses': 0, 'l2_errors': 0,
+        })
+        self.assertIsNone(self.cache.get('missing'))
+        self.assertEqual(tiered_cache.stats['l2_misses'], 1)
+
+    def test_l1_entries_expire_quickly(self):
+        self.cache = self.make_cache(self.id() + '-short', l1_timeout=0.05)
+        self.cache.set('key', 'value')
+        self.cache.l2.set('key', 'changed elsewhere')
+        self.assertEqual(self.cache.get('key'), 'value')
+        time.sleep(0.06)
+        self.assertEqual(self.cache.get('key'), 'changed elsewhere')
+
+    def test_writes_and_versions_invalidate_both_tiers(self):
+        self.cache.set('key', 'value')
+        self.cache.delete('key')
+        self.assertIsNone(self.cache.get('key'))
+
+        self.cache.set('key', 'v1')
+        self.cache.incr_version('key')
+        self.assertIsNone(self.cache.get('key'))
+        self.assertEqual(self.cache.get('key', version=2), 'v1')
+
+        self.cache.set_many({'a': 1, 'b': 2})
+        self.cache.l1.clear()
+        self.assertEqual(self.cache.get_many(['a', 'b', 'c']), {'a': 1, 'b': 2})
+        self.cache.delete_many(['a', 'b'])
+        self.assertEqual(self.cache.get_many(['a', 'b']), {})
+
+    def test_add_and_incr_follow_l2(self):
+        self.assertTrue(self.cache.add('counter', 1))
+        self.assertFalse(self.cache.add('counter', 5))
+        self.assertEqual(self.cache.incr('counter'), 2)
+        self.assertEqual(self.cache.get('counter'), 2)
+        with self.assertRaises(ValueError):
+            self.cache.incr('missing')
+
+    def test_excluded_keys_are_always_read_from_l2(self):
+        self.cache.set('circuit:gemini:open_until', 1)
+        self.assertTrue(self.cache.add('circuit:gemini:in_flight', 0))
+        self.assertEqual(self.cache.incr('circuit:gemini:in_flight'), 1)
+        # Écritures d'un autre processus : visibles immédiatement
+        self.cache.l2.set('circuit:gemini:open_until', 2)
+        self.cache.l2.incr('circuit:gemini:in_flight')
+        self.assertEqual(self.cache.get('circuit:gemini:open_until'), 2)
+        self.assertEqual(
+            self.cache.get_many(['circuit:gemini:open_until', 'circuit:gemini:in_flight']),
+            {'circuit:gemini:open_until': 2, 'circuit:gemini:in_flight': 2},
+        )
+        self.assertEqual(tiered_cache.stats['l1_hits'] + tiered_cache.stats['l1_misses'], 0)
+        self.assertEqual(len(self.cache.l1.entries), 0)
+
+    def test_l2_failure_is_a_miss(self):
+        with mock.patch.object(self.cache.l2, 'get', side_effect=ConnectionError('down')):
+            self.assertEqual(self.cache.get('key', 'default'), 'default')
+        with mock.patch.object(self.cache.l2, 'incr', side_effect=ConnectionError('down')):
+            with self.assertRaises(ValueError):
+                self.cache.incr('key')
+        self.assertEqual(tiered_cache.stats['l2_errors'], 2)
+
+
+class DatabaseConnectionPoolTests(SimpleTestCase):
+    """Moteurs servicesbladi.db : mesures et pool de connexions"""
+
+    def setUp(self):
+        handle, self.path = tempfile.mkstemp(suffix='.sqlite3')
+        os.close(handle)
+        self.addCleanup(os.remove, self.path)
+        self.addCleanup(db_metrics.close_pools)
+        db_metrics.close_pools()
+        db_metrics.reset_stats()
+
+    def make_handler(self, **pool):
+        return ConnectionHandler({
+            'default': {'ENGINE': 'django.db.backends.dummy'},
+            'pooled': {'ENGINE': 'servicesbladi.db.sqlite3', 'NAME': self.path, 'POOL': pool},
+        })
+
+    def test_closed_connections_are_reused(self):
+        handler = self.make_handler(SIZE=2)
+        first = handler.create_connection('pooled')
+        first.ensure_connection()
+        raw = first.connection
+        first.close()
+        second = handler.create_connection('pooled')
+        second.ensure_connection()
+        self.assertIs(second.connection, raw)
+        second.close()
+        self.assertEqual(db_metrics.stats['opened'], 1)
+        self.assertEqual(db_metrics.stats['reused'], 1)
+        self.assertEqual(db_metrics.snapshot()['pools']['pooled'], {'size': 2, 'idle': 1, 'in_use': 0})
+
+    def test_full_pool_waits_then_times_out(self):
+        handler = self.make_handler(SIZE=1, TIMEOUT=0.05)
+        holder = handler.create_connection('pooled')
+        holder.ensure_connection()
+        waiting = handler.create_connection('pooled')
+        with self.assertRaises(OperationalError):
+            waiting.ensure_connection()
+        self.assertEqual(db_metrics.stats['timeouts'], 1)
+        holder.close()
+        waiting.ensure_connection()
+        waiting.close()
+        self.assertEqual(db_metrics.stats['opened'], 1)
+
+    def test_broken_idle_connection_is_replaced(self):
+        handler = self.make_handler(SIZE=1, CHECK_IDLE=0)
+        first = handler.create_connection('pooled')
+        first.ensure_connection()
+        raw = first.connection
+        first.close()
+        raw.close()
+        second = handler.create_connection('pooled')
+        second.ensure_connection()
+        self.assertIsNot(second.connection, raw)
+        second.close()
+        self.assertEqual(db_metrics.stats['discarded'], 1)
+        self.assertEqual(db_metrics.stats['opened'], 2)
+
+    def test_uncommitted_work_is_rolled_back_before_reuse(self):
+        handler = self.make_handler(SIZE=1)
+        setup = handler.create_connection('pooled')
+        with setup.cursor() as cursor:
+            cursor.execute('CREATE TABLE pooled_item (id INTEGER PRIMARY KEY)')
+        setup.close()
+
+        writer = handler.create_connection('pooled')
+        writer.set_autocommit(False)
+        with writer.cursor() as cursor:
+            cursor.execute('INSERT INTO pooled_item (id) VALUES (1)')
+        writer.close()
+
+        reader = handler.create_connection('pooled')
+        with reader.cursor() as cursor:
+            cursor.execute('SELECT COUNT(*) FROM pooled_item')
+            self.assertEqual(cursor.fetchone()[0], 0)
+        self.assertTrue(reader.get_autocommit())
+        reader.close()
+
+    def test_without_pool_connections_are_only_counted(self):
+        connection = self.make_handler().create_connection('pooled')
+        connection.ensure_connection()
+        connection.close()
+        self.assertEqual(db_metrics.stats['opened'], 1)
+        self.assertEqual(db_metrics.stats['closed'], 1)
+        self.assertEqual(db_metrics.snapshot()['pools'], {})
+
+
+class DatabaseStatusViewTests(TestCase):
+    def test_staff_only(self):
+        user = get_user_model().objects.create_user(
+            email='staff@example.com', password='x', name='Staff', first_name='S', account_type='admin'
+        )
+        self.client.force_login(user)
+        self.assertEqual(self.client.get(reverse('db_status')).status_code, 403)
+        user.is_staff = True
+        user.save()
+        response = self.client.get(reverse('db_status'))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('opened', response.json())
+
+
+class BenchProfileTests(TestCase):
+    """Profil de réglages bench et commande manage.py bench"""
+
+    def test_bench_profile_needs_no_external_service(self):
+        # Variables de la production présentes : ignorées par le profil bench
+        with mock.patch.dict(os.environ, {'DB_HOST': 'prod.example.com', 'BENCH_DB_HOST': ''}):
+            bench = importlib.reload(importlib.import_module('servicesbladi.settings.bench'))
+        self.assertTrue(bench.BENCH_PROFILE)
+        self.assertEqual(bench.DATABASES['default']['ENGINE'], 'servicesbladi.db.sqlite3')
+        self.assertEqual(bench.CACHES['default']['BACKEND'], 'django.core.cache.backends.locmem.LocMemCache')
+        self.assertEqual(bench.CHANNEL_LAYERS['default']['BACKEND'], 'channels.layers.InMemoryChannelLayer')
+
+    @override_settings(BENCH_PROFILE=False)
+    def test_command_refuses_other_profiles(self):
+        with self.assertRaises(CommandError):
+            call_command('bench', stdout=StringIO())
+
+    @override_settings(BENCH_PROFILE=True)
+    def test_seed_and_measure(self):
+        out = StringIO()
+        call_command(
+            'bench', clients=4, experts=2, requests_per_client=2, messages_per_request=5,
+            notifications_per_client=3, resources=5, iterations=2, users=2, stdout=out,
+        )
+        output = out.getvalue()
+        self.assertIn('4 clients', output)
+        self.assertIn('40 messages', output)
+        self.assertIn('Historique (API)', output)
+        self.assertIn('✓ Benchmark terminé', output)
+        self.assertEqual(Conversation.objects.filter(unread_count__gt=0).exists(), True)
+        self.assertNotIn('erreur', output)
+
+    @override_settings(BENCH_PROFILE=True)
+    def test_command_refuses_the_production_database(self):
+        production = {'HOST': 'prod.example.com', 'NAME': 'servicesbladi'}
+        with mock.patch.dict(os.environ, {'DB_HOST': 'prod.example.com', 'DB_NAME': 'servicesbladi'}), \
+                mock.patch.object(connection, 'vendor', 'mysql'), \
+                mock.patch.dict(connection.settings_dict, production):
+            with self.assertRaisesMessage(CommandError, 'production'):
+                call_command('bench', reseed=True, stdout=StringIO())
+
+    @override_settings(BENCH_PROFILE=True)
+    def test_view_errors_fail_the_command(self):
+        from servicesbladi.management.commands.bench import Command
+
+        views = [('Page absente', lambda request: '/bench-page-absente/', False)]
+        with mock.patch.object(Command, 'hot_views', return_value=views):
+            with self.assertRaisesMessage(CommandError, 'Page absente'):
+                call_command(
+                    'bench', clients=2, experts=1, requests_per_client=1, messages_per_request=2,
+                    notifications_per_client=1, resources=1, iterations=2, users=1, stdout=StringIO(),
+                )
@@ -25,6 +25,7 @@ from django.http import JsonResponse
 
 # Import message_views from custom_requests app for direct URL mapping
 from custom_requests.message_views import expert_check_messages
+from servicesbladi import db as db_metrics
 
 # Add a redirect for the secure admin login
 def admin_login_redirect(request):
@@ -34,6 +35,12 @@ def admin_login_redirect(request):
 def status_check(request):
     return JsonResponse({"status": "ok", "message": "Django server is working"})
 
+# Connexions à la base ouvertes par ce processus (servicesbladi.db), pour l'équipe
+def db_status(request):
+    if not request.user.is_staff:
+        return JsonResponse({"error": "Forbidden"}, status=403)
+    return JsonResponse(db_metrics.snapshot())
+
 urlpatterns = [
     path('django-admin/', admin.site.urls),  # Renamed Django admin URL to avoid conflicts
     
@@ -41,6 +48,7 @@ urlpatterns = [
     path('management/secure8765/login/', admin_login_redirect),
     
     path('status/', status_check, name='status_check'),
+    path('status/db/', db_status, name='db_status'),
 
     # Include URLs from each app
     path('accounts/', include('accounts.urls')),
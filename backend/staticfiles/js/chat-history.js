@@ -0,0 +1,144 @@
+/**
+ * chat-history.js - Chargement de l'historique d'une conversation au défilement
+ *
+ * La page de discussion n'affiche que la dernière page de messages. Quand
+ * l'utilisateur remonte en haut de #chat-messages, la page précédente est
+ * demandée à data-history-url (?before=<curseur>) puis insérée avant les
+ * messages affichés, sans déplacer la position de lecture.
+ *
+ * Attributs de #chat-messages : data-history-url, data-history-cursor,
+ * data-has-more ("true" / "false"), data-user-id et, pour la vue
+ * administrateur, data-client-id / data-expert-id.
+ */
+
+(function() {
+    'use strict';
+
+    if (window.chatHistory) {
+        return;
+    }
+
+    const config = {
+        threshold: 80   // Distance au haut de la liste déclenchant le chargement (px)
+    };
+
+    function escapeHtml(value) {
+        return String(value || '')
+            .replace(/&/g, '&amp;')
+            .replace(/</g, '&lt;')
+            .replace(/>/g, '&gt;')
+            .replace(/"/g, '&quot;')
+            .replace(/'/g, '&#x27;');
+    }
+
+    function formatDate(value) {
+        return new Date(value).toLocaleString('fr-FR', {
+            day: '2-digit', month: '2-digit', year: 'numeric',
+            hour: '2-digit', minute: '2-digit'
+        });
+    }
+
+    function render(container, message) {
+        const element = document.createElement('div');
+        const data = container.dataset;
+        let sender = escapeHtml(message.sender_name);
+        let className;
+
+        if (data.clientId) {
+            // Vue administrateur : le rôle de l'expéditeur plutôt que le sens
+            if (String(message.sender_id) === data.clientId) {
+                className = 'message-client';
+                sender = 'Client: ' + sender;
+            } else if (String(message.sender_id) === data.expertId) {
+                className = 'message-expert';
+                sender = 'Expert: ' + sender;
+            } else {
+                className = 'message-incoming';
+                sender = 'Admin: ' + sender;
+            }
+        } else if (String(message.sender_id) === data.userId) {
+            className = 'message-outgoing';
+            sender = 'Vous';
+        } else {
+            className = 'message-incoming';
+        }
+
+        element.className = 'message ' + className;
+        element.dataset.messageId = message.id;
+        element.innerHTML = `
+            <div class="message-sender">${sender}</div>
+            <div class="message-content">${escapeHtml(message.message).slice(0, 2000)}</div>
+            <div class="message-timestamp">${formatDate(message.timestamp)}</div>
+        `;
+        return element;
+    }
+
+    function init() {
+        const container = document.getElementById('chat-messages');
+        if (!container || !container.dataset.historyUrl) {
+            return;
+        }
+
+        let cursor = container.dataset.historyCursor;
+        let hasMore = container.dataset.hasMore === 'true';
+        let loading = false;
+
+        function loadOlder() {
+            if (loading || !hasMore || !cursor) {
+                return;
+            }
+            loading = true;
+
+            fetch(container.dataset.historyUrl + '?before=' + encodeURIComponent(cursor), {
+                credentials: 'same-origin',
+                headers: {'X-Requested-With': 'XMLHttpRequest'}
+            })
+            .then(function(response) {
+                if (!response.ok) {
+                    throw new Error('HTTP ' + response.status);
+                }
+                return response.json();
+            })
+            .then(function(data) {
+                const previousHeight = container.scrollHeight;
+                const fragment = document.createDocumentFragment();
+                data.messages.forEach(function(message) {
+                    fragment.appendChild(render(container, message));
+                });
+                container.insertBefore(fragment, container.firstChild);
+                // Garder sous les yeux le message qui était en haut
+                container.scrollTop += container.scrollHeight - previousHeight;
+
+                if (data.messages.length) {
+                    cursor = data.messages[0].cursor;
+                    window.chatHistory.loadedOlder = true;
+                }
+                hasMore = data.has_more;
+            })
+            .catch(function(error) {
+                console.error("Erreur lors du chargement de l'historique:", error);
+                hasMore = false;
+            })
+            .finally(function() {
+                loading = false;
+            });
+        }
+
+        container.addEventListener('scroll', function() {
+            if (container.scrollTop < config.threshold) {
+                loadOlder();
+            }
+        }, {passive: true});
+    }
+
+    window.chatHistory = {
+        loadedOlder: false,
+        init: init
+    };
+
+    if (document.readyState === 'loading') {
+        document.addEventListener('DOMContentLoaded', init);
+    } else {
+        init();
+    }
+})();
@@ -14,6 +14,7 @@
     let maxPollFrequency = 5000; // ms
     let consecutiveErrorCount = 0;
     let maxConsecutiveErrors = 3;
+    let pollInterval = null;
     
     // Safely get and parse contact ID
     function getSafeContactId() {
@@ -151,9 +152,10 @@
                 consecutiveErrorCount++;
                 
                 // If we've had too many consecutive errors, stop polling
-                if (consecutiveErrorCount >= maxConsecutiveErrors) {
+                if (pollInterval && consecutiveErrorCount >= maxConsecutiveErrors) {
                     console.warn('Disabling message polling due to consecutive errors');
                     clearInterval(pollInterval);
+                    pollInterval = null;
                 }
             })
             .finally(() => {
@@ -173,23 +175,35 @@
             // Setup contact clicks safely
             setupSafeContactClicks();
             
-            // Setup polling with increasing backoff on errors
-            let pollInterval = setInterval(() => {
-                // Increase polling time based on consecutive errors
-                maxPollFrequency = 5000 + (consecutiveErrorCount * 5000);
-                
-                // Cap at 30 seconds
-                if (maxPollFrequency > 30000) {
-                    maxPollFrequency = 30000;
-                }
+            if (window.servicesbladiNotifications) {
+                // Push enabled (NOTIFICATIONS_PUSH, realtime-notifications.js loaded):
+                // check the conversation only when the active contact wrote to us
+                maxPollFrequency = 1000;
+                document.addEventListener('servicesbladi:notification', (event) => {
+                    const detail = event.detail || {};
+                    if (detail.kind === 'message' && detail.sender_id === getSafeContactId()) {
+                        safeCheckNewMessages();
+                    }
+                });
+            } else {
+                // Setup polling with increasing backoff on errors
+                pollInterval = setInterval(() => {
+                    // Increase polling time based on consecutive errors
+                    maxPollFrequency = 5000 + (consecutiveErrorCount * 5000);
+                    
+                    // Cap at 30 seconds
+                    if (maxPollFrequency > 30000) {
+                        maxPollFrequency = 30000;
+                    }
+                    
+                    safeCheckNewMessages();
+                }, 10000);
                 
-                safeCheckNewMessages();
-            }, 10000);
-            
-            // Clean up when leaving the page
-            window.addEventListener('beforeunload', () => {
-                clearInterval(pollInterval);
-            });
+                // Clean up when leaving the page
+                window.addEventListener('beforeunload', () => {
+                    clearInterval(pollInterval);
+                });
+            }
             
             console.log('Messaging safety enhancements loaded successfully');
         } catch (error) {
@@ -0,0 +1,131 @@
+/**
+ * realtime-notifications.js - Nouveaux messages et notifications en temps réel
+ *
+ * Ouvre le canal personnel ws/notifications/ et diffuse chaque événement reçu
+ * sous la forme d'un CustomEvent "servicesbladi:notification" sur document
+ * (detail.kind vaut "message" ou "notification"). Si le WebSocket n'est pas
+ * disponible, bascule sur le long-polling de /messaging/notifications/poll/
+ * (une requête en attente à la fois, avec le dernier curseur reçu).
+ */
+
+(function() {
+    'use strict';
+
+    if (window.servicesbladiNotifications) {
+        return;
+    }
+
+    const config = {
+        socketPath: '/ws/notifications/',
+        pollUrl: '/messaging/notifications/poll/',
+        maxSocketFailures: 3,   // Échecs consécutifs avant le long-polling
+        pollErrorDelay: 30000   // Pause après une erreur de long-polling (ms)
+    };
+
+    let socket = null;
+    let socketFailures = 0;
+    let cursor = null;
+    let polling = false;
+
+    function emit(detail) {
+        document.dispatchEvent(new CustomEvent('servicesbladi:notification', {detail: detail}));
+
+        if (detail.kind === 'notification') {
+            document.querySelectorAll('.notification-badge').forEach(function(badge) {
+                badge.textContent = (parseInt(badge.textContent, 10) || 0) + 1;
+            });
+        }
+    }
+
+    function updateBadges(state) {
+        document.querySelectorAll('.notification-badge').forEach(function(badge) {
+            badge.textContent = state.unread_notifications;
+        });
+    }
+
+    function connect() {
+        const scheme = window.location.protocol === 'https:' ? 'wss://' : 'ws://';
+        try {
+            socket = new WebSocket(scheme + window.location.host + config.socketPath);
+        } catch (error) {
+            startPolling();
+            return;
+        }
+
+        socket.onopen = function() {
+            socketFailures = 0;
+        };
+
+        socket.onmessage = function(e) {
+            try {
+                emit(JSON.parse(e.data));
+            } catch (error) {
+                console.error('Notification invalide:', error);
+            }
+        };
+
+        socket.onclose = function() {
+            socketFailures++;
+            if (socketFailures >= config.maxSocketFailures) {
+                startPolling();
+                return;
+            }
+            setTimeout(connect, Math.pow(2, socketFailures) * 1000);
+        };
+    }
+
+    function startPolling() {
+        if (!polling) {
+            polling = true;
+            poll();
+        }
+    }
+
+    function poll() {
+        const url = config.pollUrl + (cursor ? '?cursor=' + encodeURIComponent(cursor) : '');
+        fetch(url, {
+            credentials: 'same-origin',
+            headers: {'X-Requested-With': 'XMLHttpRequest'}
+        })
+        .then(function(response) {
+            if (response.status === 304) {
+                return null;
+            }
+            if (!response.ok) {
+                throw new Error('HTTP ' + response.status);
+            }
+            return response.json();
+        })
+        .then(function(data) {
+            if (data) {
+                // Premier appel : simple prise de curseur
+                if (cursor !== null) {
+                    data.events.forEach(emit);
+                    updateBadges(data);
+                }
+                cursor = data.cursor;
+            }
+            poll();
+        })
+        .catch(function(error) {
+            console.error('Erreur de long-polling des notifications:', error);
+            setTimeout(poll, config.pollErrorDelay);
+        });
+    }
+
+    window.servicesbladiNotifications = {
+        start: function() {
+            if ('WebSocket' in window) {
+                connect();
+            } else {
+                startPolling();
+            }
+        }
+    };
+
+    if (document.readyState === 'loading') {
+        document.addEventListener('DOMContentLoaded', window.servicesbladiNotifications.start);
+    } else {
+        window.servicesbladiNotifications.start();
+    }
+})();